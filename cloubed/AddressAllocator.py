@@ -0,0 +1,274 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" AddressAllocator class of Cloubed """
+
+import os
+import json
+import ipaddress
+import logging
+
+from cloubed.Utils import gen_mac, state_path, write_state
+from cloubed.CloubedException import CloubedException
+
+class AddressAllocator:
+
+    """AddressAllocator class
+
+       It allocates the MAC addresses of the network interfaces of the whole
+       testbed and the IP addresses of the interfaces with automatic IP on each
+       Network.
+
+       The MAC addresses are derived from the names of the domain and the
+       network. On collision with another address of the testbed, the salt is
+       rehashed until a free address is found. The IP addresses are allocated
+       in a bitmap of the addresses of the subnet of each Network, out of the
+       host address and the DHCP range.
+
+       The automatic IP addresses and the generated MAC addresses are recorded
+       in a lease file in the state directory so that they remain stable
+       between runs, even if the testbed changes. Otherwise, a new interface
+       whose address collides with the address of an existing interface could
+       take it over in the next run.
+    """
+
+    def __init__(self):
+
+        self._path = state_path('leases.json')
+        self._leases = { 'macs': {}, 'ips': {} }
+        if os.path.exists(self._path):
+            with open(self._path) as leases_file:
+                self._leases = json.load(leases_file)
+        self._changed = False
+
+        self._macs = {}     # owner keys indexed by MAC addresses
+        self._mac_keys = {} # MAC addresses indexed by owner keys
+        self._keys = { 'macs': set(), 'ips': set() } # keys given in this run
+        self._bitmaps = {}  # allocation state indexed by network names
+
+    def __bitmap(self, network):
+        """Returns the allocation state of the Network, creating it with the
+           host address, the DHCP range and the leases reserved if needed. The
+           state is a dict with the subnet, the bitmap of used addresses, the
+           owner keys indexed by the addresses indexes, the reverse dict and
+           the index of the first byte of the bitmap which may have a free
+           address.
+        """
+
+        if network.name in self._bitmaps:
+            return self._bitmaps[network.name]
+
+        subnet = network.get_subnet()
+        if subnet is None:
+            raise CloubedException("unable to allocate IP address on network " \
+                                   "{network} since it does not have any " \
+                                   "address".format(network=network.name))
+
+        # one bit per address of the subnet
+        bitmap = bytearray((subnet.num_addresses + 7) // 8)
+        state = { 'subnet': subnet,
+                  'bitmap': bitmap,
+                  'owners': {},
+                  'indexes': {},
+                  'hint': 0 }
+        self._bitmaps[network.name] = state
+
+        first = int(subnet.network_address)
+        AddressAllocator.__set(bitmap, 0)
+        AddressAllocator.__set(bitmap, subnet.num_addresses - 1)
+        AddressAllocator.__set(bitmap, int(ipaddress.IPv4Address(
+                                               network.ip_host)) - first)
+        dhcp_range = network.get_dhcp_range()
+        if dhcp_range is not None:
+            start = max(int(ipaddress.IPv4Address(dhcp_range[0])) - first, 0)
+            end = min(int(ipaddress.IPv4Address(dhcp_range[1])) - first,
+                      subnet.num_addresses - 1)
+            for index in range(start, end + 1):
+                AddressAllocator.__set(bitmap, index)
+
+        # reserve the leases of previous runs
+        for key, ip in self._leases['ips'].get(network.name, {}).items():
+            index = self.__index(subnet, ip)
+            if index is None or AddressAllocator.__isset(bitmap, index):
+                continue
+            AddressAllocator.__set(bitmap, index)
+            state['owners'][index] = key
+            state['indexes'][key] = index
+
+        return state
+
+    @staticmethod
+    def __set(bitmap, index):
+        bitmap[index >> 3] |= 1 << (index & 7)
+
+    @staticmethod
+    def __isset(bitmap, index):
+        return bitmap[index >> 3] & (1 << (index & 7)) != 0
+
+    @staticmethod
+    def __index(subnet, ip):
+        """Returns the index of the IP address in the subnet or None if it is
+           not valid or out of the subnet.
+        """
+
+        try:
+            address = ipaddress.IPv4Address(ip)
+        except ValueError:
+            return None
+        if address not in subnet:
+            return None
+        return int(address) - int(subnet.network_address)
+
+    def __unique_key(self, key, kind):
+        """Returns the key in parameter, suffixed with a counter if it has
+           already been given in this run for the same kind of address.
+        """
+
+        unique_key = key
+        counter = 1
+        while unique_key in self._keys[kind]:
+            counter += 1
+            unique_key = "{key}-{counter}".format(key=key, counter=counter)
+        self._keys[kind].add(unique_key)
+        return unique_key
+
+    def reserve_mac(self, mac):
+        """Reserves the MAC address statically set on a network interface so
+           that it is not allocated to another one.
+
+           :param string mac: the MAC address
+        """
+
+        self._macs[mac.lower()] = None
+
+    def reserve_ip(self, network, ip):
+        """Reserves the IP address statically set on a network interface so
+           that it is not allocated to another one.
+
+           :param Network network: the Network of the IP address
+           :param string ip: the IP address
+        """
+
+        # addresses on networks without subnet are never allocated
+        if network.get_subnet() is None:
+            return
+        state = self.__bitmap(network)
+        index = AddressAllocator.__index(state['subnet'], ip)
+        if index is None:
+            return
+        # a static address has priority over a lease
+        key = state['owners'].pop(index, None)
+        if key is not None:
+            del state['indexes'][key]
+        AddressAllocator.__set(state['bitmap'], index)
+
+    def load_macs(self):
+        """Reserves the MAC addresses leased in previous runs. This must be
+           called after all static MAC addresses are reserved.
+        """
+
+        for key, mac in self._leases['macs'].items():
+            if mac not in self._macs:
+                self._macs[mac] = key
+                self._mac_keys[key] = mac
+
+    def mac(self, key):
+        """Returns the MAC address of the network interface identified by key.
+
+           :param string key: the identifier of the network interface
+        """
+
+        key = self.__unique_key(key, 'macs')
+        if key in self._mac_keys:
+            return self._mac_keys[key]
+
+        mac = gen_mac(key)
+        attempt = 0
+        while mac in self._macs:
+            attempt += 1
+            mac = gen_mac("{key}#{attempt}".format(key=key, attempt=attempt))
+        self._macs[mac] = key
+        self._mac_keys[key] = mac
+
+        if attempt:
+            logging.debug("MAC address of {key} rehashed {attempt} times " \
+                          "due to collisions".format(key=key, attempt=attempt))
+
+        if self._leases['macs'].get(key) != mac:
+            self._leases['macs'][key] = mac
+            self._changed = True
+
+        return mac
+
+    def ip(self, network, key):
+        """Returns the IP address allocated on the Network to the network
+           interface identified by key.
+
+           :param Network network: the Network of the network interface
+           :param string key: the identifier of the network interface
+           :exceptions CloubedException:
+               * the network does not have any address
+               * there is not any free address left in the network
+        """
+
+        key = self.__unique_key(key, 'ips')
+        state = self.__bitmap(network)
+        subnet = state['subnet']
+        bitmap = state['bitmap']
+
+        if key in state['indexes']:
+            return str(subnet.network_address + state['indexes'][key])
+
+        # search the first byte with a free address, starting from the hint
+        # since addresses are never released during a run
+        index = None
+        for byte_index in range(state['hint'], len(bitmap)):
+            byte = bitmap[byte_index]
+            if byte != 0xff:
+                # position of the lowest unset bit of the byte
+                bit = (~byte & (byte + 1)).bit_length() - 1
+                index = byte_index * 8 + bit
+                state['hint'] = byte_index
+                break
+        if index is None or index >= subnet.num_addresses:
+            raise CloubedException("unable to allocate IP address on network " \
+                                   "{network} since all addresses are used" \
+                                       .format(network=network.name))
+
+        AddressAllocator.__set(bitmap, index)
+        state['owners'][index] = key
+        state['indexes'][key] = index
+        ip = str(subnet.network_address + index)
+        self._leases['ips'].setdefault(network.name, {})[key] = ip
+        self._changed = True
+        logging.debug("allocated IP address {ip} to {key} on network " \
+                      "{network}".format(ip=ip, key=key, network=network.name))
+        return ip
+
+    def save(self):
+        """Writes the leases in the state file if they have changed. This is
+           called by the actions which give the addresses to libvirt only, so
+           that the read-only commands do not write any state.
+        """
+
+        if self._changed:
+            write_state(self._path, self._leases)
+            self._changed = False
@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" AsyncEventManager class of Cloubed """
+
+import logging
+
+from cloubed.VirtController import VirtController
+from cloubed.DomainEvent import DomainEvent
+from cloubed.DomainEventStream import DomainEventStream
+from cloubed.EventJournal import EventJournal
+from cloubed.CloubedException import CloubedException
+
+class AsyncEventManager:
+
+    """AsyncEventManager class
+
+       Event manager for programs running an asyncio event loop. The event
+       implementation of libvirt is registered on the loop so that the events
+       are dispatched by the loop itself, without thread nor polling. The
+       events are delivered to the DomainEventStreams opened on the domains.
+
+       Only one event implementation can be registered in a process, the
+       AsyncEventManager therefore cannot be used along with the
+       EventManager.
+    """
+
+    def __init__(self, tbd, loop=None):
+
+        self.tbd = tbd
+        # streams indexed by domain names
+        self._streams = {}
+        self.journal = EventJournal()
+
+        VirtController.event_register_asyncio(loop)
+
+        self._ctl = VirtController(read_only=True)
+        self._callback_ids = self._ctl.domain_event_register(
+                                 self.manage_event)
+        self._ctl.setKeepAlive(5, 3)
+
+        logging.debug("initialized asyncio event manager")
+
+    def events(self, domain_name):
+
+        """Returns a new DomainEventStream of the events of the domain.
+
+           :param string domain_name: the name of the domain
+           :exceptions CloubedException:
+               * the domain is not found in the testbed
+        """
+
+        # check the domain exists
+        self.tbd.get_domain_by_name(domain_name)
+        stream = DomainEventStream(self, domain_name)
+        self._streams.setdefault(domain_name, []).append(stream)
+        return stream
+
+    def unsubscribe(self, stream):
+
+        """Removes the stream from the streams of its domain."""
+
+        streams = self._streams.get(stream.domain_name, [])
+        if stream in streams:
+            streams.remove(stream)
+
+    async def wait_event(self, domain_name, event):
+
+        """Waits until the domain is notified with the event in parameter.
+
+           :param string domain_name: the name of the domain
+           :param DomainEvent event: the awaited event
+        """
+
+        async with self.events(domain_name) as stream:
+            async for loop_event in stream:
+                if loop_event == event:
+                    logging.info("domain {domain}: waited event {event} " \
+                                 "found!".format(domain=domain_name,
+                                                 event=loop_event))
+                    return
+
+    def manage_event(self, dom, event_id, args):
+
+        """Handler called within the event loop by libvirt in case of event"""
+
+        event = DomainEvent.from_libvirt(event_id, args)
+        logging.debug("event on domain {domain_name}({domain_id}) " \
+                      "{event_type} {event_detail}" \
+                          .format(domain_name=dom.name(),
+                                  domain_id=dom.ID(),
+                                  event_type=event.type,
+                                  event_detail=event.detail))
+
+        # test if notified event comes from a domain in current testbed
+        try:
+            domain = self.tbd.get_domain_by_libvirt_name(dom.name())
+        except CloubedException:
+            logging.debug("event received for domain {domain} but not found " \
+                          "in testbed".format(domain=dom.name()))
+            return
+
+        self.journal.append(domain.name, event)
+        for stream in list(self._streams.get(domain.name, [])):
+            stream.put(event)
+
+    def terminate(self):
+
+        """Deregisters the event handler and closes all the streams."""
+
+        logging.debug("terminating asyncio event manager")
+        self._ctl.domain_event_deregister(self._callback_ids)
+        self._callback_ids = []
+        for streams in list(self._streams.values()):
+            for stream in list(streams):
+                stream.close()
+        self.journal.close()
@@ -23,20 +23,34 @@
 
 import sys
 import os
+import re
+import json
+import time
 import logging
+import ipaddress
 import _thread
 
 from cloubed.VirtController import VirtController
 from cloubed.StoragePool import StoragePool
 from cloubed.StorageVolume import StorageVolume
+from cloubed.ImageCache import ImageCache
 from cloubed.Domain import Domain
 from cloubed.Network import Network
+from cloubed.NetworkIndex import NetworkIndex
+from cloubed.AddressAllocator import AddressAllocator
 from cloubed.EventManager import EventManager
+from cloubed.AsyncEventManager import AsyncEventManager
+from cloubed.EventJournal import EventJournal
+from cloubed.Timeline import Timeline
 from cloubed.conf.Configuration import Configuration
-from cloubed.conf.ConfigurationLoader import ConfigurationLoader
+from cloubed.conf.ConfigurationCache import ConfigurationCache
 from cloubed.HTTPServer import HTTPServer
+from cloubed.HTTPProxyCache import HTTPProxyCache
+from cloubed.HTTPUploads import HTTPUploads
+from cloubed.TFTPServer import TFTPServer
 from cloubed.DomainEvent import DomainEvent
 from cloubed.CloubedException import CloubedException
+from cloubed.Utils import run_parallel, state_path, write_state
 
 class Singleton(type):
 
@@ -81,63 +95,130 @@ class Cloubed(metaclass=Singleton):
         # self.launch_event_manager() in self.wait_event()
         #
         self._event_manager = None
+        # AsyncEventManager, None at the beginning. Initialized by
+        # self.async_event_manager() for programs running an asyncio loop
+        self._async_event_manager = None
+
+        # timed spans of the operations on the testbed
+        self._timeline = Timeline()
 
         #
         # parse configuration file
         #
+        self._conf_loader = conf_loader
         if conf_loader:
-            self._conf_loader = conf_loader
+            self._conf = Configuration(self._conf_loader)
         else:
             configuration_filename = os.path.join(os.getcwd(), "cloubed.yaml")
-            self._conf_loader = ConfigurationLoader(configuration_filename)
-        self._conf = Configuration(self._conf_loader)
+            # the unmodified configuration is not parsed again
+            self._conf = ConfigurationCache().load(configuration_filename)
         self._name = self._conf.testbed
+
+        #
+        # initialize image cache, if defined
+        #
+        self._image_cache = None
+        if self._conf.image_cache is not None:
+            logging.info("initializing image cache")
+            self._image_cache = ImageCache(self, self._conf.image_cache)
     
         #
         # initialize storage pools
         #    
         self._storage_pools = []
+        self._storage_pools_by_name = {}
         for storage_pool_conf in self._conf.storage_pools:
             logging.info("initializing storage pool {name}" \
                              .format(name=storage_pool_conf.name))
-            self._storage_pools.append(StoragePool(self,
-                                                   storage_pool_conf))
+            storage_pool = StoragePool(self, storage_pool_conf)
+            self._storage_pools.append(storage_pool)
+            self._storage_pools_by_name[storage_pool.name] = storage_pool
     
         #
         # initialize storage volumes
         #
         self._storage_volumes = []
+        self._storage_volumes_by_name = {}
         for storage_volume_conf in self._conf.storage_volumes:
             logging.info("initializing storage volume {name}" \
                              .format(name=storage_volume_conf.name))
-            self._storage_volumes.append(StorageVolume(self,
-                                                       storage_volume_conf))
+            storage_volume = StorageVolume(self, storage_volume_conf)
+            self._storage_volumes.append(storage_volume)
+            self._storage_volumes_by_name[storage_volume.name] = \
+                storage_volume
     
         #
         # initialize networks
         #
         self._networks = []
+        self._networks_by_name = {}
         for network_conf in self._conf.networks:
             logging.info("initializing network {name}" \
                              .format(name=network_conf.name))
-            self._networks.append(Network(self,
-                                          network_conf))
+            network = Network(self, network_conf)
+            self._networks.append(network)
+            self._networks_by_name[network.name] = network
+        # index of active networks in libvirt, built lazily
+        self._network_index = None
+
+        #
+        # initialize address allocator with static addresses reserved first
+        #
+        self._address_allocator = AddressAllocator()
+        for domain_conf in self._conf.domains:
+            for netif_conf in domain_conf.netifs:
+                if "mac" in netif_conf:
+                    self._address_allocator.reserve_mac(netif_conf["mac"])
+                if netif_conf.get("ip", "auto") != "auto":
+                    self._address_allocator.reserve_ip(
+                        self.get_network_by_name(netif_conf["network"]),
+                        netif_conf["ip"])
+        self._address_allocator.load_macs()
 
         #
         # initialize domain and templates
         #
         self._domains = []
+        self._domains_by_name = {}
+        self._domains_by_libvirt_name = {}
         for domain_conf in self._conf.domains:
             logging.info("initializing domain {name}" \
                              .format(name=domain_conf.name))
-            self._domains.append(Domain(self,
-                                        domain_conf))
+            domain = Domain(self, domain_conf)
+            self._domains.append(domain)
+            self._domains_by_name[domain.name] = domain
+            self._domains_by_libvirt_name[domain.libvirt_name] = domain
+
+        # index the domains by the addresses of their network interfaces to
+        # identify the clients of the HTTP server
+        self._domains_by_ip = {}
+        self._domains_by_mac = {}
+        for domain in self._domains:
+            for netif in domain.netifs:
+                self._domains_by_mac[netif.mac.lower()] = domain
+                if netif.ip is not None:
+                    self._domains_by_ip[netif.ip] = domain
 
         #
-        # initialize http server, arbitrary select first host ip
-        # found in cloubed yaml file
+        # initialize the caching proxy and the uploads shared by the HTTP
+        # servers of all networks
         #
-        self._http_server = HTTPServer()
+        self._http_proxy = None
+        self._http_uploads = None
+        http_server_conf = self._conf.http_server
+        if http_server_conf is not None and http_server_conf.has_proxy():
+            self._http_proxy = HTTPProxyCache(
+                                   http_server_conf.proxy_path,
+                                   http_server_conf.proxy_size * 1024**3)
+        if http_server_conf is not None and http_server_conf.has_uploads():
+            self._http_uploads = HTTPUploads(http_server_conf.uploads_path,
+                                             self.domains())
+
+        # HTTP servers indexed by network names, launched on demand
+        self._http_servers = {}
+
+        # internal TFTP servers indexed by network names, launched on demand
+        self._tftp_servers = {}
 
     def storage_pools(self):
 
@@ -174,9 +255,8 @@ class Cloubed(metaclass=Singleton):
                * the domain could not be found in the testbed
         """
 
-        for domain in self._domains:
-            if domain.name == name:
-                return domain
+        if name in self._domains_by_name:
+            return self._domains_by_name[name]
 
         # domain not found
         raise CloubedException("domain {domain} not found in configuration" \
@@ -192,14 +272,77 @@ class Cloubed(metaclass=Singleton):
                * the domain could not be found in the testbed
         """
 
-        for domain in self._domains:
-            if domain.libvirt_name == libvirt_name:
-                return domain
+        if libvirt_name in self._domains_by_libvirt_name:
+            return self._domains_by_libvirt_name[libvirt_name]
 
         # domain not found
         raise CloubedException("domain {domain} not found in configuration" \
                                    .format(domain=libvirt_name))
 
+    def get_domain_by_ip(self, ip):
+
+        """Returns the Domain object of the testbed with a network interface
+           that has the IP address in parameter. The IP addresses set in the
+           configuration are looked up first, then the dynamic addresses
+           leased by the DHCP servers of the networks.
+
+           :param string ip: the IP address of the domain to find
+           :exceptions CloubedException:
+               * the domain could not be found in the testbed
+        """
+
+        if ip in self._domains_by_ip:
+            return self._domains_by_ip[ip]
+
+        try:
+            address = ipaddress.IPv4Address(ip)
+        except ValueError:
+            address = None
+
+        if address is not None:
+            for network in self._networks:
+                subnet = network.get_subnet()
+                if subnet is None or address not in subnet or \
+                   network.get_dhcp_range() is None:
+                    continue
+                mac = self.ctl.network_leases(network.libvirt_name).get(ip)
+                if mac in self._domains_by_mac:
+                    return self._domains_by_mac[mac]
+
+        # domain not found
+        raise CloubedException("domain with IP address {ip} not found in " \
+                               "configuration".format(ip=ip))
+
+    def get_address_allocator(self):
+
+        """Returns the AddressAllocator of the testbed"""
+
+        return self._address_allocator
+
+    def get_network_index(self):
+
+        """Returns the NetworkIndex of the IP ranges of all active networks in
+           Libvirt. The index is built once out of Libvirt and then updated by
+           the Networks when they are created or destroyed.
+        """
+
+        if self._network_index is None:
+            self._network_index = NetworkIndex()
+            for name, infos in self.ctl.info_networks().items():
+                if infos['status'] == 'active' and 'ip' in infos:
+                    self._network_index.add(name,
+                                            infos['ip'],
+                                            infos['netmask'])
+        return self._network_index
+
+    def reset_network_index(self):
+
+        """Drops the NetworkIndex so that it is built again out of Libvirt
+           on next use.
+        """
+
+        self._network_index = None
+
     def get_network_by_name(self, name):
 
         """
@@ -207,9 +350,8 @@ class Cloubed(metaclass=Singleton):
             exception if not found.
         """
 
-        for network in self._networks:
-            if network.name == name:
-                return network
+        if name in self._networks_by_name:
+            return self._networks_by_name[name]
 
         # network not found
         raise CloubedException("network {network} not found in configuration"
@@ -222,9 +364,8 @@ class Cloubed(metaclass=Singleton):
             Raises exception if not found.
         """
 
-        for storage_volume in self._storage_volumes:
-            if storage_volume.name == name:
-                return storage_volume
+        if name in self._storage_volumes_by_name:
+            return self._storage_volumes_by_name[name]
 
         # storage volume not found
         raise CloubedException("storage volume {storage_volume} not found in " \
@@ -237,14 +378,34 @@ class Cloubed(metaclass=Singleton):
             Raises exception if not found.
         """
 
-        for storage_pool in self._storage_pools:
-            if storage_pool.name == name:
-                return storage_pool
+        if name in self._storage_pools_by_name:
+            return self._storage_pools_by_name[name]
 
         # storage pool not found
         raise CloubedException("storage pool {storage_pool} not found in " \
                                "configuration".format(storage_pool=name))
 
+    def get_image_cache(self):
+
+        """
+            Returns the ImageCache object. Raises exception if the image cache
+            is not defined in configuration.
+        """
+
+        if self._image_cache is None:
+            raise CloubedException("image cache not defined in configuration")
+
+        return self._image_cache
+
+    def get_timeline(self):
+
+        """
+            Returns the Timeline object where the timed spans of the
+            operations on the testbed are recorded.
+        """
+
+        return self._timeline
+
     def get_templates_dict(self, domain_name):
 
         """Returns the dict with all variables that could be used in a template
@@ -275,25 +436,104 @@ class Cloubed(metaclass=Singleton):
             if domain.name == domain_name:
                 templates_dict.update(domain.get_contextual_templates_dict())
 
+        # token of the domain to upload files on the HTTP server
+        if self._http_uploads is not None:
+            templates_dict['self.upload_token'] = \
+                self._http_uploads.token(domain_name)
+
         return templates_dict
 
-    def serve_http(self, address):
-        
-        """ server_http: """
+    def serve_http(self, domain):
+
+        """Launches the HTTP servers on the host IP addresses of the networks
+           connected to the domain, unless already done. Each server serves
+           the root directory of its network so that the domains download
+           their files over their local bridge.
+        """
+
+        for network in domain.get_networks():
+            root = network.get_http_root()
+            if root is None or network.name in self._http_servers:
+                continue
+            logging.debug("launching HTTP server of network {network} on " \
+                          "address {address}" \
+                              .format(network=network.name,
+                                      address=network.ip_host))
+            http_server = HTTPServer(renderer=self.render_template,
+                                     proxy=self._http_proxy,
+                                     uploads=self._http_uploads,
+                                     timeline=self._timeline)
+            http_server.launch(network.ip_host, root)
+            if http_server.launched():
+                self._http_servers[network.name] = http_server
+
+    def serve_tftp(self, domain):
+
+        """Launches the internal TFTP servers of the networks connected to the
+           domain which are not served by the TFTP server of libvirt, unless
+           already done.
+        """
 
-        if self._http_server is not None:
-            if not self._http_server.launched():
-                logging.debug("launching HTTP server on address {address}" \
-                                  .format(address=address))
-                self._http_server.launch(address)
+        for network in domain.get_networks():
+            root = network.get_internal_tftp_root()
+            if root is None or network.name in self._tftp_servers:
+                continue
+            logging.debug("launching TFTP server of network {network} on " \
+                          "address {address}" \
+                              .format(network=network.name,
+                                      address=network.ip_host))
+            tftp_server = TFTPServer(timeline=self._timeline)
+            tftp_server.launch(network.ip_host, root)
+            if tftp_server.launched():
+                self._tftp_servers[network.name] = tftp_server
 
     def launch_event_manager(self):
 
         """ Launch event manager thread unless already done """
 
+        if self._async_event_manager is not None:
+            raise CloubedException("event manager cannot be launched along " \
+                                   "with asyncio event manager")
         if self._event_manager is None:
             self._event_manager = EventManager(self)
 
+    def async_event_manager(self, loop=None):
+
+        """Returns the AsyncEventManager which delivers the events of the
+           domains on the asyncio event loop, launching it unless already done.
+
+           :param asyncio.AbstractEventLoop loop: the event loop, by default
+               the running loop
+           :exceptions CloubedException:
+               * the threaded event manager is already launched
+        """
+
+        if self._event_manager is not None:
+            raise CloubedException("asyncio event manager cannot be " \
+                                   "launched along with event manager")
+        if self._async_event_manager is None:
+            self._async_event_manager = AsyncEventManager(self, loop)
+        return self._async_event_manager
+
+    def render_template(self, ip, template_name):
+
+        """Returns the content of the template of the domain with the IP
+           address in parameter, rendered in memory. This is used by the HTTP
+           server to render templates for its clients.
+
+           :param string ip: the IP address of the domain
+           :param string template_name: the name of the template to render
+           :exceptions CloubedException:
+               * the domain could not be found in the testbed
+               * the template is not defined for the domain
+               * the source template could not be read
+        """
+
+        domain = self.get_domain_by_ip(ip)
+        domain_template = domain.get_template_by_name(template_name)
+        return domain_template.content(
+                   lambda: self.get_templates_dict(domain.name))
+
     def gen_file(self, domain_name, template_name):
 
         """ gen_file: """
@@ -303,6 +543,8 @@ class Cloubed(metaclass=Singleton):
         domain = self.get_domain_by_name(domain_name)
         domain_template = domain.get_template_by_name(template_name)
         domain_template.render(templates_dict)
+        # the addresses may be written in the generated file
+        self._address_allocator.save()
 
     def boot_vm(self, domain_name,
                 bootdev="hd",
@@ -313,92 +555,112 @@ class Cloubed(metaclass=Singleton):
 
         domain = self.get_domain_by_name(domain_name)
 
-        #
-        # manage disks
-        #
+        # the volumes, the networks and the domain created during the boot
+        # are attributed to the domain in the timeline
+        with self._timeline.span('boot', domain.name, domain=domain.name):
 
-        # build list of storage volumes to overwrite
+            #
+            # manage disks
+            #
 
-        if type(overwrite_disks) == bool:
-            if overwrite_disks == True:
-                overwrite_disks = domain.get_storage_volumes_names()
-            else:
-                overwrite_disks = []
-        else:
-            # type(overwrite_disks) is list
-            # remove non-existing disks and log warning
-            domain_disks = domain.get_storage_volumes_names()
-            for disk in set(overwrite_disks) - set(domain_disks):
-                logging.warning("domain {domain} does not have disk " \
-                                "{disk}, removing it of disks to " \
-                                "overwrite" \
-                                    .format(domain=domain.name,
-                                            disk=disk))
-                overwrite_disks.remove(disk)
-
-        logging.debug("disks to overwrite for domain {domain}: {disks}" \
-                          .format(domain=domain.name,
-                                  disks=str(overwrite_disks)))
+            # build list of storage volumes to overwrite
 
-        for storage_volume in domain.get_storage_volumes():
-            #if not storage_volume.created(): #useless?
-            if storage_volume.name in overwrite_disks:
-                overwrite_storage_volume = True
+            if type(overwrite_disks) == bool:
+                if overwrite_disks == True:
+                    overwrite_disks = domain.get_storage_volumes_names()
+                else:
+                    overwrite_disks = []
             else:
-                overwrite_storage_volume = False
-            storage_volume.storage_pool.create()
-            storage_volume.create(overwrite_storage_volume)
-
-
-        #
-        # manage networks
-        #
-
-        # build list of networks to recreate
-
-        if type(recreate_networks) == bool:
-            if recreate_networks == True:
-                recreate_networks = domain.get_networks_names()
+                # type(overwrite_disks) is list
+                # remove non-existing disks and log warning
+                domain_disks = domain.get_storage_volumes_names()
+                for disk in set(overwrite_disks) - set(domain_disks):
+                    logging.warning("domain {domain} does not have disk " \
+                                    "{disk}, removing it of disks to " \
+                                    "overwrite" \
+                                        .format(domain=domain.name,
+                                                disk=disk))
+                    overwrite_disks.remove(disk)
+
+            logging.debug("disks to overwrite for domain {domain}: {disks}" \
+                              .format(domain=domain.name,
+                                      disks=str(overwrite_disks)))
+
+            # the overlays of the snapshots depend on the disks to overwrite
+            if overwrite_disks:
+                domain.clear_snapshots()
+
+            for storage_volume in domain.get_storage_volumes():
+                #if not storage_volume.created(): #useless?
+                if storage_volume.name in overwrite_disks:
+                    overwrite_storage_volume = True
+                else:
+                    overwrite_storage_volume = False
+                storage_volume.storage_pool.create()
+                # disks with a baseline or a backing volume are reset by
+                # re-creating only their top overlay
+                if overwrite_storage_volume and storage_volume.resettable():
+                    storage_volume.reset()
+                else:
+                    storage_volume.create(overwrite_storage_volume)
+
+
+            #
+            # manage networks
+            #
+
+            # networks may have been modified by others since the last
+            # operation
+            self.reset_network_index()
+
+            # build list of networks to recreate
+
+            if type(recreate_networks) == bool:
+                if recreate_networks == True:
+                    recreate_networks = domain.get_networks_names()
+                else:
+                    recreate_networks = []
             else:
-                recreate_networks = []
-        else:
-            # type(recreate_networks) is list
-            # remove non-existing networks and log warning
-            domain_networks = domain.get_networks_names()
-            for network in set(recreate_networks) - set(domain_networks):
-                logging.warning("domain {domain} is not connected to " \
-                                "network {network}, removing it of " \
-                                "networks to recreate" \
-                                    .format(domain=domain.name,
-                                            network=network))
-                recreate_networks.remove(network)
-
-        logging.debug("networks to recreate for domain {domain}: " \
-                      "{networks}" \
-                          .format(domain=domain.name,
-                                  networks=str(recreate_networks)))
-
-
-        for network in domain.get_networks():
-            #if not network.created(): #useless?
-            if network.name in recreate_networks:
-                recreate_network = True
-            else:
-                recreate_network = False
-            network.create(recreate_network)
-
-        #
-        # manage domain
-        #
-
-        domain.create(bootdev)
-
-        if domain.graphics in ["spice", "vnc"]:
-            infos = domain.get_infos()
-            logging.info("{type} console of domain {domain} available on port " \
-                         "{port}".format(type=infos['console'],
-                                         domain=domain.name,
-                                         port=infos['port']))
+                # type(recreate_networks) is list
+                # remove non-existing networks and log warning
+                domain_networks = domain.get_networks_names()
+                for network in set(recreate_networks) - set(domain_networks):
+                    logging.warning("domain {domain} is not connected to " \
+                                    "network {network}, removing it of " \
+                                    "networks to recreate" \
+                                        .format(domain=domain.name,
+                                                network=network))
+                    recreate_networks.remove(network)
+
+            logging.debug("networks to recreate for domain {domain}: " \
+                          "{networks}" \
+                              .format(domain=domain.name,
+                                      networks=str(recreate_networks)))
+
+            # the addresses of the network interfaces are kept for the next
+            # runs once they are given to libvirt
+            self._address_allocator.save()
+
+            for network in domain.get_networks():
+                #if not network.created(): #useless?
+                if network.name in recreate_networks:
+                    recreate_network = True
+                else:
+                    recreate_network = False
+                network.create(recreate_network)
+
+            #
+            # manage domain
+            #
+
+            domain.create(bootdev)
+
+            if domain.graphics in ["spice", "vnc"]:
+                infos = domain.get_infos()
+                logging.info("{type} console of domain {domain} available " \
+                             "on port {port}".format(type=infos['console'],
+                                                     domain=domain.name,
+                                                     port=infos['port']))
 
     def shutdown(self, domain_name):
 
@@ -442,12 +704,382 @@ class Cloubed(metaclass=Singleton):
         domain = self.get_domain_by_name(domain_name)
         domain.resume()
 
+    def baseline(self, domain_name):
+
+        """Records the current content of all the disks of a stopped domain
+           as their baselines. Then, booting the domain with its disks
+           overwritten brings them back to this content.
+
+           :param string domain_name: the name of the domain
+           :exceptions CloubedException:
+               * the domain could not be found in the testbed
+               * the domain is not stopped
+               * the baseline of one disk could not be recorded
+        """
+
+        domain = self.get_domain_by_name(domain_name)
+
+        status = domain.get_infos()['status']
+        if status not in [ 'undefined', 'shutoff' ]:
+            raise CloubedException("unable to record baseline of disks of " \
+                                   "domain {domain} since it is {status}" \
+                                       .format(domain=domain_name,
+                                               status=status))
+
+        for storage_volume in domain.get_storage_volumes():
+            storage_volume.make_baseline()
+
+    def create_snapshot(self, domain_name, snapshot_name, memory=False):
+
+        """ Creates a snapshot of a specific domain """
+
+        domain = self.get_domain_by_name(domain_name)
+        domain.create_snapshot(snapshot_name, memory)
+
+    def get_snapshots(self, domain_name):
+
+        """ Returns the list of snapshots of a specific domain """
+
+        domain = self.get_domain_by_name(domain_name)
+        return domain.get_snapshots()
+
+    def revert_snapshot(self, domain_name, snapshot_name):
+
+        """ Reverts a specific domain to one of its snapshots """
+
+        domain = self.get_domain_by_name(domain_name)
+        domain.revert_snapshot(snapshot_name)
+
+    def delete_snapshot(self, domain_name, snapshot_name):
+
+        """ Deletes a snapshot of a specific domain """
+
+        domain = self.get_domain_by_name(domain_name)
+        domain.delete_snapshot(snapshot_name)
+
+    def checkpoint(self, name, jobs=4):
+
+        """Saves the state of all the running domains of the testbed. All the
+           running domains are paused, then a snapshot of their disks and
+           memory named checkpoint.<name> is created concurrently for each of
+           them. The networks required to resume the domains are recorded in
+           the checkpoint. Finally, all domains are unpaused.
+
+           If the snapshot of one domain fails, the snapshots already created
+           for the other domains are deleted so that no partial checkpoint is
+           left behind.
+
+           :param string name: the name of the checkpoint
+           :param integer jobs: the maximum number of concurrent snapshots
+           :exceptions CloubedException:
+               * the name of the checkpoint is not valid or already used
+               * the snapshot of one domain could not be created
+        """
+
+        if re.match(r'^[\w.-]+$', name) is None:
+            raise CloubedException("name {name} of checkpoint is not valid" \
+                                       .format(name=name))
+
+        path = state_path('checkpoints', "{name}.json".format(name=name))
+        if os.path.exists(path):
+            raise CloubedException("checkpoint {name} already exists" \
+                                       .format(name=name))
+
+        domains = [ domain for domain in self._domains if domain.is_active() ]
+        if not domains:
+            raise CloubedException("unable to checkpoint testbed since no " \
+                                   "domain is running")
+
+        snapshot_name = "checkpoint.{name}".format(name=name)
+
+        networks = {}
+        for domain in domains:
+            for network in domain.get_networks():
+                networks[network.name] = network.toxml()
+
+        # only the domains actually paused are unpaused if one of them could
+        # not be paused
+        paused = []
+        try:
+            for domain in domains:
+                domain.pause()
+                paused.append(domain)
+            run_parallel(Domain.create_snapshot,
+                         [ (domain, snapshot_name, True) \
+                           for domain in domains ],
+                         jobs)
+        except Exception:
+            self.__rollback_checkpoint(domains, snapshot_name)
+            raise
+        finally:
+            run_parallel(Domain.unpause,
+                         [ (domain,) for domain in paused ],
+                         len(paused))
+
+        write_state(path,
+                    { 'name': name,
+                      'created': time.time(),
+                      'snapshot': snapshot_name,
+                      'domains': [ domain.name for domain in domains ],
+                      'networks': networks })
+        logging.info("checkpoint {name} of {nb} domains created" \
+                         .format(name=name, nb=len(domains)))
+
+    @staticmethod
+    def __rollback_checkpoint(domains, snapshot_name):
+
+        """Deletes the snapshot in parameter of the domains which have it,
+           after the failure of a checkpoint. The errors are only logged so
+           that the failure of the checkpoint is reported.
+        """
+
+        for domain in domains:
+            try:
+                names = [ snapshot['name'] \
+                          for snapshot in domain.get_snapshots() ]
+                if snapshot_name in names:
+                    logging.warning("deleting snapshot {snapshot} of " \
+                                    "domain {domain} of failed checkpoint" \
+                                        .format(snapshot=snapshot_name,
+                                                domain=domain.name))
+                    domain.delete_snapshot(snapshot_name)
+            except (CloubedException, OSError) as err:
+                logging.error("unable to delete snapshot {snapshot} of " \
+                              "domain {domain}: {error}" \
+                                  .format(snapshot=snapshot_name,
+                                          domain=domain.name,
+                                          error=err))
+
+    def restore(self, name, jobs=4):
+
+        """Restores all the domains saved in a checkpoint. The networks
+           recorded in the checkpoint are created if not active, then all the
+           domains are reverted concurrently to their snapshot and left
+           paused. Finally, all domains are unpaused at once so that their
+           clocks stay consistent. If one domain could not be restored, all
+           the domains are left paused.
+
+           :param string name: the name of the checkpoint
+           :param integer jobs: the maximum number of concurrent restorations
+           :exceptions CloubedException:
+               * the checkpoint does not exist
+               * one domain could not be restored
+        """
+
+        path = state_path('checkpoints', "{name}.json".format(name=name))
+        if not os.path.exists(path):
+            raise CloubedException("checkpoint {name} not found" \
+                                       .format(name=name))
+        with open(path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+
+        for network_name, xml in checkpoint['networks'].items():
+            network = self.get_network_by_name(network_name)
+            if not self.ctl.network_is_active(network.libvirt_name):
+                logging.info("creating network {name} of checkpoint " \
+                             "{checkpoint}".format(name=network_name,
+                                                   checkpoint=name))
+                self.ctl.undefine_network(network.libvirt_name)
+                self.ctl.create_network(xml)
+                self.reset_network_index()
+
+        domains = [ self.get_domain_by_name(domain_name) \
+                    for domain_name in checkpoint['domains'] ]
+
+        run_parallel(Domain.revert_snapshot,
+                     [ (domain, checkpoint['snapshot'], True) \
+                       for domain in domains ],
+                     jobs)
+        run_parallel(Domain.unpause,
+                     [ (domain,) for domain in domains ],
+                     len(domains))
+
+        logging.info("checkpoint {name} of {nb} domains restored" \
+                         .format(name=name, nb=len(domains)))
+
     def create_network(self, network_name, recreate):
 
         """ Create network in Cloubed """
         network = self.get_network_by_name(network_name)
+        self.reset_network_index()
+        # the static hosts of the network use the addresses of the network
+        # interfaces, they are kept for the next runs
+        self._address_allocator.save()
         network.create(recreate)
 
+    def import_volumes(self, volumes, jobs=4):
+
+        """Imports local image files into storage volumes, several volumes in
+           parallel.
+
+           :param dict volumes: the paths to the image files indexed by the
+               names of the storage volumes
+           :param integer jobs: the maximum number of concurrent imports
+           :exceptions CloubedException:
+               * one storage volume could not be found in the testbed
+               * one image file could not be imported
+        """
+
+        transfers = [ (self.get_storage_volume_by_name(name), path) \
+                      for name, path in volumes.items() ]
+
+        # storage pools are created sequentially before the parallel imports
+        for storage_volume, path in transfers:
+            storage_volume.storage_pool.create()
+
+        run_parallel(StorageVolume.import_image, transfers, jobs)
+
+    def export_volumes(self, volumes, jobs=4):
+
+        """Exports storage volumes into local files, several volumes in
+           parallel.
+
+           :param dict volumes: the paths to the local files indexed by the
+               names of the storage volumes
+           :param integer jobs: the maximum number of concurrent exports
+           :exceptions CloubedException:
+               * one storage volume could not be found in the testbed
+               * one storage volume could not be exported
+        """
+
+        transfers = [ (self.get_storage_volume_by_name(name), path) \
+                      for name, path in volumes.items() ]
+
+        run_parallel(StorageVolume.export_image, transfers, jobs)
+
+    def cache_image(self, path, label=None):
+
+        """Adds a local image file in the image cache and returns the hash of
+           its entry.
+
+           :param string path: the path to the local image file
+           :param string label: an optional label to refer to the entry
+           :exceptions CloubedException:
+               * the image cache is not defined in configuration
+               * the image file could not be added in the cache
+        """
+
+        return self.get_image_cache().add(path, label)
+
+    def get_image_cache_infos(self):
+
+        """Returns a dict with information about the entries of the image
+           cache indexed by their hash.
+
+           :exceptions CloubedException:
+               * the image cache is not defined in configuration
+        """
+
+        return self.get_image_cache().get_infos()
+
+    def get_events(self, domain_name=None, event_type=None,
+                   event_detail=None, tail=None):
+
+        """Returns the list of records of the events received on the domains,
+           the oldest first, optionally filtered on the domain, the type and
+           the detail of the events.
+
+           :param string domain_name: the name of the domain
+           :param string event_type: the type of the events, eg. stopped
+           :param string event_detail: the detail of the events, eg. shutdown
+           :param int tail: the maximum number of the most recent records
+               returned, all by default
+           :exceptions CloubedException:
+               * the domain could not be found in the testbed
+        """
+
+        (event_type, event_detail) = \
+            self.__check_events_filter(domain_name, event_type, event_detail)
+        return EventJournal().read(domain_name, event_type, event_detail,
+                                   tail)
+
+    def follow_events(self, domain_name=None, event_type=None,
+                      event_detail=None):
+
+        """Generator of the records of the events received on the domains
+           from now on, filtered like in get_events().
+        """
+
+        (event_type, event_detail) = \
+            self.__check_events_filter(domain_name, event_type, event_detail)
+        return EventJournal().follow(domain_name, event_type, event_detail)
+
+    def __check_events_filter(self, domain_name, event_type, event_detail):
+
+        """Checks the domain exists and returns the tuple of the type and the
+           detail of the events as recorded in the journal.
+        """
+
+        if domain_name is not None:
+            self.get_domain_by_name(domain_name)
+        if event_type is not None:
+            event_type = event_type.upper()
+            if event_detail is not None:
+                event_detail = "{event_type}_{event_detail}" \
+                                   .format(event_type=event_type,
+                                           event_detail=event_detail.upper())
+        return (event_type, event_detail)
+
+    def get_timeline_spans(self, domain_name=None):
+
+        """Returns the list of spans of the timeline of the testbed, sorted by
+           start time, optionally restricted to the spans attributed to the
+           domain. The spans of the files served to the domains by the HTTP
+           and TFTP servers are attributed to the domains with the IP
+           addresses of the clients.
+
+           :param string domain_name: the name of the domain
+           :exceptions CloubedException:
+               * the domain could not be found in the testbed
+        """
+
+        if domain_name is not None:
+            self.get_domain_by_name(domain_name)
+
+        clients = {} # names of the domains indexed by IP addresses
+        spans = []
+        for span in self._timeline.read():
+            if span['domain'] is None and 'client' in span:
+                ip = span['client']
+                if ip not in clients:
+                    try:
+                        clients[ip] = self.get_domain_by_ip(ip).name
+                    except CloubedException:
+                        clients[ip] = None
+                span['domain'] = clients[ip]
+            if domain_name is None or span['domain'] == domain_name:
+                spans.append(span)
+        return spans
+
+    def clear_timeline(self):
+
+        """Removes all the spans of the timeline of the testbed, to profile a
+           new bring-up.
+        """
+
+        self._timeline.clear()
+
+    async def wait_event_async(self, domain_name, event_type, event_detail):
+
+        """Coroutine which waits for the event on the domain within the asyncio
+           event loop.
+
+           :exceptions CloubedException:
+               * the domain could not be found in the testbed
+        """
+
+        domain = self.get_domain_by_name(domain_name)
+        self.serve_tftp(domain)
+
+        domain_event = DomainEvent(event_type.upper(),
+                                   "{event_type}_{event_detail}" \
+                                   .format(event_type=event_type.upper(),
+                                           event_detail=event_detail.upper()))
+        with self._timeline.span('wait', domain_event.detail,
+                                 domain=domain_name):
+            await self.async_event_manager().wait_event(domain_name,
+                                                        domain_event)
+
     def wait_event(self, domain_name,
                    event_type, event_detail,
                    enable_http=False):
@@ -458,13 +1090,9 @@ class Cloubed(metaclass=Singleton):
         domain = self.get_domain_by_name(domain_name)
 
         if enable_http:
-            address = domain.get_first_host_ip()
-            if address is not None:
-                self.serve_http(address)
-            else:
-                logging.debug("HTTP server not launched because no host IP " \
-                              "address on networks connected to domain " \
-                              "{domain}".format(domain=domain_name))
+            self.serve_http(domain)
+
+        self.serve_tftp(domain)
 
         if event_type != 'tcp':
 
@@ -476,14 +1104,18 @@ class Cloubed(metaclass=Singleton):
                                        "{event_type}_{event_detail}" \
                                        .format(event_type=event_type.upper(),
                                                event_detail=event_detail.upper()))
-            domain.wait_for_event(domain_event)
+            with self._timeline.span('wait', domain_event.detail,
+                                     domain=domain.name):
+                domain.wait_for_event(domain_event)
 
         else:
             if type(event_detail) is str:
                 port = int(event_detail)
             else:
                 port = event_detail
-            domain.wait_tcp_socket(port)
+            with self._timeline.span('wait', "TCP_{port}".format(port=port),
+                                     domain=domain.name):
+                domain.wait_tcp_socket(port)
 
     def get_infos(self):
         """
@@ -521,6 +1153,7 @@ class Cloubed(metaclass=Singleton):
         """
         for domain in self._domains:
             domain.destroy()
+            domain.clear_snapshots()
         for network in self._networks:
             network.destroy()
         for storage_volume in self._storage_volumes:
@@ -530,6 +1163,12 @@ class Cloubed(metaclass=Singleton):
         for domain in self._domains:
             for template in domain.templates:
                 template.delete()
+        # the checkpoints refer to the snapshots deleted with the domains
+        checkpoints_path = state_path('checkpoints')
+        if os.path.isdir(checkpoints_path):
+            for filename in os.listdir(checkpoints_path):
+                if filename.endswith('.json'):
+                    os.remove(os.path.join(checkpoints_path, filename))
 
     def xml(self, resource_type, resource_name):
         """Returns the xml representation generated by Cloubed for a resource
@@ -563,11 +1202,16 @@ class Cloubed(metaclass=Singleton):
                                    "{type}".format(type=resource_type))
 
     def clean_exit(self):
-        """Cleanly stop the internal HTTP server and the event manager thread
-           if they have been launched previously.
+        """Cleanly stop the internal HTTP and TFTP servers and the event
+           manager thread if they have been launched previously.
         """
         logging.debug("clean exit")
-        if self._http_server.launched():
-            self._http_server.terminate()
+        for http_server in self._http_servers.values():
+            http_server.terminate()
+        for tftp_server in self._tftp_servers.values():
+            tftp_server.terminate()
         if self._event_manager is not None:
             self._event_manager.terminate()
+        if self._async_event_manager is not None:
+            self._async_event_manager.terminate()
+        self._timeline.close()
@@ -51,9 +51,28 @@ class CloubedConfigurationException(CloubedException):
 
     """ Class for Configuration exceptions in Cloubed """
 
-    def __init__(self, msg):
+    def __init__(self, msg, errors=None):
 
         super(CloubedConfigurationException, self).__init__(msg)
+        # all the errors found in configuration, the message summarizes them
+        # when there are several
+        if errors is None:
+            errors = [ msg ]
+        self.errors = errors
+
+    @staticmethod
+    def from_errors(errors):
+
+        """ Returns the exception reporting all the errors of the list """
+
+        if len(errors) == 1:
+            return CloubedConfigurationException(errors[0])
+
+        msg = "{count} errors found in configuration:\n{errors}" \
+                  .format(count=len(errors),
+                          errors="\n".join([ "  - " + error \
+                                             for error in errors ]))
+        return CloubedConfigurationException(msg, errors)
 
 class CloubedControllerException(CloubedException):
 
@@ -25,14 +25,20 @@ import logging
 import time
 import threading
 import socket
+import os
+import re
+import json
 from xml.dom.minidom import Document
 
 from cloubed.CloubedException import CloubedException
 from cloubed.DomainTemplate import DomainTemplate
 from cloubed.DomainNetif import DomainNetif
+from cloubed.Network import Network
 from cloubed.DomainDisk import DomainDisk
 from cloubed.DomainVirtfs import DomainVirtfs
-from cloubed.Utils import getuser, clean_string_for_template
+from cloubed.DomainSnapshot import DomainSnapshot
+from cloubed.Utils import getuser, clean_string_for_template, state_path, \
+                          write_state
 
 class Domain:
 
@@ -124,6 +130,13 @@ class Domain:
         """
         return self.ctl.info_domain(self.libvirt_name)
 
+    def is_active(self):
+
+        """ Returns True if the Domain is running (or paused) in libvirt """
+
+        domain = self.ctl.find_domain(self.libvirt_name)
+        return domain is not None and domain.isActive()
+
     def get_template_by_name(self, template_name):
 
         """ Returns the DomainTemplate with this name """
@@ -175,22 +188,25 @@ class Domain:
 
         """ Creates the Domain """
 
-        domain = self.ctl.find_domain(self.libvirt_name)
-        if domain:
-            if domain.isActive():
-                logging.info("destroying domain {name}" \
-                                 .format(name=self.libvirt_name))
-                domain.destroy()
-            else:
-                logging.info("undefining domain {name}" \
-                                 .format(name=self.libvirt_name))
-                domain.undefine()
+        with self.tbd.get_timeline().span('domain', self.name,
+                                          domain=self.name):
 
-        self.bootdev = bootdev
+            domain = self.ctl.find_domain(self.libvirt_name)
+            if domain:
+                if domain.isActive():
+                    logging.info("destroying domain {name}" \
+                                     .format(name=self.libvirt_name))
+                    domain.destroy()
+                else:
+                    logging.info("undefining domain {name}" \
+                                     .format(name=self.libvirt_name))
+                    domain.undefine()
+
+            self.bootdev = bootdev
 
-        # create the domain
-        self.ctl.create_domain(self.toxml())
-        logging.info("domain {domain}: created".format(domain=self.name))
+            # create the domain
+            self.ctl.create_domain(self.toxml())
+            logging.info("domain {domain}: created".format(domain=self.name))
 
     def shutdown(self):
 
@@ -270,6 +286,305 @@ class Domain:
         self.ctl.resume_domain(self.libvirt_name)
         logging.info("domain {domain}: resume".format(domain=self.name))
 
+    def pause(self):
+
+        """ Pauses the execution of the domain """
+
+        self.ctl.pause_domain(self.libvirt_name)
+        logging.info("domain {domain}: paused".format(domain=self.name))
+
+    def unpause(self):
+
+        """ Resumes the execution of the previously paused domain """
+
+        self.ctl.unpause_domain(self.libvirt_name)
+        logging.info("domain {domain}: unpaused".format(domain=self.name))
+
+    #
+    # snapshots
+    #
+
+    def __snapshots_path(self):
+
+        """ Returns the path of the state file of the snapshots chain """
+
+        return state_path('snapshots', "{name}.json".format(name=self.name))
+
+    def __load_snapshots(self):
+
+        """
+            Returns a tuple with the list of layers of overlays and the list of
+            DomainSnapshot of the chain of the Domain loaded from its state
+            file. Each layer is a dict of the paths of the overlays indexed by
+            the names of the storage volumes.
+        """
+
+        path = self.__snapshots_path()
+        if not os.path.exists(path):
+            return ([], [])
+
+        with open(path) as chain_file:
+            chain = json.load(chain_file)
+
+        snapshots = [ DomainSnapshot.from_dict(self, snapshot_dict) \
+                      for snapshot_dict in chain['snapshots'] ]
+        return (chain['layers'], snapshots)
+
+    def __save_snapshots(self, layers, snapshots):
+
+        """ Saves the chain of the Domain in its state file """
+
+        path = self.__snapshots_path()
+        if not layers and not snapshots:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+
+        write_state(path,
+                    { 'layers': layers,
+                      'snapshots': [ snapshot.to_dict() \
+                                     for snapshot in snapshots ] })
+
+    @staticmethod
+    def __get_layer_backing(layers, index, storage_volume):
+
+        """
+            Returns a tuple with the path and the format of the backing file of
+            the overlay of the storage volume in the layer at index.
+        """
+
+        if index == 0:
+            return (storage_volume.getpath(), storage_volume._imgtype)
+        return (layers[index - 1][storage_volume.name], 'qcow2')
+
+    def __get_snapshot(self, snapshots, name):
+
+        """ Returns the DomainSnapshot with this name in the list """
+
+        for snapshot in snapshots:
+            if snapshot.name == name:
+                return snapshot
+
+        raise CloubedException("snapshot {name} not found for domain " \
+                               "{domain}".format(name=name, domain=self.name))
+
+    def __delete_memory(self, snapshot):
+
+        """ Deletes the file of the memory state of the DomainSnapshot """
+
+        if snapshot.memory:
+            storage_volume = self.get_storage_volumes()[0]
+            storage_volume.delete_pool_file(snapshot.get_memory_path())
+
+    def get_disk_path(self, storage_volume):
+
+        """
+            Returns the path of the file of the storage volume in parameter
+            used by the Domain, ie. the top of its chain of overlays.
+        """
+
+        layers, snapshots = self.__load_snapshots()
+        if layers and storage_volume.name in layers[-1]:
+            return layers[-1][storage_volume.name]
+        return storage_volume.getpath()
+
+    def get_snapshots(self):
+
+        """
+            Returns the list of snapshots of the Domain, the oldest first, as
+            dicts with their name, creation time, layer and if they include
+            the memory state.
+        """
+
+        layers, snapshots = self.__load_snapshots()
+        return [ snapshot.to_dict() for snapshot in snapshots ]
+
+    def create_snapshot(self, name, memory=False):
+
+        """Creates an external snapshot of all the disks of the Domain and
+           optionally of its memory state. The disks of a stopped Domain are
+           snapshotted by creating their overlays directly in their storage
+           pools.
+
+           :param string name: the name of the snapshot
+           :param boolean memory: True to save the memory state as well
+           :exceptions CloubedException:
+               * the name is not valid or already used by another snapshot
+               * the Domain does not have any disk
+               * the memory state is requested while the Domain is not
+                 running
+        """
+
+        if re.match(r'^[\w.-]+$', name) is None:
+            raise CloubedException("name {name} of snapshot of domain " \
+                                   "{domain} is not valid" \
+                                       .format(name=name, domain=self.name))
+
+        if not self.disks:
+            raise CloubedException("unable to snapshot domain {domain} " \
+                                   "since it does not have any disk" \
+                                       .format(domain=self.name))
+
+        layers, snapshots = self.__load_snapshots()
+
+        if name in [ snapshot.name for snapshot in snapshots ]:
+            raise CloubedException("snapshot {name} already exists for " \
+                                   "domain {domain}" \
+                                       .format(name=name, domain=self.name))
+
+        snapshot = DomainSnapshot(self, name, len(layers), memory)
+        layer = { disk.storage_volume.name: \
+                      snapshot.get_disk_path(disk.storage_volume) \
+                  for disk in self.disks }
+
+        if self.is_active():
+            self.ctl.snapshot_domain(self.libvirt_name,
+                                     snapshot.toxml(),
+                                     memory)
+        else:
+            if memory:
+                raise CloubedException("unable to save memory state of " \
+                                       "domain {domain} since it is not " \
+                                       "running".format(domain=self.name))
+            for storage_volume in self.get_storage_volumes():
+                backing_path, backing_imgtype = \
+                    self.__get_layer_backing(layers, len(layers),
+                                             storage_volume)
+                storage_volume.create_overlay(layer[storage_volume.name],
+                                              backing_path,
+                                              backing_imgtype)
+
+        layers.append(layer)
+        snapshots.append(snapshot)
+        self.__save_snapshots(layers, snapshots)
+        logging.info("domain {domain}: snapshot {name} created" \
+                         .format(domain=self.name, name=name))
+
+    def revert_snapshot(self, name, paused=False):
+
+        """Reverts the Domain to the snapshot in parameter. The Domain is
+           stopped, the overlays of the snapshot are re-created empty and the
+           Domain is either restored from the memory state of the snapshot or
+           booted on its disks. The snapshots created after this one depend on
+           its overlays, they are deleted.
+
+           :param string name: the name of the snapshot
+           :param boolean paused: True to leave the Domain paused after the
+               restoration of its memory state
+           :exceptions CloubedException:
+               * the snapshot does not exist
+        """
+
+        layers, snapshots = self.__load_snapshots()
+        snapshot = self.__get_snapshot(snapshots, name)
+
+        # the disks are about to be replaced under the domain
+        self.destroy()
+
+        for later in [ other for other in snapshots \
+                       if other.layer > snapshot.layer ]:
+            logging.warning("domain {domain}: deleting snapshot {later} " \
+                            "created after snapshot {name}" \
+                                .format(domain=self.name,
+                                        later=later.name,
+                                        name=name))
+            self.__delete_memory(later)
+            snapshots.remove(later)
+
+        for layer in reversed(layers[snapshot.layer + 1:]):
+            for storage_volume in self.get_storage_volumes():
+                if storage_volume.name in layer:
+                    storage_volume.delete_pool_file(layer[storage_volume.name])
+        del layers[snapshot.layer + 1:]
+
+        layer = layers[snapshot.layer]
+        for storage_volume in self.get_storage_volumes():
+            if storage_volume.name not in layer:
+                continue
+            backing_path, backing_imgtype = \
+                self.__get_layer_backing(layers, snapshot.layer,
+                                         storage_volume)
+            storage_volume.create_overlay(layer[storage_volume.name],
+                                          backing_path,
+                                          backing_imgtype)
+
+        self.__save_snapshots(layers, snapshots)
+
+        if snapshot.memory:
+            disks = { disk.device: layer[disk.storage_volume.name] \
+                      for disk in self.disks \
+                      if disk.storage_volume.name in layer }
+            self.ctl.restore_domain(snapshot.get_memory_path(), disks, paused)
+        else:
+            self.create(self.bootdev or 'hd')
+
+        logging.info("domain {domain}: reverted to snapshot {name}" \
+                         .format(domain=self.name, name=name))
+
+    def delete_snapshot(self, name):
+
+        """Deletes the snapshot in parameter. If it is the most recent
+           snapshot and the Domain is running, its overlays are merged into
+           their backing files and removed from the chain. Otherwise, the
+           overlays are kept in the chain until a revert to an older snapshot.
+
+           :param string name: the name of the snapshot
+           :exceptions CloubedException:
+               * the snapshot does not exist
+        """
+
+        layers, snapshots = self.__load_snapshots()
+        snapshot = self.__get_snapshot(snapshots, name)
+
+        self.__delete_memory(snapshot)
+        snapshots.remove(snapshot)
+
+        top = len(layers) - 1
+        if snapshot.layer == top and self.is_active():
+            for disk in self.disks:
+                storage_volume = disk.storage_volume
+                base, imgtype = self.__get_layer_backing(layers, top,
+                                                         storage_volume)
+                overlay = layers[top][storage_volume.name]
+                self.ctl.commit_domain_disk(self.libvirt_name,
+                                            disk.device,
+                                            base,
+                                            overlay)
+                storage_volume.delete_pool_file(overlay)
+            layers.pop()
+        else:
+            logging.info("domain {domain}: overlays of snapshot {name} " \
+                         "kept in the chain of disks" \
+                             .format(domain=self.name, name=name))
+
+        self.__save_snapshots(layers, snapshots)
+        logging.info("domain {domain}: snapshot {name} deleted" \
+                         .format(domain=self.name, name=name))
+
+    def clear_snapshots(self):
+
+        """
+            Deletes all the snapshots of the Domain with their overlays and
+            memory states, the disks of the Domain are then used directly.
+        """
+
+        layers, snapshots = self.__load_snapshots()
+        if not layers and not snapshots:
+            return
+
+        logging.warning("domain {domain}: deleting all snapshots" \
+                            .format(domain=self.name))
+
+        for snapshot in snapshots:
+            self.__delete_memory(snapshot)
+
+        for layer in reversed(layers):
+            for storage_volume in self.get_storage_volumes():
+                if storage_volume.name in layer:
+                    storage_volume.delete_pool_file(layer[storage_volume.name])
+
+        self.__save_snapshots([], [])
+
     def notify_event(self, event):
 
         """ notify_event: used to notify a Domain about a DomainEvent """
@@ -529,7 +844,7 @@ class Domain:
             # devices/disk/source
             element_source = self._doc.createElement("source")
             element_source.setAttribute("file",
-                                        disk.storage_volume.getpath())
+                                        self.get_disk_path(disk.storage_volume))
             element_disk.appendChild(element_source)
     
             # devices/disk/target
@@ -604,15 +919,25 @@ class Domain:
 
         for netif in self.netifs:
 
+            direct_source = netif.network.get_direct_source()
+
             # devices/interface
             element_interface = self._doc.createElement("interface")
-            element_interface.setAttribute("type", "network")
+            if direct_source is not None:
+                # macvtap attachment to the host interface
+                element_interface.setAttribute("type", "direct")
+            else:
+                element_interface.setAttribute("type", "network")
             element_devices.appendChild(element_interface)
 
             # devices/interface/source
             element_source = self._doc.createElement("source")
-            element_source.setAttribute("network",
-                                        netif.network.libvirt_name)
+            if direct_source is not None:
+                element_source.setAttribute("dev", direct_source[0])
+                element_source.setAttribute("mode", direct_source[1])
+            else:
+                element_source.setAttribute("network",
+                                            netif.network.libvirt_name)
             element_interface.appendChild(element_source)
 
             # devices/interface/target
@@ -630,6 +955,17 @@ class Domain:
             element_model.setAttribute("type", "virtio")
             element_interface.appendChild(element_model)
 
+            # devices/interface/mtu
+            if netif.mtu is not None:
+                element_mtu = self._doc.createElement("mtu")
+                element_mtu.setAttribute("size", str(netif.mtu))
+                element_interface.appendChild(element_mtu)
+
+            # devices/interface/bandwidth
+            if netif.qos is not None:
+                element_interface.appendChild(
+                    Network.bandwidth_element(self._doc, netif.qos))
+
         # devices/graphics
         if self.graphics:
             element_graphics = self._doc.createElement("graphics")
@@ -718,6 +1054,11 @@ class Domain:
                           .format(prefix=prefix,
                                   network=network_clean_name)
                 domain_dict[key] = str(netif.ip)
+            if netif.mtu:
+                key = "{prefix}.{network}.mtu" \
+                          .format(prefix=prefix,
+                                  network=network_clean_name)
+                domain_dict[key] = str(netif.mtu)
 
         tpl_vars_dict = {}
 
@@ -84,7 +84,68 @@ class DomainEvent:
         8: ["LAST", None ]
     }
 
-    def __init__(self, event_type, event_detail):
+    _watchdog_actions = { 0: "NONE", 1: "PAUSE", 2: "RESET", 3: "POWEROFF",
+                          4: "SHUTDOWN", 5: "DEBUG", 6: "INJECTNMI" }
+    _io_error_actions = { 0: "NONE", 1: "PAUSE", 2: "REPORT" }
+    _block_job_status = { 0: "COMPLETED", 1: "FAILED", 2: "CANCELED",
+                          3: "READY" }
+    _agent_states = { 1: "CONNECTED", 2: "DISCONNECTED" }
+
+    # Functions which build the tuple (type, detail, data) of the events out of
+    # the arguments of the libvirt callbacks, indexed by the names of the event
+    # IDs. The data is a dict of the additional infos of the event.
+    _builders = {
+        'LIFECYCLE': lambda args: (args[0], args[1], {}),
+        'REBOOT': lambda args: ("REBOOT", "REQUESTED", {}),
+        'WATCHDOG': lambda args: \
+            ("WATCHDOG",
+             DomainEvent._watchdog_actions.get(args[0], str(args[0])),
+             {}),
+        'IO_ERROR': lambda args: \
+            ("IO_ERROR",
+             DomainEvent._io_error_actions.get(args[2], str(args[2])),
+             { 'path': args[0], 'device': args[1] }),
+        'BLOCK_JOB': lambda args: \
+            ("BLOCK_JOB",
+             DomainEvent._block_job_status.get(args[2], str(args[2])),
+             { 'disk': args[0] }),
+        'DEVICE_REMOVED': lambda args: \
+            ("DEVICE_REMOVED", args[0].upper(), { 'device': args[0] }),
+        'AGENT_LIFECYCLE': lambda args: \
+            ("AGENT_LIFECYCLE",
+             DomainEvent._agent_states.get(args[0], str(args[0])),
+             {}),
+    }
+
+    @staticmethod
+    def from_libvirt(event_id, args):
+
+        """Returns the DomainEvent out of the name of the libvirt event ID and
+           the arguments of its callback, or None if the event ID is not
+           supported.
+
+           :param string event_id: the name of the event ID, as in
+               VirtController.domain_event_ids
+           :param tuple args: the arguments of the libvirt callback specific to
+               the event ID
+        """
+
+        builder = DomainEvent._builders.get(event_id)
+        if builder is None:
+            return None
+        (event_type, event_detail, data) = builder(args)
+        if event_id == 'LIFECYCLE':
+            return DomainEvent(event_type, event_detail)
+        return DomainEvent(event_type,
+                           "{event_type}_{event_detail}" \
+                               .format(event_type=event_type,
+                                       event_detail=event_detail),
+                           data)
+
+    def __init__(self, event_type, event_detail, data=None):
+
+        # additional infos of the event, such as the disk of a block job
+        self.data = data or {}
 
         if isinstance(event_type, int) and isinstance(event_detail, int):
 
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" DomainEventStream class of Cloubed """
+
+import asyncio
+
+class DomainEventStream:
+
+    """DomainEventStream class
+
+       Asynchronous iterator over the DomainEvents of a domain delivered by
+       the AsyncEventManager. The events are queued from the time the stream
+       is opened. The iteration stops when the stream or the manager is
+       closed.
+    """
+
+    def __init__(self, manager, domain_name):
+
+        self._manager = manager
+        self.domain_name = domain_name
+        self._queue = asyncio.Queue()
+        self.closed = False
+
+    def put(self, event):
+
+        """Queues the DomainEvent in the stream. This is called by the
+           AsyncEventManager within the event loop.
+        """
+
+        if not self.closed:
+            self._queue.put_nowait(event)
+
+    def close(self):
+
+        """Closes the stream, the pending iterations stop after the events
+           already queued.
+        """
+
+        if self.closed:
+            return
+        self.closed = True
+        self._manager.unsubscribe(self)
+        # wakes up the pending iteration
+        self._queue.put_nowait(None)
+
+    def __aiter__(self):
+
+        return self
+
+    async def __anext__(self):
+
+        event = await self._queue.get()
+        if event is None:
+            # the stream has been closed, let the other iterations stop too
+            self._queue.put_nowait(None)
+            raise StopAsyncIteration
+        return event
+
+    async def __aenter__(self):
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+
+        self.close()
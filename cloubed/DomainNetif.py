@@ -23,7 +23,6 @@
 """ DomainNetif class of Cloubed """
 
 import logging
-from cloubed.Utils import gen_mac
 
 class DomainNetif:
 
@@ -32,21 +31,30 @@ class DomainNetif:
     def __init__(self, tbd, hostname, netif_conf):
 
         self.network = tbd.get_network_by_name(netif_conf["network"])
+        allocator = tbd.get_address_allocator()
+        key = "{domain:s}-{network:s}".format(domain=hostname,
+                                              network=self.network.name)
         if "mac" in netif_conf:
             self.mac = netif_conf["mac"]
         else:
-            self.mac = gen_mac("{domain:s}-{network:s}" \
-                                  .format(domain=hostname,
-                                          network=self.network.name))
+            self.mac = allocator.mac(key)
             logging.debug("generated mac {mac} for netif on domain {domain} "\
                           "connected to network {network}" \
                               .format(mac=self.mac,
                                       domain=hostname,
                                       network=self.network.name))
         self.ip = netif_conf.get('ip')
+        if self.ip == 'auto':
+            self.ip = allocator.ip(self.network, key)
         if self.ip is not None:
             self.network.register_host(hostname, self.mac, self.ip)
 
+        self.qos = netif_conf.get('qos')
+
+        # the interface inherits the MTU of its network if not set, it
+        # cannot exceed the MTU of its network as checked by Configuration
+        self.mtu = netif_conf.get('mtu', self.network.mtu)
+
     def get_network_name(self):
 
         """
@@ -22,30 +22,64 @@
 """ DomainSnapshot class of Cloubed """
 
 import os
+import time
 from xml.dom.minidom import Document
 
 class DomainSnapshot:
 
-    """ DomainSnapshot class """
+    """DomainSnapshot class
 
-    def __init__(self, conn, name, storage_volume):
+       A DomainSnapshot is an external snapshot of all the disks of a Domain,
+       with optionally its memory state. When the snapshot is taken, the
+       current files of the disks become read-only and new qcow2 overlays
+       backed by them receive all further writes. The overlays of a snapshot
+       form one layer in the chain of disk files of the Domain. Reverting to
+       the snapshot simply re-creates its layer empty, then restores the
+       memory state if any.
+    """
 
-        self._conn = conn
-        self._virtobj = None
+    def __init__(self, domain, name, layer, memory=False, created=None):
 
-        self._name = name
-        self._storage_volume = storage_volume
+        self._domain = domain
 
-        # snapshot root path <- storage volume path without extension
-        snapshot_root_path = os.path.splitext(storage_volume.getpath())[0]
- 
-        self._snapshot_path = "{:s}-snapshot-{:s}.qcow2" \
-                                  .format(snapshot_root_path,
-                                          self._name)
+        self.name = name
+        self.layer = layer # index of the layer of overlays in the chain
+        self.memory = memory
+        if created is None:
+            created = time.time()
+        self.created = created
 
         self._doc = None
 
-        self.__init_xml()
+    def __repr__(self):
+
+        return "{name} [layer {layer}]".format(name=self.name,
+                                               layer=self.layer)
+
+    @staticmethod
+    def from_dict(domain, snapshot_dict):
+
+        """
+            Returns a new DomainSnapshot of the domain built from the dict
+            given in parameter, as returned by to_dict()
+        """
+
+        return DomainSnapshot(domain,
+                              snapshot_dict['name'],
+                              snapshot_dict['layer'],
+                              snapshot_dict['memory'],
+                              snapshot_dict['created'])
+
+    def to_dict(self):
+
+        """
+            Returns a dict with all the parameters of the DomainSnapshot
+        """
+
+        return { 'name': self.name,
+                 'layer': self.layer,
+                 'memory': self.memory,
+                 'created': self.created }
 
     def toxml(self):
 
@@ -53,15 +87,35 @@ class DomainSnapshot:
             toxml: Returns the libvirt XML representation of the DomainSnapshot
         """
 
+        self.__init_xml()
         return self._doc.toxml()
 
-    def get_path(self):
+    def get_disk_path(self, storage_volume):
+
+        """
+            get_disk_path: Returns the path of the overlay created by the
+                           DomainSnapshot for the storage volume in parameter
+        """
+
+        # snapshot root path <- storage volume path without extension
+        snapshot_root_path = os.path.splitext(storage_volume.getpath())[0]
+
+        return "{:s}-snapshot-{:s}.qcow2".format(snapshot_root_path,
+                                                 self.name)
+
+    def get_memory_path(self):
 
         """
-            get_path: Returns the path of the DomainSnapshot
+            get_memory_path: Returns the path of the file of the memory state
+                             of the DomainSnapshot, next to the first disk of
+                             the Domain
         """
 
-        return self._snapshot_path
+        storage_volume = self._domain.get_storage_volumes()[0]
+        snapshot_root_path = os.path.splitext(storage_volume.getpath())[0]
+
+        return "{:s}-snapshot-{:s}.mem".format(snapshot_root_path,
+                                               self.name)
 
     def __init_xml(self):
 
@@ -73,9 +127,12 @@ class DomainSnapshot:
         self._doc = Document() 
 
         # <domainsnapshot>
-        #   <description>Snapshot of OS install and updates</description>
+        #   <name>installed</name>
+        #   <description>snapshot installed</description>
+        #   <memory snapshot='external' file='/path/to/mem'/>
         #   <disks>
-        #     <disk name='/path/to/old'>
+        #     <disk name='vda' snapshot='external'>
+        #       <driver type='qcow2'/>
         #       <source file='/path/to/new'/>
         #     </disk>
         #   </disks>
@@ -87,27 +144,45 @@ class DomainSnapshot:
 
         # name element
         element_name = self._doc.createElement("name")
-        node_name = self._doc.createTextNode(self._name)
+        node_name = self._doc.createTextNode(self.name)
         element_name.appendChild(node_name)
         element_domainsnapshot.appendChild(element_name)
 
         # description element
         element_description = self._doc.createElement("description")
         node_description = self._doc.createTextNode("snapshot {:s}" \
-                                                        .format(self._name))
+                                                        .format(self.name))
         element_description.appendChild(node_description)
         element_domainsnapshot.appendChild(element_description)
 
+        # memory element
+        element_memory = self._doc.createElement("memory")
+        if self.memory:
+            element_memory.setAttribute("snapshot", "external")
+            element_memory.setAttribute("file", self.get_memory_path())
+        else:
+            element_memory.setAttribute("snapshot", "no")
+        element_domainsnapshot.appendChild(element_memory)
+
         # disks element
         element_disks = self._doc.createElement("disks")
         element_domainsnapshot.appendChild(element_disks)
 
-        # disks/disk
-        element_disk = self._doc.createElement("disk")
-        element_disk.setAttribute("name", self._storage_volume.getpath())
-        element_disks.appendChild(element_disk)
+        for disk in self._domain.disks:
+
+            # disks/disk
+            element_disk = self._doc.createElement("disk")
+            element_disk.setAttribute("name", disk.device)
+            element_disk.setAttribute("snapshot", "external")
+            element_disks.appendChild(element_disk)
+
+            # disks/disk/driver
+            element_driver = self._doc.createElement("driver")
+            element_driver.setAttribute("type", "qcow2")
+            element_disk.appendChild(element_driver)
 
-        # disks/disk/source
-        element_source = self._doc.createElement("source")
-        element_source.setAttribute("file", self._snapshot_path)
-        element_disk.appendChild(element_source)
+            # disks/disk/source
+            element_source = self._doc.createElement("source")
+            element_source.setAttribute("file",
+                                        self.get_disk_path(disk.storage_volume))
+            element_disk.appendChild(element_source)
@@ -46,29 +46,47 @@ class DomainTemplate():
 
         self.name = domain_template_conf['name']
         self._source_file = domain_template_conf['input']
-        self._output_file = domain_template_conf['output']
+        self._output_file = domain_template_conf.get('output')
+        # tuple with the validator of the source file and the rendered content
+        self._rendered = None
 
-    def render(self, template_dict):
+    def __substitute(self, template_dict):
 
-        """Renders the output file based on the source template.
+        """Returns the source template with the variables substituted.
 
-           :param dict template_dict: the dictionnary of variable value pairs
-               to substitute in the template file
            :exceptions CloubedException:
                * the source template could not be read
-               * the output file could not be written
         """
 
         try:
-            input_file = open(self._source_file, 'r')
+            with open(self._source_file, 'r') as input_file:
+                source = input_file.read()
         except IOError as err:
             raise CloubedException(
                       "error while reading template file {filename}: {err}" \
                           .format(filename=self._source_file,
                                   err=err))
 
-        template_str = ExtTemplate(input_file.read()) \
-                           .safe_substitute(template_dict)
+        return ExtTemplate(source).safe_substitute(template_dict)
+
+    def render(self, template_dict):
+
+        """Renders the output file based on the source template.
+
+           :param dict template_dict: the dictionnary of variable value pairs
+               to substitute in the template file
+           :exceptions CloubedException:
+               * the template does not have output file
+               * the source template could not be read
+               * the output file could not be written
+        """
+
+        if self._output_file is None:
+            raise CloubedException(
+                      "template {template} does not have output file" \
+                          .format(template=self.name))
+
+        template_str = self.__substitute(template_dict)
 
         try:
             output_file = open(self._output_file, 'w')
@@ -80,8 +98,40 @@ class DomainTemplate():
                           .format(filename=self._output_file,
                                   err=err))
 
+    def content(self, get_template_dict):
+
+        """Returns the rendered template as bytes without writing the output
+           file. The rendered content is kept in memory until the source
+           template is modified.
+
+           :param function get_template_dict: the function which returns the
+               dictionnary of variable value pairs to substitute in the
+               template file, only called when the template must be rendered
+           :exceptions CloubedException:
+               * the source template could not be read
+        """
+
+        try:
+            stat = os.stat(self._source_file)
+        except OSError as err:
+            raise CloubedException(
+                      "error while reading template file {filename}: {err}" \
+                          .format(filename=self._source_file,
+                                  err=err))
+
+        validator = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        rendered = self._rendered
+        if rendered is not None and rendered[0] == validator:
+            return rendered[1]
+
+        content = self.__substitute(get_template_dict()).encode('utf-8')
+        self._rendered = (validator, content)
+        return content
+
     def delete(self):
         """Delete the output file of the DomainTemplate if it exists."""
+        if self._output_file is None:
+            return
         if os.path.exists(self._output_file) and \
            os.path.isfile(self._output_file):
             try:
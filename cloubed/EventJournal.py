@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" EventJournal class of Cloubed """
+
+import os
+import json
+import time
+from collections import deque
+
+from cloubed.JSONLinesFile import JSONLinesFile
+from cloubed.Utils import state_path
+
+class EventJournal(JSONLinesFile):
+
+    """EventJournal class
+
+       Append-only journal of the events received on the domains of the
+       testbed, in JSON lines in the state directory. Each record carries the
+       wall-clock time and the monotonic time of the host in nanoseconds, to
+       measure the intervals between events without clock jumps, the domain,
+       the type, the detail and the additional data of the event. The journal
+       is rotated like all JSONLinesFile.
+    """
+
+    def __init__(self, path=None):
+
+        if path is None:
+            path = state_path('events.jsonl')
+        super(EventJournal, self).__init__(path)
+
+    @staticmethod
+    def record(domain_name, event):
+
+        """Returns the record dict of the event on the domain."""
+
+        record = { 'time': time.time(),
+                   'monotonic': time.monotonic_ns(),
+                   'domain': domain_name,
+                   'type': event.type,
+                   'detail': event.detail }
+        if event.data:
+            record['data'] = event.data
+        return record
+
+    def append(self, domain_name, event):
+
+        """Appends the record of the event on the domain to the journal.
+
+           :param string domain_name: the name of the domain
+           :param DomainEvent event: the event received on the domain
+        """
+
+        self.write(EventJournal.record(domain_name, event))
+
+    @staticmethod
+    def __parse(line, domain_name, event_type, event_detail):
+
+        """Returns the record of the line or None if it does not match the
+           filters or if it is incomplete.
+        """
+
+        # skip the lines of the other domains before decoding JSON, since the
+        # records are written without any whitespace
+        if domain_name is not None and \
+           '"domain":' + json.dumps(domain_name) not in line:
+            return None
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # incomplete last line being written
+            return None
+        if domain_name is not None and record['domain'] != domain_name:
+            return None
+        if event_type is not None and record['type'] != event_type:
+            return None
+        if event_detail is not None and record['detail'] != event_detail:
+            return None
+        return record
+
+    def read(self, domain_name=None, event_type=None, event_detail=None,
+             tail=None):
+
+        """Returns the list of records of the journal, the oldest first,
+           optionally filtered on the domain, the type and the detail of the
+           events.
+
+           :param string domain_name: the name of the domain
+           :param string event_type: the type of the events, eg. STOPPED
+           :param string event_detail: the detail of the events, eg.
+               STOPPED_SHUTDOWN
+           :param int tail: the maximum number of the most recent records
+               returned, all by default
+        """
+
+        records = deque(maxlen=tail)
+        for line in self.lines():
+            record = EventJournal.__parse(line, domain_name,
+                                          event_type, event_detail)
+            if record is not None:
+                records.append(record)
+        return list(records)
+
+    def follow(self, domain_name=None, event_type=None, event_detail=None,
+               interval=0.5):
+
+        """Generator of the records appended to the journal from now on,
+           optionally filtered like in read(). It polls the journal every
+           interval seconds and it reopens the journal once rotated.
+        """
+
+        journal = None
+        inode = None
+        # the records written before are skipped, unlike the records of the
+        # new journals after rotations
+        start = os.SEEK_END
+        try:
+            while True:
+                if journal is None:
+                    try:
+                        # binary mode to seek back to incomplete lines
+                        journal = open(self.path, 'rb')
+                    except FileNotFoundError:
+                        start = os.SEEK_SET
+                        time.sleep(interval)
+                        continue
+                    inode = os.fstat(journal.fileno()).st_ino
+                    journal.seek(0, start)
+                    start = os.SEEK_SET
+                line = journal.readline()
+                if line.endswith(b'\n'):
+                    record = EventJournal.__parse(line.decode('utf-8'),
+                                                  domain_name,
+                                                  event_type,
+                                                  event_detail)
+                    if record is not None:
+                        yield record
+                    continue
+                # go back to the beginning of the incomplete line
+                journal.seek(-len(line), os.SEEK_CUR)
+                try:
+                    rotated = os.stat(self.path).st_ino != inode
+                except FileNotFoundError:
+                    rotated = True
+                if rotated:
+                    # read the records appended to the previous journal
+                    # before its rotation, then the new journal from its
+                    # beginning
+                    for line in journal:
+                        record = EventJournal.__parse(line.decode('utf-8'),
+                                                      domain_name,
+                                                      event_type,
+                                                      event_detail)
+                        if record is not None:
+                            yield record
+                    journal.close()
+                    journal = None
+                    continue
+                time.sleep(interval)
+        finally:
+            if journal is not None:
+                journal.close()
+
+    @staticmethod
+    def summarize(records):
+
+        """Returns a dict of the number of events, the first and the last
+           wall-clock times and the mean interval in seconds between
+           consecutive events, indexed by the tuples (domain, type, detail)
+           of the events.
+
+           :param list records: the records of the journal, the oldest first
+        """
+
+        summary = {}
+        for record in records:
+            key = (record['domain'], record['type'], record['detail'])
+            entry = summary.get(key)
+            if entry is None:
+                summary[key] = { 'count': 1,
+                                 'first': record['time'],
+                                 'last': record['time'],
+                                 'monotonic': record['monotonic'],
+                                 'interval': None }
+                continue
+            entry['count'] += 1
+            entry['last'] = record['time']
+            interval = (record['monotonic'] - entry['monotonic']) / 1e9
+            entry['monotonic'] = record['monotonic']
+            # running mean of the intervals
+            if entry['interval'] is None:
+                entry['interval'] = interval
+            else:
+                entry['interval'] += (interval - entry['interval']) / \
+                                     (entry['count'] - 1)
+        for entry in summary.values():
+            del entry['monotonic']
+        return summary
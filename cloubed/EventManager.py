@@ -26,15 +26,21 @@ import logging
 
 from cloubed.VirtController import VirtController
 from cloubed.DomainEvent import DomainEvent
+from cloubed.EventJournal import EventJournal
+from cloubed.CloubedException import CloubedException
 
 class EventManager:
 
     """ EventManager class """
 
     tbd = None
+    journal = None
 
     def __init__(self, tbd):
 
+        # the journal must be opened before the events are received
+        EventManager.journal = EventJournal()
+
         VirtController.event_register()
         self._stop = threading.Event()
 
@@ -55,6 +61,7 @@ class EventManager:
 
         logging.debug("terminating event manager thread")
         self._stop.set()
+        EventManager.journal.close()
 
     def run_event_loop(self):
 
@@ -67,11 +74,11 @@ class EventManager:
             VirtController.event_run()
 
     @staticmethod
-    def manage_event(conn, dom, event_type, event_detail, opaque):
+    def manage_event(dom, event_id, args):
 
         """ manage_event: handler launched by libvirt in case of event """
 
-        event = DomainEvent(event_type, event_detail)
+        event = DomainEvent.from_libvirt(event_id, args)
         logging.debug("event on domain {domain_name}({domain_id}) " \
                       "{event_type} {event_detail}" \
                           .format(domain_name=dom.name(),
@@ -79,11 +86,13 @@ class EventManager:
                                   event_type=event.type,
                                   event_detail=event.detail))
 
-        domain = EventManager.tbd.get_domain_by_libvirt_name(dom.name())
         # test if notified event comes from a domain in current testbed
-        if domain is None:
+        try:
+            domain = EventManager.tbd.get_domain_by_libvirt_name(dom.name())
+        except CloubedException:
             logging.debug("event received for domain {domain} but not found " \
                           "in testbed".format(domain=dom.name()))
         else:
+            EventManager.journal.append(domain.name, event)
             domain.notify_event(event)
 
@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" HTTPFileCache class of Cloubed """
+
+import threading
+from collections import OrderedDict
+
+class HTTPFileCache:
+
+    """HTTPFileCache class
+
+       It keeps the content of small files served by the HTTPServer in memory,
+       least recently used files are evicted first when the total size of the
+       cache exceeds its budget. An entry is valid as long as the inode, the
+       size and the modification time of the file are the same.
+    """
+
+    def __init__(self, max_size=64 * 1024**2, max_file_size=1024**2):
+
+        self.max_size = max_size
+        self.max_file_size = max_file_size
+        self.size = 0
+        self._entries = OrderedDict() # (validator, content) indexed by path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def validator(stat):
+        """Returns the tuple which identifies a version of a file out of its
+           stat result.
+        """
+
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def cacheable(self, stat):
+        """Returns True if the file is small enough to be cached."""
+
+        return stat.st_size <= self.max_file_size
+
+    def get(self, path, stat):
+        """Returns the content of the file in cache or None if the file is not
+           in cache or if it has been modified since it was cached.
+
+           :param string path: the path of the file
+           :param os.stat_result stat: the current stat result of the file
+        """
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            (validator, content) = entry
+            if validator != HTTPFileCache.validator(stat):
+                del self._entries[path]
+                self.size -= len(content)
+                return None
+            self._entries.move_to_end(path)
+            return content
+
+    def put(self, path, stat, content):
+        """Adds the content of the file in cache and evicts the least recently
+           used files if the cache exceeds its budget.
+
+           :param string path: the path of the file
+           :param os.stat_result stat: the stat result of the file when its
+               content was read
+           :param bytes content: the content of the file
+        """
+
+        if len(content) > self.max_file_size:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self._entries[path] = (HTTPFileCache.validator(stat), content)
+            self.size += len(content)
+            while self.size > self.max_size:
+                (_, (_, evicted)) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
@@ -0,0 +1,279 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" HTTPProxyCache class of Cloubed """
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import email.utils
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+
+from cloubed.Utils import write_state
+
+class HTTPProxyCache:
+
+    """HTTPProxyCache class
+
+       On-disk cache of the HTTP server in forward proxy mode. The content of
+       each URL is stored in a file named after the SHA-256 hash of the URL,
+       next to a JSON file with its metadata. When the total size of the
+       entries exceeds the budget, the least recently used entries are
+       evicted.
+
+       Concurrent requests for the same URL are coalesced: one thread fetches
+       the URL upstream while the other ones wait for the entry. The packages
+       are never modified on the mirrors and they are always served from the
+       cache. The other files, like the repository indexes, are revalidated
+       upstream with a conditional request when they are older than max_age
+       seconds.
+    """
+
+    immutable_regexp = re.compile(r"\.(deb|udeb|rpm|drpm)$")
+    max_age = 60
+    timeout = 60
+
+    def __init__(self, path, budget):
+
+        self.path = path
+        self.budget = budget # bytes
+        self.size = 0
+        self._entries = OrderedDict() # metadata indexed by keys
+        self._inflight = {} # events of the fetches indexed by keys
+        self._lock = threading.Lock()
+        # never go through the proxy of the environment
+        self._opener = urllib.request.build_opener(
+                           urllib.request.ProxyHandler({}))
+        self.__load()
+
+    @staticmethod
+    def key(url):
+
+        """Returns the key of the entry of the URL."""
+
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def __data_path(self, key):
+
+        return os.path.join(self.path, key)
+
+    def __meta_path(self, key):
+
+        return os.path.join(self.path, key + '.json')
+
+    def __load(self):
+
+        """Loads the metadata of the entries stored by previous runs, the
+           least recently fetched first.
+        """
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        entries = []
+        for filename in os.listdir(self.path):
+            if filename.endswith('.tmp'):
+                # incomplete fetch
+                os.unlink(os.path.join(self.path, filename))
+                continue
+            if not filename.endswith('.json'):
+                continue
+            key = filename[:-len('.json')]
+            try:
+                with open(self.__meta_path(key)) as meta_file:
+                    meta = json.load(meta_file)
+                # the data file has the upstream modification time, the
+                # metadata file is written on each fetch or revalidation
+                written = os.stat(self.__meta_path(key)).st_mtime
+                meta['size'] = os.stat(self.__data_path(key)).st_size
+            except (OSError, ValueError):
+                continue
+            entries.append((written, key, meta))
+
+        for (_, key, meta) in sorted(entries):
+            self._entries[key] = meta
+            self.size += meta['size']
+
+    def __fresh(self, meta):
+
+        """Returns True if the entry can be served without revalidation."""
+
+        if HTTPProxyCache.immutable_regexp.search(meta['url']):
+            return True
+        return time.time() - meta['validated'] < self.max_age
+
+    def __open_entry(self, key):
+
+        """Returns the tuple (file, metadata) of the entry, or None if its
+           file has been removed. It must be called with the lock held so
+           that the entry is not evicted in the meantime. The opened file
+           remains readable after an eviction.
+        """
+
+        try:
+            handle = open(self.__data_path(key), 'rb')
+        except OSError:
+            self.__drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return (handle, self._entries[key])
+
+    def __drop(self, key):
+
+        """Removes the entry from the index and from the disk."""
+
+        meta = self._entries.pop(key, None)
+        if meta is not None:
+            self.size -= meta['size']
+        for path in [ self.__data_path(key), self.__meta_path(key) ]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def __evict(self):
+
+        """Drops the least recently used entries until the total size of the
+           cache fits in its budget. The entries being fetched are kept.
+        """
+
+        for key in list(self._entries):
+            if self.size <= self.budget:
+                break
+            if key in self._inflight:
+                continue
+            logging.debug("http proxy: evicting {url}" \
+                              .format(url=self._entries[key]['url']))
+            self.__drop(key)
+
+    def open(self, url):
+
+        """Returns a tuple with the opened file of the cached content of the
+           URL and its metadata dict, with url, size, content_type, etag and
+           last_modified keys. The URL is fetched upstream if it is not in
+           cache or if it must be revalidated.
+
+           :param string url: the URL requested by the client
+           :exceptions urllib.error.HTTPError:
+               * the upstream server answered an error
+           :exceptions OSError:
+               * the upstream server could not be reached
+        """
+
+        key = HTTPProxyCache.key(url)
+
+        while True:
+            with self._lock:
+                meta = self._entries.get(key)
+                if meta is not None and self.__fresh(meta):
+                    entry = self.__open_entry(key)
+                    if entry is not None:
+                        return entry
+                    meta = None
+                event = self._inflight.get(key)
+                if event is None:
+                    # this thread fetches the URL
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    break
+            # wait for the fetch of another thread and check the cache again
+            event.wait()
+
+        try:
+            return self.__fetch(url, key, meta)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def __fetch(self, url, key, meta):
+
+        """Fetches the URL upstream, conditionally if a stale entry exists,
+           stores it in cache and returns the tuple (file, metadata).
+        """
+
+        request = urllib.request.Request(url)
+        if meta is not None:
+            if meta['etag'] is not None:
+                request.add_header('If-None-Match', meta['etag'])
+            if meta['last_modified'] is not None:
+                request.add_header('If-Modified-Since', meta['last_modified'])
+
+        try:
+            response = self._opener.open(request, timeout=self.timeout)
+        except urllib.error.HTTPError as err:
+            if err.code != 304 or meta is None:
+                raise
+            err.close()
+            logging.debug("http proxy: {url} not modified upstream" \
+                              .format(url=url))
+            with self._lock:
+                meta['validated'] = time.time()
+                write_state(self.__meta_path(key), meta)
+                entry = self.__open_entry(key)
+            if entry is None:
+                # removed in the meantime, fetch it again unconditionally
+                return self.__fetch(url, key, None)
+            return entry
+
+        tmp_path = self.__data_path(key) + '.tmp'
+        with response, open(tmp_path, 'wb') as tmp_file:
+            shutil.copyfileobj(response, tmp_file, 1024**2)
+            headers = response.headers
+
+        meta = { 'url': url,
+                 'size': os.stat(tmp_path).st_size,
+                 'content_type': headers.get('Content-Type'),
+                 'etag': headers.get('ETag'),
+                 'last_modified': headers.get('Last-Modified'),
+                 'validated': time.time() }
+
+        # the cached file has the upstream modification time so that the
+        # Last-Modified header sent to the clients is the upstream one
+        if meta['last_modified'] is not None:
+            try:
+                mtime = email.utils.parsedate_to_datetime(
+                            meta['last_modified']).timestamp()
+                os.utime(tmp_path, (mtime, mtime))
+            except (TypeError, ValueError, IndexError):
+                pass
+
+        logging.debug("http proxy: fetched {url} ({size} bytes)" \
+                          .format(url=url, size=meta['size']))
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous['size']
+            os.replace(tmp_path, self.__data_path(key))
+            write_state(self.__meta_path(key), meta)
+            self._entries[key] = meta
+            self.size += meta['size']
+            entry = self.__open_entry(key)
+            self.__evict()
+        return entry
@@ -0,0 +1,498 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" HTTPRequestHandler class of Cloubed """
+
+import os
+import re
+import logging
+import contextlib
+import datetime
+import email.utils
+import http.server
+import urllib.error
+import urllib.parse
+from http import HTTPStatus
+
+from cloubed.HTTPFileCache import HTTPFileCache
+from cloubed.CloubedException import CloubedException
+
+class HTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
+
+    """HTTPRequestHandler class
+
+       It serves the files of the root directory of the HTTPServer with
+       persistent HTTP/1.1 connections. The large files are sent with
+       os.sendfile() so that their content is never copied in Python, and
+       single byte ranges are supported. The small files are served from the
+       file cache of the server. The ETag and Last-Modified validators are sent
+       so that clients can revalidate their copies with conditional requests
+       answered by 304 Not Modified. The directories are still listed by
+       SimpleHTTPRequestHandler.
+
+       The paths under templates_prefix are the templates of the domain of the
+       client, identified by its IP address, rendered by the renderer of the
+       server. The absolute URLs are served by the proxy cache of the server,
+       when enabled. The files sent by the domains with PUT or POST requests
+       under uploads_prefix are streamed on disk by the uploads manager of the
+       server, when enabled. The GET and HEAD requests are recorded as spans
+       in the timeline of the server, when given, with the IP address of the
+       client to attribute them to its domain.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    # idle persistent connections are closed after this number of seconds to
+    # release the worker threads
+    timeout = 30
+
+    range_regexp = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+    templates_prefix = "/.cloubed/templates/"
+    uploads_prefix = "/.cloubed/uploads/"
+
+    # size of the chunks of the uploaded files written on disk
+    upload_chunk_size = 1024**2
+
+    def log_message(self, format, *args):
+
+        logging.debug("http: {client} {message}" \
+                          .format(client=self.address_string(),
+                                  message=format % args))
+
+    def do_GET(self):
+
+        with self.__span():
+            self.__serve(send_body=True)
+
+    def do_HEAD(self):
+
+        with self.__span():
+            self.__serve(send_body=False)
+
+    def do_PUT(self):
+
+        self.__upload()
+
+    def do_POST(self):
+
+        self.__upload()
+
+    def __span(self):
+        """Returns the context manager of the span of the request in the
+           timeline of the server, or a null context without timeline.
+        """
+
+        if self.server.timeline is None:
+            return contextlib.nullcontext()
+        return self.server.timeline.span('http', self.path,
+                                         client=self.client_address[0])
+
+    def __token(self):
+        """Returns the upload token sent in the Authorization header or in
+           the token parameter of the query string, or None if not found.
+        """
+
+        header = self.headers.get('Authorization', '')
+        if header.startswith('Bearer '):
+            return header[len('Bearer '):].strip()
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        return query.get('token', [ None ])[0]
+
+    def __copy_body(self, output, count):
+        """Copies count bytes of the request body in the output file, chunk
+           by chunk.
+        """
+
+        while count > 0:
+            chunk = self.rfile.read(min(count,
+                                        HTTPRequestHandler.upload_chunk_size))
+            if not chunk:
+                raise ValueError("connection closed before the end of body")
+            output.write(chunk)
+            count -= len(chunk)
+
+    def __receive_body(self, output):
+        """Writes the request body in the output file, either with chunked
+           transfer encoding or with a Content-Length, and returns its size.
+        """
+
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            total = 0
+            while True:
+                line = self.rfile.readline(65537)
+                size = int(line.split(b';')[0].strip(), 16)
+                if size == 0:
+                    # skip the trailer
+                    while self.rfile.readline(65537) not in [ b'\r\n',
+                                                              b'\n',
+                                                              b'' ]:
+                        pass
+                    return total
+                self.__copy_body(output, size)
+                self.rfile.readline() # CRLF at the end of the chunk
+                total += size
+
+        length = self.headers.get('Content-Length')
+        if length is None:
+            raise ValueError("length of body is required")
+        length = int(length)
+        if length < 0:
+            raise ValueError("length of body is not valid")
+        self.__copy_body(output, length)
+        return length
+
+    def __upload(self):
+        """Writes the body of the request in the file of the domain
+           authenticated by the upload token.
+        """
+
+        request_path = urllib.parse.unquote(
+                           urllib.parse.urlsplit(self.path).path)
+
+        # the body is not read on errors, the connection cannot be reused
+        if not request_path.startswith(HTTPRequestHandler.uploads_prefix):
+            self.close_connection = True
+            self.send_error(HTTPStatus.METHOD_NOT_ALLOWED)
+            return
+
+        uploads = self.server.uploads
+        if uploads is None:
+            self.close_connection = True
+            self.send_error(HTTPStatus.FORBIDDEN, "Uploads disabled")
+            return
+
+        token = self.__token()
+        domain = None if token is None else uploads.authenticate(token)
+        if domain is None:
+            self.close_connection = True
+            self.send_error(HTTPStatus.UNAUTHORIZED)
+            return
+
+        filename = request_path[len(HTTPRequestHandler.uploads_prefix):]
+        try:
+            (output, tmp_path, path) = uploads.create(domain, filename)
+        except (CloubedException, OSError) as err:
+            logging.warning("http: unable to create upload {filename} of " \
+                            "domain {domain}: {err}".format(filename=filename,
+                                                            domain=domain,
+                                                            err=err))
+            self.close_connection = True
+            self.send_error(HTTPStatus.BAD_REQUEST)
+            return
+
+        try:
+            with output:
+                size = self.__receive_body(output)
+            os.replace(tmp_path, path)
+        except (ValueError, OSError) as err:
+            logging.warning("http: upload {filename} of domain {domain} " \
+                            "failed: {err}".format(filename=filename,
+                                                   domain=domain,
+                                                   err=err))
+            os.unlink(tmp_path)
+            self.close_connection = True
+            try:
+                self.send_error(HTTPStatus.BAD_REQUEST)
+            except OSError:
+                pass
+            return
+
+        logging.info("http: received {filename} ({size} bytes) from domain " \
+                     "{domain}".format(filename=filename,
+                                       size=size,
+                                       domain=domain))
+        self.send_response(HTTPStatus.CREATED)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def __parse_range(self, size):
+        """Returns the tuple (first, last) of the byte range requested in the
+           Range header, None if the whole file must be sent or False if the
+           range cannot be satisfied. Multiple ranges are not supported, the
+           whole file is sent instead as allowed by RFC 7233.
+        """
+
+        header = self.headers.get('Range')
+        if header is None:
+            return None
+        match = HTTPRequestHandler.range_regexp.match(header.strip())
+        if match is None:
+            return None
+        (first, last) = match.groups()
+        if first == '' and last == '':
+            return None
+        if first == '':
+            # suffix range: the last bytes of the file
+            length = int(last)
+            if length == 0:
+                return False
+            return (max(size - length, 0), size - 1)
+        first = int(first)
+        last = size - 1 if last == '' else min(int(last), size - 1)
+        if first >= size or first > last:
+            return False
+        return (first, last)
+
+    @staticmethod
+    def etag(stat):
+        """Returns the entity tag of a version of a file out of its stat
+           result.
+        """
+
+        return '"{ino:x}-{size:x}-{mtime:x}"'.format(ino=stat.st_ino,
+                                                      size=stat.st_size,
+                                                      mtime=stat.st_mtime_ns)
+
+    def __not_modified(self, stat, etag):
+        """Returns True if the client already has the version of the file
+           according to the If-None-Match or If-Modified-Since headers of the
+           request. If-Modified-Since is ignored when If-None-Match is present,
+           as required by RFC 7232.
+        """
+
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            for tag in if_none_match.split(','):
+                tag = tag.strip()
+                # weak comparison
+                if tag.startswith('W/'):
+                    tag = tag[2:]
+                if tag == '*' or tag == etag:
+                    return True
+            return False
+
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since is not None:
+            try:
+                date = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError, IndexError):
+                return False
+            if date.tzinfo is None:
+                date = date.replace(tzinfo=datetime.timezone.utc)
+            return int(stat.st_mtime) <= date.timestamp()
+
+        return False
+
+    def __range_applicable(self, stat, etag):
+        """Returns False if the Range header must be ignored because the
+           If-Range header of the request does not match the current version
+           of the file.
+        """
+
+        if_range = self.headers.get('If-Range')
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        return if_range == etag or \
+               if_range == self.date_time_string(stat.st_mtime)
+
+    def __read_content(self, path, stat):
+        """Returns the content of the file if it is small enough to be kept in
+           the file cache of the server, reading it on disk on cache miss, or
+           None if it must be sent from disk.
+        """
+
+        cache = self.server.file_cache
+        if not cache.cacheable(stat):
+            return None
+        content = cache.get(path, stat)
+        if content is not None:
+            return content
+        with open(path, 'rb') as handle:
+            content = handle.read()
+            # the file may have changed between stat() and read()
+            current = os.fstat(handle.fileno())
+        if HTTPFileCache.validator(current) == HTTPFileCache.validator(stat) \
+           and len(content) == stat.st_size:
+            cache.put(path, stat, content)
+            return content
+        return None
+
+    def __serve_template(self, template_name, send_body):
+        """Serves the template rendered for the domain of the client."""
+
+        renderer = self.server.renderer
+        if renderer is None:
+            self.send_error(HTTPStatus.NOT_FOUND, "Template not found")
+            return
+
+        client = self.client_address[0]
+        try:
+            content = renderer(client, template_name)
+        except CloubedException as err:
+            logging.debug("http: unable to render template {template} for " \
+                          "{client}: {err}".format(template=template_name,
+                                                   client=client,
+                                                   err=err))
+            self.send_error(HTTPStatus.NOT_FOUND, "Template not found")
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        # the content depends on the client
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(content)
+
+    def __serve(self, send_body):
+        """Serves the file of the requested path, or delegates to
+           SimpleHTTPRequestHandler for directories.
+        """
+
+        # absolute URL in forward proxy mode
+        if self.path.startswith("http://"):
+            self.__serve_proxy(send_body)
+            return
+
+        request_path = urllib.parse.unquote(
+                           urllib.parse.urlsplit(self.path).path)
+        if request_path.startswith(HTTPRequestHandler.templates_prefix):
+            self.__serve_template(
+                request_path[len(HTTPRequestHandler.templates_prefix):],
+                send_body)
+            return
+
+        path = self.translate_path(self.path)
+
+        if os.path.isdir(path):
+            handle = self.send_head()
+            if handle:
+                try:
+                    if send_body:
+                        self.copyfile(handle, self.wfile)
+                finally:
+                    handle.close()
+            return
+
+        try:
+            stat = os.stat(path)
+            content = self.__read_content(path, stat)
+            handle = None
+            if content is None:
+                handle = open(path, 'rb')
+                stat = os.fstat(handle.fileno())
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+
+        try:
+            self.__send_entity(stat, self.guess_type(path), content, handle,
+                               send_body)
+        finally:
+            if handle is not None:
+                handle.close()
+
+    def __serve_proxy(self, send_body):
+        """Serves the URL requested in forward proxy mode out of the proxy
+           cache of the server.
+        """
+
+        proxy = self.server.proxy
+        if proxy is None:
+            self.send_error(HTTPStatus.FORBIDDEN, "Proxy disabled")
+            return
+
+        try:
+            (handle, meta) = proxy.open(self.path)
+        except urllib.error.HTTPError as err:
+            self.send_error(err.code)
+            return
+        except OSError as err:
+            logging.debug("http: unable to fetch {url}: {err}" \
+                              .format(url=self.path, err=err))
+            self.send_error(HTTPStatus.BAD_GATEWAY)
+            return
+
+        try:
+            content_type = meta['content_type']
+            if content_type is None:
+                content_type = "application/octet-stream"
+            self.__send_entity(os.fstat(handle.fileno()), content_type, None,
+                               handle, send_body)
+        finally:
+            handle.close()
+
+    def __send_entity(self, stat, content_type, content, handle, send_body):
+        """Sends the response with the content of a file, either in memory or
+           from the opened file handle. The conditional and range requests are
+           handled with the stat result of the file.
+        """
+
+        size = stat.st_size
+        etag = HTTPRequestHandler.etag(stat)
+        last_modified = self.date_time_string(stat.st_mtime)
+
+        if self.__not_modified(stat, etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            return
+
+        byte_range = None
+        if self.__range_applicable(stat, etag):
+            byte_range = self.__parse_range(size)
+
+        if byte_range is False:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", "bytes */{size}" \
+                                                  .format(size=size))
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if byte_range is None:
+            (first, last) = (0, size - 1)
+            self.send_response(HTTPStatus.OK)
+        else:
+            (first, last) = byte_range
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range",
+                             "bytes {first}-{last}/{size}" \
+                                 .format(first=first,
+                                         last=last,
+                                         size=size))
+
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(last - first + 1))
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+        if send_body and last >= first:
+            if content is not None:
+                self.wfile.write(content[first:last + 1])
+            else:
+                self.__send_file(handle, first, last - first + 1)
+
+    def __send_file(self, handle, offset, count):
+        """Sends count bytes of the file handle starting at offset on the
+           connection. socket.sendfile() uses os.sendfile() and waits for the
+           socket to be writable since it has a timeout, it falls back to a
+           regular copy if sendfile is not supported.
+        """
+
+        self.wfile.flush()
+        self.connection.sendfile(handle, offset, count)
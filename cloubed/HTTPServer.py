@@ -21,20 +21,104 @@
 
 """ HTTPServer class of Cloubed """
 
+import os
 import http.server
-import socketserver
 import threading
 import logging
 import socket
+from concurrent.futures import ThreadPoolExecutor
+
+from cloubed.HTTPRequestHandler import HTTPRequestHandler
+from cloubed.HTTPFileCache import HTTPFileCache
+
+class ThreadPoolHTTPServer(http.server.HTTPServer):
+
+    """ThreadPoolHTTPServer class
+
+       HTTP server which handles the connections in a pool of threads. The
+       size of the pool caps the number of connections served concurrently,
+       the other ones wait in the pool queue. The small files served are kept
+       in a file cache shared by all connections. The renderer is the
+       function called to render the templates requested by the clients. The
+       proxy is the HTTPProxyCache of the forward proxy mode and uploads is
+       the HTTPUploads of the files sent by the domains, if enabled. The
+       requests are recorded in the timeline, if given.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, root, max_connections,
+                 renderer=None, proxy=None, uploads=None, timeline=None):
+
+        self.root = root
+        self.renderer = renderer
+        self.proxy = proxy
+        self.uploads = uploads
+        self.timeline = timeline
+        self.file_cache = HTTPFileCache()
+        self._executor = ThreadPoolExecutor(max_workers=max_connections,
+                                            thread_name_prefix="ClouBedHTTP")
+        # connections being served, closed when the server is closed
+        self._requests = set()
+        self._requests_lock = threading.Lock()
+        http.server.HTTPServer.__init__(self, address, handler)
+
+    def process_request(self, request, client_address):
+
+        with self._requests_lock:
+            self._requests.add(request)
+        self._executor.submit(self.__process_request_thread,
+                              request, client_address)
+
+    def __process_request_thread(self, request, client_address):
+
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            with self._requests_lock:
+                self._requests.discard(request)
+            self.shutdown_request(request)
+
+    def finish_request(self, request, client_address):
+
+        self.RequestHandlerClass(request, client_address, self,
+                                 directory=self.root)
+
+    def handle_error(self, request, client_address):
+
+        logging.debug("http: error while serving {client}" \
+                          .format(client=client_address[0]),
+                      exc_info=True)
+
+    def server_close(self):
+
+        http.server.HTTPServer.server_close(self)
+        # close idle persistent connections so that the worker threads do not
+        # delay the exit of the program
+        with self._requests_lock:
+            for request in self._requests:
+                try:
+                    request.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        self._executor.shutdown(wait=False)
 
 class HTTPServer():
 
     """ HTTPServer class """
 
-    def __init__(self):
+    def __init__(self, port=5432, max_connections=64, renderer=None,
+                 proxy=None, uploads=None, timeline=None):
 
-        self._port = 5432
-        self._handler = http.server.SimpleHTTPRequestHandler
+        self.port = port
+        self._max_connections = max_connections
+        self._renderer = renderer
+        self._proxy = proxy
+        self._uploads = uploads
+        self._timeline = timeline
+        self._handler = HTTPRequestHandler
         self._address = None
         self._httpd = None
         self._thread = None
@@ -50,16 +134,38 @@ class HTTPServer():
 
         return self._thread is not None and self._httpd is not None
 
-    def launch(self, address):
+    def launch(self, address, root=None):
 
         """
-            launch: Creates the daemon thread that will start the HTTP server
+            launch: Binds the HTTP server on the address and creates the daemon
+            thread that will serve the files of the root directory, by default
+            the current directory.
         """
 
         self._address = address
+        if root is None:
+            root = os.getcwd()
+
+        try:
+            self._httpd = ThreadPoolHTTPServer((self._address, self.port),
+                                               self._handler,
+                                               root,
+                                               self._max_connections,
+                                               self._renderer,
+                                               self._proxy,
+                                               self._uploads,
+                                               self._timeline)
+        except socket.error as e:
+            logging.warning("error while launching TCP Server: {err}" \
+                                .format(err=e))
+            return
+
+        # real port if the port 0 was given to get a free port
+        self.port = self._httpd.server_address[1]
+
         self._thread = threading.Thread(target=self.threaded_server,
                                         name="ClouBedHTTPServer")
-        self._thread.setDaemon(True)
+        self._thread.daemon = True
         self._thread.start()
 
     def terminate(self):
@@ -69,16 +175,12 @@ class HTTPServer():
         """
         logging.debug("shutting down http server")
         self._httpd.shutdown()
+        self._httpd.server_close()
 
     def threaded_server(self):
 
         """
-            threaded_server: Thread routine that actually starts the HTTP server
+            threaded_server: Thread routine that actually runs the HTTP server
         """
 
-        try:
-            self._httpd = socketserver.TCPServer((self._address, self._port),
-                                                 self._handler)
-            self._httpd.serve_forever()
-        except socket.error as e:
-            logging.warn("error while launching TCP Server: {err}".format(err=e))
+        self._httpd.serve_forever()
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" HTTPUploads class of Cloubed """
+
+import os
+import hmac
+import hashlib
+import secrets
+import tempfile
+
+from cloubed.Utils import state_path
+from cloubed.CloubedException import CloubedException
+
+class HTTPUploads:
+
+    """HTTPUploads class
+
+       It manages the files uploaded by the domains on the HTTP server. Each
+       domain is authenticated by a token derived from its name and a secret
+       key of the testbed, kept in the state directory. The files of each
+       domain are written in its own sub-directory of the uploads directory.
+       The uploaded content is written in a temporary file which is renamed
+       when complete, so that partial uploads are never visible.
+    """
+
+    def __init__(self, path, domains):
+
+        self.path = path
+        self._key = HTTPUploads.__load_key()
+        # domain names indexed by their tokens
+        self._domains = { self.token(domain): domain for domain in domains }
+
+    @staticmethod
+    def __load_key():
+
+        """Returns the secret key of the testbed, generating it on first
+           use.
+        """
+
+        key_path = state_path('uploads.key')
+        if os.path.exists(key_path):
+            with open(key_path) as key_file:
+                return key_file.read().strip()
+
+        directory = os.path.dirname(key_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        key = secrets.token_hex(32)
+        descriptor = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                             0o600)
+        with os.fdopen(descriptor, 'w') as key_file:
+            key_file.write(key)
+        return key
+
+    def token(self, domain_name):
+
+        """Returns the upload token of the domain.
+
+           :param string domain_name: the name of the domain
+        """
+
+        return hmac.new(self._key.encode('ascii'),
+                        domain_name.encode('utf-8'),
+                        hashlib.sha256).hexdigest()
+
+    def authenticate(self, token):
+
+        """Returns the name of the domain of the token or None if the token
+           is not valid.
+
+           :param string token: the token sent by the client
+        """
+
+        return self._domains.get(token)
+
+    def create(self, domain_name, filename):
+
+        """Returns a tuple with the opened temporary file where the uploaded
+           content must be written, its path and the final path of the file.
+
+           :param string domain_name: the name of the domain
+           :param string filename: the path of the file relative to the
+               directory of the domain
+           :exceptions CloubedException:
+               * the path is out of the directory of the domain
+        """
+
+        directory = os.path.realpath(os.path.join(self.path, domain_name))
+        path = os.path.realpath(os.path.join(directory, filename.lstrip('/')))
+        if not path.startswith(directory + os.sep):
+            raise CloubedException("path {filename} of upload is not valid" \
+                                       .format(filename=filename))
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        (descriptor, tmp_path) = tempfile.mkstemp(
+                                     dir=os.path.dirname(path),
+                                     prefix="." + os.path.basename(path) + ".",
+                                     suffix=".tmp")
+        # mkstemp() creates the file readable by the owner only
+        os.fchmod(descriptor, 0o644)
+        return (os.fdopen(descriptor, 'wb'), tmp_path, path)
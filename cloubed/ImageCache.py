@@ -0,0 +1,385 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" ImageCache class of Cloubed """
+
+import os
+import json
+import time
+import fcntl
+import hashlib
+import logging
+from contextlib import contextmanager
+from xml.dom.minidom import Document
+
+from cloubed.CloubedException import CloubedException
+from cloubed.StoragePool import StoragePool
+from cloubed.StorageVolume import QCOW2_MAGIC
+from cloubed.StorageVolumeTransfer import StorageVolumeTransfer
+from cloubed.Utils import getuser
+
+class ImageCache:
+
+    """ImageCache class
+
+       It manages a host-wide cache of base images shared by all testbeds.
+       The images are stored as storage volumes in a dedicated StoragePool,
+       named after the SHA-256 hash of their content so that the same image is
+       never stored twice. An index file in the storage pool directory keeps
+       track of the labels, sizes, last usage times and references of all
+       entries. A reference is the path of a storage volume which uses the
+       entry as backing. When the total size of the entries exceeds the
+       budget, the least recently used entries without reference are
+       evicted.
+    """
+
+    index_filename = '.cloubed-cache.json'
+    lock_filename = '.cloubed-cache.lock'
+
+    def __init__(self, tbd, image_cache_conf):
+
+        self.tbd = tbd
+        self.ctl = self.tbd.ctl
+
+        self.storage_pool = StoragePool(tbd, image_cache_conf)
+        # the cache is shared by all testbeds, its name does not include the
+        # testbed
+        self.storage_pool.libvirt_name = "{user}:{name}" \
+                                             .format(user=getuser(),
+                                                     name=image_cache_conf.name)
+        self.path = image_cache_conf.path
+        self.budget = image_cache_conf.size * 1024**3 # bytes
+
+        self._index_path = os.path.join(self.path, self.index_filename)
+        self._lock_path = os.path.join(self.path, self.lock_filename)
+
+    @contextmanager
+    def __locked(self):
+
+        """Context manager which holds an exclusive lock on the cache and gives
+           the index. The index is saved when leaving the context without
+           error. The lock protects the index against concurrent cloubed
+           processes on the host.
+        """
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        with open(self._lock_path, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                index = self.__load_index()
+                yield index
+                self.__save_index(index)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def __load_index(self):
+
+        """Returns the index of the cache loaded from its file, or an empty
+           index if the file does not exist yet.
+        """
+
+        if not os.path.exists(self._index_path):
+            return { 'entries': {} }
+        try:
+            with open(self._index_path) as index_file:
+                return json.load(index_file)
+        except ValueError as err:
+            raise CloubedException("index of image cache {path} is " \
+                                   "corrupted: {error}" \
+                                       .format(path=self._index_path,
+                                               error=err))
+
+    def __save_index(self, index):
+
+        """Atomically writes the index in parameter in its file."""
+
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w') as index_file:
+            json.dump(index, index_file, indent=2, sort_keys=True)
+        os.replace(tmp_path, self._index_path)
+
+    @staticmethod
+    def digest(path):
+
+        """Returns the hexadecimal SHA-256 hash of the content of the file in
+           parameter.
+        """
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as image:
+            for chunk in iter(lambda: image.read(1024**2), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    @staticmethod
+    def getfilename(digest, imgtype):
+
+        """Returns the file name of the storage volume of a cache entry."""
+
+        return "{digest}.{imgtype}".format(digest=digest, imgtype=imgtype)
+
+    def getpath(self, digest, imgtype):
+
+        """Returns the absolute path of the storage volume of a cache entry."""
+
+        return os.path.join(self.path, self.getfilename(digest, imgtype))
+
+    def add(self, path, label=None):
+
+        """Adds the local image file in parameter in the cache, unless an entry
+           with the same content already exists. Then, other entries are
+           evicted if the cache is over its budget. Returns the hash of the
+           entry.
+
+           :param string path: the path to the local image file
+           :param string label: an optional label to refer to the entry
+           :exceptions CloubedException:
+               * the image file does not exist
+               * the label is already given to another entry
+        """
+
+        if not os.path.isfile(path):
+            raise CloubedException("image file {path} to add in image cache " \
+                                   "does not exist".format(path=path))
+
+        with open(path, 'rb') as image:
+            imgtype = 'qcow2' if image.read(4) == QCOW2_MAGIC else 'raw'
+
+        logging.info("computing hash of image file {path}".format(path=path))
+        digest = self.digest(path)
+
+        self.storage_pool.create()
+
+        with self.__locked() as index:
+
+            entries = index['entries']
+
+            if label is not None:
+                for other, entry in entries.items():
+                    if other != digest and entry.get('label') == label:
+                        raise CloubedException("label {label} is already " \
+                                               "given to image cache entry " \
+                                               "{digest}" \
+                                                   .format(label=label,
+                                                           digest=other))
+
+            if digest in entries and \
+               self.ctl.find_storage_volume(self.storage_pool,
+                                            self.getfilename(digest,
+                                                             imgtype)):
+                logging.info("image file {path} already in image cache as " \
+                             "{digest}".format(path=path, digest=digest))
+            else:
+                self.__import(digest, imgtype, path)
+                refs = entries.get(digest, {}).get('refs', [])
+                entries[digest] = { 'format': imgtype,
+                                    'size': os.stat(path).st_blocks * 512,
+                                    'refs': refs }
+
+            entry = entries[digest]
+            if label is not None:
+                entry['label'] = label
+            entry['last_used'] = time.time()
+
+            self.__evict(index, keep=digest)
+
+        return digest
+
+    def __import(self, digest, imgtype, path):
+
+        """Creates the storage volume of a new cache entry and uploads the
+           content of the local image file in parameter into it.
+        """
+
+        filename = self.getfilename(digest, imgtype)
+        transfer = StorageVolumeTransfer(filename, path, 'import')
+        transfer.open()
+        try:
+            self.ctl.create_storage_volume(self.storage_pool,
+                                           self.__volume_xml(filename,
+                                                             transfer.total))
+            logging.info("importing image {path} in image cache" \
+                             .format(path=path))
+            self.ctl.upload_storage_volume(self.storage_pool,
+                                           filename,
+                                           transfer)
+        finally:
+            transfer.close()
+
+    def lookup(self, key):
+
+        """Returns a tuple with the hash and the format of the cache entry
+           whose label or hash prefix is given in parameter.
+
+           :param string key: the label or a prefix of the hash of the entry
+           :exceptions CloubedException:
+               * no entry or more than one entry match the key
+        """
+
+        with self.__locked() as index:
+
+            entries = index['entries']
+
+            matches = [ digest for digest, entry in entries.items() \
+                        if entry.get('label') == key ]
+            if not matches:
+                matches = [ digest for digest in entries \
+                            if digest.startswith(key) ]
+
+            if not matches:
+                raise CloubedException("entry {key} not found in image cache" \
+                                           .format(key=key))
+            if len(matches) > 1:
+                raise CloubedException("more than one entry of image cache " \
+                                       "match {key}".format(key=key))
+
+            digest = matches[0]
+            entries[digest]['last_used'] = time.time()
+            return (digest, entries[digest]['format'])
+
+    def acquire(self, digest, volume_path):
+
+        """Records the storage volume whose path is given in parameter as a
+           reference to the cache entry with the hash in parameter. An entry
+           with references is never evicted.
+        """
+
+        with self.__locked() as index:
+            entry = index['entries'].get(digest)
+            if entry is None:
+                raise CloubedException("entry {digest} not found in image " \
+                                       "cache".format(digest=digest))
+            if volume_path not in entry['refs']:
+                entry['refs'].append(volume_path)
+            entry['last_used'] = time.time()
+
+    def release(self, volume_path):
+
+        """Removes the storage volume whose path is given in parameter from the
+           references of the cache entries, then evicts entries if the cache
+           is over its budget.
+        """
+
+        with self.__locked() as index:
+            for entry in index['entries'].values():
+                if volume_path in entry['refs']:
+                    entry['refs'].remove(volume_path)
+            self.__evict(index)
+
+    def __evict(self, index, keep=None):
+
+        """Deletes the least recently used entries without reference until
+           the total size of the cache fits in its budget. The references to
+           storage volumes which do not exist anymore, for example because
+           they have been deleted outside of Cloubed, are dropped first. The
+           entry whose hash is given in keep, typically the one just added,
+           is never evicted, even if it has no reference yet.
+        """
+
+        entries = index['entries']
+
+        for entry in entries.values():
+            entry['refs'] = [ ref for ref in entry['refs'] \
+                              if os.path.exists(ref) ]
+
+        total = sum(entry['size'] for entry in entries.values())
+        candidates = sorted((digest for digest, entry in entries.items() \
+                             if not entry['refs'] and digest != keep),
+                            key=lambda digest: entries[digest]['last_used'])
+
+        while total > self.budget and candidates:
+            digest = candidates.pop(0)
+            entry = entries.pop(digest)
+            total -= entry['size']
+            logging.info("evicting entry {digest} of image cache" \
+                             .format(digest=digest))
+            storage_volume = self.ctl.find_storage_volume(
+                                 self.storage_pool,
+                                 self.getfilename(digest, entry['format']))
+            if storage_volume is not None:
+                storage_volume.delete(0)
+
+        if total > self.budget:
+            logging.warning("image cache is over its budget of {budget}GB " \
+                            "but all remaining entries are in use" \
+                                .format(budget=self.budget // 1024**3))
+
+    def get_infos(self):
+
+        """Returns a dict of the cache entries indexed by their hash. Each
+           entry is a dict with its format, size, label, last usage time and
+           number of references.
+        """
+
+        with self.__locked() as index:
+            return { digest: { 'format': entry['format'],
+                               'size': entry['size'],
+                               'label': entry.get('label'),
+                               'last_used': entry['last_used'],
+                               'refs': len(entry['refs']) } \
+                     for digest, entry in index['entries'].items() }
+
+    @staticmethod
+    def __volume_xml(filename, capacity):
+
+        """Returns the libvirt XML representation of an empty raw sparse
+           storage volume for a new cache entry. Like for imports in
+           StorageVolume, the content of the image then defines the actual
+           format.
+        """
+
+        doc = Document()
+
+        # <volume>
+        #   <name>digest.qcow2</name>
+        #   <allocation>0</allocation>
+        #   <capacity unit="bytes">1048576</capacity>
+        #   <target>
+        #     <format type='raw'/>
+        #   </target>
+        # </volume>
+
+        element_volume = doc.createElement("volume")
+        doc.appendChild(element_volume)
+
+        element_name = doc.createElement("name")
+        element_name.appendChild(doc.createTextNode(filename))
+        element_volume.appendChild(element_name)
+
+        element_allocation = doc.createElement("allocation")
+        element_allocation.appendChild(doc.createTextNode("0"))
+        element_volume.appendChild(element_allocation)
+
+        element_capacity = doc.createElement("capacity")
+        element_capacity.setAttribute("unit", "bytes")
+        element_capacity.appendChild(doc.createTextNode(str(capacity)))
+        element_volume.appendChild(element_capacity)
+
+        element_target = doc.createElement("target")
+        element_volume.appendChild(element_target)
+
+        element_format = doc.createElement("format")
+        element_format.setAttribute("type", "raw")
+        element_target.appendChild(element_format)
+
+        return doc.toxml()
@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" JSONLinesFile class of Cloubed """
+
+import os
+import json
+import threading
+
+class JSONLinesFile:
+
+    """JSONLinesFile class
+
+       Base class of the append-only files of JSON records, one per line, in
+       the state directory. The records are written without any whitespace
+       and flushed at once since the files are read by other processes while
+       they are written.
+
+       When the file exceeds its maximum size, it is renamed with the .1
+       suffix, replacing the previous one, and a new file is started. The
+       records therefore never take more than twice the maximum size on disk.
+       The file can be written by several processes: a process which finds
+       the file already rotated by another one reopens the new file instead
+       of rotating it again.
+    """
+
+    max_size = 16 * 1024**2
+
+    def __init__(self, path):
+
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def write(self, record):
+
+        """Appends the JSON serializable record to the file."""
+
+        # the maximum size is in bytes
+        line = (json.dumps(record, separators=(',', ':')) + '\n') \
+                   .encode('utf-8')
+
+        with self._lock:
+            if self._file is None:
+                self.__open()
+            if self.__size() + len(line) > self.max_size:
+                # another process may have rotated the file in the meantime
+                if self.__rotated():
+                    self._file.close()
+                    self.__open()
+                if self.__size() + len(line) > self.max_size:
+                    self.__rotate()
+            self._file.write(line)
+            self._file.flush()
+
+    def __open(self):
+
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._file = open(self.path, 'ab')
+
+    def __size(self):
+
+        """Returns the size of the opened file, including the records
+           appended by the other processes.
+        """
+
+        return os.fstat(self._file.fileno()).st_size
+
+    def __rotated(self):
+
+        """Returns True if the opened file is no longer at the path of the
+           file, ie. it has been rotated by another process.
+        """
+
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        return not os.path.samestat(stat, os.fstat(self._file.fileno()))
+
+    def __rotate(self):
+
+        self._file.close()
+        os.replace(self.path, self.path + '.1')
+        self.__open()
+
+    def close(self):
+
+        """Closes the file if opened."""
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def clear(self):
+
+        """Removes all the records, in the rotated file as well."""
+
+        self.close()
+        for path in [ self.path + '.1', self.path ]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def lines(self):
+
+        """Generator of the lines of the rotated file then of the current
+           file, the oldest first. The last line can be incomplete if it is
+           being written.
+        """
+
+        for path in [ self.path + '.1', self.path ]:
+            try:
+                records = open(path)
+            except FileNotFoundError:
+                continue
+            with records:
+                yield from records
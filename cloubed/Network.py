@@ -21,9 +21,11 @@
 
 """ Network class of Cloubed """
 
+import os
 import logging
+import ipaddress
 from xml.dom.minidom import Document
-from cloubed.Utils import getuser, net_conflict, clean_string_for_template
+from cloubed.Utils import getuser, clean_string_for_template
 from cloubed.CloubedException import CloubedException
 
 class Network:
@@ -48,6 +50,8 @@ class Network:
 
         self._forward_mode = network_conf.forward_mode
         self._bridge_name = network_conf.bridge_name
+        self._direct_interface = network_conf.direct_interface
+        self._direct_mode = network_conf.direct_mode
 
         self._with_local_settings = False
         self.ip_host = None
@@ -67,13 +71,30 @@ class Network:
 
         self._domain = network_conf.domain
 
+        self.mtu = network_conf.mtu
+        self._qos = network_conf.qos
+
         self._with_pxe = False
         self._tftproot = None
         self._bootfile = None
+        self._tftp = None
         if network_conf.has_pxe():
             self._with_pxe = True
             self._tftproot = network_conf.pxe_tftp_dir
             self._bootfile = network_conf.pxe_boot_file
+            self._tftp = network_conf.tftp
+
+        # the http server listens on all networks with a host IP address by
+        # default and serves the current directory
+        http_server_conf = network_conf.conf.http_server
+        self._http_proxy = http_server_conf is not None and \
+                           http_server_conf.has_proxy()
+        self._http_root = os.getcwd()
+        if http_server_conf is not None:
+            if http_server_conf.listens(self.name):
+                self._http_root = http_server_conf.get_root(self.name)
+            else:
+                self._http_root = None
 
         # list of statically declared hosts in the network
         self._hosts = []
@@ -99,6 +120,65 @@ class Network:
         """
         return self.ctl.info_network(self.libvirt_name)
 
+    def __dedicated_bridge(self):
+        """Returns True if the Network has a dedicated bridge managed by
+           libvirt, False if the Network is attached to an existing bridge or
+           to a host interface.
+        """
+
+        return self._forward_mode not in ['bridge', 'direct']
+
+    def get_internal_tftp_root(self):
+        """Returns the root directory of the TFTP server of the Network if
+           its PXE files must be served by the internal TFTP server of Cloubed
+           instead of libvirt, None otherwise.
+        """
+
+        if not self._with_pxe or self._tftp != 'internal' or \
+           not self.__dedicated_bridge() or self.ip_host is None:
+            return None
+        return self._tftproot
+
+    def get_http_root(self):
+        """Returns the root directory served by the HTTP server listening on
+           the host IP address of the Network, or None if the HTTP server does
+           not listen on the Network.
+        """
+
+        if self.ip_host is None:
+            return None
+        return self._http_root
+
+    def get_direct_source(self):
+        """Returns a tuple with the host interface and the macvtap mode of the
+           Network in direct forwarding mode or None in other modes.
+        """
+
+        if self._forward_mode != 'direct':
+            return None
+        return (self._direct_interface, self._direct_mode)
+
+    def get_subnet(self):
+        """Returns the IP subnet of the Network as an ipaddress.IPv4Network or
+           None if the Network does not have local IP settings.
+        """
+
+        if not self._with_local_settings or not self.__dedicated_bridge():
+            return None
+        return ipaddress.IPv4Network("{ip}/{mask}" \
+                                         .format(ip=self.ip_host,
+                                                 mask=self._netmask),
+                                     strict=False)
+
+    def get_dhcp_range(self):
+        """Returns a tuple with the first and the last addresses of the DHCP
+           range of the Network or None if DHCP is disabled.
+        """
+
+        if not self._with_dhcp:
+            return None
+        return (self._dhcp_range_start, self._dhcp_range_end)
+
     def register_host(self, hostname, mac, ip):
 
         """ Register a host with a static IP address in DHCP """
@@ -125,22 +205,17 @@ class Network:
         else:
             logging.warn("undefining network {name}".format(name=self.name))
             network.undefine()
+        self.tbd.reset_network_index()
 
     def __check_conflict(self):
-        """It looks over existing active networks in Libvirt in order to detect
-           potential conflicting IP settings. If yes, it returns a tuple with
-           True and the name of the first conflicting network. Else it returns
-           a tuple with False and None.
+        """It looks up the index of active networks in Libvirt in order to
+           detect potential conflicting IP settings. If yes, it returns a tuple
+           with True and the name of the first conflicting network. Else it
+           returns a tuple with False and None.
         """
-        infos = self.ctl.info_networks()
-        for network_name, network_infos in list(infos.items()):
-            if network_name != self.libvirt_name and \
-                network_infos['status'] == 'active':
-                if net_conflict(self.ip_host, self._netmask,
-                               network_infos.get('ip'),
-                               network_infos.get('netmask')):
-                    return (True, network_name)
-        return (False, None)
+        network_name = self.tbd.get_network_index() \
+                           .conflict(self.ip_host, self._netmask)
+        return (network_name is not None, network_name)
 
     def create(self, overwrite=False):
         """Creates the Network in libvirt. First, it searches if the network
@@ -154,31 +229,178 @@ class Network:
            :exceptions CloubedException:
                * another active network with conflicting IP settings has been
                  found in Libvirt.
+               * the host interface of the network in direct forwarding mode
+                 does not exist.
         """
 
-        network = self.ctl.find_network(self.libvirt_name)
-        found = network is not None
-        create = False
+        if self._forward_mode == 'direct' and \
+           not os.path.exists(os.path.join('/sys/class/net',
+                                           self._direct_interface)):
+            raise CloubedException("host network interface {interface} of " \
+                                   "network {network} does not exist" \
+                                       .format(interface=self._direct_interface,
+                                               network=self.name))
+
+        with self.tbd.get_timeline().span('network', self.name):
+
+            network = self.ctl.find_network(self.libvirt_name)
+            found = network is not None
+            create = False
+
+            if found and overwrite:
+                if network.isActive():
+                    logging.info("destroying network {name}" \
+                                     .format(name=self.name))
+                    network.destroy()
+                else:
+                    logging.info("undefining network {name}" \
+                                     .format(name=self.name))
+                    network.undefine()
+                self.tbd.get_network_index().remove(self.libvirt_name)
+                create = True
+            elif not found:
+                create = True
+            elif network.isActive():
+                # apply the hosts added or modified since the network was
+                # created
+                self.update_hosts()
+
+            if create:
+                conflict, network_name = self.__check_conflict()
+                if conflict:
+                    raise CloubedException("another network {network} is " \
+                                           "already active with conflicting " \
+                                           "IP settings" \
+                                               .format(network=network_name))
+                else:
+                    self.ctl.create_network(self.toxml())
+                    if self._with_local_settings:
+                        self.tbd.get_network_index().add(self.libvirt_name,
+                                                         self.ip_host,
+                                                         self._netmask)
+
+    def __dns_hosts(self):
+        """Returns the list of DNS hosts of the registered hosts as tuples
+           with the IP address and the sorted tuple of hostnames.
+        """
 
-        if found and overwrite:
-            if network.isActive():
-                logging.info("destroying network {name}".format(name=self.name))
-                network.destroy()
-            else:
-                logging.info("undefining network {name}".format(name=self.name))
-                network.undefine()
-            create = True
-        elif not found:
-            create = True
-
-        if create:
-            conflict, network_name = self.__check_conflict()
-            if conflict:
-                raise CloubedException("another network {network} is already " \
-                                       "active with conflicting IP settings" \
-                                           .format(network=network_name))
+        hostnames = {}
+        for host in self._hosts:
+            hostnames.setdefault(host["ip"], []).append(host["hostname"])
+        return [ (ip, tuple(sorted(names))) for ip, names in hostnames.items() ]
+
+    @staticmethod
+    def __element_dhcp_host(doc, host):
+        """Returns the ip/dhcp/host XML element of a host."""
+
+        element_host = doc.createElement("host")
+        element_host.setAttribute("mac", host["mac"])
+        element_host.setAttribute("name", host["hostname"])
+        element_host.setAttribute("ip", host["ip"])
+        return element_host
+
+    @staticmethod
+    def __element_dns_host(doc, ip, hostnames):
+        """Returns the dns/host XML element of an IP address and its
+           hostnames.
+        """
+
+        element_host = doc.createElement("host")
+        element_host.setAttribute("ip", ip)
+        for hostname in hostnames:
+            element_hostname = doc.createElement("hostname")
+            element_hostname.appendChild(doc.createTextNode(hostname))
+            element_host.appendChild(element_hostname)
+        return element_host
+
+    @staticmethod
+    def bandwidth_element(doc, qos):
+        """Returns the bandwidth XML element of the ConfigurationQos in
+           parameter, for networks and domain interfaces.
+        """
+
+        # <bandwidth>
+        #   <inbound average='1000' peak='5000' burst='1024'/>
+        #   <outbound average='128' peak='256' burst='256'/>
+        # </bandwidth>
+
+        element_bandwidth = doc.createElement("bandwidth")
+        for direction, settings in [ ("inbound", qos.inbound),
+                                     ("outbound", qos.outbound) ]:
+            if settings is None:
+                continue
+            element_direction = doc.createElement(direction)
+            for parameter in [ "average", "peak", "burst" ]:
+                if parameter in settings:
+                    element_direction.setAttribute(parameter,
+                                                   str(settings[parameter]))
+            element_bandwidth.appendChild(element_direction)
+        return element_bandwidth
+
+    def update_hosts(self):
+        """Compares the registered hosts with the static DHCP hosts and the DNS
+           hosts of the active Network in Libvirt, then applies the differences
+           with live updates so that the connectivity of running domains is
+           not interrupted. Returns the number of updates.
+
+           :exceptions CloubedControllerException:
+               * a problem is encountered in libvirt
+        """
+
+        # To avoid unwanted behaviour and conflicts on external LAN, there is
+        # not any host on bridge and direct forwording networks
+        if not self.__dedicated_bridge() or not self._with_local_settings:
+            return 0
+
+        (live_dhcp, live_dns) = self.ctl.network_hosts(self.libvirt_name)
+        doc = Document()
+        deletes = []
+        modifies = []
+        adds = []
+
+        if self._with_dhcp:
+            live = { host["mac"]: host for host in live_dhcp }
+            wanted = {}
+            for host in self._hosts:
+                host = dict(host, mac=host["mac"].lower())
+                wanted[host["mac"]] = host
+            for mac, host in live.items():
+                if mac not in wanted:
+                    deletes.append(('dhcp-host', host))
+            for mac, host in wanted.items():
+                if mac not in live:
+                    adds.append(('dhcp-host', host))
+                elif live[mac] != host:
+                    modifies.append(('dhcp-host', host))
+
+        # DNS hosts cannot be modified in libvirt, they are deleted and added
+        wanted_dns = self.__dns_hosts()
+        for dns_host in live_dns:
+            if dns_host not in wanted_dns:
+                deletes.append(('dns-host', dns_host))
+        for dns_host in wanted_dns:
+            if dns_host not in live_dns:
+                adds.append(('dns-host', dns_host))
+
+        # deletions first to release IP addresses and hostnames
+        updates = [ ('delete', update) for update in deletes ] + \
+                  [ ('modify', update) for update in modifies ] + \
+                  [ ('add', update) for update in adds ]
+
+        for command, (section, host) in updates:
+            if section == 'dhcp-host':
+                element = Network.__element_dhcp_host(doc, host)
             else:
-                self.ctl.create_network(self.toxml())
+                element = Network.__element_dns_host(doc, host[0], host[1])
+            logging.info("network {name}: {command} {section} {xml}" \
+                             .format(name=self.name,
+                                     command=command,
+                                     section=section,
+                                     xml=element.toxml()))
+            self.ctl.update_network(self.libvirt_name, command, section,
+                                    element.toxml())
+
+        return len(updates)
 
     def __init_xml(self):
 
@@ -217,6 +439,11 @@ class Network:
         #   <bridge name="virbr2" />
         #   <forward mode="nat"/>
         #   <domain name="example.net">
+        #   <dns>
+        #     <host ip="192.168.152.10">
+        #       <hostname>srv1</hostname>
+        #     </host>
+        #   </dns>
         #   <ip address="192.168.152.1" netmask="255.255.255.0">
         #     <tftp root="/var/lib/tftp" />
         #     <dhcp>
@@ -234,6 +461,15 @@ class Network:
         #   <bridge name="br0"/>
         # </network>
 
+        # Direct attachment to host interface with macvtap
+
+        # <network>
+        #   <name>direct</name>
+        #   <forward mode="bridge">
+        #     <interface dev="eth0"/>
+        #   </forward>
+        # </network>
+
         # root element: network
         element_network = self._doc.createElement("network")
         self._doc.appendChild(element_network)
@@ -244,27 +480,59 @@ class Network:
         element_name.appendChild(node_name)
         element_network.appendChild(element_name)
 
-        # bridge element
-        element_bridge = self._doc.createElement("bridge")
-        if self._bridge_name is not None:
-            element_bridge.setAttribute("name", self._bridge_name)
-        element_network.appendChild(element_bridge)
+        # bridge element, direct networks do not have any bridge
+        if self._forward_mode != 'direct':
+            element_bridge = self._doc.createElement("bridge")
+            if self._bridge_name is not None:
+                element_bridge.setAttribute("name", self._bridge_name)
+            element_network.appendChild(element_bridge)
 
         # forward element
-        if self._forward_mode is not None:
+        if self._forward_mode == 'direct':
+            # the macvtap mode is the forward mode in libvirt
+            element_forward = self._doc.createElement("forward")
+            element_forward.setAttribute("mode", self._direct_mode)
+            element_network.appendChild(element_forward)
+
+            # forward/interface element
+            element_interface = self._doc.createElement("interface")
+            element_interface.setAttribute("dev", self._direct_interface)
+            element_forward.appendChild(element_interface)
+
+        elif self._forward_mode is not None:
             element_forward = self._doc.createElement("forward")
             element_forward.setAttribute("mode", self._forward_mode)
             element_network.appendChild(element_forward)
 
+        # mtu element, the MTU of existing bridges and host interfaces is
+        # managed on the host
+        if self.mtu is not None and self.__dedicated_bridge():
+            element_mtu = self._doc.createElement("mtu")
+            element_mtu.setAttribute("size", str(self.mtu))
+            element_network.appendChild(element_mtu)
+
+        # bandwidth element
+        if self._qos is not None:
+            element_network.appendChild(
+                Network.bandwidth_element(self._doc, self._qos))
+
         # domain
         if self._domain:
             element_domain = self._doc.createElement("domain")
             element_domain.setAttribute("name", self._domain)
             element_network.appendChild(element_domain)
 
+        # dns element
+        if self.__dedicated_bridge() and self._hosts:
+            element_dns = self._doc.createElement("dns")
+            for ip, hostnames in self.__dns_hosts():
+                element_dns.appendChild(
+                    Network.__element_dns_host(self._doc, ip, hostnames))
+            element_network.appendChild(element_dns)
+
         # To avoid unwanted behaviour and conflicts on external LAN, DHCP and
-        # PXE cannot be enable on bridge forwording networks
-        if self._forward_mode != 'bridge':
+        # PXE cannot be enable on bridge and direct forwording networks
+        if self.__dedicated_bridge():
 
             # ip element
             if self._with_local_settings:
@@ -273,8 +541,9 @@ class Network:
                 element_ip.setAttribute("netmask", self._netmask)
                 element_network.appendChild(element_ip)
 
-            # ip/tftp element
-            if self._with_pxe:
+            # ip/tftp element, unless the files are served by the internal
+            # TFTP server
+            if self._with_pxe and self._tftp != 'internal':
                 element_tftp = self._doc.createElement("tftp")
                 element_tftp.setAttribute("root", self._tftproot)
                 element_ip.appendChild(element_tftp)
@@ -298,11 +567,8 @@ class Network:
 
                 # ip/dhcp/host
                 for host in self._hosts:
-                    element_host = self._doc.createElement("host")
-                    element_host.setAttribute("mac", host["mac"])
-                    element_host.setAttribute("name", host["hostname"])
-                    element_host.setAttribute("ip", host["ip"])
-                    element_dhcp.appendChild(element_host)
+                    element_dhcp.appendChild(
+                        Network.__element_dhcp_host(self._doc, host))
 
     def get_templates_dict(self):
 
@@ -328,12 +594,18 @@ class Network:
                      "network.{name}.pxe_tftp_dir" \
                          .format(name=clean_name) : str(self._tftproot),
                      "network.{name}.pxe_boot_file" \
-                         .format(name=clean_name) : str(self._bootfile) }
+                         .format(name=clean_name) : str(self._bootfile),
+                     "network.{name}.mtu" \
+                         .format(name=clean_name) : str(self.mtu) }
 
         # port is hard-coded in HTTPServer class
-        if self.ip_host is not None:
+        if self.get_http_root() is not None:
             http_server = "http://" + self.ip_host + ":5432"
             tpl_dict["network.{name}.http_server" \
                      .format(name=clean_name)] = http_server
+            # the same server is the caching proxy, if enabled
+            if self._http_proxy:
+                tpl_dict["network.{name}.http_proxy" \
+                         .format(name=clean_name)] = http_server
 
         return tpl_dict
\ No newline at end of file
@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" NetworkIndex class of Cloubed """
+
+import bisect
+import ipaddress
+import logging
+
+class NetworkIndex:
+
+    """NetworkIndex class
+
+       It indexes the IPv4 address ranges of networks as integer intervals
+       [start, end] sorted by start address. Along with the sorted intervals,
+       it maintains the running maximum of the end addresses so that the
+       conflict of a new range with all indexed ranges is checked with a
+       single binary search, even if indexed ranges overlap.
+    """
+
+    def __init__(self):
+
+        self._starts = []  # sorted start addresses
+        self._ranges = []  # (start, end, name) tuples in the same order
+        self._max_ends = [] # index of the range with max end among [0, i]
+        self._names = {}   # (start, end) indexed by network name
+
+    @staticmethod
+    def interval(ip, netmask):
+        """Returns the tuple (start, end) of integer addresses of the IPv4
+           network with the given address and netmask, or None if they are not
+           valid.
+
+           :param string ip: an IP address of the network
+           :param string netmask: the netmask of the network
+        """
+
+        try:
+            network = ipaddress.IPv4Network("{ip}/{mask}" \
+                                                .format(ip=ip, mask=netmask),
+                                            strict=False)
+        except ValueError as err:
+            logging.debug("unable to index network {ip}/{mask}: {error}" \
+                              .format(ip=ip, mask=netmask, error=err))
+            return None
+        return (int(network.network_address), int(network.broadcast_address))
+
+    def __rebuild_max_ends(self, first):
+        """Recomputes the running maximum of end addresses starting at
+           position first.
+        """
+
+        del self._max_ends[first:]
+        for pos in range(first, len(self._ranges)):
+            best = pos
+            if pos > 0:
+                previous = self._max_ends[pos - 1]
+                if self._ranges[previous][1] >= self._ranges[pos][1]:
+                    best = previous
+            self._max_ends.append(best)
+
+    def add(self, name, ip, netmask):
+        """Adds the network in the index. If a network with the same name is
+           already indexed, it is replaced.
+
+           :param string name: the name of the network
+           :param string ip: an IP address of the network
+           :param string netmask: the netmask of the network
+        """
+
+        self.remove(name)
+        interval = NetworkIndex.interval(ip, netmask)
+        if interval is None:
+            return
+        (start, end) = interval
+        pos = bisect.bisect_right(self._starts, start)
+        self._starts.insert(pos, start)
+        self._ranges.insert(pos, (start, end, name))
+        self._names[name] = interval
+        self.__rebuild_max_ends(pos)
+
+    def remove(self, name):
+        """Removes the network from the index, if present.
+
+           :param string name: the name of the network
+        """
+
+        interval = self._names.pop(name, None)
+        if interval is None:
+            return
+        pos = bisect.bisect_left(self._starts, interval[0])
+        while self._ranges[pos][2] != name:
+            pos += 1
+        del self._starts[pos]
+        del self._ranges[pos]
+        self.__rebuild_max_ends(pos)
+
+    def conflict(self, ip, netmask):
+        """Returns the name of one indexed network whose range overlaps the
+           network with the given address and netmask, or None if there is
+           not any.
+
+           :param string ip: an IP address of the network
+           :param string netmask: the netmask of the network
+        """
+
+        interval = NetworkIndex.interval(ip, netmask)
+        if interval is None:
+            return None
+        (start, end) = interval
+
+        # ranges starting after end cannot overlap, among the other ones the
+        # range with the max end overlaps if any does.
+        pos = bisect.bisect_right(self._starts, end)
+        if pos == 0:
+            return None
+        best = self._ranges[self._max_ends[pos - 1]]
+        if best[1] >= start:
+            return best[2]
+        return None
@@ -25,8 +25,13 @@ import logging
 import os
 from xml.dom.minidom import Document
 
+from cloubed.CloubedException import CloubedException
+from cloubed.StorageVolumeTransfer import StorageVolumeTransfer
 from cloubed.Utils import getuser, clean_string_for_template
 
+# first bytes of all qcow2 image files
+QCOW2_MAGIC = b'QFI\xfb'
+
 class StorageVolume:
 
     """ StorageVoluem class """
@@ -53,6 +58,8 @@ class StorageVolume:
         self._imgtype = storage_volume_conf.format
 
         self._backing = storage_volume_conf.backing
+        # True if the backing is an entry of the image cache
+        self._backing_cache = storage_volume_conf.backing_cache
 
         self._doc = None
 
@@ -94,6 +101,32 @@ class StorageVolume:
 
         return os.path.join(self.storage_pool.path, self.getfilename())
 
+    def getbaselinefilename(self):
+
+        """
+            getbaselinefilename: Returns the file name of the baseline of the
+                                 StorageVolume
+        """
+
+        return self.libvirt_name + "-baseline.qcow2"
+
+    def getbaselinepath(self):
+
+        """
+            getbaselinepath: Returns the full absolute path of the baseline of
+                             the StorageVolume
+        """
+
+        return os.path.join(self.storage_pool.path, self.getbaselinefilename())
+
+    def has_baseline(self):
+
+        """
+            Returns True if a baseline has been recorded for the StorageVolume
+        """
+
+        return os.path.exists(self.getbaselinepath())
+
     def get_infos(self):
         """Returns a dict full of key/value string pairs with information about
            the StorageVolume.
@@ -104,7 +137,7 @@ class StorageVolume:
     def destroy(self):
 
         """
-            Destroys the StorageVolume in libvirt
+            Destroys the StorageVolume and its baseline, if any, in libvirt
         """
 
         storage_volume = self.ctl.find_storage_volume(self.storage_pool,
@@ -113,10 +146,20 @@ class StorageVolume:
         if storage_volume is None:
             logging.debug("unable to destroy storage volume {name} since not " \
                           "found in libvirt".format(name=self.name))
-            return # do nothing and leave
+        else:
+            logging.warn("destroying storage volume {name}" \
+                             .format(name=self.name))
+            storage_volume.delete(0)
+
+            if self._backing_cache:
+                self.tbd.get_image_cache().release(self.getpath())
 
-        logging.warn("destroying storage volume {name}".format(name=self.name))
-        storage_volume.delete(0)
+        baseline = self.ctl.find_storage_volume(self.storage_pool,
+                                                self.getbaselinefilename())
+        if baseline is not None:
+            logging.warn("destroying baseline of storage volume {name}" \
+                             .format(name=self.name))
+            baseline.delete(0)
 
     def create(self, overwrite=True):
 
@@ -127,30 +170,297 @@ class StorageVolume:
         found = False
         sv_name = None
 
-        # delete storage volumes w/ the same name
+        with self.tbd.get_timeline().span('volume', self.name):
+
+            # delete storage volumes w/ the same name
+            storage_volume = self.ctl.find_storage_volume(self.storage_pool,
+                                                          self.getfilename())
+            found = storage_volume is not None
+
+            if found and overwrite:
+
+                # first delete then re-create the storage volume
+                logging.info("deleting storage volume {filename}" \
+                                 .format(filename=self.getfilename()))
+                storage_volume.delete(0)
+                self.ctl.create_storage_volume(self.storage_pool,
+                                               self.toxml())
+            elif not found:
+                self.ctl.create_storage_volume(self.storage_pool,
+                                               self.toxml())
+
+            self.__acquire_backing()
+
+    def reset(self):
+
+        """Resets the StorageVolume to the content of its baseline or, if it
+           does not have any, of its backing volume. Only the top qcow2
+           overlay is thrown away and re-created empty over the baseline or
+           the backing volume, the cost of this operation does not depend on
+           the size of the StorageVolume.
+
+           :exceptions CloubedException:
+               * the StorageVolume has neither baseline nor backing volume
+        """
+
+        if not self.resettable():
+            raise CloubedException("unable to reset storage volume {name} " \
+                                   "since it has neither baseline nor " \
+                                   "backing volume".format(name=self.name))
+
+        with self.tbd.get_timeline().span('volume', self.name, reset=True):
+
+            storage_volume = self.ctl.find_storage_volume(self.storage_pool,
+                                                          self.getfilename())
+            if storage_volume is not None:
+                logging.info("resetting storage volume {name}" \
+                                 .format(name=self.name))
+                storage_volume.delete(0)
+
+            self.ctl.create_storage_volume(self.storage_pool, self.toxml())
+            self.__acquire_backing()
+
+    def make_baseline(self):
+
+        """Records the current content of the StorageVolume as its baseline.
+           The file of the StorageVolume becomes the baseline and a new empty
+           qcow2 overlay backed by the baseline is created in place of the
+           StorageVolume. Then, reset() brings the StorageVolume back to this
+           content.
+
+           :exceptions CloubedException:
+               * the format of the StorageVolume is not qcow2
+               * the StorageVolume already has a baseline
+               * the StorageVolume does not exist in libvirt
+        """
+
+        if self._imgtype != 'qcow2':
+            raise CloubedException("unable to record baseline of storage " \
+                                   "volume {name} since its format is not " \
+                                   "qcow2".format(name=self.name))
+
+        if self.has_baseline():
+            raise CloubedException("storage volume {name} already has a " \
+                                   "baseline".format(name=self.name))
+
         storage_volume = self.ctl.find_storage_volume(self.storage_pool,
                                                       self.getfilename())
-        found = storage_volume is not None
+        if storage_volume is None:
+            raise CloubedException("unable to record baseline of storage " \
+                                   "volume {name} since not found in libvirt" \
+                                       .format(name=self.name))
+
+        logging.info("recording baseline of storage volume {name}" \
+                         .format(name=self.name))
+
+        # libvirt cannot rename volumes, the file is renamed in the directory
+        # of the storage pool which is then refreshed.
+        os.rename(self.getpath(), self.getbaselinepath())
+        self.ctl.refresh_storage_pool(self.storage_pool)
+        self.ctl.create_storage_volume(self.storage_pool, self.toxml())
+
+    def create_overlay(self, path, backing_path, backing_imgtype='qcow2'):
+
+        """Creates an empty qcow2 overlay of the StorageVolume in its storage
+           pool, backed by the file in parameter. An existing file with the
+           same path is deleted first. This is used by the snapshots of
+           domains.
+
+           :param string path: the absolute path of the overlay, in the
+               directory of the storage pool
+           :param string backing_path: the absolute path of the backing file
+           :param string backing_imgtype: the format of the backing file
+        """
+
+        self.delete_pool_file(path)
+        xml = self.__toxml(imgtype='qcow2',
+                           filename=os.path.basename(path),
+                           backing=(backing_path, backing_imgtype))
+        self.ctl.create_storage_volume(self.storage_pool, xml)
+
+    def delete_pool_file(self, path):
 
-        if found and overwrite:
+        """Deletes the file whose path is given in parameter from the storage
+           pool of the StorageVolume, if it exists. The storage pool is
+           refreshed first since the file may have been created outside of
+           the storage pool, eg. by a snapshot of a domain.
+
+           :param string path: the absolute path of the file, in the
+               directory of the storage pool
+        """
 
-            # first delete then re-create the storage volume
+        if self.ctl.find_storage_pool(self.storage_pool.path) is None:
+            return # nothing to delete
+
+        self.ctl.refresh_storage_pool(self.storage_pool)
+        pool_file = self.ctl.find_storage_volume(self.storage_pool,
+                                                 os.path.basename(path))
+        if pool_file is not None:
+            logging.debug("deleting file {path} of storage pool {pool}" \
+                              .format(path=path,
+                                      pool=self.storage_pool.name))
+            pool_file.delete(0)
+
+    def resettable(self):
+
+        """
+            Returns True if the StorageVolume can be reset by re-creating its
+            top qcow2 overlay, ie. if it has a baseline or a backing volume.
+        """
+
+        return self._imgtype == 'qcow2' and \
+               (self._backing is not None or self.has_baseline())
+
+    def __acquire_backing(self):
+
+        """
+            Records the StorageVolume as a reference to its backing entry of
+            the image cache, if any.
+        """
+
+        if self._backing_cache:
+            image_cache = self.tbd.get_image_cache()
+            digest, imgtype = image_cache.lookup(self._backing)
+            image_cache.acquire(digest, self.getpath())
+
+    def __get_backing(self):
+
+        """
+            Returns a tuple with the path and the format of the backing of the
+            StorageVolume: its baseline if recorded, else either another
+            StorageVolume of the testbed or an entry of the image cache.
+        """
+
+        if self.has_baseline():
+            return (self.getbaselinepath(), 'qcow2')
+
+        if self._backing_cache:
+            image_cache = self.tbd.get_image_cache()
+            digest, imgtype = image_cache.lookup(self._backing)
+            return (image_cache.getpath(digest, imgtype), imgtype)
+
+        backing = self.tbd.get_storage_volume_by_name(self._backing)
+        return (backing.getpath(), backing._imgtype)
+
+    def import_image(self, path):
+
+        """Imports the content of the local image file in parameter into the
+           StorageVolume. The StorageVolume is first re-created with the exact
+           size of the image file, then the content is uploaded through a
+           sparse stream.
+
+           :param string path: the path to the local image file
+           :exceptions CloubedException:
+               * the image file could not be read
+               * the format of the image file does not match the format of
+                 the StorageVolume
+        """
+
+        if not os.path.isfile(path):
+            raise CloubedException("image file {path} to import in storage " \
+                                   "volume {name} does not exist" \
+                                       .format(path=path, name=self.name))
+
+        if self._imgtype == 'qcow2':
+            with open(path, 'rb') as image:
+                if image.read(4) != QCOW2_MAGIC:
+                    raise CloubedException("image file {path} is not in " \
+                                           "format qcow2 of storage volume " \
+                                           "{name}".format(path=path,
+                                                           name=self.name))
+
+        if self._backing is not None:
+            logging.warning("backing of storage volume {name} is ignored " \
+                            "by import".format(name=self.name))
+
+        baseline = self.ctl.find_storage_volume(self.storage_pool,
+                                                self.getbaselinefilename())
+        if baseline is not None:
+            logging.warning("baseline of storage volume {name} is dropped " \
+                            "by import".format(name=self.name))
+            baseline.delete(0)
+
+        storage_volume = self.ctl.find_storage_volume(self.storage_pool,
+                                                      self.getfilename())
+        if storage_volume is not None:
             logging.info("deleting storage volume {filename}" \
                              .format(filename=self.getfilename()))
             storage_volume.delete(0)
-            self.ctl.create_storage_volume(self.storage_pool,
-                                           self.toxml())
-        elif not found:
-            self.ctl.create_storage_volume(self.storage_pool,
-                                           self.toxml())
 
-    def __init_xml(self):
+        # The volume is created as an empty raw sparse file of the exact size
+        # of the image so that holes skipped in the stream are zeros in the
+        # volume. The content of the image then defines the actual format.
+        transfer = StorageVolumeTransfer(self.name, path, 'import')
+        transfer.open()
+        try:
+            xml = self.__toxml(capacity=transfer.total,
+                               imgtype='raw',
+                               with_backing=False)
+            self.ctl.create_storage_volume(self.storage_pool, xml)
+            logging.info("importing image {path} in storage volume {name}" \
+                             .format(path=path, name=self.name))
+            self.ctl.upload_storage_volume(self.storage_pool,
+                                           self.getfilename(),
+                                           transfer)
+        finally:
+            transfer.close()
+
+    def export_image(self, path):
+
+        """Exports the content of the StorageVolume into the local file in
+           parameter through a sparse stream. The holes of the volume are
+           kept in the local file.
+
+           :param string path: the path to the local file
+           :exceptions CloubedException:
+               * the StorageVolume does not exist in libvirt
+               * the local file could not be written
+        """
+
+        storage_volume = self.ctl.find_storage_volume(self.storage_pool,
+                                                      self.getfilename())
+        if storage_volume is None:
+            raise CloubedException("unable to export storage volume {name} " \
+                                   "since not found in libvirt" \
+                                       .format(name=self.name))
+
+        transfer = StorageVolumeTransfer(self.name, path, 'export')
+        transfer.open()
+        try:
+            logging.info("exporting storage volume {name} in file {path}" \
+                             .format(path=path, name=self.name))
+            self.ctl.download_storage_volume(self.storage_pool,
+                                             self.getfilename(),
+                                             transfer)
+        finally:
+            transfer.close()
+
+    def __toxml(self, **kwargs):
+
+        """
+            Returns the libvirt XML representation of the StorageVolume as
+            string with the overrides in parameter given to __init_xml()
+        """
+
+        self.__init_xml(**kwargs)
+        return self._doc.toxml()
+
+    def __init_xml(self, capacity=None, imgtype=None, with_backing=True,
+                   filename=None, backing=None):
 
         """
             __init_xml: Generates the libvirt XML representation of the
-                        StorageVolume
+                        StorageVolume. The optional parameters override the
+                        capacity (in bytes), the format, the file name and
+                        the backing (a tuple with its path and its format) of
+                        the volume, or disable its backing volume.
         """
 
+        if imgtype is None:
+            imgtype = self._imgtype
+        if filename is None:
+            filename = self.getfilename()
+
         self._doc = Document()
 
         # <volume>
@@ -179,7 +489,7 @@ class StorageVolume:
 
         # name element
         element_name = self._doc.createElement("name")
-        node_name = self._doc.createTextNode(self.getfilename())
+        node_name = self._doc.createTextNode(filename)
         element_name.appendChild(node_name)
         element_volume.appendChild(element_name)
         
@@ -191,8 +501,12 @@ class StorageVolume:
         
         # capacity element
         element_capacity = self._doc.createElement("capacity")
-        element_capacity.setAttribute("unit", "G") # gigabyte
-        node_capacity = self._doc.createTextNode(str(self._size))
+        if capacity is None:
+            element_capacity.setAttribute("unit", "G") # gigabyte
+            node_capacity = self._doc.createTextNode(str(self._size))
+        else:
+            element_capacity.setAttribute("unit", "bytes")
+            node_capacity = self._doc.createTextNode(str(capacity))
         element_capacity.appendChild(node_capacity)
         element_volume.appendChild(element_capacity)
 
@@ -202,7 +516,7 @@ class StorageVolume:
 
         # target/format element
         element_format = self._doc.createElement("format")
-        element_format.setAttribute("type", self._imgtype)
+        element_format.setAttribute("type", imgtype)
         element_target.appendChild(element_format)
 
         # target/permissions element
@@ -243,9 +557,14 @@ class StorageVolume:
         #     </permissions>
         #   </backingStore>
 
-        if self._backing is not None:
+        if with_backing and \
+           (backing is not None or \
+            self._backing is not None or self.has_baseline()):
 
-            backing = self.tbd.get_storage_volume_by_name(self._backing)
+            if backing is not None:
+                backing_path, backing_imgtype = backing
+            else:
+                backing_path, backing_imgtype = self.__get_backing()
 
             # backingStore element
             element_backing = self._doc.createElement("backingStore")
@@ -253,13 +572,13 @@ class StorageVolume:
 
             # backingStore/path element
             element_path = self._doc.createElement("path")
-            node_path = self._doc.createTextNode(backing.getpath())
+            node_path = self._doc.createTextNode(backing_path)
             element_path.appendChild(node_path)
             element_backing.appendChild(element_path)
 
             # backingStore/format element
             element_format = self._doc.createElement("format")
-            element_format.setAttribute("type", backing._imgtype)
+            element_format.setAttribute("type", backing_imgtype)
             element_backing.appendChild(element_format)
 
             # backingStore/permissions element
@@ -0,0 +1,207 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" StorageVolumeTransfer class of Cloubed """
+
+import os
+import errno
+import time
+import logging
+
+from cloubed.CloubedException import CloubedException
+
+class StorageVolumeTransfer:
+
+    """StorageVolumeTransfer class
+
+       It holds the local file and the progress of a stream transfer of a
+       StorageVolume, either an import (local file to volume) or an export
+       (volume to local file). The VirtController drives the libvirt stream and
+       calls the methods of this class to read, write and skip holes in the
+       local file.
+    """
+
+    # minimal number of seconds between two progress reports
+    progress_interval = 5
+
+    def __init__(self, name, path, mode):
+
+        self.name = name
+        self.path = path
+        self._mode = mode # either 'import' or 'export'
+
+        self.total = None   # total size in bytes, if known
+        self.data = 0       # bytes actually transferred in the stream
+        self.holes = 0      # bytes of holes skipped
+
+        self._fd = None
+        self._start = None
+        self._last_report = None
+
+    def open(self):
+        """Opens the local file of the transfer.
+
+           :exceptions CloubedException:
+               * the local file could not be opened
+        """
+
+        if self._mode == 'import':
+            flags = os.O_RDONLY
+        else:
+            flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+
+        try:
+            self._fd = os.open(self.path, flags, 0o644)
+        except OSError as err:
+            raise CloubedException("unable to open file {path} for {mode} " \
+                                   "of storage volume {name}: {error}" \
+                                       .format(path=self.path,
+                                               mode=self._mode,
+                                               name=self.name,
+                                               error=err))
+
+        if self._mode == 'import':
+            self.total = os.fstat(self._fd).st_size
+
+        self._start = self._last_report = time.monotonic()
+
+    def close(self):
+        """Closes the local file and reports the final transfer rate."""
+
+        if self._fd is None:
+            return
+        os.close(self._fd)
+        self._fd = None
+        elapsed = max(time.monotonic() - self._start, 0.001)
+        logging.info("{mode} of storage volume {name} done: {data} MiB of " \
+                     "data, {holes} MiB of holes in {elapsed:.1f}s " \
+                     "({rate:.1f} MiB/s)" \
+                         .format(mode=self._mode,
+                                 name=self.name,
+                                 data=self.data // 1024**2,
+                                 holes=self.holes // 1024**2,
+                                 elapsed=elapsed,
+                                 rate=self.data / 1024**2 / elapsed))
+
+    def progress(self):
+        """Returns the number of bytes processed so far, including holes."""
+
+        return self.data + self.holes
+
+    def __report(self):
+        """Logs the progress of the transfer if the last report is older than
+           progress_interval.
+        """
+
+        now = time.monotonic()
+        if now - self._last_report < self.progress_interval:
+            return
+        self._last_report = now
+        elapsed = max(now - self._start, 0.001)
+        if self.total:
+            percent = "{0:.0f}%".format(100.0 * self.progress() / self.total)
+        else:
+            percent = "{0} MiB".format(self.progress() // 1024**2)
+        logging.info("{mode} of storage volume {name}: {percent} " \
+                     "({rate:.1f} MiB/s)" \
+                         .format(mode=self._mode,
+                                 name=self.name,
+                                 percent=percent,
+                                 rate=self.data / 1024**2 / elapsed))
+
+    #
+    # import handlers
+    #
+
+    def read(self, nbytes):
+        """Reads at most nbytes of data at the current position of the local
+           file.
+        """
+
+        buf = os.read(self._fd, nbytes)
+        self.data += len(buf)
+        self.__report()
+        return buf
+
+    def hole(self):
+        """Returns a tuple (in_data, length) describing the section of the
+           local file which starts at the current position: in_data is True
+           if the section contains data, False if it is a hole.
+        """
+
+        cur = os.lseek(self._fd, 0, os.SEEK_CUR)
+        try:
+            data = os.lseek(self._fd, cur, os.SEEK_DATA)
+        except OSError as err:
+            # ENXIO means cur is either in the trailing hole or after EOF
+            if err.errno != errno.ENXIO:
+                raise
+            data = -1
+
+        if data < 0:
+            eof = os.lseek(self._fd, 0, os.SEEK_END)
+            os.lseek(self._fd, cur, os.SEEK_SET)
+            return (False, max(eof - cur, 0))
+
+        if data > cur:
+            os.lseek(self._fd, cur, os.SEEK_SET)
+            return (False, data - cur)
+
+        # cur is in data, search for the start of the next hole. There is
+        # always a hole at EOF.
+        hole = os.lseek(self._fd, data, os.SEEK_HOLE)
+        os.lseek(self._fd, cur, os.SEEK_SET)
+        return (True, hole - data)
+
+    def skip(self, length):
+        """Skips a hole of length bytes in the local file."""
+
+        os.lseek(self._fd, length, os.SEEK_CUR)
+        self.holes += length
+        self.__report()
+
+    #
+    # export handlers
+    #
+
+    def write(self, buf):
+        """Writes all the data of buf at the current position of the local
+           file.
+        """
+
+        view = memoryview(buf)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        self.data += len(buf)
+        self.__report()
+
+    def write_hole(self, length):
+        """Skips length bytes from the current position of the local file,
+           extending it with a hole up to the end of the skipped section so
+           that a trailing hole is kept. Nothing is deallocated: this relies
+           on the writes being sequential in the file truncated by open().
+        """
+
+        cur = os.lseek(self._fd, length, os.SEEK_CUR)
+        os.ftruncate(self._fd, cur)
+        self.holes += length
+        self.__report()
@@ -0,0 +1,379 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" TFTPServer class of Cloubed """
+
+import os
+import time
+import struct
+import socket
+import threading
+import logging
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+from cloubed.CloubedException import CloubedException
+
+# TFTP opcodes (RFC 1350 and RFC 2347)
+OPCODE_RRQ = 1
+OPCODE_WRQ = 2
+OPCODE_DATA = 3
+OPCODE_ACK = 4
+OPCODE_ERROR = 5
+OPCODE_OACK = 6
+
+# TFTP error codes
+ERROR_UNDEFINED = 0
+ERROR_NOT_FOUND = 1
+ERROR_ACCESS = 2
+ERROR_ILLEGAL = 4
+ERROR_OPTIONS = 8
+
+class TFTPServer():
+
+    """TFTPServer class
+
+       Read-only TFTP server for the PXE boot of the domains. It negotiates
+       the blksize (RFC 2348), tsize, timeout (RFC 2349) and windowsize
+       (RFC 7440) options so that large boot files are sent with a few large
+       datagrams per round-trip. Each transfer is served from its own UDP port
+       in a pool of threads and its rate is logged when it is over. The
+       transfers are recorded as spans in the timeline, if given.
+    """
+
+    default_blksize = 512
+    max_blksize = 65464
+    max_windowsize = 64
+    retries = 5
+
+    def __init__(self, port=69, max_transfers=64, timeline=None):
+
+        self.port = port
+        self._max_transfers = max_transfers
+        self._timeline = timeline
+        self._address = None
+        self._root = None
+        self._socket = None
+        self._thread = None
+        self._executor = None
+        self._stop = threading.Event()
+        # transfered bytes and durations indexed by client addresses
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+
+    def launched(self):
+
+        """
+           Returns True if the TFTPServer is already launched
+        """
+
+        return self._thread is not None and self._socket is not None
+
+    def launch(self, address, root):
+
+        """
+            launch: Binds the TFTP server on the address and creates the
+            daemon thread that will serve the files of the root directory.
+        """
+
+        self._address = address
+        self._root = os.path.realpath(root)
+
+        try:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.bind((self._address, self.port))
+        except socket.error as e:
+            logging.warning("error while launching TFTP Server: {err}" \
+                                .format(err=e))
+            self._socket = None
+            return
+
+        # real port if the port 0 was given to get a free port
+        self.port = self._socket.getsockname()[1]
+        # periodically wake up to check whether the server must stop
+        self._socket.settimeout(0.5)
+
+        self._executor = ThreadPoolExecutor(max_workers=self._max_transfers,
+                                            thread_name_prefix="ClouBedTFTP")
+        self._thread = threading.Thread(target=self.threaded_server,
+                                        name="ClouBedTFTPServer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def terminate(self):
+
+        """
+            shutdown the tftp server in thread
+        """
+
+        logging.debug("shutting down tftp server")
+        self._stop.set()
+        self._thread.join()
+        self._socket.close()
+        self._executor.shutdown(wait=False)
+
+    def threaded_server(self):
+
+        """
+            threaded_server: Thread routine that receives the requests and
+            submits the transfers to the pool
+        """
+
+        while not self._stop.is_set():
+            try:
+                (packet, client) = self._socket.recvfrom(self.max_blksize)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self._executor.submit(self.__serve, packet, client)
+
+    @staticmethod
+    def __error(sock, code, message):
+        """Sends an ERROR packet on the connected socket."""
+
+        try:
+            sock.send(struct.pack("!HH", OPCODE_ERROR, code) +
+                      message.encode('ascii') + b'\0')
+        except OSError:
+            pass
+
+    @staticmethod
+    def __parse_request(packet):
+        """Returns the tuple (opcode, filename, mode, options) of a request
+           packet. The names of the options are lowercased.
+        """
+
+        (opcode,) = struct.unpack("!H", packet[:2])
+        fields = packet[2:].split(b'\0')
+        # the packet ends with a null byte, hence the last empty field
+        if len(fields) < 3 or fields[-1] != b'':
+            raise ValueError("malformed request")
+        fields = [ field.decode('ascii') for field in fields[:-1] ]
+        (filename, mode) = fields[0:2]
+        options = {}
+        for index in range(2, len(fields) - 1, 2):
+            options[fields[index].lower()] = fields[index + 1]
+        return (opcode, filename, mode.lower(), options)
+
+    def __resolve(self, filename):
+        """Returns the path of the file requested in the root directory or
+           None if it is out of the root directory.
+        """
+
+        path = os.path.realpath(os.path.join(self._root,
+                                             filename.lstrip('/')))
+        if not path.startswith(self._root + os.sep):
+            return None
+        return path
+
+    def __negotiate(self, options, size):
+        """Returns the dict of options acknowledged to the client and the
+           tuple (blksize, windowsize, timeout) of the transfer. The values
+           out of the allowed ranges are lowered or the options are ignored.
+        """
+
+        accepted = {}
+        blksize = self.default_blksize
+        windowsize = 1
+        timeout = 1
+
+        try:
+            if 'blksize' in options and int(options['blksize']) >= 8:
+                blksize = min(int(options['blksize']), self.max_blksize)
+                accepted['blksize'] = blksize
+            if 'windowsize' in options and int(options['windowsize']) >= 1:
+                windowsize = min(int(options['windowsize']),
+                                 self.max_windowsize)
+                accepted['windowsize'] = windowsize
+            if 'timeout' in options and \
+               1 <= int(options['timeout']) <= 255:
+                timeout = int(options['timeout'])
+                accepted['timeout'] = timeout
+        except ValueError:
+            raise CloubedException("invalid value of option")
+        if 'tsize' in options:
+            accepted['tsize'] = size
+
+        return (accepted, blksize, windowsize, timeout)
+
+    def __receive_ack(self, sock):
+        """Returns the block number of the next ACK packet received on the
+           socket, or None on timeout.
+        """
+
+        while True:
+            try:
+                packet = sock.recv(self.max_blksize)
+            except socket.timeout:
+                return None
+            if len(packet) < 4:
+                continue
+            (opcode, number) = struct.unpack("!HH", packet[:4])
+            if opcode == OPCODE_ACK:
+                return number
+            if opcode == OPCODE_ERROR:
+                raise CloubedException("error {code} sent by client: " \
+                                        "{message}" \
+                                            .format(code=number,
+                                                    message=packet[4:-1] \
+                                                        .decode('ascii',
+                                                                'replace')))
+
+    def __send_options(self, sock, accepted):
+        """Sends the OACK packet and waits for the ACK of block 0."""
+
+        oack = struct.pack("!H", OPCODE_OACK)
+        for name, value in accepted.items():
+            oack += "{name}\0{value}\0".format(name=name,
+                                               value=value).encode('ascii')
+
+        for _ in range(self.retries):
+            sock.send(oack)
+            if self.__receive_ack(sock) == 0:
+                return
+        raise CloubedException("options not acknowledged")
+
+    def __send_file(self, sock, fd, size, blksize, windowsize):
+        """Sends the file in windows of windowsize blocks and waits for the
+           ACK of the last block of each window. The transfer restarts from
+           the last acknowledged block when a block is lost. The blocks are
+           counted from 0 in the transfer and numbered from 1 modulo 65536 in
+           the packets, to support files of more than 65535 blocks.
+        """
+
+        # the last block is shorter than blksize, possibly empty
+        total = size // blksize + 1
+        acked = 0
+        retries = 0
+
+        while acked < total:
+            end = min(acked + windowsize, total)
+            for block in range(acked, end):
+                data = os.pread(fd, blksize, block * blksize)
+                sock.send(struct.pack("!HH", OPCODE_DATA,
+                                      (block + 1) & 0xffff) + data)
+
+            number = self.__receive_ack(sock)
+            delta = None if number is None else (number - acked) & 0xffff
+            if delta is None or delta == 0 or delta > end - acked:
+                # timeout, duplicate or stale ACK: send again the window
+                retries += 1
+                if retries > self.retries:
+                    raise CloubedException("too many retries")
+                continue
+            acked += delta
+            retries = 0
+
+    def __serve(self, packet, client):
+        """Serves one request received from client on its own socket."""
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind((self._address, 0))
+            sock.connect(client)
+
+            try:
+                (opcode, filename, mode, options) = \
+                    TFTPServer.__parse_request(packet)
+            except (ValueError, UnicodeDecodeError, struct.error):
+                TFTPServer.__error(sock, ERROR_ILLEGAL, "Illegal operation")
+                return
+
+            if opcode != OPCODE_RRQ:
+                TFTPServer.__error(sock, ERROR_ACCESS, "Read-only server")
+                return
+
+            path = self.__resolve(filename)
+            try:
+                if path is None:
+                    raise OSError
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                logging.debug("tftp: file {filename} requested by {client} " \
+                              "not found".format(filename=filename,
+                                                 client=client[0]))
+                TFTPServer.__error(sock, ERROR_NOT_FOUND, "File not found")
+                return
+
+            try:
+                size = os.fstat(fd).st_size
+                try:
+                    (accepted, blksize, windowsize, timeout) = \
+                        self.__negotiate(options, size)
+                except CloubedException as err:
+                    TFTPServer.__error(sock, ERROR_OPTIONS, str(err))
+                    return
+                sock.settimeout(timeout)
+
+                start = time.monotonic()
+                with self.__span(filename, client[0]):
+                    if accepted:
+                        self.__send_options(sock, accepted)
+                    self.__send_file(sock, fd, size, blksize, windowsize)
+                duration = time.monotonic() - start
+            finally:
+                os.close(fd)
+
+            self.__report(client[0], filename, size, duration,
+                          blksize, windowsize)
+
+        except CloubedException as err:
+            logging.warning("tftp: transfer to {client} aborted: {err}" \
+                                .format(client=client[0], err=err))
+            TFTPServer.__error(sock, ERROR_UNDEFINED, str(err))
+        except OSError as err:
+            logging.warning("tftp: transfer to {client} failed: {err}" \
+                                .format(client=client[0], err=err))
+        finally:
+            sock.close()
+
+    def __span(self, filename, client):
+        """Returns the context manager of the span of the transfer in the
+           timeline, or a null context without timeline.
+        """
+
+        if self._timeline is None:
+            return contextlib.nullcontext()
+        return self._timeline.span('tftp', filename, client=client)
+
+    def __report(self, client, filename, size, duration, blksize, windowsize):
+        """Logs the rate of the transfer and adds it to the client stats."""
+
+        rate = size / duration / 1024 if duration > 0 else 0
+        logging.info("tftp: sent {filename} to {client}: {size} bytes in " \
+                     "{duration:.2f}s ({rate:.0f} KiB/s, blksize {blksize}, " \
+                     "windowsize {windowsize})" \
+                         .format(filename=filename,
+                                 client=client,
+                                 size=size,
+                                 duration=duration,
+                                 rate=rate,
+                                 blksize=blksize,
+                                 windowsize=windowsize))
+
+        with self._stats_lock:
+            stats = self.stats.setdefault(client, { 'transfers': 0,
+                                                    'bytes': 0,
+                                                    'seconds': 0.0 })
+            stats['transfers'] += 1
+            stats['bytes'] += size
+            stats['seconds'] += duration
@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" Timeline class of Cloubed """
+
+import os
+import json
+import time
+import itertools
+import threading
+import contextlib
+import contextvars
+
+from cloubed.JSONLinesFile import JSONLinesFile
+from cloubed.Utils import state_path
+
+class Timeline(JSONLinesFile):
+
+    """Timeline class
+
+       Append-only record of the timed spans of the operations on the
+       testbed, in JSON lines in the state directory, to profile the bring-up
+       of the domains. Each span carries its phase (boot, volume, network,
+       domain, wait, http, tftp), the name of its resource, the domain it is
+       attributed to, the wall-clock time and the monotonic time of the host
+       in nanoseconds at its start, and its duration in nanoseconds. The
+       monotonic clock of the host is shared by all processes so that the
+       spans recorded by successive cloubed commands can be ordered.
+
+       The spans opened in a thread or an asyncio task while another span is
+       opened in the same thread or task are its children and they are
+       attributed to its domain by default. A span is written when it is
+       closed, thus the children before their parent. The timeline is rotated
+       like all JSONLinesFile.
+    """
+
+    # tuples of the opened spans of the threads and of the asyncio tasks,
+    # which all have their own context
+    _spans = contextvars.ContextVar('spans', default=())
+    _counter = itertools.count(1)
+
+    def __init__(self, path=None):
+
+        if path is None:
+            path = state_path('timeline.jsonl')
+        super(Timeline, self).__init__(path)
+
+    @contextlib.contextmanager
+    def span(self, phase, name, domain=None, **attributes):
+
+        """Context manager which records the time spent in its block as a
+           span of the timeline. The span dict is given to the block which
+           can add attributes to it.
+
+           :param string phase: the phase of the span, eg. volume
+           :param string name: the name of the resource of the span
+           :param string domain: the name of the domain the span is
+               attributed to, by default the domain of the parent span
+           :param attributes: additional attributes of the span
+        """
+
+        stack = Timeline._spans.get()
+        parent = stack[-1] if stack else None
+        if domain is None and parent is not None:
+            domain = parent['domain']
+
+        span = { 'id': "{pid}.{number}".format(pid=os.getpid(),
+                                                number=next(Timeline._counter)),
+                 'parent': parent['id'] if parent is not None else None,
+                 'phase': phase,
+                 'name': name,
+                 'domain': domain,
+                 'time': time.time(),
+                 'start': time.monotonic_ns(),
+                 'thread': threading.get_ident() }
+        span.update(attributes)
+
+        Timeline._spans.set(stack + (span,))
+        try:
+            yield span
+        except BaseException:
+            span['failed'] = True
+            raise
+        finally:
+            # the span is removed by itself, whatever the spans opened after
+            # it and not closed yet
+            Timeline._spans.set(tuple(opened \
+                                      for opened in Timeline._spans.get() \
+                                      if opened is not span))
+            span['duration'] = time.monotonic_ns() - span['start']
+            self.append(span)
+
+    def append(self, span):
+
+        """Appends the span to the timeline."""
+
+        self.write(span)
+
+    def read(self):
+
+        """Returns the list of spans of the timeline, sorted by start time."""
+
+        spans = []
+        for line in self.lines():
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                # incomplete last line being written
+                continue
+        spans.sort(key=lambda span: span['start'])
+        return spans
+
+    @staticmethod
+    def phases(spans):
+
+        """Returns a dict of the number of spans and their total duration in
+           seconds, indexed by phases, in dicts indexed by domains. The spans
+           which are not attributed to any domain are indexed by None. The
+           durations of the nested spans are also included in the durations
+           of their parents.
+
+           :param list spans: the spans of the timeline
+        """
+
+        phases = {}
+        for span in spans:
+            entry = phases.setdefault(span['domain'], {}) \
+                          .setdefault(span['phase'], { 'count': 0,
+                                                       'duration': 0.0 })
+            entry['count'] += 1
+            entry['duration'] += span['duration'] / 1e9
+        return phases
+
+    @staticmethod
+    def critical_path(spans):
+
+        """Returns the list of the spans of the critical path of the timeline,
+           the first first, as tuples (span, idle) where idle is the time in
+           seconds between the end of the previous span of the path and the
+           start of the span.
+
+           The path is built backwards from the span which ends last: the
+           predecessor of a span is the span which ends last before its start.
+           Only the innermost spans are considered since their parents are
+           not more than the sum of their children, eg. the boot of a domain
+           is its volumes, its networks and the start of the domain.
+
+           :param list spans: the spans of the timeline
+        """
+
+        parents = set(span['parent'] for span in spans)
+        leaves = [ span for span in spans if span['id'] not in parents ]
+        if not leaves:
+            return []
+
+        # spans sorted by end time
+        leaves.sort(key=lambda span: span['start'] + span['duration'])
+        current = leaves.pop()
+        path = [current]
+        while True:
+            predecessor = None
+            while leaves:
+                candidate = leaves.pop()
+                if candidate['start'] + candidate['duration'] \
+                   <= current['start']:
+                    predecessor = candidate
+                    break
+            if predecessor is None:
+                break
+            path.append(predecessor)
+            current = predecessor
+        path.reverse()
+
+        result = []
+        end = path[0]['start']
+        for span in path:
+            result.append((span, (span['start'] - end) / 1e9))
+            end = span['start'] + span['duration']
+        return result
+
+    @staticmethod
+    def chrome_trace(spans):
+
+        """Returns the dict of the spans in the Trace Event Format, to be
+           written in JSON and loaded in chrome://tracing or Perfetto. The
+           domains are the processes of the trace and the threads of the
+           processes of cloubed are their threads, so that concurrent spans
+           are not drawn over each other.
+
+           :param list spans: the spans of the timeline
+        """
+
+        events = []
+        if not spans:
+            return { 'traceEvents': events, 'displayTimeUnit': 'ms' }
+
+        origin = min(span['start'] for span in spans)
+        pids = {} # trace pids indexed by domains
+        tids = {} # trace tids indexed by (pid, thread) of the spans
+
+        for span in spans:
+            domain = span['domain']
+            if domain not in pids:
+                pids[domain] = len(pids) + 1
+                events.append({ 'ph': 'M',
+                                'name': 'process_name',
+                                'pid': pids[domain],
+                                'tid': 0,
+                                'args': { 'name': domain or 'testbed' } })
+            thread = (span['id'].split('.')[0], span['thread'])
+            if thread not in tids:
+                tids[thread] = len(tids) + 1
+            args = { key: value for key, value in span.items() \
+                     if key not in ['id', 'parent', 'phase', 'name', 'domain',
+                                    'time', 'start', 'duration', 'thread'] }
+            events.append({ 'ph': 'X',
+                            'name': "{phase} {name}" \
+                                        .format(phase=span['phase'],
+                                                name=span['name']),
+                            'cat': span['phase'],
+                            'pid': pids[domain],
+                            'tid': tids[thread],
+                            'ts': (span['start'] - origin) / 1e3,
+                            'dur': span['duration'] / 1e3,
+                            'args': args })
+
+        return { 'traceEvents': events, 'displayTimeUnit': 'ms' }
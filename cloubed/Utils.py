@@ -22,9 +22,15 @@
 """ Set of utilities functions for Cloubed """
 
 import hashlib
+import json
 import pwd
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# directory of the state files, the .cloubed directory in the current
+# directory if None
+STATE_DIR = None
 
 def gen_mac(salt):
 
@@ -38,36 +44,6 @@ def gen_mac(salt):
     mac.extend((salted[:2], salted[2:4], salted[4:6]))
     return ':'.join(mac)
 
-def net_conflict(ip1, mask1, ip2, mask2):
-    """Returns true is the two IPv4 networks are in conflict.
-       If the netaddr module is not available, a debug message is printed and
-       False is returned.
-       If the format of one the parameter is not valid (could not lead to a
-       valid IPv4 IP set), a debug message is printed and False is returned.
-
-       :param string ip1: IP address of network 1
-       :param string mask1: netmask of network 1
-       :param string ip2: IP address of network 2
-       :param string mask2: netmask of network 2
-    """
-
-    try:
-        from netaddr import IPSet, AddrFormatError
-    except ImportError:
-        logging.debug("unable to check conflicting networks since netaddr " \
-                      "module is not available")
-        return False
-
-    try:
-        set1 = IPSet(['{ip}/{mask}'.format(ip=ip1, mask=mask1)])
-        set2 = IPSet(['{ip}/{mask}'.format(ip=ip2, mask=mask2)])
-    except AddrFormatError as err:
-        logging.debug("unable to check conflicting networks due to error in " \
-                      "address format: {error}".format(error=err))
-        return False
-
-    return not set1.isdisjoint(set2)
-
 def getuser():
 
     """
@@ -78,6 +54,56 @@ def getuser():
     return pwd.getpwuid(os.geteuid())[0]
 
 
+def state_path(*parts):
+    """Returns the absolute path of a file in the state directory of the
+       testbed, ie. the .cloubed directory in the current directory, where
+       the YAML file is loaded from, unless STATE_DIR is set. The directories
+       of the path are not created.
+
+       :param strings parts: the components of the path of the file relative
+           to the state directory
+    """
+
+    if STATE_DIR is not None:
+        return os.path.join(STATE_DIR, *parts)
+    return os.path.join(os.getcwd(), '.cloubed', *parts)
+
+def write_state(path, content):
+    """Atomically writes the content in parameter as JSON in the state file
+       whose path is given in parameter, creating its directory if needed.
+
+       :param string path: the path of the state file, as returned by
+           state_path()
+       :param content: the JSON serializable content of the file
+    """
+
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as state_file:
+        json.dump(content, state_file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
 def clean_string_for_template(string):
 
-    return string.replace('-','')
\ No newline at end of file
+    return string.replace('-','')
+
+def run_parallel(func, args_list, jobs):
+    """Runs func with each tuple of arguments of args_list in a pool of at most
+       jobs threads and returns the list of results in the same order. All
+       calls are run until completion, then the first exception raised by one
+       of them, if any, is raised again.
+
+       :param function func: the function to run
+       :param list args_list: list of tuples of arguments for func
+       :param integer jobs: maximum number of concurrent threads
+    """
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = [ executor.submit(func, *args) for args in args_list ]
+
+    results = []
+    for future in futures:
+        results.append(future.result())
+    return results
@@ -25,9 +25,16 @@
 
 import libvirt
 import logging
+import time
 from xml.dom.minidom import parseString
 from cloubed.CloubedException import CloubedControllerException
 
+# size of the buffers used to send and receive data through libvirt streams
+STREAM_BUFFER_SIZE = 4 * 1024**2
+
+# maximum number of seconds to wait for a block commit to be ready to pivot
+BLOCK_COMMIT_TIMEOUT = 600
+
 class VirtController(object):
 
     def __init__(self, read_only=False):
@@ -88,6 +95,30 @@ class VirtController(object):
         except libvirt.libvirtError as err:
             raise CloubedControllerException(err)
 
+    def refresh_storage_pool(self, storage_pool):
+        """Refreshes the list of volumes of the storage pool in libvirt after
+           files have been changed in its directory.
+
+           :param StoragePool storage_pool: a reference to the storage pool to
+               refresh
+           :exceptions CloubedControllerException:
+               * the storage pool in parameter could not be found in libvirt
+               * a problem is encountered in libvirt
+        """
+
+        # type(pool) is libvirt.virStoragePool
+        pool = self.find_storage_pool(storage_pool.path)
+
+        if not pool:
+            raise CloubedControllerException("pool {path} not found by "\
+                                             "virtualization controller" \
+                                             .format(path=storage_pool.path))
+
+        try:
+            pool.refresh(0)
+        except libvirt.libvirtError as err:
+            raise CloubedControllerException(err)
+
     @staticmethod
     def __status_storage_pool(state_code):
         """Returns the name of the status of the StoragePool in Libvirt
@@ -275,6 +306,91 @@ class VirtController(object):
                 infos['status'] = 'undefined'
         return infos
 
+    def upload_storage_volume(self, storage_pool, name, transfer):
+        """Uploads the content of the local file of the transfer into the
+           storage volume through a sparse stream. The holes of the local file
+           are never sent over the stream, data is sent by chunks of
+           STREAM_BUFFER_SIZE bytes.
+
+           :param StoragePool storage_pool: a reference to the storage pool in
+               which the volume should be found
+           :param string name: the name of the filename of the storage volume
+           :param StorageVolumeTransfer transfer: the opened transfer
+           :exceptions CloubedControllerException:
+               * the storage volume could not be found in libvirt
+               * a problem is encountered in libvirt
+        """
+
+        storage_volume = self.find_storage_volume(storage_pool, name)
+        if storage_volume is None:
+            raise CloubedControllerException("storage volume {name} not " \
+                                             "found by virtualization " \
+                                             "controller".format(name=name))
+
+        stream = self.conn.newStream(0)
+        try:
+            storage_volume.upload(stream, 0, 0,
+                                  libvirt.VIR_STORAGE_VOL_UPLOAD_SPARSE_STREAM)
+            while True:
+                (in_data, length) = transfer.hole()
+                if not in_data and length > 0:
+                    stream.sendHole(length, 0)
+                    transfer.skip(length)
+                    continue
+                want = STREAM_BUFFER_SIZE
+                if 0 < length < want:
+                    want = length
+                buf = transfer.read(want)
+                if not buf:
+                    break
+                # send() may not send all the buffer at once
+                while buf:
+                    sent = stream.send(buf)
+                    buf = buf[sent:]
+            stream.finish()
+        except libvirt.libvirtError as err:
+            stream.abort()
+            raise CloubedControllerException(err)
+
+    def download_storage_volume(self, storage_pool, name, transfer):
+        """Downloads the content of the storage volume into the local file of
+           the transfer through a sparse stream. The holes of the volume are
+           never received over the stream but left as holes in the local
+           file.
+
+           :param StoragePool storage_pool: a reference to the storage pool in
+               which the volume should be found
+           :param string name: the name of the filename of the storage volume
+           :param StorageVolumeTransfer transfer: the opened transfer
+           :exceptions CloubedControllerException:
+               * the storage volume could not be found in libvirt
+               * a problem is encountered in libvirt
+        """
+
+        storage_volume = self.find_storage_volume(storage_pool, name)
+        if storage_volume is None:
+            raise CloubedControllerException("storage volume {name} not " \
+                                             "found by virtualization " \
+                                             "controller".format(name=name))
+
+        stream = self.conn.newStream(0)
+        try:
+            storage_volume.download(stream, 0, 0,
+                              libvirt.VIR_STORAGE_VOL_DOWNLOAD_SPARSE_STREAM)
+            while True:
+                buf = stream.recvFlags(STREAM_BUFFER_SIZE,
+                                       libvirt.VIR_STREAM_RECV_STOP_AT_HOLE)
+                if buf == -3: # in a hole
+                    transfer.write_hole(stream.recvHole(0))
+                    continue
+                if not buf:
+                    break
+                transfer.write(buf)
+            stream.finish()
+        except libvirt.libvirtError as err:
+            stream.abort()
+            raise CloubedControllerException(err)
+
     #
     # networks
     #
@@ -313,6 +429,121 @@ class VirtController(object):
         except libvirt.libvirtError as err:
             raise CloubedControllerException(err)
 
+    def network_is_active(self, name):
+        """Returns True if the network whose name is in parameter exists and
+           is active in libvirt, False otherwise.
+
+           :param string name: the name of the network
+           :exceptions CloubedControllerException:
+               * a problem is encountered in libvirt
+        """
+
+        network = self.find_network(name)
+        if network is None:
+            return False
+        try:
+            return bool(network.isActive())
+        except libvirt.libvirtError as err:
+            raise CloubedControllerException(err)
+
+    def undefine_network(self, name):
+        """Removes the persistent definition of the network whose name is in
+           parameter in libvirt, if it exists.
+
+           :param string name: the name of the network to undefine
+           :exceptions CloubedControllerException:
+               * a problem is encountered in libvirt
+        """
+
+        network = self.find_network(name)
+        if network is not None:
+            try:
+                network.undefine()
+            except libvirt.libvirtError as err:
+                raise CloubedControllerException(err)
+
+    def network_hosts(self, name):
+        """Returns a tuple with the list of static DHCP hosts and the list of
+           DNS hosts of an active network in Libvirt. The DHCP hosts are dicts
+           with mac, hostname and ip keys. The DNS hosts are tuples with the IP
+           address and the sorted tuple of hostnames.
+
+           :param string name: the name of the network to inspect
+           :exceptions CloubedControllerException:
+               * a problem is encountered in libvirt
+        """
+
+        try:
+            network = self.conn.networkLookupByName(name)
+            xml = parseString(network.XMLDesc(0))
+        except libvirt.libvirtError as err:
+            raise CloubedControllerException(err)
+
+        dhcp_hosts = []
+        for element_dhcp in xml.getElementsByTagName('dhcp'):
+            for element in element_dhcp.getElementsByTagName('host'):
+                dhcp_hosts.append({ 'mac': element.getAttribute('mac').lower(),
+                                    'hostname': element.getAttribute('name'),
+                                    'ip': element.getAttribute('ip') })
+
+        dns_hosts = []
+        for element_dns in xml.getElementsByTagName('dns'):
+            for element in element_dns.getElementsByTagName('host'):
+                hostnames = [ node.firstChild.data \
+                              for node in \
+                                  element.getElementsByTagName('hostname') \
+                              if node.firstChild is not None ]
+                dns_hosts.append((element.getAttribute('ip'),
+                                  tuple(sorted(hostnames))))
+
+        return (dhcp_hosts, dns_hosts)
+
+    def update_network(self, name, command, section, xml):
+        """Applies a live update on one element of a section of an active
+           network in Libvirt.
+
+           :param string name: the name of the network to update
+           :param string command: either 'add', 'modify' or 'delete'
+           :param string section: either 'dhcp-host' or 'dns-host'
+           :param string xml: the XML description of the element
+           :exceptions CloubedControllerException:
+               * a problem is encountered in libvirt
+        """
+
+        commands = {
+            'add': libvirt.VIR_NETWORK_UPDATE_COMMAND_ADD_LAST,
+            'modify': libvirt.VIR_NETWORK_UPDATE_COMMAND_MODIFY,
+            'delete': libvirt.VIR_NETWORK_UPDATE_COMMAND_DELETE
+        }
+        sections = {
+            'dhcp-host': libvirt.VIR_NETWORK_SECTION_IP_DHCP_HOST,
+            'dns-host': libvirt.VIR_NETWORK_SECTION_DNS_HOST
+        }
+
+        try:
+            network = self.conn.networkLookupByName(name)
+            network.update(commands[command], sections[section], -1, xml,
+                           libvirt.VIR_NETWORK_UPDATE_AFFECT_LIVE)
+        except libvirt.libvirtError as err:
+            raise CloubedControllerException(err)
+
+    def network_leases(self, name):
+        """Returns a dict of the MAC addresses of the current DHCP leases of
+           an active network in Libvirt indexed by their IP addresses.
+
+           :param string name: the name of the network to inspect
+           :exceptions CloubedControllerException:
+               * a problem is encountered in libvirt
+        """
+
+        try:
+            network = self.conn.networkLookupByName(name)
+            leases = network.DHCPLeases()
+        except libvirt.libvirtError as err:
+            raise CloubedControllerException(err)
+
+        return { lease['ipaddr']: lease['mac'].lower() for lease in leases }
+
     @staticmethod
     def __info_network(network):
         """Returns a dict with a bunch of infos about a Libvirt network.
@@ -516,6 +747,181 @@ class VirtController(object):
             except libvirt.libvirtError as err:
                 raise CloubedControllerException(err)
 
+    def pause_domain(self, domain_name):
+        """Pauses the execution of the domain in libvirt whose name is in
+           parameter. The domain stays in memory but its CPUs are stopped.
+
+           :param string domain_name: the name of the domain to pause
+           :exceptions CloubedControllerException:
+               * a problem is encountered in libvirt
+        """
+
+        domain = self.find_domain(domain_name)
+        if domain is not None:
+            try:
+                domain.suspend()
+            except libvirt.libvirtError as err:
+                raise CloubedControllerException(err)
+
+    def unpause_domain(self, domain_name):
+        """Resumes the execution of a previously paused domain in libvirt
+           whose name is in parameter.
+
+           :param string domain_name: the name of the domain to unpause
+           :exceptions CloubedControllerException:
+               * a problem is encountered in libvirt
+        """
+
+        domain = self.find_domain(domain_name)
+        if domain is not None:
+            try:
+                domain.resume()
+            except libvirt.libvirtError as err:
+                raise CloubedControllerException(err)
+
+    def snapshot_domain(self, domain_name, xml, memory):
+        """Creates an external snapshot of the active domain in libvirt whose
+           name is in parameter based on the XML description in parameter.
+           The snapshot metadata are not kept in libvirt, the chain of
+           snapshots is managed by Cloubed.
+
+           :param string domain_name: the name of the domain to snapshot
+           :param string xml: the XML description of the snapshot
+           :param boolean memory: True if the memory state is saved with the
+               disks
+           :exceptions CloubedControllerException:
+               * the domain could not be found in libvirt
+               * a problem is encountered in libvirt
+        """
+
+        domain = self.find_domain(domain_name)
+        if domain is None:
+            raise CloubedControllerException("domain {name} not found by " \
+                                             "virtualization controller" \
+                                                 .format(name=domain_name))
+
+        flags = libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_NO_METADATA | \
+                libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_ATOMIC
+        if not memory:
+            flags |= libvirt.VIR_DOMAIN_SNAPSHOT_CREATE_DISK_ONLY
+
+        try:
+            domain.snapshotCreateXML(xml, flags)
+        except libvirt.libvirtError as err:
+            raise CloubedControllerException(err)
+
+    def restore_domain(self, path, disks, paused=False):
+        """Restores a domain from the memory state saved in the file in
+           parameter. The sources of the disks in the domain description saved
+           along with the memory state are replaced by the files in parameter.
+
+           :param string path: the path of the file of the memory state
+           :param dict disks: the paths of the disk files indexed by their
+               target devices
+           :param boolean paused: True to leave the domain paused, else it is
+               running after the restoration
+           :exceptions CloubedControllerException:
+               * a problem is encountered in libvirt
+        """
+
+        try:
+            xml = parseString(self.conn.saveImageGetXMLDesc(path, 0))
+            for element_disk in xml.getElementsByTagName('disk'):
+                targets = element_disk.getElementsByTagName('target')
+                sources = element_disk.getElementsByTagName('source')
+                if not targets or not sources:
+                    continue
+                device = targets[0].getAttribute('dev')
+                if device in disks:
+                    sources[0].setAttribute('file', disks[device])
+            if paused:
+                flags = libvirt.VIR_DOMAIN_SAVE_PAUSED
+            else:
+                flags = libvirt.VIR_DOMAIN_SAVE_RUNNING
+            self.conn.restoreFlags(path, xml.documentElement.toxml(), flags)
+        except libvirt.libvirtError as err:
+            raise CloubedControllerException(err)
+
+    def commit_domain_disk(self, domain_name, device, base, top,
+                           timeout=BLOCK_COMMIT_TIMEOUT):
+        """Merges the content of the active top file of a disk of the active
+           domain whose name is in parameter into its backing file, then pivots
+           the disk on the backing file. This method blocks until the end of
+           the block job, the job is aborted if it is not ready to pivot
+           within timeout seconds.
+
+           :param string domain_name: the name of the domain
+           :param string device: the target device of the disk
+           :param string base: the path of the backing file
+           :param string top: the path of the active top file to merge
+           :param integer timeout: the maximum number of seconds to wait for
+               the job
+           :exceptions CloubedControllerException:
+               * the domain could not be found in libvirt
+               * the job is aborted or timed out
+               * a problem is encountered in libvirt
+        """
+
+        domain = self.find_domain(domain_name)
+        if domain is None:
+            raise CloubedControllerException("domain {name} not found by " \
+                                             "virtualization controller" \
+                                                 .format(name=domain_name))
+
+        try:
+            domain.blockCommit(device, base, top, 0,
+                               libvirt.VIR_DOMAIN_BLOCK_COMMIT_ACTIVE | \
+                               libvirt.VIR_DOMAIN_BLOCK_COMMIT_SHALLOW)
+            # the job can pivot once libvirt reports it ready, ie. once all
+            # data have been merged and the writes are mirrored, the progress
+            # is 0/0 before the job has measured anything
+            deadline = time.monotonic() + timeout
+            while True:
+                info = domain.blockJobInfo(device, 0)
+                if not info:
+                    raise CloubedControllerException("commit of disk " \
+                                                     "{device} of domain " \
+                                                     "{name} aborted" \
+                                                     .format(device=device,
+                                                             name=domain_name))
+                if VirtController.__block_job_ready(domain, device):
+                    break
+                if time.monotonic() > deadline:
+                    # the top file stays the active file of the disk
+                    domain.blockJobAbort(device, 0)
+                    raise CloubedControllerException("commit of disk " \
+                                                     "{device} of domain " \
+                                                     "{name} timed out after " \
+                                                     "{timeout} seconds" \
+                                                     .format(device=device,
+                                                             name=domain_name,
+                                                             timeout=timeout))
+                time.sleep(0.1)
+            domain.blockJobAbort(device,
+                                 libvirt.VIR_DOMAIN_BLOCK_JOB_ABORT_PIVOT)
+        except libvirt.libvirtError as err:
+            raise CloubedControllerException(err)
+
+    @staticmethod
+    def __block_job_ready(domain, device):
+        """Returns True if the block job of the disk of the libvirt.virDomain
+           in parameter is ready to pivot, according to the mirror element of
+           the disk in the XML description of the domain.
+
+          :param libvirt.virDomain domain: the domain of the disk
+          :param string device: the target device of the disk
+        """
+
+        xml = parseString(domain.XMLDesc(0))
+        for disk in xml.getElementsByTagName('disk'):
+            targets = disk.getElementsByTagName('target')
+            if not targets or targets[0].getAttribute('dev') != device:
+                continue
+            for mirror in disk.getElementsByTagName('mirror'):
+                if mirror.getAttribute('ready') == 'yes':
+                    return True
+        return False
+
     @staticmethod
     def __status_domain(state_code):
         """Returns the name of the status of the Domain in Libvirt
@@ -607,6 +1013,27 @@ class VirtController(object):
 
         libvirt.virEventRegisterDefaultImpl()
 
+    @staticmethod
+    def event_register_asyncio(loop=None):
+        """Registers the event implementation of libvirt on the asyncio event
+           loop, so that the events are dispatched by the loop without any
+           thread. Only one event implementation can be registered in a
+           process.
+
+           :param asyncio.AbstractEventLoop loop: the event loop, by default
+               the running loop
+           :exceptions CloubedControllerException:
+               * the libvirtaio module of libvirt-python is not available
+        """
+
+        try:
+            import libvirtaio
+        except ImportError:
+            raise CloubedControllerException(
+                      "unable to register libvirt events on asyncio loop " \
+                      "because libvirtaio module is not available")
+        libvirtaio.virEventRegisterAsyncIOImpl(loop=loop)
+
     @staticmethod
     def event_run():
 
@@ -618,14 +1045,63 @@ class VirtController(object):
 
         self.conn.setKeepAlive(major, minor)
 
+    # IDs of the domain events subscribed by the event managers, indexed by
+    # their names in DomainEvent
+    domain_event_ids = { 'LIFECYCLE': 'VIR_DOMAIN_EVENT_ID_LIFECYCLE',
+                         'REBOOT': 'VIR_DOMAIN_EVENT_ID_REBOOT',
+                         'WATCHDOG': 'VIR_DOMAIN_EVENT_ID_WATCHDOG',
+                         'IO_ERROR': 'VIR_DOMAIN_EVENT_ID_IO_ERROR',
+                         'BLOCK_JOB': 'VIR_DOMAIN_EVENT_ID_BLOCK_JOB',
+                         'DEVICE_REMOVED': 'VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED',
+                         'AGENT_LIFECYCLE':
+                             'VIR_DOMAIN_EVENT_ID_AGENT_LIFECYCLE' }
+
     def domain_event_register(self, handler):
-        """Returns void
+        """Registers the handler of the events of all domains for all the
+           event IDs of domain_event_ids supported by libvirt and returns the
+           list of IDs of the callbacks. The handler is called with the
+           libvirt domain, the name of the event ID and the tuple of the
+           arguments specific to this event ID.
+
+           :exceptions CloubedControllerException:
+               * a problem is encountered in libvirt
+        """
+
+        callback_ids = []
+        for name, constant in VirtController.domain_event_ids.items():
+            event_id = getattr(libvirt, constant, None)
+            if event_id is None:
+                logging.debug("event {name} not supported by libvirt" \
+                                  .format(name=name))
+                continue
+            # the callbacks of all event IDs start with the connection and the
+            # domain and end with the opaque argument
+            callback = lambda conn, dom, *args, name=name: \
+                           handler(dom, name, args[:-1])
+            try:
+                callback_ids.append(
+                    self.conn.domainEventRegisterAny(None,
+                                                     event_id,
+                                                     callback,
+                                                     None))
+            except libvirt.libvirtError as err:
+                raise CloubedControllerException(err)
+        return callback_ids
+
+    def domain_event_deregister(self, callback_ids):
+        """Deregisters the handlers of domain events with the callback IDs in
+           parameter.
+
+           :exceptions CloubedControllerException:
+               * a problem is encountered in libvirt
         """
 
-        self.conn.domainEventRegisterAny(None,
-                                         libvirt.VIR_DOMAIN_EVENT_ID_LIFECYCLE,
-                                         handler,
-                                         None)
+        try:
+            for callback_id in callback_ids:
+                self.conn.domainEventDeregisterAny(callback_id)
+        except libvirt.libvirtError as err:
+            raise CloubedControllerException(err)
+
     #
     # Support testing methods
     #
@@ -87,6 +87,55 @@ def resume(domain_name):
     cloubed = Cloubed()
     cloubed.resume(domain_name)
 
+def baseline(domain_name):
+
+    """ Records the current content of the disks of a domain as baselines """
+
+    cloubed = Cloubed()
+    cloubed.baseline(domain_name)
+
+def snapshot_create(domain_name, snapshot_name, memory=False):
+
+    """ Creates a snapshot of the disks and optionally memory of a domain """
+
+    cloubed = Cloubed()
+    cloubed.create_snapshot(domain_name, snapshot_name, memory)
+
+def snapshot_list(domain_name):
+
+    """ Returns the list of snapshots of a domain """
+
+    cloubed = Cloubed()
+    return cloubed.get_snapshots(domain_name)
+
+def snapshot_revert(domain_name, snapshot_name):
+
+    """ Reverts a domain to one of its snapshots """
+
+    cloubed = Cloubed()
+    cloubed.revert_snapshot(domain_name, snapshot_name)
+
+def snapshot_delete(domain_name, snapshot_name):
+
+    """ Deletes a snapshot of a domain """
+
+    cloubed = Cloubed()
+    cloubed.delete_snapshot(domain_name, snapshot_name)
+
+def checkpoint(name, jobs=4):
+
+    """ Saves the state of all the running domains of the testbed """
+
+    cloubed = Cloubed()
+    cloubed.checkpoint(name, jobs)
+
+def restore(name, jobs=4):
+
+    """ Restores all the domains saved in a checkpoint """
+
+    cloubed = Cloubed()
+    cloubed.restore(name, jobs)
+
 def create_network(network_name, recreate):
 
     """ Creates network in libvirt """
@@ -94,6 +143,34 @@ def create_network(network_name, recreate):
     cloubed = Cloubed()
     cloubed.create_network(network_name, recreate)
 
+def import_volumes(volumes, jobs=4):
+
+    """ Imports local image files into storage volumes """
+
+    cloubed = Cloubed()
+    cloubed.import_volumes(volumes, jobs)
+
+def export_volumes(volumes, jobs=4):
+
+    """ Exports storage volumes into local files """
+
+    cloubed = Cloubed()
+    cloubed.export_volumes(volumes, jobs)
+
+def cache_image(path, label=None):
+
+    """ Adds a local image file in the image cache """
+
+    cloubed = Cloubed()
+    return cloubed.cache_image(path, label)
+
+def image_cache():
+
+    """ Returns information about the entries of the image cache """
+
+    cloubed = Cloubed()
+    return cloubed.get_image_cache_infos()
+
 def cleanup():
 
     """ Destroys all resources in libvirt """
@@ -108,6 +185,21 @@ def wait(domain, event, detail, enable_http=False):
     cloubed = Cloubed()
     cloubed.wait_event(domain, event, detail, enable_http)
 
+async def wait_async(domain, event, detail):
+
+    """Coroutine which waits for an event on a domain within the asyncio event
+       loop"""
+
+    cloubed = Cloubed()
+    await cloubed.wait_event_async(domain, event, detail)
+
+def events(domain):
+
+    """Returns the asynchronous stream of events of a domain"""
+
+    cloubed = Cloubed()
+    return cloubed.async_event_manager().events(domain)
+
 def storage_pools():
 
     """ Returns the list of storage pools names """
@@ -59,7 +59,17 @@ class CloubedArgumentParser(argparse.ArgumentParser):
                                      'status',
                                      'cleanup',
                                      'vars',
-                                     'xml'],
+                                     'xml',
+                                     'import',
+                                     'export',
+                                     'cache',
+                                     'baseline',
+                                     'snapshot',
+                                     'checkpoint',
+                                     'restore',
+                                     'events',
+                                     'timeline',
+                                     'validate'],
                             help="name of the action to perform")
 
         # TODO: actually still to be implemented
@@ -86,6 +96,18 @@ class CloubedArgumentParser(argparse.ArgumentParser):
         parser_gen_grp = self.add_argument_group('Arguments for gen action')
         parser_wait_grp = self.add_argument_group('Arguments for wait action')
         parser_xml_grp = self.add_argument_group('Arguments for xml action')
+        parser_transfer_grp = self.add_argument_group('Arguments for import ' \
+                                                      'and export actions')
+        parser_cache_grp = self.add_argument_group('Arguments for cache action')
+        parser_snapshot_grp = self.add_argument_group('Arguments for ' \
+                                                      'snapshot action')
+        parser_checkpoint_grp = self.add_argument_group('Arguments for ' \
+                                                        'checkpoint and ' \
+                                                        'restore actions')
+        parser_events_grp = self.add_argument_group('Arguments for events ' \
+                                                    'action')
+        parser_timeline_grp = self.add_argument_group('Arguments for ' \
+                                                      'timeline action')
 
         parser_boot_grp.add_argument("--bootdev",
                             dest='bootdev',
@@ -127,6 +149,91 @@ class CloubedArgumentParser(argparse.ArgumentParser):
                             nargs=1,
                             help="Print XML description of this resource")
 
+        parser_transfer_grp.add_argument("--volumes",
+                            dest='volumes',
+                            nargs='+',
+                            help="Storage volumes to import or export with " \
+                                 "their local files, in the form volume:path" \
+                                 " separated by blank spaces")
+
+        parser_transfer_grp.add_argument("--jobs",
+                            dest='jobs',
+                            nargs=1,
+                            type=int,
+                            help="Maximum number of storage volumes " \
+                                 "transferred or domains saved and restored " \
+                                 "in parallel (default: 4)")
+
+        parser_cache_grp.add_argument("--add",
+                            dest='add',
+                            nargs=1,
+                            help="Image file to add in the image cache")
+
+        parser_cache_grp.add_argument("--label",
+                            dest='label',
+                            nargs=1,
+                            help="Label of the image added in the image cache")
+
+        parser_snapshot_grp.add_argument("--create",
+                            dest='snapshot_create',
+                            nargs=1,
+                            help="Create a snapshot with this name")
+
+        parser_snapshot_grp.add_argument("--list",
+                            dest='snapshot_list',
+                            help="List the snapshots of the domain",
+                            action="store_true")
+
+        parser_snapshot_grp.add_argument("--revert",
+                            dest='snapshot_revert',
+                            nargs=1,
+                            help="Revert the domain to the snapshot with " \
+                                 "this name")
+
+        parser_snapshot_grp.add_argument("--delete",
+                            dest='snapshot_delete',
+                            nargs=1,
+                            help="Delete the snapshot with this name")
+
+        parser_snapshot_grp.add_argument("--memory",
+                            dest='memory',
+                            help="Save the memory state of the domain in the " \
+                                 "created snapshot",
+                            action="store_true")
+
+        parser_checkpoint_grp.add_argument("--name",
+                            dest='name',
+                            nargs=1,
+                            help="Name of the checkpoint")
+
+        parser_events_grp.add_argument("--tail",
+                            dest='tail',
+                            nargs=1,
+                            type=int,
+                            help="Number of the most recent events to print " \
+                                 "(default: all)")
+
+        parser_events_grp.add_argument("--follow",
+                            dest='follow',
+                            help="Print the events as they are received",
+                            action="store_true")
+
+        parser_events_grp.add_argument("--summary",
+                            dest='summary',
+                            help="Print the number of events and the mean " \
+                                 "interval between them by domain and event",
+                            action="store_true")
+
+        parser_timeline_grp.add_argument("--chrome",
+                            dest='chrome',
+                            nargs=1,
+                            help="Export the timeline in this file in the " \
+                                 "Chrome trace format")
+
+        parser_timeline_grp.add_argument("--clear",
+                            dest='clear',
+                            help="Remove all the spans of the timeline",
+                            action="store_true")
 
     def check_required(self):
 
@@ -172,7 +279,29 @@ class CloubedArgumentParser(argparse.ArgumentParser):
                 },
                 "xml": {
                     "resource": "--resource"
-                }
+                },
+                "import": {
+                    "volumes": "--volumes"
+                },
+                "export": {
+                    "volumes": "--volumes"
+                },
+                "cache": {},
+                "baseline": {
+                    "domain": "--domain"
+                },
+                "snapshot": {
+                    "domain": "--domain"
+                },
+                "checkpoint": {
+                    "name": "--name"
+                },
+                "restore": {
+                    "name": "--name"
+                },
+                "events": {},
+                "timeline": {},
+                "validate": {}
             }
 
         error_str = "{attribute} is required for {action} action"
@@ -219,7 +348,20 @@ class CloubedArgumentParser(argparse.ArgumentParser):
             'status': [],
             'cleanup': [],
             'vars': [ 'domain' ],
-            'xml': [ 'resource' ]
+            'xml': [ 'resource' ],
+            'import': [ 'volumes', 'jobs' ],
+            'export': [ 'volumes', 'jobs' ],
+            'cache': [ 'add', 'label' ],
+            'baseline': [ 'domain' ],
+            'snapshot': [ 'domain',
+                          'snapshot_create',
+                          'snapshot_revert',
+                          'snapshot_delete' ],
+            'checkpoint': [ 'name', 'jobs' ],
+            'restore': [ 'name', 'jobs' ],
+            'events': [ 'domain', 'event', 'tail' ],
+            'timeline': [ 'domain', 'chrome' ],
+            'validate': []
         }
 
         # For each argument, the name of the corresponding long option
@@ -231,7 +373,17 @@ class CloubedArgumentParser(argparse.ArgumentParser):
             'filename': '--filename',
             'event': '--event',
             'enable_http': '--enable-http',
-            'resource': '--resource'
+            'resource': '--resource',
+            'volumes': '--volumes',
+            'jobs': '--jobs',
+            'add': '--add',
+            'label': '--label',
+            'snapshot_create': '--create',
+            'snapshot_revert': '--revert',
+            'snapshot_delete': '--delete',
+            'name': '--name',
+            'tail': '--tail',
+            'chrome': '--chrome'
         }
 
         error_str = "{attribute} is not compatible with {action} action"
@@ -344,6 +496,37 @@ class CloubedArgumentParser(argparse.ArgumentParser):
                                             "is not valid")
         return waited_event
 
+    def parse_events_filter(self):
+        """
+           Parses and returns the tuple (type, detail) of the optional --event
+           parameter of events action, in the form type or type:detail, or
+           raises exception if problem is found
+        """
+
+        if self._args.event is None:
+            return (None, None)
+
+        event_filter = self._args.event[0].split(':')
+        if len(event_filter) == 1:
+            return (event_filter[0], None)
+        if len(event_filter) != 2:
+            raise CloubedArgumentException("format of --event parameter " \
+                                            "is not valid")
+        return tuple(event_filter)
+
+    def parse_tail(self):
+        """
+           Parses and returns value of --tail parameter of events action or
+           raises exception if problem is found
+        """
+
+        if self._args.tail is None:
+            return None
+        if self._args.tail[0] < 1:
+            raise CloubedArgumentException("--tail parameter must be a " \
+                                            "positive integer")
+        return self._args.tail[0]
+
     def parse_resource(self):
         """
            Parses and returns values of --resource parameter of xml action or
@@ -356,3 +539,89 @@ class CloubedArgumentParser(argparse.ArgumentParser):
             raise CloubedArgumentException("format of --resource parameter " \
                                             "is not valid")
         return resource
+
+    def parse_volumes(self):
+        """
+           Parses and returns values of --volumes parameter of import and
+           export actions as a dict of paths indexed by storage volume names
+           or raises exception if problem is found
+        """
+
+        volumes = {}
+        for volume_str in self._args.volumes:
+            volume = volume_str.split(':', 1)
+            if len(volume) != 2 or not volume[0] or not volume[1]:
+                raise CloubedArgumentException("format of --volumes " \
+                                                "parameter is not valid")
+            volumes[volume[0]] = volume[1]
+        return volumes
+
+    def parse_jobs(self):
+        """
+           Parses and returns value of --jobs parameter of import, export,
+           checkpoint and restore actions or raises exception if problem is
+           found
+        """
+
+        if self._args.jobs:
+            jobs = self._args.jobs[0]
+            if jobs < 1:
+                raise CloubedArgumentException("--jobs parameter must be a " \
+                                                "positive integer")
+            return jobs
+        else:
+            return 4 # default value
+
+    def parse_cache(self):
+        """
+           Parses and returns values of --add and --label parameters of cache
+           action as a tuple (path, label) or raises exception if problem is
+           found. The path is None if --add is not defined.
+        """
+
+        if self._args.add:
+            path = self._args.add[0]
+        else:
+            path = None
+
+        if self._args.label:
+            if path is None:
+                raise CloubedArgumentException("--label parameter requires " \
+                                                "--add parameter")
+            label = self._args.label[0]
+        else:
+            label = None
+
+        return (path, label)
+
+    def parse_snapshot(self):
+        """
+           Parses and returns values of --create, --list, --revert, --delete
+           and --memory parameters of snapshot action as a tuple (operation,
+           name, memory) or raises exception if problem is found. The name is
+           None with list operation.
+        """
+
+        operations = []
+        if self._args.snapshot_create:
+            operations.append(('create', self._args.snapshot_create[0]))
+        if self._args.snapshot_list:
+            operations.append(('list', None))
+        if self._args.snapshot_revert:
+            operations.append(('revert', self._args.snapshot_revert[0]))
+        if self._args.snapshot_delete:
+            operations.append(('delete', self._args.snapshot_delete[0]))
+
+        if len(operations) != 1:
+            raise CloubedArgumentException("snapshot action requires one " \
+                                            "and only one parameter among " \
+                                            "--create, --list, --revert and " \
+                                            "--delete")
+
+        operation, name = operations[0]
+
+        if self._args.memory and operation != 'create':
+            raise CloubedArgumentException("--memory parameter requires " \
+                                            "--create parameter")
+
+        return (operation, name, self._args.memory)
@@ -22,9 +22,17 @@
 """ All functions for cloubed CLI script"""
 
 from ..Cloubed import Cloubed
-from ..CloubedException import CloubedException, CloubedArgumentException
+from ..conf.ConfigurationCache import ConfigurationCache
+from ..CloubedException import CloubedException, \
+                               CloubedArgumentException, \
+                               CloubedConfigurationException
 from ..cli.CloubedArgumentParser import CloubedArgumentParser
+from ..EventJournal import EventJournal
+from ..Timeline import Timeline
+import os
 import sys
+import json
+import time
 import logging
 
 def print_testbed_infos(testbed):
@@ -95,6 +103,135 @@ def print_domain_infos(name, infos):
     for key, value in list(infos.items()):
         print(("    - {key:10s}: {value:10s}".format(key=key, value=value)))
 
+def print_image_cache_infos(entries):
+    """
+        Prints nicely a dict full of informations about the entries of the
+        image cache, the most recently used first.
+    """
+
+    print("image cache:")
+    for digest, infos in sorted(list(entries.items()),
+                                key=lambda item: item[1]['last_used'],
+                                reverse=True):
+        print(("  - {digest}".format(digest=digest)))
+        if infos['label'] is not None:
+            print(("    - label     : {label}".format(label=infos['label'])))
+        print(("    - format    : {format}".format(format=infos['format'])))
+        print(("    - size      : {size:.2f}GB" \
+                  .format(size=infos['size']/1024**3)))
+        print(("    - refs      : {refs}".format(refs=infos['refs'])))
+
+def print_snapshots(domain_name, snapshots):
+    """
+        Prints nicely the list of snapshots of a domain, the oldest first.
+    """
+
+    print(("snapshots of domain {domain}:".format(domain=domain_name)))
+    for snapshot in snapshots:
+        created = time.strftime("%Y-%m-%d %H:%M:%S",
+                                time.localtime(snapshot['created']))
+        if snapshot['memory']:
+            state = "disks+memory"
+        else:
+            state = "disks"
+        print(("  - {name:20s} {created} {state}" \
+                  .format(name=snapshot['name'],
+                          created=created,
+                          state=state)))
+
+def print_event_record(record):
+    """
+        Prints nicely a record of the journal of the events.
+    """
+
+    received = time.strftime("%Y-%m-%d %H:%M:%S",
+                             time.localtime(record['time']))
+    line = "{received}.{micro:06d} {domain:20s} {type:16s} {detail}" \
+               .format(received=received,
+                       micro=int(record['time'] % 1 * 1e6),
+                       domain=record['domain'],
+                       type=record['type'],
+                       detail=record['detail'])
+    for key, value in sorted(record.get('data', {}).items()):
+        line += " {key}={value}".format(key=key, value=value)
+    print(line)
+
+def print_events_summary(summary):
+    """
+        Prints nicely the summary of the journal of the events by domain and
+        event.
+    """
+
+    print("events:")
+    for (domain, _, detail), infos in sorted(summary.items()):
+        last = time.strftime("%Y-%m-%d %H:%M:%S",
+                             time.localtime(infos['last']))
+        if infos['interval'] is None:
+            interval = "-"
+        else:
+            interval = "{interval:.3f}s".format(interval=infos['interval'])
+        print(("  - {domain:20s} {detail:30s} {count:6d} last {last} " \
+               "every {interval}".format(domain=domain,
+                                         detail=detail,
+                                         count=infos['count'],
+                                         last=last,
+                                         interval=interval)))
+
+def print_timeline(phases, critical_path):
+    """
+        Prints nicely the durations of the phases of the timeline by domain
+        and its critical path.
+    """
+
+    print("phases:")
+    for domain, domain_phases in sorted(phases.items(),
+                                        key=lambda item: item[0] or ''):
+        print(("  - {domain}".format(domain=domain or 'testbed')))
+        for phase, infos in sorted(domain_phases.items()):
+            print(("    - {phase:10s} {count:6d} {duration:10.3f}s" \
+                      .format(phase=phase,
+                              count=infos['count'],
+                              duration=infos['duration'])))
+
+    if not critical_path:
+        return
+    first = critical_path[0][0]
+    last = critical_path[-1][0]
+    total = (last['start'] + last['duration'] - first['start']) / 1e9
+    print(("critical path: {total:.3f}s".format(total=total)))
+    for span, idle in critical_path:
+        print(("  - {offset:10.3f}s {duration:10.3f}s idle {idle:8.3f}s " \
+               "{domain:20s} {phase:10s} {name}" \
+                  .format(offset=(span['start'] - first['start']) / 1e9,
+                          duration=span['duration'] / 1e9,
+                          idle=idle,
+                          domain=span['domain'] or 'testbed',
+                          phase=span['phase'],
+                          name=span['name'])))
+
+def validate_configuration():
+
+    """ Validates the configuration without connecting to the hypervisor and
+        prints all the errors found, returns True if it is valid """
+
+    configuration_filename = os.path.join(os.getcwd(), "cloubed.yaml")
+    try:
+        configuration = ConfigurationCache().load(configuration_filename)
+    except CloubedConfigurationException as cdb_error:
+        for error in cdb_error.errors:
+            print("error: {error}".format(error=error))
+        return False
+
+    print("configuration of testbed {testbed} is valid: {storage_pools} " \
+          "storage pool(s), {storage_volumes} storage volume(s), " \
+          "{networks} network(s), {domains} domain(s)" \
+              .format(testbed=configuration.testbed,
+                      storage_pools=len(configuration.storage_pools),
+                      storage_volumes=len(configuration.storage_volumes),
+                      networks=len(configuration.networks),
+                      domains=len(configuration.domains)))
+    return True
+
 def print_template_vars(domain_vars):
     """Prints the dict of variables that could be used in the templates for a
        domain.
@@ -146,6 +283,11 @@ def main():
         parser.check_required()
         parser.check_optionals()
 
+        # the configuration is validated without the hypervisor
+        if args.actions[0] == "validate":
+            logging.debug("Action validate")
+            sys.exit(0 if validate_configuration() else 1)
+
         try:
             cloubed = Cloubed()
         except CloubedException as cdb_error:
@@ -276,6 +418,125 @@ def main():
             xml = cloubed.xml(resource_type, resource_name)
             print((xml.toprettyxml(indent="  ")))
 
+        elif action_name == "import":
+
+            volumes = parser.parse_volumes()
+            jobs = parser.parse_jobs()
+
+            logging.debug("Action import of {volumes}" \
+                              .format(volumes=list(volumes.keys())))
+
+            cloubed.import_volumes(volumes, jobs)
+
+        elif action_name == "export":
+
+            volumes = parser.parse_volumes()
+            jobs = parser.parse_jobs()
+
+            logging.debug("Action export of {volumes}" \
+                              .format(volumes=list(volumes.keys())))
+
+            cloubed.export_volumes(volumes, jobs)
+
+        elif action_name == "baseline":
+
+            domain_name = args.domain[0]
+
+            logging.debug("Action baseline on {domain}" \
+                              .format(domain=domain_name))
+
+            cloubed.baseline(domain_name)
+
+        elif action_name == "snapshot":
+
+            domain_name = args.domain[0]
+            operation, snapshot_name, memory = parser.parse_snapshot()
+
+            logging.debug("Action snapshot {operation} on {domain}" \
+                              .format(operation=operation,
+                                      domain=domain_name))
+
+            if operation == 'create':
+                cloubed.create_snapshot(domain_name, snapshot_name, memory)
+            elif operation == 'list':
+                print_snapshots(domain_name,
+                                cloubed.get_snapshots(domain_name))
+            elif operation == 'revert':
+                cloubed.revert_snapshot(domain_name, snapshot_name)
+            else:
+                cloubed.delete_snapshot(domain_name, snapshot_name)
+
+        elif action_name == "checkpoint":
+
+            checkpoint_name = args.name[0]
+            jobs = parser.parse_jobs()
+
+            logging.debug("Action checkpoint {name}" \
+                              .format(name=checkpoint_name))
+
+            cloubed.checkpoint(checkpoint_name, jobs)
+
+        elif action_name == "restore":
+
+            checkpoint_name = args.name[0]
+            jobs = parser.parse_jobs()
+
+            logging.debug("Action restore {name}" \
+                              .format(name=checkpoint_name))
+
+            cloubed.restore(checkpoint_name, jobs)
+
+        elif action_name == "cache":
+
+            path, label = parser.parse_cache()
+
+            if path is not None:
+                logging.debug("Action cache of {path}".format(path=path))
+                digest = cloubed.cache_image(path, label)
+                print(digest)
+            else:
+                logging.debug("Action cache")
+                print_image_cache_infos(cloubed.get_image_cache_infos())
+
+        elif action_name == "events":
+
+            domain_name = args.domain[0] if args.domain else None
+            event_type, event_detail = parser.parse_events_filter()
+            tail = parser.parse_tail()
+
+            logging.debug("Action events")
+
+            if args.summary:
+                records = cloubed.get_events(domain_name, event_type,
+                                             event_detail)
+                print_events_summary(EventJournal.summarize(records))
+            else:
+                for record in cloubed.get_events(domain_name, event_type,
+                                                 event_detail, tail):
+                    print_event_record(record)
+                if args.follow:
+                    for record in cloubed.follow_events(domain_name,
+                                                        event_type,
+                                                        event_detail):
+                        print_event_record(record)
+                        sys.stdout.flush()
+
+        elif action_name == "timeline":
+
+            domain_name = args.domain[0] if args.domain else None
+
+            logging.debug("Action timeline")
+
+            if args.clear:
+                cloubed.clear_timeline()
+            else:
+                spans = cloubed.get_timeline_spans(domain_name)
+                if args.chrome:
+                    with open(args.chrome[0], 'w') as trace:
+                        json.dump(Timeline.chrome_trace(spans), trace)
+                print_timeline(Timeline.phases(spans),
+                               Timeline.critical_path(spans))
+
         else:
             raise CloubedArgumentException(
                       "Unknown action '{action}'".format(action=action_name))
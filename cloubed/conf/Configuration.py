@@ -24,6 +24,9 @@
 import logging
 from cloubed.CloubedException import CloubedConfigurationException
 from cloubed.conf.ConfigurationStoragePool import ConfigurationStoragePool
+from cloubed.conf.ConfigurationImageCache import ConfigurationImageCache
+from cloubed.conf.ConfigurationHTTPServer import ConfigurationHTTPServer
+from cloubed.conf.ConfigurationQos import ConfigurationQos
 from cloubed.conf.ConfigurationStorageVolume import ConfigurationStorageVolume
 from cloubed.conf.ConfigurationNetwork import ConfigurationNetwork
 from cloubed.conf.ConfigurationDomain import ConfigurationDomain
@@ -40,11 +43,41 @@ class Configuration:
         self.testbed = None
         self.__parse_testbed(conf)
 
+        # the image cache must be parsed before the storage volumes since
+        # their backing can refer to its entries
+        self.image_cache = None
+        self.__parse_image_cache(conf)
+
+        # the http server must be parsed before the networks since their
+        # template variables depend on it
+        self.http_server = None
+        self.__parse_http_server(conf)
+
+        # the errors of the qos classes, of all the items and of the
+        # references between them are reported at once
+        errors = []
+
+        # the qos classes must be parsed before the networks and the domains
+        # since they can refer to them
+        self.qos = []
+        self._qos_by_name = {}
+        errors.extend(self.__parse_qos(conf))
+
         self.storage_pools   = []
         self.storage_volumes = []
         self.networks        = []
         self.domains         = []
-        self.__parse_items(conf)
+        # names of the items which are not valid, the references to these
+        # items are not reported as errors again
+        self.__invalid_names = set()
+
+        try:
+            self.__parse_items(conf)
+        except CloubedConfigurationException as error:
+            errors.extend(error.errors)
+        errors.extend(self.__check_references())
+        if errors:
+            raise CloubedConfigurationException.from_errors(errors)
 
         self.templates = {} # empty dict
         self.__parse_templates(conf)
@@ -65,13 +98,92 @@ class Configuration:
 
         self.testbed = conf['testbed']
 
+    def __parse_image_cache(self, conf):
+        """
+            Parses the optional imagecache section over the conf dictionary
+            given in parameter and raises appropriate exception if a problem is
+            found
+        """
+
+        if 'imagecache' not in conf:
+            return
+
+        image_cache = conf['imagecache']
+
+        if type(image_cache) is not dict:
+            raise CloubedConfigurationException(
+                      "format of the imagecache section is not valid")
+
+        self.image_cache = ConfigurationImageCache(self, dict(image_cache))
+
+    def __parse_http_server(self, conf):
+        """
+            Parses the optional httpserver section over the conf dictionary
+            given in parameter and raises appropriate exception if a problem is
+            found
+        """
+
+        if 'httpserver' not in conf:
+            return
+
+        http_server = conf['httpserver']
+
+        if type(http_server) is not dict:
+            raise CloubedConfigurationException(
+                      "format of the httpserver section is not valid")
+
+        self.http_server = ConfigurationHTTPServer(self, dict(http_server))
+
+    def __parse_qos(self, conf):
+        """
+            Parses the optional qos section with the list of QoS classes over
+            the conf dictionary given in parameter and returns the list of
+            errors found
+        """
+
+        errors = []
+
+        if 'qos' not in conf:
+            return errors
+
+        qos_items = conf['qos']
+
+        if type(qos_items) is not list:
+            errors.append("format of qos parameter is not valid")
+            return errors
+
+        for qos_item in qos_items:
+            if type(qos_item) is not dict:
+                errors.append("format of one qos object is not valid")
+                continue
+            qos_item['testbed'] = self.testbed
+            try:
+                qos = ConfigurationQos(self, qos_item)
+            except CloubedConfigurationException as error:
+                errors.extend(error.errors)
+                continue
+            self.qos.append(qos)
+            self._qos_by_name[qos.name] = qos
+
+        return errors
+
+    def get_qos(self, name):
+        """
+            Returns the ConfigurationQos with the name given in parameter or
+            None if not found
+        """
+
+        return self._qos_by_name.get(name)
+
     def __parse_items(self, conf):
         """
             Parses all items (storage pools, storage volumes, networks and
             domains) over the conf dictionary given in parameter and raises
-            appropriate exception if a problem is found
+            appropriate exception with all the problems found
         """
 
+        errors = []
+
         # This dict basically contains all infos to parse items in YAML and
         # build according data structures. The format of this dict is:
         # <name of section for the items in YAML> : {
@@ -113,19 +225,150 @@ class Configuration:
                     if default_item is not None:
                         item_list.append(item_class(self, default_item))
                 else:
-                    raise CloubedConfigurationException(
-                          "{item_section} parameter is missing" \
-                              .format(item_section=item_section))
+                    errors.append("{item_section} parameter is missing" \
+                                      .format(item_section=item_section))
             else:
                 items = conf[item_section]
                 if type(items) is not list:
-                    raise CloubedConfigurationException(
+                    errors.append(
                           "format of {item_section} parameter is not valid" \
                              .format(item_section=item_section))
+                    continue
 
                 for item in items:
+                    if type(item) is not dict:
+                        errors.append("format of one item of {item_section} " \
+                                      "parameter is not valid" \
+                                          .format(item_section=item_section))
+                        continue
                     item['testbed'] = self.testbed
-                    item_list.append(item_class(self, item))
+                    try:
+                        # the replicated items are validated once
+                        replicas = list(item_class(self, item).replicas())
+                        item_list.extend(replicas)
+                        for replica in replicas:
+                            self.storage_volumes.extend(
+                                replica.get_storage_volumes())
+                    except CloubedConfigurationException as error:
+                        errors.extend(error.errors)
+                        self.__invalid_names.update(
+                            self.__item_names(item))
+
+        if errors:
+            raise CloubedConfigurationException.from_errors(errors)
+
+    @staticmethod
+    def __item_names(item):
+        """
+            Returns the set of names of the items described by the item
+            dictionary given in parameter, even if it is not valid: its name
+            and the names of the storage volumes of its disks section, along
+            with the names of all their replicas if it has a count parameter.
+        """
+
+        patterns = [ item.get('name') ]
+        disks = item.get('disks')
+        if type(disks) is list:
+            patterns.extend([ disk.get('name') for disk in disks \
+                              if type(disk) is dict ])
+        patterns = [ pattern for pattern in patterns \
+                     if type(pattern) is str ]
+
+        indexes = []
+        count = item.get('count')
+        start = item.get('start', 1)
+        if type(count) is int and type(start) is int:
+            indexes = range(start, start + count)
+
+        names = set(patterns)
+        for pattern in patterns:
+            for index in indexes:
+                try:
+                    names.add(pattern.format(index=index))
+                except (KeyError, IndexError, ValueError):
+                    break # pattern not valid, it is reported as is
+        return names
+
+    def __check_references(self):
+        """
+            Indexes all items by name and returns the list of errors found in
+            the references between them: names defined more than once and
+            references to items which are not defined, and the parameters
+            which are not consistent with the items they reference.
+        """
+
+        errors = []
+
+        indexes = {}
+        for (type_name, item_list) in [ ('storage pool', self.storage_pools),
+                                        ('storage volume',
+                                         self.storage_volumes),
+                                        ('network', self.networks),
+                                        ('domain', self.domains) ]:
+            index = {}
+            for item in item_list:
+                if item.name in index:
+                    errors.append("{type_name} {name} is defined more than " \
+                                  "once".format(type_name=type_name,
+                                                name=item.name))
+                index[item.name] = item
+            indexes[type_name] = index
+
+        def defined(type_name, name):
+            return name in indexes[type_name] or name in self.__invalid_names
+
+        for storage_volume in self.storage_volumes:
+            if not defined('storage pool', storage_volume.storage_pool):
+                errors.append("storage pool {storage_pool} of storage " \
+                              "volume {name} is not defined" \
+                                  .format(
+                                      storage_pool=storage_volume.storage_pool,
+                                      name=storage_volume.name))
+            if storage_volume.backing is not None and \
+               not storage_volume.backing_cache and \
+               not defined('storage volume', storage_volume.backing):
+                errors.append("backing volume {backing} of storage volume " \
+                              "{name} is not defined" \
+                                  .format(backing=storage_volume.backing,
+                                          name=storage_volume.name))
+
+        for domain in self.domains:
+            for netif_id, netif in enumerate(domain.netifs):
+                if not defined('network', netif['network']):
+                    errors.append("network {network} of netif {netif_id} " \
+                                  "of domain {domain} is not defined" \
+                                      .format(network=netif['network'],
+                                              netif_id=netif_id,
+                                              domain=domain.name))
+                network = indexes['network'].get(netif['network'])
+                if network is not None and network.mtu is not None and \
+                   netif.get('mtu', network.mtu) > network.mtu:
+                    errors.append("mtu {mtu} of netif {netif_id} of domain " \
+                                  "{domain} exceeds mtu {network_mtu} of " \
+                                  "network {network}" \
+                                      .format(mtu=netif['mtu'],
+                                              netif_id=netif_id,
+                                              domain=domain.name,
+                                              network_mtu=network.mtu,
+                                              network=network.name))
+            for disk in domain.disks:
+                if not defined('storage volume', disk['storage_volume']):
+                    errors.append("storage volume {storage_volume} of disk " \
+                                  "{device} of domain {domain} is not " \
+                                  "defined".format(
+                                      storage_volume=disk['storage_volume'],
+                                      device=disk['device'],
+                                      domain=domain.name))
+
+        # the networks of the http server can be checked once all networks
+        # are parsed
+        if self.http_server is not None:
+            try:
+                self.http_server.check_networks(indexes['network'])
+            except CloubedConfigurationException as error:
+                errors.extend(error.errors)
+
+        return errors
 
     def __parse_templates(self, conf):
         """
@@ -0,0 +1,260 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" ConfigurationCache class """
+
+import os
+import json
+import hashlib
+import logging
+import importlib.metadata
+
+import yaml
+
+from cloubed.conf.ConfigurationLoader import ConfigurationLoader
+from cloubed.conf.Configuration import Configuration
+from cloubed.conf.ConfigurationStoragePool import ConfigurationStoragePool
+from cloubed.conf.ConfigurationStorageVolume import ConfigurationStorageVolume
+from cloubed.conf.ConfigurationNetwork import ConfigurationNetwork
+from cloubed.conf.ConfigurationDomain import ConfigurationDomain
+from cloubed.conf.ConfigurationQos import ConfigurationQos
+from cloubed.conf.ConfigurationHTTPServer import ConfigurationHTTPServer
+from cloubed.conf.ConfigurationImageCache import ConfigurationImageCache
+from cloubed.CloubedException import CloubedConfigurationException
+from cloubed.Utils import state_path, write_state
+
+class ConfigurationCache:
+
+    """ConfigurationCache class
+
+       It keeps the last validated Configuration in the state directory, so
+       that the YAML file is neither parsed nor validated again while it is
+       not modified. The Configuration is serialized as plain JSON data: the
+       objects are recorded with the name of their class and their
+       attributes. Only the objects of the classes of the configuration are
+       rebuilt out of the cache, without running any of their code, so a
+       tampered cache file cannot run any code. The entry is keyed by the hash
+       of the content of the YAML file, the version of cloubed and of PyYAML,
+       and the current directory since the relative paths of the
+       configuration are resolved against it.
+    """
+
+    # classes of the objects which can be rebuilt out of the cache, indexed
+    # by their names
+    classes = { cls.__name__: cls for cls in [ Configuration,
+                                               ConfigurationStoragePool,
+                                               ConfigurationStorageVolume,
+                                               ConfigurationNetwork,
+                                               ConfigurationDomain,
+                                               ConfigurationQos,
+                                               ConfigurationHTTPServer,
+                                               ConfigurationImageCache ] }
+
+    def __init__(self, path=None):
+
+        if path is None:
+            path = state_path('configuration.cache')
+        self.path = path
+
+    @staticmethod
+    def version():
+
+        """Returns the version of cloubed and the signature of the modules of
+           the configuration, so that the cached configurations are rebuilt
+           when cloubed is upgraded or modified.
+        """
+
+        try:
+            package_version = importlib.metadata.version('cloubed')
+        except importlib.metadata.PackageNotFoundError:
+            # running from the sources
+            package_version = None
+
+        directory = os.path.dirname(os.path.abspath(__file__))
+        modules = []
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.py'):
+                stat = os.stat(os.path.join(directory, filename))
+                modules.append((filename, stat.st_size, stat.st_mtime_ns))
+
+        return repr((package_version, yaml.__version__, modules))
+
+    @staticmethod
+    def key(content):
+
+        """Returns the key of the entry of the content of the YAML file."""
+
+        digest = hashlib.sha256(content)
+        digest.update(ConfigurationCache.version().encode('utf-8'))
+        digest.update(os.getcwd().encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def __encode(configuration):
+
+        """Returns the Configuration in parameter as JSON data: a dict with
+           the list of the objects, each with its class and its attributes,
+           and the reference to the Configuration in this list. The objects
+           shared in the Configuration are recorded once. Raises TypeError if
+           the Configuration contains values which cannot be cached.
+        """
+
+        objects = []
+        refs = {} # indexes in objects indexed by the ids of the objects
+
+        def encode(value):
+            if value is None or type(value) in (bool, int, float, str):
+                return value
+            if type(value) is list:
+                return [ encode(item) for item in value ]
+            if type(value) in (tuple, set):
+                return { type(value).__name__: \
+                             [ encode(item) for item in value ] }
+            if type(value) is dict:
+                return { 'dict': [ [ encode(key), encode(item) ] \
+                                   for key, item in value.items() ] }
+            class_name = type(value).__name__
+            if ConfigurationCache.classes.get(class_name) is not type(value):
+                raise TypeError("value of type {type} cannot be cached" \
+                                    .format(type=class_name))
+            if id(value) not in refs:
+                refs[id(value)] = len(objects)
+                entry = { 'class': class_name }
+                objects.append(entry)
+                state = dict(vars(value))
+                if type(value) is Configuration:
+                    # the content of the YAML file is not needed once parsed
+                    state['_loader'] = None
+                entry['state'] = { attr: encode(item) \
+                                   for attr, item in state.items() }
+            return { 'ref': refs[id(value)] }
+
+        root = encode(configuration)
+        return { 'root': root, 'objects': objects }
+
+    @staticmethod
+    def __decode(data):
+
+        """Returns the Configuration rebuilt out of the JSON data in
+           parameter, as returned by __encode(). Raises ValueError,
+           TypeError, KeyError or IndexError if the data is not valid.
+        """
+
+        entries = data['objects']
+        objects = []
+        for entry in entries:
+            cls = ConfigurationCache.classes.get(entry['class'])
+            if cls is None:
+                raise ValueError("class {name} cannot be rebuilt" \
+                                     .format(name=entry['class']))
+            # the objects are rebuilt without running their code
+            objects.append(cls.__new__(cls))
+
+        def decode(value):
+            if type(value) is list:
+                return [ decode(item) for item in value ]
+            if type(value) is not dict:
+                return value
+            ((kind, items),) = value.items()
+            if kind == 'ref':
+                if type(items) is not int:
+                    raise ValueError("reference {ref} is not valid" \
+                                         .format(ref=items))
+                return objects[items]
+            if kind == 'tuple':
+                return tuple(decode(item) for item in items)
+            if kind == 'set':
+                return set(decode(item) for item in items)
+            if kind == 'dict':
+                return { decode(key): decode(item) for key, item in items }
+            raise ValueError("kind {kind} of value is not valid" \
+                                 .format(kind=kind))
+
+        for obj, entry in zip(objects, entries):
+            vars(obj).update({ attr: decode(item) \
+                               for attr, item in entry['state'].items() })
+
+        configuration = decode(data['root'])
+        if type(configuration) is not Configuration:
+            raise ValueError("root of cache is not a configuration")
+        return configuration
+
+    def __get(self, key):
+
+        """Returns the cached Configuration of the key or None if not
+           found.
+        """
+
+        try:
+            with open(self.path) as cache_file:
+                entry = json.load(cache_file)
+            if type(entry) is not dict or entry.get('key') != key:
+                return None
+            return ConfigurationCache.__decode(entry['configuration'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError, KeyError, IndexError,
+                AttributeError) as err:
+            logging.debug("unable to load configuration cache: {err}" \
+                              .format(err=err))
+            return None
+
+    def __put(self, key, configuration):
+
+        """Writes the entry of the Configuration atomically, the errors are
+           ignored since the cache is only an optimization.
+        """
+
+        try:
+            data = ConfigurationCache.__encode(configuration)
+            write_state(self.path, { 'key': key, 'configuration': data })
+        except (OSError, TypeError, ValueError) as err:
+            logging.debug("unable to write configuration cache: {err}" \
+                              .format(err=err))
+
+    def load(self, file_path):
+
+        """Returns the Configuration of the YAML file, without parsing nor
+           validating it if it has not been modified since it was cached.
+
+           :param string file_path: the path of the YAML file
+           :exceptions CloubedConfigurationException:
+               * the file could not be opened
+               * the configuration is not valid
+        """
+
+        try:
+            with open(file_path, 'rb') as yaml_file:
+                raw_content = yaml_file.read()
+        except IOError:
+            raise CloubedConfigurationException(
+                      "Not able to open file {file_path}" \
+                          .format(file_path = file_path))
+
+        key = ConfigurationCache.key(raw_content)
+        configuration = self.__get(key)
+        if configuration is not None:
+            logging.debug("configuration loaded from cache")
+            return configuration
+
+        configuration = Configuration(ConfigurationLoader(file_path))
+        self.__put(key, configuration)
+        return configuration
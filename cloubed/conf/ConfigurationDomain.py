@@ -23,6 +23,7 @@
 
 import re
 import os
+import ipaddress
 from cloubed.conf.ConfigurationItem import ConfigurationItem
 from cloubed.conf.ConfigurationStorageVolume import ConfigurationStorageVolume
 from cloubed.VirtController import VirtController
@@ -36,6 +37,8 @@ class ConfigurationDomain(ConfigurationItem):
 
         super(ConfigurationDomain, self).__init__(conf, domain_item)
 
+        self._parse_count(domain_item)
+
         self.sockets = None
         self.cores = None
         self.threads = None
@@ -50,6 +53,8 @@ class ConfigurationDomain(ConfigurationItem):
         self.__parse_netifs(domain_item)
 
         self.disks = []
+        # storage volumes defined in the disks section
+        self._storage_volumes = []
         self.__parse_disks(domain_item)
 
         self.cdrom = None
@@ -62,6 +67,9 @@ class ConfigurationDomain(ConfigurationItem):
         self.template_vars = {}
         self.__parse_templates(domain_item)
 
+        if self.count is not None:
+            self.__check_patterns()
+
     def __parse_cpu(self, conf):
         """
             Parses the cpu parameter over the conf dictionary given in parameter
@@ -256,6 +264,41 @@ class ConfigurationDomain(ConfigurationItem):
                                   .format(netif_id=netif_id,
                                           domain=self.name))
 
+            if "mtu" in netif:
+
+                if type(netif["mtu"]) is not int:
+                    raise CloubedConfigurationException(
+                              "format of mtu of netif {netif_id} of domain "\
+                              "{domain} is not valid" \
+                                  .format(netif_id=netif_id,
+                                          domain=self.name))
+
+                if netif["mtu"] < 68 or netif["mtu"] > 65535:
+                    raise CloubedConfigurationException(
+                              "mtu of netif {netif_id} of domain {domain} " \
+                              "must be between 68 and 65535" \
+                                  .format(netif_id=netif_id,
+                                          domain=self.name))
+
+            if "qos" in netif:
+
+                if type(netif["qos"]) is not str:
+                    raise CloubedConfigurationException(
+                              "format of qos of netif {netif_id} of domain "\
+                              "{domain} is not valid" \
+                                  .format(netif_id=netif_id,
+                                          domain=self.name))
+
+                qos = self.conf.get_qos(netif["qos"])
+                if qos is None:
+                    raise CloubedConfigurationException(
+                              "qos {qos} of netif {netif_id} of domain " \
+                              "{domain} is not defined" \
+                                  .format(qos=netif["qos"],
+                                          netif_id=netif_id,
+                                          domain=self.name))
+                netif = dict(netif, qos=qos)
+
             self.netifs.append(netif)
 
             netif_id += 1
@@ -357,7 +400,7 @@ class ConfigurationDomain(ConfigurationItem):
                         del sp_item[key]
 
                 sp = ConfigurationStorageVolume(self.conf, sp_item)
-                self.conf.storage_volumes.append(sp)
+                self._storage_volumes.append(sp)
 
                 disk['storage_volume'] = sp.name
 
@@ -482,7 +525,7 @@ class ConfigurationDomain(ConfigurationItem):
         if 'files' in conf:
             tpl_files = conf['files']
             # files section must be a list a dict with keys name, input and
-            # output
+            # optional output
             if type(tpl_files) is not list:
                 raise CloubedConfigurationException(
                     "format of the files sub-section in the templates " \
@@ -491,7 +534,7 @@ class ConfigurationDomain(ConfigurationItem):
 
             for tpl_file in tpl_files:
 
-                required_parameters = ['name', 'input', 'output']
+                required_parameters = ['name', 'input']
                 for parameter in required_parameters:
                     if parameter not in tpl_file:
                         raise CloubedConfigurationException(
@@ -499,7 +542,11 @@ class ConfigurationDomain(ConfigurationItem):
                             "domain {domain} is missing" \
                                 .format(parameter = parameter,
                                         domain = self.name))
-                    if type(tpl_file[parameter]) is not str:
+                # the output file is optional since templates can be served
+                # by the HTTP server without being written
+                for parameter in required_parameters + ['output']:
+                    if parameter in tpl_file and \
+                       type(tpl_file[parameter]) is not str:
                         raise CloubedConfigurationException(
                             "format of {parameter} parameter of a template " \
                             "file of domain {domain} is not valid" \
@@ -536,6 +583,119 @@ class ConfigurationDomain(ConfigurationItem):
         else:
             self.template_vars = {}
 
+    @staticmethod
+    def __offset_ip(ip, offset):
+        """Returns the IP address at offset from the IP address in parameter.
+        """
+
+        return str(ipaddress.IPv4Address(ip) + offset)
+
+    @staticmethod
+    def __offset_mac(mac, offset):
+        """Returns the MAC address at offset from the MAC address in
+           parameter.
+        """
+
+        value = int(mac.replace(':', ''), 16) + offset
+        if value >= 2**48:
+            raise ValueError("MAC address out of range")
+        digits = "{value:012x}".format(value=value)
+        return ':'.join(digits[i:i+2] for i in range(0, 12, 2))
+
+    def __check_patterns(self):
+        """
+            Checks the parameters of the replicas of the domain can be
+            computed out of the patterns and the base addresses of the domain
+            and raises appropriate exception if a problem is found. The IP
+            and MAC addresses of the network interfaces are incremented with
+            the index of the replicas.
+        """
+
+        last_offset = self.count - 1
+
+        for netif_id, netif in enumerate(self.netifs):
+            for parameter, offset_address in [ ('ip', self.__offset_ip),
+                                               ('mac', self.__offset_mac) ]:
+                if netif.get(parameter, 'auto') == 'auto':
+                    continue
+                try:
+                    offset_address(netif[parameter], last_offset)
+                except ValueError:
+                    raise CloubedConfigurationException(
+                              "{parameter} of netif {netif_id} of domain " \
+                              "{domain} is not valid with count parameter" \
+                                  .format(parameter=parameter,
+                                          netif_id=netif_id,
+                                          domain=self.name))
+
+        for disk in self.disks:
+            self._format(disk['storage_volume'])
+
+        # the storage volumes defined in the disks section cannot be shared
+        for storage_volume in self._storage_volumes:
+            if self.count > 1 and \
+               self._format(storage_volume.name) == \
+               self._format(storage_volume.name, self.start + 1):
+                raise CloubedConfigurationException(
+                          "name of disk {disk} of domain {domain} must " \
+                          "contain the {{index}} pattern with count " \
+                          "parameter".format(disk=storage_volume.name,
+                                             domain=self.name))
+
+        for tpl_file in self.template_files:
+            if 'output' in tpl_file:
+                self._format(tpl_file['output'])
+
+    def replicate(self, index):
+        """
+            Returns the replica of the domain with the index given in
+            parameter, along with the replicas of the storage volumes of its
+            disks section.
+        """
+
+        replica = super(ConfigurationDomain, self).replicate(index)
+        offset = index - self.start
+
+        replica.netifs = []
+        for netif in self.netifs:
+            netif = dict(netif)
+            if netif.get('ip', 'auto') != 'auto':
+                netif['ip'] = self.__offset_ip(netif['ip'], offset)
+            if 'mac' in netif:
+                netif['mac'] = self.__offset_mac(netif['mac'], offset)
+            replica.netifs.append(netif)
+
+        replica.disks = []
+        for disk in self.disks:
+            disk = dict(disk)
+            for parameter in ['storage_volume', 'name']:
+                if parameter in disk:
+                    disk[parameter] = disk[parameter].format(index=index)
+            replica.disks.append(disk)
+
+        replica._storage_volumes = []
+        for storage_volume in self._storage_volumes:
+            storage_volume = storage_volume.replicate(index)
+            replica._storage_volumes.append(storage_volume)
+
+        replica.template_files = []
+        for tpl_file in self.template_files:
+            tpl_file = dict(tpl_file)
+            if 'output' in tpl_file:
+                tpl_file['output'] = tpl_file['output'].format(index=index)
+            replica.template_files.append(tpl_file)
+        replica.template_vars = dict(self.template_vars)
+
+        return replica
+
+    def get_storage_volumes(self):
+        """
+            Returns the list of storage volumes defined in the disks section
+            of the domain.
+        """
+
+        return self._storage_volumes
+
     def _get_type(self):
 
         """ Returns the type of the item """
@@ -0,0 +1,247 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" ConfigurationHTTPServer class """
+
+import os
+
+from cloubed.conf.ConfigurationItem import ConfigurationItem
+from cloubed.CloubedException import CloubedConfigurationException
+from cloubed.Utils import state_path
+
+class ConfigurationHTTPServer(ConfigurationItem):
+
+    """ Configuration of the internal HTTP server class """
+
+    def __init__(self, conf, http_server_item):
+
+        # the name of the server is not a user input, it is always the same
+        http_server_item['name'] = 'httpserver'
+
+        super(ConfigurationHTTPServer, self).__init__(conf, http_server_item)
+
+        # caching proxy
+        self.proxy_path = None
+        self.proxy_size = None
+        self.__parse_proxy(http_server_item)
+
+        # uploads
+        self.uploads_path = None
+        self.__parse_uploads(http_server_item)
+
+        # networks where the server listens, all networks with a host IP
+        # address by default, and their document roots
+        self.networks = None
+        self.roots = {}
+        self.__parse_networks(http_server_item)
+        self.__parse_roots(http_server_item)
+
+    def __parse_proxy(self, conf):
+        """
+            Parses the proxy parameter over the conf dictionary given in
+            parameter and raises appropriate exception if a problem is found.
+            The proxy is enabled with either true or a dict with the optional
+            path of the cache directory and its size in gigabytes.
+        """
+
+        if 'proxy' not in conf or conf['proxy'] is False:
+            self.proxy_path = None
+            self.proxy_size = None
+            return
+
+        proxy = conf['proxy']
+
+        if proxy is True:
+            proxy = {}
+
+        if type(proxy) is not dict:
+            raise CloubedConfigurationException(
+                     "format of the proxy parameter of the http server is " \
+                     "not valid")
+
+        for parameter in proxy:
+            if parameter not in ['path', 'size']:
+                raise CloubedConfigurationException(
+                         "unknown parameter {parameter} in proxy section of " \
+                         "the http server".format(parameter=parameter))
+
+        path = proxy.get('path', state_path('proxy'))
+        if type(path) is not str:
+            raise CloubedConfigurationException(
+                     "format of the path parameter of the proxy of the http " \
+                     "server is not valid")
+        if path[0] != '/': # relative path
+            path = os.path.join(os.getcwd(), path)
+
+        size = proxy.get('size', 10)
+        if type(size) is not int or size <= 0:
+            raise CloubedConfigurationException(
+                     "format of the size parameter of the proxy of the http " \
+                     "server is not valid")
+
+        self.proxy_path = path
+        self.proxy_size = size
+
+    def __parse_uploads(self, conf):
+        """
+            Parses the uploads parameter over the conf dictionary given in
+            parameter and raises appropriate exception if a problem is found.
+            The uploads are enabled with either true or a dict with the
+            optional path of the directory of the uploaded files.
+        """
+
+        if 'uploads' not in conf or conf['uploads'] is False:
+            self.uploads_path = None
+            return
+
+        uploads = conf['uploads']
+
+        if uploads is True:
+            uploads = {}
+
+        if type(uploads) is not dict:
+            raise CloubedConfigurationException(
+                     "format of the uploads parameter of the http server is " \
+                     "not valid")
+
+        for parameter in uploads:
+            if parameter not in ['path']:
+                raise CloubedConfigurationException(
+                         "unknown parameter {parameter} in uploads section " \
+                         "of the http server".format(parameter=parameter))
+
+        path = uploads.get('path', 'uploads')
+        if type(path) is not str:
+            raise CloubedConfigurationException(
+                     "format of the path parameter of the uploads of the " \
+                     "http server is not valid")
+        if path[0] != '/': # relative path
+            path = os.path.join(os.getcwd(), path)
+
+        self.uploads_path = path
+
+    def __parse_networks(self, conf):
+        """
+            Parses the networks parameter over the conf dictionary given in
+            parameter and raises appropriate exception if a problem is found.
+            It is the list of the names of the networks where the HTTP server
+            listens on the host IP address.
+        """
+
+        if 'networks' not in conf:
+            self.networks = None
+            return
+
+        networks = conf['networks']
+
+        if type(networks) is not list or \
+           not all(type(network) is str for network in networks):
+            raise CloubedConfigurationException(
+                     "format of the networks parameter of the http server " \
+                     "is not valid")
+
+        self.networks = networks
+
+    def __parse_roots(self, conf):
+        """
+            Parses the roots parameter over the conf dictionary given in
+            parameter and raises appropriate exception if a problem is found.
+            It is a dict of the directories served to the domains indexed by
+            network names. The other networks are served the current
+            directory.
+        """
+
+        if 'roots' not in conf:
+            self.roots = {}
+            return
+
+        roots = conf['roots']
+
+        if type(roots) is not dict:
+            raise CloubedConfigurationException(
+                     "format of the roots parameter of the http server is " \
+                     "not valid")
+
+        self.roots = {}
+        for network, path in roots.items():
+            if type(path) is not str:
+                raise CloubedConfigurationException(
+                         "format of the root of network {network} of the " \
+                         "http server is not valid".format(network=network))
+            if path[0] != '/': # relative path
+                path = os.path.join(os.getcwd(), path)
+            self.roots[network] = path
+
+    def check_networks(self, network_names):
+        """
+            Raises CloubedConfigurationException if the networks or the roots
+            parameters refer to networks not found in the collection of names
+            given in parameter, with all the networks not found.
+        """
+
+        referenced = list(self.networks or []) + list(self.roots)
+        errors = [ "network {network} of the http server is not defined" \
+                       .format(network=network) \
+                   for network in referenced if network not in network_names ]
+        if errors:
+            raise CloubedConfigurationException.from_errors(errors)
+
+    def listens(self, network_name):
+
+        """
+            Returns True if the HTTP server listens on the network whose name
+            is given in parameter, False otherwise.
+        """
+
+        return self.networks is None or network_name in self.networks
+
+    def get_root(self, network_name):
+
+        """
+            Returns the directory served to the domains of the network whose
+            name is given in parameter, the current directory by default.
+        """
+
+        return self.roots.get(network_name, os.getcwd())
+
+    def has_uploads(self):
+
+        """
+            Returns True if the uploads on the HTTP server are enabled, False
+            otherwise.
+        """
+
+        return self.uploads_path is not None
+
+    def has_proxy(self):
+
+        """
+            Returns True if the caching proxy of the HTTP server is enabled,
+            False otherwise.
+        """
+
+        return self.proxy_path is not None
+
+    def _get_type(self):
+
+        """ Returns the type of the item """
+
+        return "http server"
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" ConfigurationImageCache class """
+
+from cloubed.conf.ConfigurationStoragePool import ConfigurationStoragePool
+from cloubed.CloubedException import CloubedConfigurationException
+
+class ConfigurationImageCache(ConfigurationStoragePool):
+
+    """ Configuration of the host-wide Image Cache class """
+
+    def __init__(self, conf, image_cache_item):
+
+        # the name of the cache is not a user input, it is always the same
+        image_cache_item['name'] = 'imagecache'
+
+        super(ConfigurationImageCache, self).__init__(conf, image_cache_item)
+
+        self.size = None
+        self.__parse_size(image_cache_item)
+
+    @staticmethod
+    def default():
+        return None
+
+    def __parse_size(self, conf):
+        """
+            Parses the size parameter over the conf dictionary given in
+            parameter and raises appropriate exception if a problem is found.
+            The size is the budget of the cache in gigabytes, it defaults to
+            20GB.
+        """
+
+        if 'size' not in conf:
+            self.size = 20
+            return
+
+        size = conf['size']
+
+        if type(size) is not int or size <= 0:
+            raise CloubedConfigurationException(
+                     "format of the size parameter of the image cache is " \
+                     "not valid")
+
+        self.size = size
+
+    def _get_type(self):
+
+        """ Returns the type of the item """
+
+        return "image cache"
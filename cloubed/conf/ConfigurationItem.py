@@ -21,6 +21,8 @@
 
 """ ConfigurationItem class """
 
+import copy
+
 from cloubed.CloubedException import CloubedConfigurationException
 
 class ConfigurationItem(object):
@@ -39,6 +41,11 @@ class ConfigurationItem(object):
         self.testbed = conf.testbed
         self.conf = conf
 
+        # number of replicas of the item and index of the first one, the
+        # item is not replicated by default
+        self.count = None
+        self.start = 1
+
     def __parse_name(self, conf):
         """
             Parses the name parameter over the conf dictionary given in
@@ -57,6 +64,102 @@ class ConfigurationItem(object):
 
         self.name = conf['name']
 
+    def _parse_count(self, conf):
+        """
+            Parses the optional count and start parameters over the conf
+            dictionary given in parameter and raises appropriate exception if
+            a problem is found. With count, the item is the template of count
+            replicas whose name is a pattern formatted with their index, eg.
+            node{index:03d}, starting from start.
+        """
+
+        if 'count' not in conf:
+            if 'start' in conf:
+                raise CloubedConfigurationException(
+                    "start parameter of {type_name} {name} requires count " \
+                    "parameter".format(type_name = self._get_type(),
+                                       name = self.name))
+            return
+
+        count = conf['count']
+        if type(count) is not int or count < 1:
+            raise CloubedConfigurationException(
+                "format of count parameter of {type_name} {name} is not " \
+                "valid".format(type_name = self._get_type(),
+                               name = self.name))
+
+        start = conf.get('start', 1)
+        if type(start) is not int or start < 0:
+            raise CloubedConfigurationException(
+                "format of start parameter of {type_name} {name} is not " \
+                "valid".format(type_name = self._get_type(),
+                               name = self.name))
+
+        self.count = count
+        self.start = start
+
+        # the names of the replicas must differ
+        if count > 1 and \
+           self._format(self.name) == self._format(self.name, start + 1):
+            raise CloubedConfigurationException(
+                "name of {type_name} {name} must contain the {{index}} " \
+                "pattern with count parameter" \
+                    .format(type_name = self._get_type(),
+                            name = self.name))
+
+    def _format(self, pattern, index=None):
+        """
+            Returns the pattern given in parameter formatted with the index,
+            by default the index of the first replica, and raises appropriate
+            exception if the pattern is not valid.
+        """
+
+        if index is None:
+            index = self.start
+
+        try:
+            return pattern.format(index=index)
+        except (KeyError, IndexError, ValueError):
+            raise CloubedConfigurationException(
+                "pattern {pattern} of {type_name} {name} is not valid" \
+                    .format(pattern = pattern,
+                            type_name = self._get_type(),
+                            name = self.name))
+
+    def replicate(self, index):
+        """
+            Returns the replica of the item with the index given in parameter.
+            The item has been fully validated, the replica is a shallow copy
+            with its patterns formatted.
+        """
+
+        replica = copy.copy(self)
+        replica.name = self.name.format(index=index)
+        replica.count = None
+        return replica
+
+    def replicas(self):
+        """
+            Generator of the items described by this item: itself if it is
+            not replicated, its replicas otherwise.
+        """
+
+        if self.count is None:
+            yield self
+            return
+
+        for index in range(self.start, self.start + self.count):
+            yield self.replicate(index)
+
+    def get_storage_volumes(self):
+        """
+            Returns the list of storage volumes defined inside the item, they
+            are added to the configuration along with the item. The item
+            defines no storage volume by default.
+        """
+
+        return []
+
     def _get_type(self):
 
         """ Returns the type of the item """
@@ -24,6 +24,13 @@
 import yaml
 from cloubed.CloubedException import CloubedConfigurationException
 
+# the parser of libyaml is much faster than the pure Python one, when PyYAML
+# is built with it
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 class ConfigurationLoader:
 
     """ ConfigurationLoader class """
@@ -40,8 +47,8 @@ class ConfigurationLoader:
                           .format(file_path = self.file_path))
 
         try:
-            self.content = yaml.load(yaml_file, Loader=yaml.FullLoader)
-        except yaml.YAMLError as err:
+            self.content = yaml.load(yaml_file, Loader=SafeLoader)
+        except (yaml.YAMLError, UnicodeDecodeError) as err:
             raise CloubedConfigurationException(
                       "Error while loading {file_path} file (may" \
                       " not be valid YAML content): {error}" \
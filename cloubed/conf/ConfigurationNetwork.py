@@ -43,6 +43,11 @@ class ConfigurationNetwork(ConfigurationItem):
         self.bridge_name = None
         self.__parse_bridge_name(network_item)
 
+        # host interface and macvtap mode of direct networks
+        self.direct_interface = None
+        self.direct_mode = None
+        self.__parse_direct(network_item)
+
         # local settings
         self.ip_host = None
         self.netmask = None
@@ -62,6 +67,18 @@ class ConfigurationNetwork(ConfigurationItem):
         self.pxe_boot_file = None
         self.__parse_pxe(network_item)
 
+        # tftp server
+        self.tftp = None
+        self.__parse_tftp(network_item)
+
+        # mtu
+        self.mtu = None
+        self.__parse_mtu(network_item)
+
+        # qos
+        self.qos = None
+        self.__parse_qos(network_item)
+
     def __parse_forward_mode(self, conf):
         """
             Parses the forward parameter over the conf dictionary given in
@@ -74,7 +91,7 @@ class ConfigurationNetwork(ConfigurationItem):
 
             if type(forward) is str:
 
-                valid_forwards = ["bridge", "nat", "none"]
+                valid_forwards = ["bridge", "nat", "direct", "none"]
 
                 if forward in valid_forwards:
                     if forward == "none":
@@ -134,6 +151,52 @@ class ConfigurationNetwork(ConfigurationItem):
             # not bridge forward mode and bridge parameter not defined
             self.bridge_name = None
 
+    def __parse_direct(self, conf):
+        """
+            Parses the interface and mode parameters of direct networks over
+            the conf dictionary given in parameter and raises appropriate
+            exception if a problem is found. This method must be called *after*
+            __parse_forward_mode() since it relies on the attribute set by this
+            method.
+        """
+
+        # forward is not direct -> interface and mode parameters have no sense
+        if self.forward_mode != 'direct':
+            for parameter in ['interface', 'mode']:
+                if parameter in conf:
+                    raise CloubedConfigurationException(
+                        "{parameter} parameter has no sense on network " \
+                        "{network} with forwarding mode {forward}" \
+                            .format(parameter=parameter,
+                                    network=self.name,
+                                    forward=self.forward_mode))
+            self.direct_interface = None
+            self.direct_mode = None
+            return
+
+        # forward is direct -> interface parameter is mandatory
+        if 'interface' not in conf:
+            raise CloubedConfigurationException(
+                "interface parameter is missing on network {network} with " \
+                "direct forwarding mode".format(network=self.name))
+
+        if type(conf['interface']) is not str:
+            raise CloubedConfigurationException(
+                "interface parameter format of network {network} is not " \
+                "valid".format(network=self.name))
+
+        self.direct_interface = conf['interface']
+
+        mode = conf.get('mode', 'bridge')
+        valid_modes = ['bridge', 'vepa', 'passthrough']
+
+        if mode not in valid_modes:
+            raise CloubedConfigurationException(
+                "mode parameter of network {network} is not valid" \
+                    .format(network=self.name))
+
+        self.direct_mode = mode
+
     def __parse_ip_host_netmask(self, conf):
         """
             Parses the address or deprecated (ip_host and netmask) parameters
@@ -143,19 +206,21 @@ class ConfigurationNetwork(ConfigurationItem):
            method.
         """
 
-        # forward is bridge -> address has no sense
-        if self.forward_mode == 'bridge' and 'address' in conf :
+        # forward is bridge or direct -> address has no sense
+        if self.forward_mode in ['bridge', 'direct'] and 'address' in conf :
             raise CloubedConfigurationException(
                 "address parameter has no sense on network {network} with " \
-                "bridge forwarding mode".format(network=self.name))
+                "{forward} forwarding mode".format(network=self.name,
+                                                   forward=self.forward_mode))
 
-        # forward is bridge -> ip_host and netmask have no sense
-        if self.forward_mode == 'bridge' and \
+        # forward is bridge or direct -> ip_host and netmask have no sense
+        if self.forward_mode in ['bridge', 'direct'] and \
            ( 'ip_host' in conf or 'netmask' in conf ):
             raise CloubedConfigurationException(
                 "ip_host and netmask parameters have no sense on network " \
-                "{network} with bridge forwarding mode" \
-                    .format(network=self.name))
+                "{network} with {forward} forwarding mode" \
+                    .format(network=self.name,
+                            forward=self.forward_mode))
 
         if 'address' in conf:
 
@@ -393,6 +458,100 @@ class ConfigurationNetwork(ConfigurationItem):
             self.pxe_tftp_dir = None
             self.pxe_boot_file = None
 
+    def __parse_tftp(self, conf):
+        """
+            Parses the tftp parameter over the conf dictionary given in
+            parameter and raises appropriate exception if a problem is found.
+            This method must be called *after* __parse_pxe() since it relies
+            on the attributes set by this method.
+        """
+
+        if 'tftp' in conf:
+
+            if not self.has_pxe():
+                raise CloubedConfigurationException(
+                    "tftp parameter of network {network} cannot be set " \
+                    "without pxe".format(network=self.name))
+
+            tftp = conf['tftp']
+
+            if type(tftp) is not str:
+                raise CloubedConfigurationException(
+                    "format of tftp parameter of network {network} is not " \
+                    "valid".format(network=self.name))
+
+            if tftp not in ['libvirt', 'internal']:
+                raise CloubedConfigurationException(
+                    "tftp parameter of network {network} must be either " \
+                    "libvirt or internal".format(network=self.name))
+
+            self.tftp = tftp
+
+        elif self.has_pxe():
+            self.tftp = 'libvirt' # default value with pxe
+
+        else:
+            self.tftp = None
+
+    def __parse_mtu(self, conf):
+        """
+            Parses the mtu parameter over the conf dictionary given in
+            parameter and raises appropriate exception if a problem is found.
+        """
+
+        if 'mtu' in conf:
+
+            mtu = conf['mtu']
+
+            if type(mtu) is not int:
+                raise CloubedConfigurationException(
+                    "format of mtu parameter of network {network} is not " \
+                    "valid".format(network=self.name))
+
+            if mtu < 68 or mtu > 65535:
+                raise CloubedConfigurationException(
+                    "mtu parameter of network {network} must be between 68 " \
+                    "and 65535".format(network=self.name))
+
+            self.mtu = mtu
+
+        else:
+            # default is None, libvirt then keeps the default MTU
+            self.mtu = None
+
+    def __parse_qos(self, conf):
+        """
+            Parses the qos parameter over the conf dictionary given in
+            parameter and raises appropriate exception if a problem is found.
+            This method must be called *after* __parse_forward_mode() since
+            it relies on the attribute set by this method.
+        """
+
+        if 'qos' not in conf:
+            # default is None, traffic is not shaped
+            self.qos = None
+            return
+
+        # libvirt does not shape the traffic of existing bridges and host
+        # interfaces
+        if self.forward_mode in ['bridge', 'direct']:
+            raise CloubedConfigurationException(
+                "qos parameter has no sense on network {network} with " \
+                "{forward} forwarding mode".format(network=self.name,
+                                                   forward=self.forward_mode))
+
+        if type(conf['qos']) is not str:
+            raise CloubedConfigurationException(
+                "format of qos parameter of network {network} is not " \
+                "valid".format(network=self.name))
+
+        self.qos = self.conf.get_qos(conf['qos'])
+        if self.qos is None:
+            raise CloubedConfigurationException(
+                "qos {qos} of network {network} is not defined" \
+                    .format(qos=conf['qos'],
+                            network=self.name))
+
     def _get_type(self):
 
         """ Returns the type of the item """
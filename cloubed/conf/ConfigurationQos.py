@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020 Rémi Palancher
+#
+# This file is part of Cloubed.
+#
+# Cloubed is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# Cloubed is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with Cloubed.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+""" ConfigurationQos class """
+
+from cloubed.conf.ConfigurationItem import ConfigurationItem
+from cloubed.CloubedException import CloubedConfigurationException
+
+class ConfigurationQos(ConfigurationItem):
+
+    """ QoS class Configuration class """
+
+    def __init__(self, conf, qos_item):
+
+        super(ConfigurationQos, self).__init__(conf, qos_item)
+
+        # inbound and outbound traffic shaping
+        self.inbound = None
+        self.outbound = None
+        self.__parse_bandwidth(qos_item)
+
+    def __parse_direction(self, conf, direction):
+        """
+            Parses the average, peak and burst parameters of the traffic
+            direction section of the conf dictionary given in parameter, and
+            returns them in a dict or None if the section is not defined.
+            Raises appropriate exception if a problem is found.
+        """
+
+        if direction not in conf:
+            return None
+
+        direction_conf = conf[direction]
+
+        if type(direction_conf) is not dict:
+            raise CloubedConfigurationException(
+                "format of {direction} section of qos {qos} is not valid" \
+                    .format(direction=direction,
+                            qos=self.name))
+
+        if 'average' not in direction_conf:
+            raise CloubedConfigurationException(
+                "average parameter must be defined in {direction} section of " \
+                "qos {qos}".format(direction=direction,
+                                   qos=self.name))
+
+        settings = {}
+        for parameter, value in direction_conf.items():
+
+            if parameter not in ['average', 'peak', 'burst']:
+                raise CloubedConfigurationException(
+                    "unknown parameter {parameter} in {direction} section of " \
+                    "qos {qos}".format(parameter=parameter,
+                                       direction=direction,
+                                       qos=self.name))
+
+            if type(value) is not int or value <= 0:
+                raise CloubedConfigurationException(
+                    "{parameter} parameter in {direction} section of qos " \
+                    "{qos} must be a positive integer" \
+                        .format(parameter=parameter,
+                                direction=direction,
+                                qos=self.name))
+
+            settings[parameter] = value
+
+        return settings
+
+    def __parse_bandwidth(self, conf):
+        """
+            Parses the inbound and outbound sections over the conf dictionary
+            given in parameter and raises appropriate exception if a problem is
+            found. The average and peak rates are in KiB/s and the burst size
+            is in KiB, like in libvirt.
+        """
+
+        self.inbound = self.__parse_direction(conf, 'inbound')
+        self.outbound = self.__parse_direction(conf, 'outbound')
+
+        if self.inbound is None and self.outbound is None:
+            raise CloubedConfigurationException(
+                "qos {qos} must define inbound or outbound section" \
+                    .format(qos=self.name))
+
+    def _get_type(self):
+
+        """ Returns the type of the item """
+
+        return "qos"
@@ -32,6 +32,7 @@ class ConfigurationStorageVolume(ConfigurationItem):
 
         super(ConfigurationStorageVolume, self).__init__(conf, storage_volume_item)
 
+        self._parse_count(storage_volume_item)
         self.size = None
         self.__parse_size(storage_volume_item)
         self.storage_pool = None
@@ -39,6 +40,7 @@ class ConfigurationStorageVolume(ConfigurationItem):
         self.format = None
         self.__parse_format(storage_volume_item)
         self.backing = None
+        self.backing_cache = False
         self.__parse_backing(storage_volume_item)
 
     def __parse_size(self, conf):
@@ -127,6 +129,25 @@ class ConfigurationStorageVolume(ConfigurationItem):
                           "format of backing parameter of storage volume " \
                           "{name} is not valid".format(name=self.name))
 
+            # A backing prefixed by cache: refers to an entry of the image
+            # cache, either by its label or by (a prefix of) its hash.
+            if backing.startswith('cache:'):
+
+                if self.conf.image_cache is None:
+                    raise CloubedConfigurationException(
+                              "backing of storage volume {name} refers to " \
+                              "the image cache but imagecache section is " \
+                              "missing".format(name=self.name))
+
+                backing = backing[len('cache:'):]
+
+                if not len(backing):
+                    raise CloubedConfigurationException(
+                              "format of backing parameter of storage volume " \
+                              "{name} is not valid".format(name=self.name))
+
+                self.backing_cache = True
+
             self.backing = backing
 
         else:
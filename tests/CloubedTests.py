@@ -3,9 +3,19 @@
 import unittest
 import sys
 import os
+import atexit
+import shutil
+import tempfile
 
 sys.path.append(os.path.abspath(os.path.join(os.getcwd(),'..')))
 
+from cloubed import Utils
+
+# the state files of the tests are written in temporary directories, never in
+# the .cloubed directory of the current directory
+tests_state_dir = tempfile.mkdtemp(prefix='cloubed-tests-')
+atexit.register(shutil.rmtree, tests_state_dir, True)
+
 __all__ = [ 'CloubedTestCase',
             'loadtestcase' ]
 
@@ -15,6 +25,15 @@ class CloubedTestCase(unittest.TestCase):
 
         super(CloubedTestCase, self).__init__(methodName)
 
+    def run(self, result=None):
+
+        # each test starts with an empty state directory
+        Utils.STATE_DIR = tempfile.mkdtemp(dir=tests_state_dir)
+        try:
+            return super(CloubedTestCase, self).run(result)
+        finally:
+            Utils.STATE_DIR = None
+
     def shortDescription(self):
 
         doc = self._testMethodDoc
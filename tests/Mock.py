@@ -1,4 +1,5 @@
 from xml.dom.minidom import Document, parseString
+import libvirt
 from libvirt import libvirtError
 
 conf_minimal = { 'testbed': 'test_testbed',
@@ -74,6 +75,12 @@ class MockLibvirtConnect():
         self.domains = []
         self.defined_domains = []
 
+        # (event ID, callback) of the registered domain event handlers
+        self.event_callbacks = []
+
+        # streams created by newStream()
+        self.streams = []
+
     def listStoragePools(self):
         """Mock of libvirt.virConnect.listStoragePools()"""
 
@@ -177,7 +184,97 @@ class MockLibvirtConnect():
     def domainEventRegisterAny(self, dom, eventID, cb, opaque):
         """Mock of libvirt.virConnect.domainEventRegisterAny()"""
 
-        pass
+        self.event_callbacks.append((eventID, cb))
+        return len(self.event_callbacks) - 1
+
+    def newStream(self, flags):
+        """Mock of libvirt.virConnect.newStream()"""
+
+        stream = MockLibvirtStream()
+        self.streams.append(stream)
+        return stream
+
+class MockLibvirtStream():
+
+    """Class to mock libvirt.virStream class and its methods used in Cloubed
+       for sparse transfers of storage volumes. The content transferred is a
+       list of segments, either ('data', bytes) or ('hole', length).
+    """
+
+    def __init__(self):
+
+        self.segments = []
+        # maximum number of bytes accepted by one send(), to check partial
+        # sends
+        self.max_send = None
+        # True to raise libvirtError on the next send() or recvFlags()
+        self.fail = False
+        self.finished = False
+        self.aborted = False
+
+    def __check(self):
+
+        if self.fail:
+            raise libvirtError("stream failure")
+
+    def send(self, data):
+        """Mock of libvirt.virStream.send()
+
+           This method is used in VirtController.upload_storage_volume()
+        """
+
+        self.__check()
+        if self.max_send is not None:
+            data = data[:self.max_send]
+        self.segments.append(('data', bytes(data)))
+        return len(data)
+
+    def sendHole(self, length, flags):
+        """Mock of libvirt.virStream.sendHole()
+
+           This method is used in VirtController.upload_storage_volume()
+        """
+
+        self.__check()
+        self.segments.append(('hole', length))
+
+    def recvFlags(self, nbytes, flags):
+        """Mock of libvirt.virStream.recvFlags()
+
+           This method is used in VirtController.download_storage_volume(),
+           it returns -3 when the stream is in a hole.
+        """
+
+        self.__check()
+        if not self.segments:
+            return b''
+        (kind, content) = self.segments[0]
+        if kind == 'hole':
+            return -3
+        if len(content) > nbytes:
+            self.segments[0] = (kind, content[nbytes:])
+        else:
+            self.segments.pop(0)
+        return content[:nbytes]
+
+    def recvHole(self, flags):
+        """Mock of libvirt.virStream.recvHole()
+
+           This method is used in VirtController.download_storage_volume()
+        """
+
+        (kind, length) = self.segments.pop(0)
+        return length
+
+    def finish(self):
+        """Mock of libvirt.virStream.finish()"""
+
+        self.finished = True
+
+    def abort(self):
+        """Mock of libvirt.virStream.abort()"""
+
+        self.aborted = True
 
 class MockLibvirtStoragePool():
 
@@ -259,6 +356,37 @@ class MockLibvirtStoragePool():
 
         pass
 
+class MockLibvirtStorageVolume():
+
+    """Class to mock libvirt.virStorageVol class and its methods used in
+       Cloubed
+    """
+
+    def __init__(self, name, segments=None):
+
+        self._name = name
+        # content of the volume as segments of data and holes, like in
+        # MockLibvirtStream
+        self.segments = segments or []
+
+    def upload(self, stream, offset, length, flags):
+        """Mock of libvirt.virStorageVol.upload()
+
+           The content sent in the stream replaces the content of the volume.
+        """
+
+        self.segments = stream.segments
+
+    def download(self, stream, offset, length, flags):
+        """Mock of libvirt.virStorageVol.download()"""
+
+        stream.segments = list(self.segments)
+
+    def delete(self, flags):
+        """Mock of libvirt.virStorageVol.delete()"""
+
+        pass
+
 class MockLibvirtNetwork():
 
     """Class to mock libvirt.virNetwork class and its methods used in
@@ -269,6 +397,7 @@ class MockLibvirtNetwork():
 
         self.name = name
         self.active = True
+        self.undefined = False
 
     def isActive(self):
         """Mock of libvirt.virNetwork.isActive()
@@ -287,6 +416,14 @@ class MockLibvirtNetwork():
 
         pass
 
+    def undefine(self):
+        """Mock of libvirt.virNetwork.undefine()
+
+           This method is used in VirtController.undefine_network()
+        """
+
+        self.undefined = True
+
     def XMLDesc(self, flag):
         """Mock of libvirt.virNetwork.XMLDesc()
 
@@ -299,6 +436,14 @@ class MockLibvirtNetwork():
         doc.appendChild(elt)
         return doc.toxml()
 
+    def update(self, command, section, parentIndex, xml, flags):
+        """Mock of libvirt.virNetwork.update()
+
+           This method is used in VirtController.update_network()
+        """
+
+        pass
+
 class MockLibvirtDomain():
 
     """Class to mock libvirt.virDomain class and its methods used in
@@ -311,6 +456,15 @@ class MockLibvirtDomain():
         self._name = name
         self.active = True
 
+        # steps of the block jobs indexed by disk devices, each step is a
+        # tuple with the dict returned by blockJobInfo() and True if the job
+        # is ready to pivot, the last step is repeated
+        self.block_job_steps = {}
+        # current steps of the running block jobs indexed by disk devices
+        self.block_jobs = {}
+        # disk devices whose block job has been pivoted
+        self.pivoted = []
+
     def name(self):
         """Mock of libvirt.virDomain.name()"""
 
@@ -356,4 +510,53 @@ class MockLibvirtDomain():
         elt.setAttribute("type", "spice")
         elt.setAttribute("port", "5900")
         dom.appendChild(elt)
+        if self.block_jobs:
+            devices = doc.createElement("devices")
+            dom.appendChild(devices)
+            for device, step in self.block_jobs.items():
+                disk = doc.createElement("disk")
+                devices.appendChild(disk)
+                elt = doc.createElement("target")
+                elt.setAttribute("dev", device)
+                disk.appendChild(elt)
+                elt = doc.createElement("mirror")
+                elt.setAttribute("job", "active-commit")
+                if step is not None and step[1]:
+                    elt.setAttribute("ready", "yes")
+                disk.appendChild(elt)
         return doc.toxml()
+
+    def blockCommit(self, disk, base, top, bandwidth, flags):
+        """Mock of libvirt.virDomain.blockCommit()
+
+           This method is used in VirtController.commit_domain_disk()
+        """
+
+        self.block_jobs[disk] = None
+
+    def blockJobInfo(self, disk, flags):
+        """Mock of libvirt.virDomain.blockJobInfo()
+
+           This method is used in VirtController.commit_domain_disk()
+        """
+
+        if disk not in self.block_jobs:
+            return {}
+        steps = self.block_job_steps[disk]
+        step = steps.pop(0) if len(steps) > 1 else steps[0]
+        self.block_jobs[disk] = step
+        return step[0]
+
+    def blockJobAbort(self, disk, flags):
+        """Mock of libvirt.virDomain.blockJobAbort()
+
+           This method is used in VirtController.commit_domain_disk()
+        """
+
+        step = self.block_jobs.pop(disk, None)
+        if flags & libvirt.VIR_DOMAIN_BLOCK_JOB_ABORT_PIVOT:
+            if step is None or not step[1]:
+                raise libvirtError("block copy still active: disk '{disk}' " \
+                                   "not ready for pivot yet" \
+                                       .format(disk=disk))
+            self.pivoted.append(disk)
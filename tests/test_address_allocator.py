@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import mock
+import ipaddress
+import tempfile
+
+from CloubedTests import *
+
+from cloubed.AddressAllocator import AddressAllocator
+from cloubed.CloubedException import CloubedException
+from cloubed.Utils import gen_mac, state_path
+
+class NetworkStub:
+
+    def __init__(self, name, address, dhcp_range=None):
+        self.name = name
+        self.ip_host = address.split('/')[0]
+        self.subnet = ipaddress.IPv4Network(address, strict=False) \
+                          if address else None
+        self.dhcp_range = dhcp_range
+
+    def get_subnet(self):
+        return self.subnet
+
+    def get_dhcp_range(self):
+        return self.dhcp_range
+
+class TestAddressAllocator(CloubedTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        self.addCleanup(os.chdir, self.cwd)
+        self.network = NetworkStub('net', '10.0.0.1/28',
+                                   ('10.0.0.8', '10.0.0.11'))
+
+    def test_ip(self):
+        """
+            AddressAllocator.ip() should allocate the first free addresses out
+            of the host address and the DHCP range
+        """
+        allocator = AddressAllocator()
+        allocator.reserve_ip(self.network, '10.0.0.3')
+        ips = [ allocator.ip(self.network, "node{0}".format(index)) \
+                for index in range(7) ]
+        self.assertEqual(ips, [ '10.0.0.2', '10.0.0.4', '10.0.0.5',
+                                '10.0.0.6', '10.0.0.7', '10.0.0.12',
+                                '10.0.0.13' ])
+        self.assertEqual(allocator.ip(self.network, 'node7'), '10.0.0.14')
+        self.assertRaisesRegex(CloubedException,
+                               "unable to allocate IP address on network net " \
+                               "since all addresses are used",
+                               allocator.ip, self.network, 'node8')
+
+    def test_ip_no_subnet(self):
+        """
+            AddressAllocator.ip() should raise CloubedException if the network
+            does not have any address
+        """
+        allocator = AddressAllocator()
+        network = NetworkStub('bridge', '')
+        allocator.reserve_ip(network, '10.0.0.3')
+        self.assertRaisesRegex(CloubedException,
+                               "unable to allocate IP address on network " \
+                               "bridge since it does not have any address",
+                               allocator.ip, network, 'node')
+
+    def test_ip_leases(self):
+        """
+            AddressAllocator.ip() should give the same addresses in the next
+            run, even if new interfaces are allocated first
+        """
+        allocator = AddressAllocator()
+        self.assertEqual(allocator.ip(self.network, 'node1'), '10.0.0.2')
+        self.assertEqual(allocator.ip(self.network, 'node2'), '10.0.0.3')
+        allocator.save()
+        self.assertTrue(os.path.exists(state_path('leases.json')))
+
+        allocator = AddressAllocator()
+        self.assertEqual(allocator.ip(self.network, 'node0'), '10.0.0.4')
+        self.assertEqual(allocator.ip(self.network, 'node2'), '10.0.0.3')
+
+    def test_ip_lease_static(self):
+        """
+            AddressAllocator.reserve_ip() should have priority over the leases
+        """
+        allocator = AddressAllocator()
+        self.assertEqual(allocator.ip(self.network, 'node1'), '10.0.0.2')
+        allocator.save()
+
+        allocator = AddressAllocator()
+        allocator.reserve_ip(self.network, '10.0.0.2')
+        self.assertEqual(allocator.ip(self.network, 'node1'), '10.0.0.3')
+
+    def test_mac(self):
+        """
+            AddressAllocator.mac() should return the MAC address generated
+            out of the key and a distinct address for the same key
+        """
+        allocator = AddressAllocator()
+        mac = allocator.mac('dom-net')
+        self.assertEqual(mac, gen_mac('dom-net'))
+        self.assertEqual(allocator.mac('dom-net'), gen_mac('dom-net-2'))
+
+    def test_mac_lease(self):
+        """
+            AddressAllocator.mac() should lease every generated address so that
+            a new key whose address collides with it in the next run is
+            rehashed instead of taking it over
+        """
+        allocator = AddressAllocator()
+        mac = allocator.mac('dom-net')
+        allocator.save()
+
+        allocator = AddressAllocator()
+        allocator.load_macs()
+        # another interface whose generated address is the same
+        with mock.patch.object(sys.modules['cloubed.AddressAllocator'],
+                               'gen_mac',
+                               side_effect=lambda key: mac \
+                                   if key == 'other' else gen_mac(key)):
+            self.assertEqual(allocator.mac('other'), gen_mac('other#1'))
+        self.assertEqual(allocator.mac('dom-net'), mac)
+
+    def test_mac_collision(self):
+        """
+            AddressAllocator.mac() should rehash the key on collision and keep
+            the rehashed address in the next run
+        """
+        allocator = AddressAllocator()
+        allocator.reserve_mac(gen_mac('dom-net').upper())
+        mac = allocator.mac('dom-net')
+        self.assertEqual(mac, gen_mac('dom-net#1'))
+        allocator.save()
+
+        allocator = AddressAllocator()
+        allocator.load_macs()
+        self.assertEqual(allocator.mac('dom-net'), mac)
+
+loadtestcase(TestAddressAllocator)
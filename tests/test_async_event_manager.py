@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+
+import os
+import asyncio
+import tempfile
+
+import mock
+
+from CloubedTests import *
+
+from cloubed.AsyncEventManager import AsyncEventManager
+from cloubed.DomainEvent import DomainEvent
+from cloubed.CloubedException import CloubedException
+
+class DomainStub:
+
+    def __init__(self, name):
+        self.name = name
+        self.libvirt_name = 'test_testbed-' + name
+
+class LibvirtDomainStub:
+
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+    def ID(self):
+        return 1
+
+class CloubedStub:
+
+    def __init__(self):
+        self._domains = [ DomainStub('test_domain1'),
+                          DomainStub('test_domain2') ]
+
+    def get_domain_by_name(self, name):
+        for domain in self._domains:
+            if domain.name == name:
+                return domain
+        raise CloubedException("domain {domain} not found in configuration" \
+                                   .format(domain=name))
+
+    def get_domain_by_libvirt_name(self, libvirt_name):
+        for domain in self._domains:
+            if domain.libvirt_name == libvirt_name:
+                return domain
+        raise CloubedException("domain {domain} not found in configuration" \
+                                   .format(domain=libvirt_name))
+
+class TestAsyncEventManager(CloubedTestCase):
+
+    def setUp(self):
+
+        # the events are recorded in the journal of the state directory
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        self.addCleanup(os.chdir, cwd)
+
+        patcher_ctl = mock.patch('cloubed.AsyncEventManager.VirtController')
+        self.ctl_m = patcher_ctl.start()
+        self.addCleanup(patcher_ctl.stop)
+        self.ctl_m.return_value.domain_event_register.return_value = [ 42 ]
+        self.manager = AsyncEventManager(CloubedStub())
+
+    def __notify(self, domain_name, event_type, event_detail):
+
+        self.manager.manage_event(LibvirtDomainStub(domain_name),
+                                  'LIFECYCLE',
+                                  (event_type, event_detail))
+
+    def test_register(self):
+        """
+            AsyncEventManager.__init__() should register the asyncio event
+            implementation and the handler of the events
+        """
+        self.ctl_m.event_register_asyncio.assert_called_once_with(None)
+        self.ctl_m.return_value.domain_event_register.assert_called_once_with(
+            self.manager.manage_event)
+        self.manager.terminate()
+        self.ctl_m.return_value.domain_event_deregister \
+            .assert_called_once_with([ 42 ])
+
+    def test_events(self):
+        """
+            AsyncEventManager.events() should give the stream of the events of
+            the domain, which stops when the manager is terminated
+        """
+
+        async def run():
+            stream = self.manager.events('test_domain2')
+            self.__notify('test_testbed-test_domain1', 2, 0)
+            self.__notify('test_testbed-test_domain2', 2, 0)
+            self.__notify('other_domain', 2, 0)
+            self.__notify('test_testbed-test_domain2', 5, 0)
+            self.manager.terminate()
+            return [ str(event) async for event in stream ]
+
+        self.assertEqual(asyncio.run(run()),
+                         [ 'STARTED>STARTED_BOOTED',
+                           'STOPPED>STOPPED_SHUTDOWN' ])
+        self.assertEqual([ (record['domain'], record['detail']) \
+                           for record in self.manager.journal.read() ],
+                         [ ('test_domain1', 'STARTED_BOOTED'),
+                           ('test_domain2', 'STARTED_BOOTED'),
+                           ('test_domain2', 'STOPPED_SHUTDOWN') ])
+        self.assertRaisesRegex(CloubedException,
+                               "domain fail not found in configuration",
+                               self.manager.events,
+                               'fail')
+
+    def test_wait_event(self):
+        """
+            AsyncEventManager.wait_event() should return once the event is
+            notified on the domain and close its stream
+        """
+
+        async def run():
+            waiter = asyncio.ensure_future(
+                self.manager.wait_event('test_domain1',
+                                        DomainEvent('STOPPED',
+                                                    'STOPPED_SHUTDOWN')))
+            # let the waiter open its stream
+            await asyncio.sleep(0)
+            self.__notify('test_testbed-test_domain1', 2, 0)
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+            self.__notify('test_testbed-test_domain1', 5, 0)
+            await asyncio.wait_for(waiter, 1)
+
+        asyncio.run(run())
+        self.assertEqual(self.manager._streams['test_domain1'], [])
+
+loadtestcase(TestAsyncEventManager)
@@ -1,6 +1,9 @@
 #!/usr/bin/python3
 
+import os
+import sys
 import mock
+import tempfile
 
 from CloubedTests import *
 from Mock import MockConfigurationLoader, MockLibvirt, MockLibvirtConnect, MockLibvirtStoragePool, MockLibvirtNetwork, MockLibvirtDomain
@@ -11,7 +14,8 @@ from cloubed.StoragePool import StoragePool
 from cloubed.StorageVolume import StorageVolume
 from cloubed.Network import Network
 from cloubed.Domain import Domain
-from cloubed.Utils import getuser
+from cloubed.Timeline import Timeline
+from cloubed.Utils import getuser, state_path
 
 #import logging
 #logging.basicConfig(format='%(levelname)-7s: %(message)s',
@@ -117,6 +121,14 @@ class TestCloubed(CloubedTestCase):
         self.addCleanup(patcher_conn.stop)
         self.loader = MockConfigurationLoader(conf)
         self.tbd = Cloubed(conf_loader=self.loader)
+        # record the spans of the tests in a temporary timeline
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        timeline = Timeline(os.path.join(self.tmpdir.name, 'timeline.jsonl'))
+        patcher_timeline = mock.patch.object(self.tbd, '_timeline', timeline)
+        patcher_timeline.start()
+        self.addCleanup(patcher_timeline.stop)
+        self.addCleanup(timeline.close)
 
     def test_storage_pools(self):
         """Cloubed.storage_pools() should return the list of names of storage
@@ -169,6 +181,59 @@ class TestCloubed(CloubedTestCase):
                                 self.tbd.get_domain_by_libvirt_name,
                                 'fail')
 
+    def test_get_domain_by_ip(self):
+        """Cloubed.get_domain_by_ip() shoud find the Domain with a network
+           interface with the IP address in parameter and return it else raise
+           CloubedException
+        """
+
+        domain = self.tbd.get_domain_by_ip('10.5.0.10')
+        self.assertEqual(domain.name, 'test_domain2')
+        self.assertRaisesRegex(CloubedException,
+                                'domain with IP address 192.0.2.1 not found ' \
+                                'in configuration',
+                                self.tbd.get_domain_by_ip,
+                                '192.0.2.1')
+
+    def test_render_template(self):
+        """Cloubed.render_template() shoud raise CloubedException if the
+           domain or the template could not be found
+        """
+
+        self.assertRaisesRegex(CloubedException,
+                                'template fail not defined for domain ' \
+                                'test_domain2',
+                                self.tbd.render_template,
+                                '10.5.0.10',
+                                'fail')
+        self.assertRaisesRegex(CloubedException,
+                                'error while reading template file ' \
+                                'templates/preseed.cfg',
+                                self.tbd.render_template,
+                                '10.5.0.10',
+                                'preseed')
+
+    def test_serve_http(self):
+        """Cloubed.serve_http() should launch one HTTP server on the host IP
+           address of each network of the domain, only once
+        """
+
+        # the Cloubed singleton is shared by all tests
+        self.tbd._http_servers.clear()
+        self.addCleanup(self.tbd._http_servers.clear)
+        # the cloubed.Cloubed name is shadowed by the Cloubed class
+        with mock.patch.object(sys.modules['cloubed.Cloubed'],
+                               'HTTPServer') as http_server_m:
+            self.tbd.serve_http(self.tbd.get_domain_by_name('test_domain1'))
+            self.assertEqual(http_server_m.call_count, 0)
+            domain = self.tbd.get_domain_by_name('test_domain2')
+            self.tbd.serve_http(domain)
+            self.tbd.serve_http(domain)
+            self.assertEqual(http_server_m.call_count, 1)
+            http_server_m.return_value.launch.assert_called_once_with(
+                '10.5.0.1', os.getcwd())
+        self.assertEqual(list(self.tbd._http_servers), ['test_network2'])
+
     def test_get_network_by_name(self):
         """Cloubed.get_network_by_name() shoud find the Network with name in
            parameter and return it else raise CloubedException
@@ -229,6 +294,54 @@ class TestCloubed(CloubedTestCase):
                          recreate_networks=True)
         self.tbd.boot_vm('test_domain2')
 
+    def test_save_leases(self):
+        """Cloubed should write the leases of the addresses when booting a
+           domain but not when it is only initialized
+        """
+
+        # a new instance apart from the singleton, with the leases of the
+        # empty state directory of this test
+        tbd = type.__call__(Cloubed, conf_loader=self.loader)
+        tbd._timeline = self.tbd._timeline
+        self.assertFalse(os.path.exists(state_path('leases.json')))
+        tbd.boot_vm('test_domain1')
+        self.assertTrue(os.path.exists(state_path('leases.json')))
+
+    def test_get_timeline_spans(self):
+        """Cloubed.get_timeline_spans() should return the spans of the boot of
+           the domains, attributed to the domains, and the spans of the
+           clients of the servers attributed with their IP addresses
+        """
+
+        self.tbd.boot_vm('test_domain1')
+        with self.tbd.get_timeline().span('http', '/preseed.cfg',
+                                          client='10.5.0.10'):
+            pass
+        with self.tbd.get_timeline().span('http', '/preseed.cfg',
+                                          client='192.0.2.1'):
+            pass
+
+        spans = self.tbd.get_timeline_spans()
+        self.assertEqual([ (span['phase'], span['name'], span['domain']) \
+                           for span in spans ],
+                         [ ('boot', 'test_domain1', 'test_domain1'),
+                           ('volume', 'test_storage_volume1', 'test_domain1'),
+                           ('network', 'test_network1', 'test_domain1'),
+                           ('domain', 'test_domain1', 'test_domain1'),
+                           ('http', '/preseed.cfg', 'test_domain2'),
+                           ('http', '/preseed.cfg', None) ])
+        for span in spans[1:4]:
+            self.assertEqual(span['parent'], spans[0]['id'])
+
+        self.assertEqual(len(self.tbd.get_timeline_spans('test_domain2')), 1)
+        self.assertRaisesRegex(CloubedException,
+                                'domain fail not found in configuration',
+                                self.tbd.get_timeline_spans,
+                                'fail')
+
+        self.tbd.clear_timeline()
+        self.assertEqual(self.tbd.get_timeline_spans(), [])
+
     def test_shutdown(self):
         """Cloubed.shutdown() shoud run without trouble
         """
@@ -306,4 +419,158 @@ class TestCloubed(CloubedTestCase):
                                 self.tbd.xml,
                                 'fail', 'test_fail')
 
+class TestCloubedCheckpoint(CloubedTestCase):
+
+    def setUp(self):
+
+        patcher_open = mock.patch('libvirt.open', libvirt_mod_m.open)
+        patcher_conn = mock.patch('libvirt.virConnect', libvirt_conn_m)
+        patcher_open.start()
+        patcher_conn.start()
+        self.addCleanup(patcher_open.stop)
+        self.addCleanup(patcher_conn.stop)
+        self.tbd = Cloubed(conf_loader=MockConfigurationLoader(conf))
+        # checkpoints are saved in the state directory of the current
+        # directory
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        self.addCleanup(os.chdir, cwd)
+
+        for method in [ 'is_active', 'pause', 'unpause', 'create_snapshot',
+                        'get_snapshots', 'delete_snapshot',
+                        'revert_snapshot' ]:
+            patcher = mock.patch.object(Domain, method, autospec=True)
+            setattr(self, method, patcher.start())
+            self.addCleanup(patcher.stop)
+        self.is_active.return_value = True
+        for method in [ 'network_is_active', 'undefine_network',
+                        'create_network' ]:
+            patcher = mock.patch.object(self.tbd.ctl, method)
+            setattr(self, method, patcher.start())
+            self.addCleanup(patcher.stop)
+        self.network_is_active.return_value = False
+
+        self.domain1 = self.tbd.get_domain_by_name('test_domain1')
+        self.domain2 = self.tbd.get_domain_by_name('test_domain2')
+
+    def __fail_domain2(self, domain, *args):
+        if domain is self.domain2:
+            raise CloubedException("failure of domain {domain}" \
+                                       .format(domain=domain.name))
+
+    def test_checkpoint_restore(self):
+        """Cloubed.checkpoint() should snapshot all running domains and
+           Cloubed.restore() should recreate the inactive networks and revert
+           all the domains before unpausing them
+        """
+
+        self.tbd.checkpoint('cp1')
+        self.assertEqual(sorted(call[0][0].name for call \
+                                in self.create_snapshot.call_args_list),
+                         ['test_domain1', 'test_domain2'])
+        self.create_snapshot.assert_any_call(self.domain1,
+                                             'checkpoint.cp1', True)
+        self.assertEqual(self.unpause.call_count, 2)
+        self.assertRaisesRegex(CloubedException,
+                               'checkpoint cp1 already exists',
+                               self.tbd.checkpoint,
+                               'cp1')
+
+        self.unpause.reset_mock()
+        self.tbd.restore('cp1')
+        self.revert_snapshot.assert_any_call(self.domain2,
+                                             'checkpoint.cp1', True)
+        self.assertEqual(self.revert_snapshot.call_count, 2)
+        self.assertEqual(self.unpause.call_count, 2)
+        self.assertEqual(sorted(call[0][0] for call \
+                                in self.undefine_network.call_args_list),
+                         sorted(self.tbd.get_network_by_name(name) \
+                                    .libvirt_name \
+                                for name in ['test_network1',
+                                             'test_network2']))
+        self.assertEqual(self.create_network.call_count, 2)
+
+    def test_checkpoint_invalid(self):
+        """Cloubed.checkpoint() should raise CloubedException if the name is
+           not valid and Cloubed.restore() if the checkpoint does not exist
+        """
+
+        self.assertRaisesRegex(CloubedException,
+                               'name ../cp of checkpoint is not valid',
+                               self.tbd.checkpoint,
+                               '../cp')
+        self.create_snapshot.assert_not_called()
+        self.assertRaisesRegex(CloubedException,
+                               'checkpoint cp1 not found',
+                               self.tbd.restore,
+                               'cp1')
+
+    def test_checkpoint_pause_failure(self):
+        """Cloubed.checkpoint() should unpause only the domains already paused
+           when one domain could not be paused
+        """
+
+        self.pause.side_effect = self.__fail_domain2
+
+        self.assertRaisesRegex(CloubedException,
+                               'failure of domain test_domain2',
+                               self.tbd.checkpoint,
+                               'cp1')
+        self.create_snapshot.assert_not_called()
+        self.unpause.assert_called_once_with(self.domain1)
+
+    def test_cleanup_checkpoints(self):
+        """Cloubed.cleanup() should remove the checkpoints of the testbed"""
+
+        self.tbd.checkpoint('cp1')
+        self.tbd.cleanup()
+        self.assertRaisesRegex(CloubedException,
+                               'checkpoint cp1 not found',
+                               self.tbd.restore,
+                               'cp1')
+
+    def test_checkpoint_partial_failure(self):
+        """Cloubed.checkpoint() should delete the snapshots already created
+           when the snapshot of one domain fails, unpause all the domains and
+           not save the checkpoint
+        """
+
+        self.create_snapshot.side_effect = self.__fail_domain2
+        self.get_snapshots.side_effect = \
+            lambda domain: [ { 'name': 'checkpoint.cp1' } ] \
+                           if domain is self.domain1 else []
+
+        self.assertRaisesRegex(CloubedException,
+                               'failure of domain test_domain2',
+                               self.tbd.checkpoint,
+                               'cp1')
+        self.delete_snapshot.assert_called_once_with(self.domain1,
+                                                     'checkpoint.cp1')
+        self.assertEqual(self.unpause.call_count, 2)
+        self.assertRaisesRegex(CloubedException,
+                               'checkpoint cp1 not found',
+                               self.tbd.restore,
+                               'cp1')
+
+    def test_restore_partial_failure(self):
+        """Cloubed.restore() should raise the error of the domain which could
+           not be reverted and leave the domains paused
+        """
+
+        self.tbd.checkpoint('cp1')
+        self.unpause.reset_mock()
+        self.network_is_active.return_value = True
+        self.revert_snapshot.side_effect = self.__fail_domain2
+
+        self.assertRaisesRegex(CloubedException,
+                               'failure of domain test_domain2',
+                               self.tbd.restore,
+                               'cp1')
+        self.assertEqual(self.revert_snapshot.call_count, 2)
+        self.unpause.assert_not_called()
+        self.create_network.assert_not_called()
+
 loadtestcase(TestCloubed)
+loadtestcase(TestCloubedCheckpoint)
@@ -142,7 +142,8 @@ class TestCloubedArgumentParser(CloubedTestCase):
         """
             Raises CloubedArgumentException because action requires domain
         """
-        actions = [ "boot", "gen", "wait", "vars" ]
+        actions = [ "boot", "gen", "wait", "vars", "baseline",
+                    "snapshot" ]
         for action in actions:
             sys.argv = ["cloubed", action]
             parser = CloubedArgumentParser("test_description")
@@ -520,4 +521,234 @@ class TestCloubedArgumentParser(CloubedTestCase):
                                 "format of --resource parameter is not valid",
                                 parser.parse_resource)
 
+    #
+    # CloubedArgumentParser.parse_volumes()
+    #
+
+    def test_parse_volumes_ok(self):
+        """
+            Checks CloubedArgumentParser.parse_volumes() should return a dict
+            with the paths indexed by volume names
+        """
+        sys.argv = ['cloubed', 'import', '--volumes', 'vol1:/tmp/a.qcow2',
+                    'vol2:b:c.qcow2']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        self.assertEqual(parser.parse_volumes(),
+                         { 'vol1': '/tmp/a.qcow2', 'vol2': 'b:c.qcow2' })
+
+    def test_parse_volumes_not_valid(self):
+        """
+            Checks CloubedArgumentParser.parse_volumes() should raise
+            CloubedArgumentException if the format of one volume is not valid
+        """
+        for volume in [ 'fail', 'fail:', ':fail' ]:
+            sys.argv = ['cloubed', 'export', '--volumes', volume]
+            parser = CloubedArgumentParser('test_description')
+            parser.add_args()
+            parser.parse_args()
+            self.assertRaisesRegex(CloubedArgumentException,
+                                   "format of --volumes parameter is not valid",
+                                   parser.parse_volumes)
+
+    #
+    # CloubedArgumentParser.parse_jobs()
+    #
+
+    def test_parse_jobs(self):
+        """
+            Checks CloubedArgumentParser.parse_jobs() should return the number
+            of jobs, 4 by default, and raise CloubedArgumentException if it is
+            not positive
+        """
+        sys.argv = ['cloubed', 'import', '--volumes', 'vol:file']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        self.assertEqual(parser.parse_jobs(), 4)
+
+        sys.argv = ['cloubed', 'import', '--volumes', 'vol:file',
+                    '--jobs', '8']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        self.assertEqual(parser.parse_jobs(), 8)
+
+        sys.argv = ['cloubed', 'import', '--volumes', 'vol:file',
+                    '--jobs', '0']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        self.assertRaisesRegex(CloubedArgumentException,
+                               "--jobs parameter must be a positive integer",
+                               parser.parse_jobs)
+
+    #
+    # CloubedArgumentParser.parse_cache()
+    #
+
+    def test_parse_cache(self):
+        """
+            Checks CloubedArgumentParser.parse_cache() should return the path
+            and the label of the image to add, None if not defined, and raise
+            CloubedArgumentException if --label is defined without --add
+        """
+        sys.argv = ['cloubed', 'cache']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        self.assertEqual(parser.parse_cache(), (None, None))
+
+        sys.argv = ['cloubed', 'cache', '--add', 'image.qcow2',
+                    '--label', 'debian']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        self.assertEqual(parser.parse_cache(), ('image.qcow2', 'debian'))
+
+        sys.argv = ['cloubed', 'cache', '--label', 'debian']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        self.assertRaisesRegex(CloubedArgumentException,
+                               "--label parameter requires --add parameter",
+                               parser.parse_cache)
+
+    #
+    # CloubedArgumentParser.parse_snapshot()
+    #
+
+    def test_parse_snapshot_ok(self):
+        """
+            Checks CloubedArgumentParser.parse_snapshot() should return the
+            operation, the name of the snapshot and the memory flag
+        """
+        args = [ ([ '--create', 'snap', '--memory' ], ('create', 'snap', True)),
+                 ([ '--list' ], ('list', None, False)),
+                 ([ '--revert', 'snap' ], ('revert', 'snap', False)),
+                 ([ '--delete', 'snap' ], ('delete', 'snap', False)) ]
+        for arg, result in args:
+            sys.argv = ['cloubed', 'snapshot', '--domain', 'dom'] + arg
+            parser = CloubedArgumentParser('test_description')
+            parser.add_args()
+            parser.parse_args()
+            self.assertEqual(parser.parse_snapshot(), result)
+
+    def test_parse_snapshot_not_valid(self):
+        """
+            Checks CloubedArgumentParser.parse_snapshot() should raise
+            CloubedArgumentException if not exactly one operation is given or
+            if --memory is given without --create
+        """
+        for arg in [ [], [ '--create', 'snap', '--delete', 'snap' ] ]:
+            sys.argv = ['cloubed', 'snapshot', '--domain', 'dom'] + arg
+            parser = CloubedArgumentParser('test_description')
+            parser.add_args()
+            parser.parse_args()
+            self.assertRaisesRegex(CloubedArgumentException,
+                                   "snapshot action requires one and only " \
+                                   "one parameter",
+                                   parser.parse_snapshot)
+
+        sys.argv = ['cloubed', 'snapshot', '--domain', 'dom', '--revert',
+                    'snap', '--memory']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        self.assertRaisesRegex(CloubedArgumentException,
+                               "--memory parameter requires --create parameter",
+                               parser.parse_snapshot)
+
+    def test_check_required_checkpoint_no_name(self):
+        """
+            Raises CloubedArgumentException because checkpoint and restore
+            actions require name
+        """
+        for action in [ 'checkpoint', 'restore' ]:
+            sys.argv = ['cloubed', action, '--jobs', '2']
+            parser = CloubedArgumentParser("test_description")
+            parser.add_args()
+            parser.parse_args()
+            self.assertRaisesRegex(CloubedArgumentException,
+                                   "--name is required for {action} action" \
+                                       .format(action=action),
+                                   parser.check_required)
+
+    def test_parse_events(self):
+        """
+            Checks CloubedArgumentParser.parse_events_filter() and
+            CloubedArgumentParser.parse_tail() return the filters of events
+            action and raise CloubedArgumentException if not valid
+        """
+        for (arg, expected) in [ ([], (None, None)),
+                                 (['--event', 'reboot'], ('reboot', None)),
+                                 (['--event', 'stopped:shutdown'],
+                                  ('stopped', 'shutdown')) ]:
+            sys.argv = ['cloubed', 'events', '--tail', '10'] + arg
+            parser = CloubedArgumentParser('test_description')
+            parser.add_args()
+            parser.parse_args()
+            parser.check_optionals()
+            self.assertEqual(parser.parse_events_filter(), expected)
+            self.assertEqual(parser.parse_tail(), 10)
+
+        sys.argv = ['cloubed', 'events', '--event', 'a:b:c', '--tail', '0']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        self.assertRaisesRegex(CloubedArgumentException,
+                               "format of --event parameter is not valid",
+                               parser.parse_events_filter)
+        self.assertRaisesRegex(CloubedArgumentException,
+                               "--tail parameter must be a positive integer",
+                               parser.parse_tail)
+
+    def test_timeline_optionals(self):
+        """
+            Checks CloubedArgumentParser.check_optionals() accepts --domain and
+            --chrome with timeline action and raises CloubedArgumentException
+            with the options of other actions
+        """
+        sys.argv = ['cloubed', 'timeline', '--domain', 'node1',
+                    '--chrome', 'trace.json', '--clear']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        args = parser.parse_args()
+        parser.check_required()
+        parser.check_optionals()
+        self.assertEqual(args.chrome, ['trace.json'])
+        self.assertTrue(args.clear)
+
+        sys.argv = ['cloubed', 'timeline', '--tail', '10']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        self.assertRaisesRegex(CloubedArgumentException,
+                               "--tail is not compatible with timeline " \
+                               "action",
+                               parser.check_optionals)
+
+    def test_validate_optionals(self):
+        """
+            Checks CloubedArgumentParser.check_optionals() raises
+            CloubedArgumentException with the options of other actions for
+            validate action
+        """
+        sys.argv = ['cloubed', 'validate']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        parser.check_required()
+        parser.check_optionals()
+
+        sys.argv = ['cloubed', 'validate', '--domain', 'node1']
+        parser = CloubedArgumentParser('test_description')
+        parser.add_args()
+        parser.parse_args()
+        self.assertRaisesRegex(CloubedArgumentException,
+                               "--domain is not compatible with validate " \
+                               "action",
+                               parser.check_optionals)
+
 loadtestcase(TestCloubedArgumentParser)
@@ -142,6 +142,59 @@ class TestConfigurationItems(CloubedTestCase):
         self.assertIsInstance(self._configuration.storage_pools.pop(),
                               ConfigurationStoragePool)
 
+    def test_parse_items_count(self):
+        """
+            Configuration.__parse_items() should add the replicas of the items
+            with the count parameter in the list of items, starting at the
+            start index
+        """
+        conf = { 'storagepools': [ ],
+                 'storagevolumes': [
+                     { 'name': 'test_storage_volume{index}',
+                       'size': 10,
+                       'count': 2,
+                       'start': 0 },
+                     { 'name': 'test_storage_volume',
+                       'size': 10 } ],
+                 'networks': [ ],
+                 'domains': [ ] }
+
+        del self._configuration.storage_volumes[:]
+        self._configuration._Configuration__parse_items(conf)
+        self.assertEqual([ storage_volume.name for storage_volume \
+                           in self._configuration.storage_volumes ],
+                         [ 'test_storage_volume0',
+                           'test_storage_volume1',
+                           'test_storage_volume' ])
+
+    def test_parse_items_disks(self):
+        """
+            Configuration.__parse_items() should add the storage volumes of
+            the disks section of the domains and of all their replicas in the
+            list of storage volumes
+        """
+        domain = { 'cpu': 1,
+                   'memory': 1,
+                   'netifs': [],
+                   'disks': [ { 'device': 'sda',
+                                'name': 'test_root{index}',
+                                'size': 10 } ] }
+        conf = { 'storagepools': [ ],
+                 'storagevolumes': [ ],
+                 'networks': [ ],
+                 'domains': [ dict(domain, name='test_domain{index}',
+                                   count=2),
+                              dict(domain, name='test_domain',
+                                   disks=[ { 'device': 'sda',
+                                             'name': 'test_root',
+                                             'size': 10 } ]) ] }
+
+        del self._configuration.storage_volumes[:]
+        self._configuration._Configuration__parse_items(conf)
+        self.assertEqual([ storage_volume.name for storage_volume \
+                           in self._configuration.storage_volumes ],
+                         [ 'test_root1', 'test_root2', 'test_root' ])
+
     def test_parse_items_missing_section(self):
         """
             Configuration.__parse_items() should raise
@@ -231,7 +284,148 @@ class TestConfigurationTemplates(CloubedTestCase):
                                     invalid_conf)
 
 
+class TestConfigurationReferences(CloubedTestCase):
+
+    def setUp(self):
+        self._conf = copy.deepcopy(conf)
+
+    def test_check_references_ok(self):
+        """
+            Configuration should resolve the references between the items
+            whatever their order in the sections
+        """
+        self._conf['storagevolumes'].insert(0,
+            { 'name': 'test_storage_volume2',
+              'storagepool': 'test_storage_pool',
+              'size': 10,
+              'backing': 'test_storage_volume' })
+        self._conf['domains'][0]['netifs'] = [ { 'network': 'test_network' } ]
+        self._conf['domains'][0]['disks'] = [
+            { 'device': 'sda',
+              'storage_volume': 'test_storage_volume2' } ]
+        configuration = Configuration(MockConfigurationLoader(self._conf))
+        self.assertEqual(len(configuration.storage_volumes), 2)
+
+    def test_check_references_errors(self):
+        """
+            Configuration should raise CloubedConfigurationException with all
+            the errors of the items and of the references between them, except
+            the references to the items which are not valid
+        """
+        self._conf['storagevolumes'].append(
+            { 'name': 'test_storage_volume2',
+              'storagepool': 'fail_storage_pool',
+              'size': 10,
+              'backing': 'fail_storage_volume' })
+        self._conf['networks'].append({ 'name': 'test_network2',
+                                        'forward': 'fail' })
+        self._conf['domains'][0]['netifs'] = [
+            { 'network': 'test_network' },
+            { 'network': 'fail_network' },
+            { 'network': 'test_network2' } ]
+        self._conf['domains'][0]['disks'] = [
+            { 'device': 'sda',
+              'storage_volume': 'fail_storage_volume' } ]
+        # the invalid domain is not reported as defined more than once
+        self._conf['domains'].append({ 'name': 'test_domain',
+                                       'cpu': 1,
+                                       'memory': 1,
+                                       'netifs': [] })
+        self._conf['domains'].append({ 'name': 'test_domain',
+                                       'cpu': 1,
+                                       'memory': 1,
+                                       'netifs': [],
+                                       'disks': [] })
+
+        with self.assertRaises(CloubedConfigurationException) as context:
+            Configuration(MockConfigurationLoader(self._conf))
+        self.assertEqual(context.exception.errors,
+            [ "Forward parameter of network test_network2 is not valid",
+              "disks section of domain test_domain is missing",
+              "domain test_domain is defined more than once",
+              "storage pool fail_storage_pool of storage volume " \
+              "test_storage_volume2 is not defined",
+              "backing volume fail_storage_volume of storage volume " \
+              "test_storage_volume2 is not defined",
+              "network fail_network of netif 1 of domain test_domain is not " \
+              "defined",
+              "storage volume fail_storage_volume of disk sda of domain " \
+              "test_domain is not defined" ])
+        self.assertRegex(str(context.exception),
+                         "^7 errors found in configuration:\n  - Forward")
+
+    def test_check_references_count_errors(self):
+        """
+            Configuration should not report the references to the replicas of
+            a counted item which is not valid, nor to the storage volumes of
+            its disks section
+        """
+        self._conf['networks'].append({ 'name': 'net{index}',
+                                        'count': 2,
+                                        'forward': 'fail' })
+        self._conf['domains'].append({ 'name': 'node{index:03d}',
+                                       'count': 2,
+                                       'cpu': 'fail',
+                                       'memory': 1,
+                                       'netifs': [],
+                                       'disks': [
+                                           { 'device': 'sda',
+                                             'name': 'node{index:03d}-root',
+                                             'storagepool':
+                                                 'test_storage_pool',
+                                             'size': 10 } ] })
+        self._conf['domains'][0]['netifs'] = [ { 'network': 'net2' } ]
+        self._conf['domains'][0]['disks'] = [
+            { 'device': 'sda',
+              'storage_volume': 'node001-root' } ]
+
+        with self.assertRaises(CloubedConfigurationException) as context:
+            Configuration(MockConfigurationLoader(self._conf))
+        self.assertEqual(len(context.exception.errors), 2)
+        self.assertNotRegex(str(context.exception), 'not defined')
+
+    def test_check_references_mtu(self):
+        """
+            Configuration should report the netifs whose mtu exceeds the mtu
+            of their network
+        """
+        self._conf['networks'][0]['mtu'] = 1500
+        self._conf['networks'].append({ 'name': 'test_network2' })
+        self._conf['domains'][0]['netifs'] = [
+            { 'network': 'test_network' },
+            { 'network': 'test_network', 'mtu': 1400 },
+            { 'network': 'test_network', 'mtu': 9000 },
+            { 'network': 'test_network2', 'mtu': 9000 } ]
+
+        with self.assertRaises(CloubedConfigurationException) as context:
+            Configuration(MockConfigurationLoader(self._conf))
+        self.assertEqual(context.exception.errors,
+            [ "mtu 9000 of netif 2 of domain test_domain exceeds mtu 1500 " \
+              "of network test_network" ])
+
+    def test_check_references_qos_errors(self):
+        """
+            Configuration should report all the errors of the qos section
+            along with the errors of the items
+        """
+        self._conf['qos'] = [ 'fail',
+                              { 'name': 'test_qos',
+                                'inbound': 'fail' },
+                              { 'inbound': { 'average': 1000 } } ]
+        self._conf['networks'].append({ 'name': 'test_network2',
+                                        'forward': 'fail' })
+
+        with self.assertRaises(CloubedConfigurationException) as context:
+            Configuration(MockConfigurationLoader(self._conf))
+        errors = context.exception.errors
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(errors[0], "format of one qos object is not valid")
+        self.assertEqual(errors[-1],
+                         "Forward parameter of network test_network2 is not " \
+                         "valid")
+
 loadtestcase(TestConfiguration)
 loadtestcase(TestConfigurationTestbed)
 loadtestcase(TestConfigurationItems)
 loadtestcase(TestConfigurationTemplates)
+loadtestcase(TestConfigurationReferences)
@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import json
+import mock
+import pickle
+import datetime
+import tempfile
+
+from CloubedTests import *
+
+from cloubed.conf.ConfigurationCache import ConfigurationCache
+from cloubed.conf.ConfigurationLoader import ConfigurationLoader
+from cloubed.conf.Configuration import Configuration
+from cloubed.CloubedException import CloubedConfigurationException
+
+yaml_content = """testbed: test_testbed
+storagevolumes:
+  - name: test_storage_volume
+    size: 10
+networks:
+  - name: test_network
+domains:
+  - name: test_domain
+    cpu: 1
+    memory: 1
+    netifs:
+      - network: test_network
+    disks:
+      - device: sda
+        storage_volume: test_storage_volume
+"""
+
+class TestConfigurationCache(CloubedTestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        self.addCleanup(os.chdir, cwd)
+        self.yaml_path = os.path.join(self.tmpdir.name, 'cloubed.yaml')
+        self.__write(yaml_content)
+        self.cache = ConfigurationCache()
+        # the cloubed.conf.ConfigurationCache name is shadowed by the class
+        self.loader_m = mock.patch.object(
+                            sys.modules['cloubed.conf.ConfigurationCache'],
+                            'ConfigurationLoader',
+                            side_effect=ConfigurationLoader).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def __write(self, content):
+        with open(self.yaml_path, 'w') as yaml_file:
+            yaml_file.write(content)
+
+    def __parsed(self):
+        """Returns the number of times the YAML file has been parsed"""
+        return self.loader_m.call_count
+
+    def test_load(self):
+        """
+            ConfigurationCache.load() should parse and validate the YAML file
+            only when it is not cached or when its content has changed
+        """
+        configuration = self.cache.load(self.yaml_path)
+        self.assertEqual(configuration.testbed, 'test_testbed')
+        self.assertEqual(self.__parsed(), 1)
+        with open(self.cache.path) as cache_file:
+            entry = json.load(cache_file)
+        # the validated configuration is cached as plain JSON data
+        objects = entry['configuration']['objects']
+        self.assertEqual(entry['configuration']['root'], { 'ref': 0 })
+        self.assertEqual(objects[0]['class'], 'Configuration')
+        self.assertIsNone(objects[0]['state']['_loader'])
+
+        with mock.patch.object(Configuration,
+                               '_Configuration__check_references') as check_m:
+            configuration = self.cache.load(self.yaml_path)
+        self.assertEqual(self.__parsed(), 1)
+        check_m.assert_not_called()
+        self.assertIsInstance(configuration, Configuration)
+        self.assertEqual([ domain.name for domain in configuration.domains ],
+                         [ 'test_domain' ])
+        self.assertEqual(configuration.domains[0].netifs[0]['network'],
+                         'test_network')
+        # the objects shared in the configuration are still shared
+        self.assertIs(configuration.domains[0].conf, configuration)
+
+        self.__write(yaml_content.replace('test_domain', 'other_domain'))
+        configuration = self.cache.load(self.yaml_path)
+        self.assertEqual(self.__parsed(), 2)
+        self.assertEqual([ domain.name for domain in configuration.domains ],
+                         [ 'other_domain' ])
+
+    def test_load_corrupted(self):
+        """
+            ConfigurationCache.load() should parse the YAML file again when
+            the cache is corrupted
+        """
+        self.cache.load(self.yaml_path)
+        with open(self.cache.path, 'wb') as cache_file:
+            cache_file.write(b'garbage')
+        configuration = self.cache.load(self.yaml_path)
+        self.assertEqual(configuration.testbed, 'test_testbed')
+        self.assertEqual(self.__parsed(), 2)
+
+        # a pickle is never loaded
+        with open(self.cache.path, 'wb') as cache_file:
+            pickle.dump((ConfigurationCache.key(yaml_content.encode()),
+                         configuration), cache_file)
+        configuration = self.cache.load(self.yaml_path)
+        self.assertEqual(configuration.testbed, 'test_testbed')
+        self.assertEqual(self.__parsed(), 3)
+
+    def test_load_unknown_class(self):
+        """
+            ConfigurationCache.load() should never rebuild the objects of
+            classes which are not part of the configuration
+        """
+        entry = { 'key': ConfigurationCache.key(yaml_content.encode()),
+                  'configuration': {
+                      'root': { 'ref': 0 },
+                      'objects': [ { 'class': 'Popen',
+                                     'state': { 'args': 'true' } } ] } }
+        with open(self.cache.path, 'w') as cache_file:
+            json.dump(entry, cache_file)
+        configuration = self.cache.load(self.yaml_path)
+        self.assertEqual(configuration.testbed, 'test_testbed')
+        self.assertEqual(self.__parsed(), 1)
+
+    def test_load_not_cacheable(self):
+        """
+            ConfigurationCache.load() should not cache the configuration
+            which holds values that cannot be represented in JSON
+        """
+        init = Configuration.__init__
+        def init_date(configuration, loader):
+            init(configuration, loader)
+            configuration.created = datetime.date(2020, 1, 1)
+        with mock.patch.object(Configuration, '__init__', init_date):
+            configuration = self.cache.load(self.yaml_path)
+        self.assertEqual(configuration.testbed, 'test_testbed')
+        self.assertFalse(os.path.exists(self.cache.path))
+
+    def test_load_invalid(self):
+        """
+            ConfigurationCache.load() should raise
+            CloubedConfigurationException if the file cannot be opened or if
+            the configuration is not valid, without caching it
+        """
+        self.assertRaisesRegex(CloubedConfigurationException,
+                               "Not able to open file .*/nonexisting.yaml",
+                               self.cache.load,
+                               os.path.join(self.tmpdir.name,
+                                            'nonexisting.yaml'))
+
+        self.__write(yaml_content.replace('testbed: test_testbed\n', ''))
+        for _ in range(2):
+            self.assertRaisesRegex(CloubedConfigurationException,
+                                   "testbed parameter is missing",
+                                   self.cache.load,
+                                   self.yaml_path)
+        self.assertEqual(self.__parsed(), 2)
+        self.assertFalse(os.path.exists(self.cache.path))
+
+loadtestcase(TestConfigurationCache)
@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 
 import os
+import re
 
 from CloubedTests import *
 
@@ -463,6 +464,45 @@ class TestConfigurationDomainNetifs(CloubedTestCase):
                  self.domain_conf._ConfigurationDomain__parse_netifs,
                  invalid_config)
 
+    def test_parse_netifs_invalid_mtu(self):
+        """
+            ConfigurationDomain.__parse_netifs() should raise
+            CloubedConfigurationException when netifs in parameter have invalid
+            MTU format or value
+        """
+
+        invalid_config = { 'netifs': [ { 'network': 'test', 'mtu': '1500' } ] }
+
+        self.assertRaisesRegex(
+                 CloubedConfigurationException,
+                 "format of mtu of netif 0 of domain test_name is not valid",
+                 self.domain_conf._ConfigurationDomain__parse_netifs,
+                 invalid_config)
+
+        invalid_config = { 'netifs': [ { 'network': 'test', 'mtu': 42 } ] }
+
+        self.assertRaisesRegex(
+                 CloubedConfigurationException,
+                 "mtu of netif 0 of domain test_name must be between 68 and " \
+                 "65535",
+                 self.domain_conf._ConfigurationDomain__parse_netifs,
+                 invalid_config)
+
+    def test_parse_netifs_undefined_qos(self):
+        """
+            ConfigurationDomain.__parse_netifs() should raise
+            CloubedConfigurationException when netifs in parameter refer to an
+            undefined QoS class
+        """
+
+        invalid_config = { 'netifs': [ { 'network': 'test', 'qos': 'fail' } ] }
+
+        self.assertRaisesRegex(
+                 CloubedConfigurationException,
+                 "qos fail of netif 0 of domain test_name is not defined",
+                 self.domain_conf._ConfigurationDomain__parse_netifs,
+                 invalid_config)
+
 class TestConfigurationDomainDisks(CloubedTestCase):
 
     def setUp(self):
@@ -950,6 +990,29 @@ class TestConfigurationDomainTemplates(CloubedTestCase):
         self.assertEqual(self.domain_conf.template_files, [])
         self.assertEqual(self.domain_conf._template_vars, {})
 
+    def test_parse_templates_without_output(self):
+        """
+            ConfigurationDomain.__parse_templates() should accept template
+            files without output file
+        """
+
+        conf = { 'templates':
+                     { 'files': [ { 'name': 'test_template_file_name',
+                                    'input': 'test_template_file_input' } ] } }
+        self.domain_conf._ConfigurationDomain__parse_templates(conf)
+        self.assertEqual(len(self.domain_conf.template_files), 1)
+
+        invalid_conf = { 'templates':
+                             { 'files': [ { 'name': 'test_template_file_name',
+                                            'input': 'test_template_file_input',
+                                            'output': 42 } ] } }
+        self.assertRaisesRegex(
+                 CloubedConfigurationException,
+                 "format of output parameter of a template file of domain " \
+                 "test_name is not valid",
+                 self.domain_conf._ConfigurationDomain__parse_templates,
+                 invalid_conf)
+
     def test_parse_templates_invalid_files_format(self):
         """
             ConfigurationDomain.__parse_templates() should raise
@@ -1034,6 +1097,113 @@ class TestConfigurationDomainTemplates(CloubedTestCase):
                  self.domain_conf._ConfigurationDomain__parse_templates,
                  invalid_conf)
 
+class TestConfigurationDomainCount(CloubedTestCase):
+
+    def setUp(self):
+        self._loader = MockConfigurationLoader(conf_minimal)
+        self.conf = Configuration(self._loader)
+        self.conf.storage_volumes = []
+        self._domain_item = { 'name': 'node{index:03d}',
+                              'count': 3,
+                              'cpu': 1,
+                              'memory': 1,
+                              'netifs': [
+                                  { 'network': 'test_netif',
+                                    'ip': '10.0.0.254',
+                                    'mac': '52:54:00:00:00:ff' },
+                                  { 'network': 'test_netif2' } ],
+                              'disks': [
+                                  { 'device': 'sda',
+                                    'name': 'node{index:03d}-root',
+                                    'storagepool': 'test_storage_pool',
+                                    'size': 10 },
+                                  { 'device': 'sdb',
+                                    'storage_volume': 'shared' } ],
+                              'templates': {
+                                  'files': [
+                                      { 'name': 'preseed',
+                                        'input': 'preseed.cfg',
+                                        'output': 'http/{index}.cfg' } ] } }
+
+    def test_parse_count_ok(self):
+        """
+            ConfigurationDomain.replicas() should return the replicas of the
+            domain with count parameter with their names, addresses, disks and
+            templates outputs formatted with their index, and the storage
+            volumes of their disks section, without adding them to the
+            configuration
+        """
+        domain_conf = ConfigurationDomain(self.conf, self._domain_item)
+        self.assertEqual(self.conf.storage_volumes, [])
+
+        replicas = list(domain_conf.replicas())
+        self.assertEqual([ replica.name for replica in replicas ],
+                         [ 'node001', 'node002', 'node003' ])
+        self.assertEqual([ replica.netifs[0]['ip'] for replica in replicas ],
+                         [ '10.0.0.254', '10.0.0.255', '10.0.1.0' ])
+        self.assertEqual([ replica.netifs[0]['mac'] for replica in replicas ],
+                         [ '52:54:00:00:00:ff',
+                           '52:54:00:00:01:00',
+                           '52:54:00:00:01:01' ])
+        self.assertNotIn('ip', replicas[2].netifs[1])
+        self.assertEqual([ disk['storage_volume'] \
+                           for disk in replicas[1].disks ],
+                         [ 'node002-root', 'shared' ])
+        self.assertEqual([ storage_volume.name for replica in replicas \
+                           for storage_volume \
+                           in replica.get_storage_volumes() ],
+                         [ 'node001-root', 'node002-root', 'node003-root' ])
+        self.assertEqual([ storage_volume.name for storage_volume \
+                           in domain_conf.get_storage_volumes() ],
+                         [ 'node{index:03d}-root' ])
+        self.assertEqual(self.conf.storage_volumes, [])
+        self.assertEqual(replicas[2].template_files[0]['output'],
+                         'http/3.cfg')
+        self.assertEqual(domain_conf.netifs[0]['ip'], '10.0.0.254')
+
+        self._domain_item['start'] = 0
+        del self._domain_item['count']
+        self.assertRaisesRegex(CloubedConfigurationException,
+                                "start parameter of domain node{index:03d} " \
+                                "requires count parameter",
+                                ConfigurationDomain,
+                                self.conf,
+                                self._domain_item)
+
+    def test_parse_count_invalid(self):
+        """
+            ConfigurationDomain should raise CloubedConfigurationException if
+            the count parameter or the patterns of the replicas are not valid
+        """
+        for (parameters, error) in [
+              ({ 'count': 0 },
+               "format of count parameter of domain node{index:03d} is not " \
+               "valid"),
+              ({ 'start': 'fail' },
+               "format of start parameter of domain node{index:03d} is not " \
+               "valid"),
+              ({ 'name': 'node' },
+               "name of domain node must contain the {index} pattern with " \
+               "count parameter"),
+              ({ 'name': 'node{id}' },
+               "pattern node{id} of domain node{id} is not valid"),
+              ({ 'netifs': [ { 'network': 'test_netif',
+                               'ip': '255.255.255.254' } ] },
+               "ip of netif 0 of domain node{index:03d} is not valid with " \
+               "count parameter"),
+              ({ 'disks': [ { 'device': 'sda',
+                              'name': 'root',
+                              'storagepool': 'test_storage_pool',
+                              'size': 10 } ] },
+               "name of disk root of domain node{index:03d} must contain " \
+               "the {index} pattern with count parameter") ]:
+            domain_item = dict(self._domain_item, **parameters)
+            self.assertRaisesRegex(CloubedConfigurationException,
+                                    re.escape(error),
+                                    ConfigurationDomain,
+                                    self.conf,
+                                    domain_item)
+
 loadtestcase(TestConfigurationDomain)
 loadtestcase(TestConfigurationDomainCpu)
 loadtestcase(TestConfigurationDomainMemory)
@@ -1043,3 +1213,4 @@ loadtestcase(TestConfigurationDomainDisks)
 loadtestcase(TestConfigurationDomainCdrom)
 loadtestcase(TestConfigurationDomainVirtfs)
 loadtestcase(TestConfigurationDomainTemplates)
+loadtestcase(TestConfigurationDomainCount)
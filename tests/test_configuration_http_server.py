@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+
+import os
+
+from CloubedTests import *
+
+from cloubed.conf.Configuration import Configuration
+from cloubed.conf.ConfigurationHTTPServer import ConfigurationHTTPServer
+from cloubed.CloubedException import CloubedConfigurationException
+from cloubed.Utils import state_path
+from Mock import MockConfigurationLoader, conf_minimal
+
+class TestConfigurationHTTPServer(CloubedTestCase):
+
+    def setUp(self):
+        self._loader = MockConfigurationLoader(conf_minimal)
+        self.conf = Configuration(self._loader)
+        self.http_server_conf = ConfigurationHTTPServer(self.conf, {})
+
+    def test_attr_name(self):
+        """
+            ConfigurationHTTPServer.name should always be httpserver
+        """
+        self.assertEqual(self.http_server_conf.name, 'httpserver')
+
+    def test_parse_proxy_ok(self):
+        """
+            ConfigurationHTTPServer.__parse_proxy() should parse valid values
+            without errors and set proxy instance attributes properly
+        """
+        conf = { 'proxy': { 'path': '/test_path', 'size': 5 } }
+        self.http_server_conf._ConfigurationHTTPServer__parse_proxy(conf)
+        self.assertEqual(self.http_server_conf.proxy_path, '/test_path')
+        self.assertEqual(self.http_server_conf.proxy_size, 5)
+        self.assertTrue(self.http_server_conf.has_proxy())
+
+        # relative path and default size
+        conf = { 'proxy': { 'path': 'test_path' } }
+        self.http_server_conf._ConfigurationHTTPServer__parse_proxy(conf)
+        self.assertEqual(self.http_server_conf.proxy_path,
+                         os.path.join(os.getcwd(), 'test_path'))
+        self.assertEqual(self.http_server_conf.proxy_size, 10)
+
+        # default path in state directory
+        conf = { 'proxy': True }
+        self.http_server_conf._ConfigurationHTTPServer__parse_proxy(conf)
+        self.assertEqual(self.http_server_conf.proxy_path,
+                         state_path('proxy'))
+
+        conf = { }
+        self.http_server_conf._ConfigurationHTTPServer__parse_proxy(conf)
+        self.assertFalse(self.http_server_conf.has_proxy())
+
+    def test_parse_proxy_invalid(self):
+        """
+            ConfigurationHTTPServer.__parse_proxy() should raise a
+            CloubedConfigurationException if the format of the proxy parameter
+            in the configuration is not valid
+        """
+        invalid_confs = [ ({ 'proxy': 42 },
+                           "format of the proxy parameter of the http server " \
+                           "is not valid"),
+                          ({ 'proxy': { 'fail': 42 } },
+                           "unknown parameter fail in proxy section of the " \
+                           "http server"),
+                          ({ 'proxy': { 'path': 42 } },
+                           "format of the path parameter of the proxy of the " \
+                           "http server is not valid"),
+                          ({ 'proxy': { 'size': 0 } },
+                           "format of the size parameter of the proxy of the " \
+                           "http server is not valid") ]
+        for (invalid_conf, message) in invalid_confs:
+            self.assertRaisesRegex(
+                CloubedConfigurationException,
+                message,
+                self.http_server_conf._ConfigurationHTTPServer__parse_proxy,
+                invalid_conf)
+
+    def test_parse_uploads(self):
+        """
+            ConfigurationHTTPServer.__parse_uploads() should parse valid values
+            and raise CloubedConfigurationException with invalid values
+        """
+        conf = { 'uploads': True }
+        self.http_server_conf._ConfigurationHTTPServer__parse_uploads(conf)
+        self.assertEqual(self.http_server_conf.uploads_path,
+                         os.path.join(os.getcwd(), 'uploads'))
+        self.assertTrue(self.http_server_conf.has_uploads())
+
+        conf = { 'uploads': { 'path': '/test_path' } }
+        self.http_server_conf._ConfigurationHTTPServer__parse_uploads(conf)
+        self.assertEqual(self.http_server_conf.uploads_path, '/test_path')
+
+        conf = { }
+        self.http_server_conf._ConfigurationHTTPServer__parse_uploads(conf)
+        self.assertFalse(self.http_server_conf.has_uploads())
+
+        invalid_confs = [ ({ 'uploads': 'yes' },
+                           "format of the uploads parameter of the http " \
+                           "server is not valid"),
+                          ({ 'uploads': { 'size': 1 } },
+                           "unknown parameter size in uploads section of the " \
+                           "http server"),
+                          ({ 'uploads': { 'path': 42 } },
+                           "format of the path parameter of the uploads of " \
+                           "the http server is not valid") ]
+        for (invalid_conf, message) in invalid_confs:
+            self.assertRaisesRegex(
+                CloubedConfigurationException,
+                message,
+                self.http_server_conf._ConfigurationHTTPServer__parse_uploads,
+                invalid_conf)
+
+    def test_parse_networks(self):
+        """
+            ConfigurationHTTPServer.__parse_networks() should parse valid
+            values and raise CloubedConfigurationException with invalid values
+        """
+        conf = { }
+        self.http_server_conf._ConfigurationHTTPServer__parse_networks(conf)
+        self.assertTrue(self.http_server_conf.listens('test_network'))
+
+        conf = { 'networks': [ 'test_network' ] }
+        self.http_server_conf._ConfigurationHTTPServer__parse_networks(conf)
+        self.assertTrue(self.http_server_conf.listens('test_network'))
+        self.assertFalse(self.http_server_conf.listens('other_network'))
+
+        for invalid_conf in [ { 'networks': 'test_network' },
+                              { 'networks': [ 42 ] } ]:
+            self.assertRaisesRegex(
+                CloubedConfigurationException,
+                "format of the networks parameter of the http server is " \
+                "not valid",
+                self.http_server_conf._ConfigurationHTTPServer__parse_networks,
+                invalid_conf)
+
+    def test_parse_roots(self):
+        """
+            ConfigurationHTTPServer.__parse_roots() should parse valid values
+            and raise CloubedConfigurationException with invalid values
+        """
+        conf = { 'roots': { 'test_network': '/test_path',
+                            'other_network': 'test_path' } }
+        self.http_server_conf._ConfigurationHTTPServer__parse_roots(conf)
+        self.assertEqual(self.http_server_conf.get_root('test_network'),
+                         '/test_path')
+        self.assertEqual(self.http_server_conf.get_root('other_network'),
+                         os.path.join(os.getcwd(), 'test_path'))
+        self.assertEqual(self.http_server_conf.get_root('third_network'),
+                         os.getcwd())
+
+        invalid_confs = [ ({ 'roots': [ '/test_path' ] },
+                           "format of the roots parameter of the http " \
+                           "server is not valid"),
+                          ({ 'roots': { 'test_network': 42 } },
+                           "format of the root of network test_network of " \
+                           "the http server is not valid") ]
+        for (invalid_conf, message) in invalid_confs:
+            self.assertRaisesRegex(
+                CloubedConfigurationException,
+                message,
+                self.http_server_conf._ConfigurationHTTPServer__parse_roots,
+                invalid_conf)
+
+    def test_check_networks(self):
+        """
+            ConfigurationHTTPServer.check_networks() should raise
+            CloubedConfigurationException if a network is not defined
+        """
+        self.http_server_conf.networks = [ 'test_network' ]
+        self.http_server_conf.roots = { 'other_network': '/test_path' }
+        self.http_server_conf.check_networks([ 'test_network',
+                                               'other_network' ])
+        self.assertRaisesRegex(
+            CloubedConfigurationException,
+            "network other_network of the http server is not defined",
+            self.http_server_conf.check_networks,
+            [ 'test_network' ])
+
+loadtestcase(TestConfigurationHTTPServer)
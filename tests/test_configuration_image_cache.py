@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+
+import os
+
+from CloubedTests import *
+
+from cloubed.conf.Configuration import Configuration
+from cloubed.conf.ConfigurationImageCache import ConfigurationImageCache
+from cloubed.CloubedException import CloubedConfigurationException
+from Mock import MockConfigurationLoader, conf_minimal
+
+class TestConfigurationImageCache(CloubedTestCase):
+
+    def setUp(self):
+        image_cache_item = { 'path': '/test_path',
+                             'size': 50 }
+        self._loader = MockConfigurationLoader(conf_minimal)
+        self.conf = Configuration(self._loader)
+        self.image_cache_conf = ConfigurationImageCache(self.conf,
+                                                        image_cache_item)
+
+    def test_attr_name(self):
+        """
+            ConfigurationImageCache.name should always be imagecache
+        """
+        self.assertEqual(self.image_cache_conf.name, 'imagecache')
+
+    def test_attr_path(self):
+        """
+            ConfigurationImageCache.path should be the path of the image cache
+        """
+        self.assertEqual(self.image_cache_conf.path, '/test_path')
+
+    def test_parse_size_ok(self):
+        """
+            ConfigurationImageCache.__parse_size() should parse valid values
+            without errors and set size instance attribute properly
+        """
+        conf = { 'size': 10 }
+        self.image_cache_conf._ConfigurationImageCache__parse_size(conf)
+        self.assertEqual(self.image_cache_conf.size, 10)
+
+        # size parameter is optional, it defaults to 20GB
+        conf = { }
+        self.image_cache_conf._ConfigurationImageCache__parse_size(conf)
+        self.assertEqual(self.image_cache_conf.size, 20)
+
+    def test_parse_size_invalid(self):
+        """
+            ConfigurationImageCache.__parse_size() should raise a
+            CloubedConfigurationException if the format of size parameter in
+            the configuration is not valid
+        """
+
+        invalid_confs = [ { 'size': 'test' },
+                          { 'size': 0      },
+                          { 'size': -1     },
+                          { 'size': None   } ]
+        for invalid_conf in invalid_confs:
+            self.assertRaisesRegex(
+                     CloubedConfigurationException,
+                     "format of the size parameter of the image cache is " \
+                     "not valid",
+                     self.image_cache_conf._ConfigurationImageCache__parse_size,
+                     invalid_conf)
+
+class TestConfigurationImageCacheSection(CloubedTestCase):
+
+    def test_section_ok(self):
+        """
+            Configuration.image_cache should be the parsed image cache if the
+            imagecache section is defined, None otherwise
+        """
+        conf = dict(conf_minimal)
+        conf['imagecache'] = { 'path': 'test_cache' }
+        configuration = Configuration(MockConfigurationLoader(conf))
+        self.assertIsInstance(configuration.image_cache,
+                              ConfigurationImageCache)
+        self.assertEqual(configuration.image_cache.path,
+                         os.path.join(os.getcwd(), 'test_cache'))
+
+        configuration = Configuration(MockConfigurationLoader(conf_minimal))
+        self.assertIsNone(configuration.image_cache)
+
+    def test_section_invalid(self):
+        """
+            Configuration should raise a CloubedConfigurationException if the
+            format of the imagecache section is not valid
+        """
+        conf = dict(conf_minimal)
+        conf['imagecache'] = [ 'test_cache' ]
+        self.assertRaisesRegex(
+                 CloubedConfigurationException,
+                 "format of the imagecache section is not valid",
+                 Configuration,
+                 MockConfigurationLoader(conf))
+
+loadtestcase(TestConfigurationImageCache)
+loadtestcase(TestConfigurationImageCacheSection)
@@ -747,6 +747,186 @@ class TestConfigurationNetworkPxe(CloubedTestCase):
              self.network_conf._ConfigurationNetwork__parse_pxe,
              invalid_conf)
 
+    def test_parse_tftp(self):
+        """
+            ConfigurationNetwork.__parse_tftp() should parse valid values,
+            default to libvirt with pxe and raise
+            CloubedConfigurationException with invalid values
+        """
+        conf = { 'ip_host': '10.0.0.1',
+                 'netmask': '255.255.255.0',
+                 'dhcp':
+                     { 'start': '10.0.0.100',
+                       'end'  : '10.0.0.200' },
+                 'pxe': '/test_tftp_dir/test_boot_file' }
+        self.network_conf._ConfigurationNetwork__parse_forward_mode(conf)
+        self.network_conf._ConfigurationNetwork__parse_ip_host_netmask(conf)
+        self.network_conf._ConfigurationNetwork__parse_dhcp(conf)
+        self.network_conf._ConfigurationNetwork__parse_pxe(conf)
+        self.network_conf._ConfigurationNetwork__parse_tftp(conf)
+        self.assertEqual(self.network_conf.tftp, 'libvirt')
+
+        self.network_conf._ConfigurationNetwork__parse_tftp(
+            { 'tftp': 'internal' })
+        self.assertEqual(self.network_conf.tftp, 'internal')
+
+        self.assertRaisesRegex(
+             CloubedConfigurationException,
+             "tftp parameter of network {network} must be either libvirt or " \
+             "internal".format(network=self.network_conf.name),
+             self.network_conf._ConfigurationNetwork__parse_tftp,
+             { 'tftp': 'fail' })
+        self.assertRaisesRegex(
+             CloubedConfigurationException,
+             "format of tftp parameter of network {network} is not valid" \
+                 .format(network=self.network_conf.name),
+             self.network_conf._ConfigurationNetwork__parse_tftp,
+             { 'tftp': 42 })
+
+        self.network_conf._ConfigurationNetwork__parse_pxe({})
+        self.network_conf._ConfigurationNetwork__parse_tftp({})
+        self.assertEqual(self.network_conf.tftp, None)
+        self.assertRaisesRegex(
+             CloubedConfigurationException,
+             "tftp parameter of network {network} cannot be set without " \
+             "pxe".format(network=self.network_conf.name),
+             self.network_conf._ConfigurationNetwork__parse_tftp,
+             { 'tftp': 'internal' })
+
+class TestConfigurationNetworkDirect(CloubedTestCase):
+
+    def setUp(self):
+        self._network_item = valid_network_item
+        self._loader = MockConfigurationLoader(conf_minimal)
+        self.conf = Configuration(self._loader)
+        self.network_conf = ConfigurationNetwork(self.conf, self._network_item)
+
+    def test_parse_direct_ok(self):
+        """
+            ConfigurationNetwork.__parse_direct() should parse valid values
+            without errors and set direct_interface and direct_mode instance
+            attributes
+        """
+        conf = { 'forward': 'direct',
+                 'interface': 'eth0' }
+        self.network_conf._ConfigurationNetwork__parse_forward_mode(conf)
+        self.network_conf._ConfigurationNetwork__parse_direct(conf)
+        self.assertEqual(self.network_conf.direct_interface, 'eth0')
+        self.assertEqual(self.network_conf.direct_mode, 'bridge')
+
+        conf = { 'forward': 'direct',
+                 'interface': 'eth1',
+                 'mode': 'passthrough' }
+        self.network_conf._ConfigurationNetwork__parse_direct(conf)
+        self.assertEqual(self.network_conf.direct_interface, 'eth1')
+        self.assertEqual(self.network_conf.direct_mode, 'passthrough')
+
+    def test_parse_direct_wrong_forward(self):
+        """
+            ConfigurationNetwork.__parse_direct() should raise
+            CloubedConfigurationException if interface or mode parameters are
+            defined on a network with forward mode != direct
+        """
+        invalid_conf = { 'forward': 'nat',
+                         'interface': 'eth0' }
+        self.network_conf._ConfigurationNetwork__parse_forward_mode(invalid_conf)
+        self.assertRaisesRegex(
+             CloubedConfigurationException,
+             "interface parameter has no sense on network {network} with " \
+             "forwarding mode nat".format(network=self.network_conf.name),
+             self.network_conf._ConfigurationNetwork__parse_direct,
+             invalid_conf)
+
+    def test_parse_direct_invalid(self):
+        """
+            ConfigurationNetwork.__parse_direct() should raise
+            CloubedConfigurationException if the interface is missing or if the
+            mode is not valid
+        """
+        invalid_conf = { 'forward': 'direct' }
+        self.network_conf._ConfigurationNetwork__parse_forward_mode(invalid_conf)
+        self.assertRaisesRegex(
+             CloubedConfigurationException,
+             "interface parameter is missing on network {network} with " \
+             "direct forwarding mode".format(network=self.network_conf.name),
+             self.network_conf._ConfigurationNetwork__parse_direct,
+             invalid_conf)
+
+        invalid_conf = { 'forward': 'direct',
+                         'interface': 'eth0',
+                         'mode': 'private' }
+        self.assertRaisesRegex(
+             CloubedConfigurationException,
+             "mode parameter of network {network} is not valid" \
+                 .format(network=self.network_conf.name),
+             self.network_conf._ConfigurationNetwork__parse_direct,
+             invalid_conf)
+
+    def test_parse_direct_address(self):
+        """
+            ConfigurationNetwork.__parse_ip_host_netmask() should raise
+            CloubedConfigurationException if address is defined on a network
+            with direct forward mode
+        """
+        invalid_conf = { 'forward': 'direct',
+                         'interface': 'eth0',
+                         'address': '10.0.0.1/24' }
+        self.network_conf._ConfigurationNetwork__parse_forward_mode(invalid_conf)
+        self.assertRaisesRegex(
+             CloubedConfigurationException,
+             "address parameter has no sense on network {network} with " \
+             "direct forwarding mode".format(network=self.network_conf.name),
+             self.network_conf._ConfigurationNetwork__parse_ip_host_netmask,
+             invalid_conf)
+
+class TestConfigurationNetworkMtu(CloubedTestCase):
+
+    def setUp(self):
+        self._network_item = valid_network_item
+        self._loader = MockConfigurationLoader(conf_minimal)
+        self.conf = Configuration(self._loader)
+        self.network_conf = ConfigurationNetwork(self.conf, self._network_item)
+
+    def test_parse_mtu_ok(self):
+        """
+            ConfigurationNetwork.__parse_mtu() should parse valid values
+            without errors and set mtu instance attribute properly
+        """
+        conf = {}
+        self.network_conf._ConfigurationNetwork__parse_mtu(conf)
+        self.assertEqual(self.network_conf.mtu, None)
+
+        conf = { 'mtu': 9000 }
+        self.network_conf._ConfigurationNetwork__parse_mtu(conf)
+        self.assertEqual(self.network_conf.mtu, 9000)
+
+    def test_parse_mtu_invalid_format(self):
+        """
+            ConfigurationNetwork.__parse_mtu() should raise
+            CloubedConfigurationException if the mtu is not an integer
+        """
+        invalid_conf = { 'mtu': '9000' }
+        self.assertRaisesRegex(
+             CloubedConfigurationException,
+             "format of mtu parameter of network {network} is not valid" \
+                 .format(network=self.network_conf.name),
+             self.network_conf._ConfigurationNetwork__parse_mtu,
+             invalid_conf)
+
+    def test_parse_mtu_invalid_value(self):
+        """
+            ConfigurationNetwork.__parse_mtu() should raise
+            CloubedConfigurationException if the mtu is out of range
+        """
+        for mtu in [ 0, 67, 65536 ]:
+            invalid_conf = { 'mtu': mtu }
+            self.assertRaisesRegex(
+                 CloubedConfigurationException,
+                 "mtu parameter of network {network} must be between 68 and " \
+                 "65535".format(network=self.network_conf.name),
+                 self.network_conf._ConfigurationNetwork__parse_mtu,
+                 invalid_conf)
+
 loadtestcase(TestConfigurationNetwork)
 loadtestcase(TestConfigurationNetworkForwardMode)
 loadtestcase(TestConfigurationNetworkBridgeName)
@@ -754,3 +934,5 @@ loadtestcase(TestConfigurationNetworkIpHostNetmask)
 loadtestcase(TestConfigurationNetworkDhcp)
 loadtestcase(TestConfigurationNetworkDomain)
 loadtestcase(TestConfigurationNetworkPxe)
+loadtestcase(TestConfigurationNetworkDirect)
+loadtestcase(TestConfigurationNetworkMtu)
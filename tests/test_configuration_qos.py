@@ -0,0 +1,126 @@
+#!/usr/bin/python3
+
+from CloubedTests import *
+
+from cloubed.conf.Configuration import Configuration
+from cloubed.conf.ConfigurationQos import ConfigurationQos
+from cloubed.conf.ConfigurationNetwork import ConfigurationNetwork
+from cloubed.CloubedException import CloubedConfigurationException
+from Mock import MockConfigurationLoader, conf_minimal
+
+valid_qos_item = { 'name': 'test_qos_name',
+                   'inbound': { 'average': 1000,
+                                'peak': 5000,
+                                'burst': 1024 } }
+
+class TestConfigurationQos(CloubedTestCase):
+
+    def setUp(self):
+        self._loader = MockConfigurationLoader(conf_minimal)
+        self.conf = Configuration(self._loader)
+        self.qos_conf = ConfigurationQos(self.conf, valid_qos_item)
+
+    def test_get_type(self):
+        """
+            ConfigurationQos._get_type() should return qos
+        """
+        self.assertEqual(self.qos_conf._get_type(), 'qos')
+
+    def test_parse_bandwidth_ok(self):
+        """
+            ConfigurationQos.__parse_bandwidth() should parse valid values
+            without errors and set inbound and outbound instance attributes
+        """
+        self.assertEqual(self.qos_conf.inbound,
+                         { 'average': 1000, 'peak': 5000, 'burst': 1024 })
+        self.assertEqual(self.qos_conf.outbound, None)
+
+        conf = { 'outbound': { 'average': 128 } }
+        self.qos_conf._ConfigurationQos__parse_bandwidth(conf)
+        self.assertEqual(self.qos_conf.inbound, None)
+        self.assertEqual(self.qos_conf.outbound, { 'average': 128 })
+
+    def test_parse_bandwidth_empty(self):
+        """
+            ConfigurationQos.__parse_bandwidth() should raise
+            CloubedConfigurationException if there is neither inbound nor
+            outbound section
+        """
+        self.assertRaisesRegex(
+             CloubedConfigurationException,
+             "qos test_qos_name must define inbound or outbound section",
+             self.qos_conf._ConfigurationQos__parse_bandwidth,
+             {})
+
+    def test_parse_bandwidth_invalid(self):
+        """
+            ConfigurationQos.__parse_bandwidth() should raise
+            CloubedConfigurationException if the sections or the parameters
+            are not valid
+        """
+        invalid_confs = [
+            ({ 'inbound': 1000 },
+             "format of inbound section of qos test_qos_name is not valid"),
+            ({ 'inbound': { 'peak': 1000 } },
+             "average parameter must be defined in inbound section of qos " \
+             "test_qos_name"),
+            ({ 'outbound': { 'average': 1000, 'floor': 10 } },
+             "unknown parameter floor in outbound section of qos " \
+             "test_qos_name"),
+            ({ 'outbound': { 'average': -1 } },
+             "average parameter in outbound section of qos test_qos_name " \
+             "must be a positive integer") ]
+        for invalid_conf, error in invalid_confs:
+            self.assertRaisesRegex(
+                 CloubedConfigurationException,
+                 error,
+                 self.qos_conf._ConfigurationQos__parse_bandwidth,
+                 invalid_conf)
+
+class TestConfigurationQosReferences(CloubedTestCase):
+
+    def setUp(self):
+        conf = dict(conf_minimal, qos=[ dict(valid_qos_item) ])
+        self._loader = MockConfigurationLoader(conf)
+        self.conf = Configuration(self._loader)
+
+    def test_network_qos(self):
+        """
+            ConfigurationNetwork should refer to the ConfigurationQos of the
+            qos parameter
+        """
+        network_conf = ConfigurationNetwork(self.conf,
+                                            { 'name': 'test_network_name',
+                                              'qos': 'test_qos_name' })
+        self.assertIs(network_conf.qos, self.conf.qos[0])
+
+    def test_network_qos_undefined(self):
+        """
+            ConfigurationNetwork should raise CloubedConfigurationException if
+            the qos parameter refers to an undefined qos
+        """
+        self.assertRaisesRegex(
+             CloubedConfigurationException,
+             "qos fail of network test_network_name is not defined",
+             ConfigurationNetwork,
+             self.conf,
+             { 'name': 'test_network_name', 'qos': 'fail' })
+
+    def test_network_qos_bridge(self):
+        """
+            ConfigurationNetwork should raise CloubedConfigurationException if
+            the qos parameter is set on a network in bridge forwarding mode
+        """
+        self.assertRaisesRegex(
+             CloubedConfigurationException,
+             "qos parameter has no sense on network test_network_name with " \
+             "bridge forwarding mode",
+             ConfigurationNetwork,
+             self.conf,
+             { 'name': 'test_network_name',
+               'forward': 'bridge',
+               'bridge': 'br0',
+               'qos': 'test_qos_name' })
+
+loadtestcase(TestConfigurationQos)
+loadtestcase(TestConfigurationQosReferences)
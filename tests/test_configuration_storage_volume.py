@@ -315,6 +315,44 @@ class TestConfigurationStorageVolumeBacking(CloubedTestCase):
                      self.storage_volume_conf._ConfigurationStorageVolume__parse_backing,
                      invalid_conf)
 
+    def test_parse_backing_cache(self):
+        """
+            ConfigurationStorageVolume.__parse_backing() should parse backing
+            parameter referring to an entry of the image cache and set
+            backing_cache instance attribute
+        """
+        self.conf.image_cache = 'test_image_cache'
+        conf = { 'backing': 'cache:test_label' }
+        self.storage_volume_conf._ConfigurationStorageVolume__parse_backing(conf)
+        self.assertEqual(self.storage_volume_conf.backing,
+                         'test_label')
+        self.assertTrue(self.storage_volume_conf.backing_cache)
+
+    def test_parse_backing_cache_invalid(self):
+        """
+            ConfigurationStorageVolume.__parse_backing() should raise
+            CloubedConfigurationException when the backing parameter refers to
+            the image cache while it is not defined or without entry
+        """
+        conf = { 'backing': 'cache:test_label' }
+        self.assertRaisesRegex(
+                 CloubedConfigurationException,
+                 "backing of storage volume {name} refers to the image " \
+                 "cache but imagecache section is missing" \
+                     .format(name=self.storage_volume_conf.name),
+                 self.storage_volume_conf._ConfigurationStorageVolume__parse_backing,
+                 conf)
+
+        self.conf.image_cache = 'test_image_cache'
+        conf = { 'backing': 'cache:' }
+        self.assertRaisesRegex(
+                 CloubedConfigurationException,
+                 "format of backing parameter of storage volume {name} " \
+                 "is not valid" \
+                     .format(name=self.storage_volume_conf.name),
+                 self.storage_volume_conf._ConfigurationStorageVolume__parse_backing,
+                 conf)
+
 
 loadtestcase(TestConfigurationStorageVolume)
 loadtestcase(TestConfigurationStorageVolumeSize)
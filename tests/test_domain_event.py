@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+
+from CloubedTests import *
+
+from cloubed.DomainEvent import DomainEvent
+
+class TestDomainEvent(CloubedTestCase):
+
+    def test_init(self):
+        """
+            DomainEvent.__init__() should translate the lifecycle event codes
+            of libvirt into names
+        """
+        event = DomainEvent(5, 0)
+        self.assertEqual(event.type, 'STOPPED')
+        self.assertEqual(event.detail, 'STOPPED_SHUTDOWN')
+        self.assertEqual(event, DomainEvent('STOPPED', 'STOPPED_SHUTDOWN'))
+
+    def test_from_libvirt(self):
+        """
+            DomainEvent.from_libvirt() should build the DomainEvent out of the
+            arguments of the callbacks of all supported event IDs
+        """
+        events = [ ('LIFECYCLE', (2, 0),
+                    'STARTED>STARTED_BOOTED', {}),
+                   ('REBOOT', (),
+                    'REBOOT>REBOOT_REQUESTED', {}),
+                   ('WATCHDOG', (2,),
+                    'WATCHDOG>WATCHDOG_RESET', {}),
+                   ('IO_ERROR', ('/var/lib/disk.qcow2', 'virtio-disk0', 1),
+                    'IO_ERROR>IO_ERROR_PAUSE',
+                    { 'path': '/var/lib/disk.qcow2',
+                      'device': 'virtio-disk0' }),
+                   ('BLOCK_JOB', ('vda', 2, 3),
+                    'BLOCK_JOB>BLOCK_JOB_READY', { 'disk': 'vda' }),
+                   ('DEVICE_REMOVED', ('virtio-disk1',),
+                    'DEVICE_REMOVED>DEVICE_REMOVED_VIRTIO-DISK1',
+                    { 'device': 'virtio-disk1' }),
+                   ('AGENT_LIFECYCLE', (1, 2),
+                    'AGENT_LIFECYCLE>AGENT_LIFECYCLE_CONNECTED', {}),
+                   ('WATCHDOG', (42,),
+                    'WATCHDOG>WATCHDOG_42', {}) ]
+        for (event_id, args, expected, data) in events:
+            event = DomainEvent.from_libvirt(event_id, args)
+            self.assertEqual(str(event), expected)
+            self.assertEqual(event.data, data)
+        self.assertIsNone(DomainEvent.from_libvirt('TUNABLE', ()))
+
+loadtestcase(TestDomainEvent)
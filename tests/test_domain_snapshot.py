@@ -0,0 +1,275 @@
+#!/usr/bin/python3
+
+import os
+import mock
+import tempfile
+from xml.dom.minidom import parseString
+
+from CloubedTests import *
+
+from cloubed.Domain import Domain
+from cloubed.DomainSnapshot import DomainSnapshot
+from cloubed.CloubedException import CloubedException
+
+class StorageVolumeStub:
+
+    def __init__(self, path):
+        self.path = path
+
+    def getpath(self):
+        return self.path
+
+class DiskStub:
+
+    def __init__(self, device, path):
+        self.device = device
+        self.storage_volume = StorageVolumeStub(path)
+
+class DomainStub:
+
+    def __init__(self):
+        self.disks = [ DiskStub('vda', '/pool/user:tb:root.qcow2'),
+                       DiskStub('vdb', '/pool/user:tb:data.qcow2') ]
+
+    def get_storage_volumes(self):
+        return [ disk.storage_volume for disk in self.disks ]
+
+class TestDomainSnapshot(CloubedTestCase):
+
+    def setUp(self):
+        self.domain = DomainStub()
+        self.snapshot = DomainSnapshot(self.domain, 'test_snap', 1,
+                                       memory=True, created=42.0)
+
+    def test_get_disk_path(self):
+        """
+            DomainSnapshot.get_disk_path() should return the path of the
+            overlay next to the storage volume
+        """
+        self.assertEqual(
+            self.snapshot.get_disk_path(self.domain.disks[1].storage_volume),
+            '/pool/user:tb:data-snapshot-test_snap.qcow2')
+
+    def test_get_memory_path(self):
+        """
+            DomainSnapshot.get_memory_path() should return the path of the
+            memory state next to the first disk of the domain
+        """
+        self.assertEqual(self.snapshot.get_memory_path(),
+                         '/pool/user:tb:root-snapshot-test_snap.mem')
+
+    def test_dict(self):
+        """
+            DomainSnapshot.from_dict() should build a DomainSnapshot equivalent
+            to the one given to to_dict()
+        """
+        snapshot_dict = self.snapshot.to_dict()
+        self.assertEqual(snapshot_dict,
+                         { 'name': 'test_snap',
+                           'layer': 1,
+                           'memory': True,
+                           'created': 42.0 })
+        snapshot = DomainSnapshot.from_dict(self.domain, snapshot_dict)
+        self.assertEqual(snapshot.to_dict(), snapshot_dict)
+
+    def test_toxml(self):
+        """
+            DomainSnapshot.toxml() should return an external snapshot of all
+            disks with the memory state if requested
+        """
+        doc = parseString(self.snapshot.toxml())
+        memory = doc.getElementsByTagName('memory')[0]
+        self.assertEqual(memory.getAttribute('snapshot'), 'external')
+        self.assertEqual(memory.getAttribute('file'),
+                         self.snapshot.get_memory_path())
+        disks = doc.getElementsByTagName('disk')
+        self.assertEqual([ disk.getAttribute('name') for disk in disks ],
+                         [ 'vda', 'vdb' ])
+        sources = doc.getElementsByTagName('source')
+        self.assertEqual(sources[0].getAttribute('file'),
+                         '/pool/user:tb:root-snapshot-test_snap.qcow2')
+
+        snapshot = DomainSnapshot(self.domain, 'test_disks', 0)
+        doc = parseString(snapshot.toxml())
+        memory = doc.getElementsByTagName('memory')[0]
+        self.assertEqual(memory.getAttribute('snapshot'), 'no')
+
+class ChainStorageVolumeStub:
+
+    def __init__(self, name, imgtype):
+        self.name = name
+        self._imgtype = imgtype
+        self.create_overlay = mock.Mock()
+        self.delete_pool_file = mock.Mock()
+
+    def getpath(self):
+        return "/pool/{name}.{imgtype}".format(name=self.name,
+                                               imgtype=self._imgtype)
+
+class CloubedStub:
+
+    def __init__(self):
+        self.ctl = mock.Mock()
+        self.storage_volumes = { 'root': ChainStorageVolumeStub('root', 'raw'),
+                                 'data': ChainStorageVolumeStub('data',
+                                                                'qcow2') }
+
+    def get_storage_volume_by_name(self, name):
+        return self.storage_volumes[name]
+
+class DomainConfStub:
+
+    def __init__(self):
+        self.name = 'test_domain'
+        self.testbed = 'test_testbed'
+        self.sockets = self.cores = self.threads = 1
+        self.memory = 1
+        self.netifs = []
+        self.disks = [ { 'device': 'vda',
+                         'storage_volume': 'root',
+                         'bus': 'virtio' },
+                       { 'device': 'vdb',
+                         'storage_volume': 'data',
+                         'bus': 'virtio' } ]
+        self.cdrom = None
+        self.virtfs = []
+        self.graphics = 'spice'
+        self.template_files = []
+        self.template_vars = {}
+
+class TestDomainSnapshotChain(CloubedTestCase):
+
+    def setUp(self):
+        # the chains of snapshots are saved in the state directory
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        self.addCleanup(os.chdir, cwd)
+
+        self.tbd = CloubedStub()
+        self.domain = Domain(self.tbd, DomainConfStub())
+        self.root = self.tbd.storage_volumes['root']
+        self.data = self.tbd.storage_volumes['data']
+        self.active = False
+        for (method, kwargs) in [ ('is_active',
+                                   { 'side_effect': lambda: self.active }),
+                                  ('destroy', {}),
+                                  ('create', {}) ]:
+            patcher = mock.patch.object(self.domain, method, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def __snapshots(self):
+        return [ snapshot['name'] for snapshot in self.domain.get_snapshots() ]
+
+    def test_create_snapshot(self):
+        """
+            Domain.create_snapshot() should create the overlays of the stopped
+            domain backed by the previous layer, or snapshot the running
+            domain in libvirt
+        """
+        self.domain.create_snapshot('snap1')
+        self.root.create_overlay.assert_called_with(
+            '/pool/root-snapshot-snap1.qcow2', '/pool/root.raw', 'raw')
+        self.data.create_overlay.assert_called_with(
+            '/pool/data-snapshot-snap1.qcow2', '/pool/data.qcow2', 'qcow2')
+
+        self.domain.create_snapshot('snap2')
+        self.root.create_overlay.assert_called_with(
+            '/pool/root-snapshot-snap2.qcow2',
+            '/pool/root-snapshot-snap1.qcow2', 'qcow2')
+        self.assertEqual(self.domain.get_disk_path(self.root),
+                         '/pool/root-snapshot-snap2.qcow2')
+
+        self.active = True
+        self.domain.create_snapshot('snap3', memory=True)
+        self.assertEqual(self.tbd.ctl.snapshot_domain.call_count, 1)
+        self.assertEqual(self.root.create_overlay.call_count, 2)
+        self.assertEqual(self.__snapshots(), [ 'snap1', 'snap2', 'snap3' ])
+
+        self.assertRaisesRegex(CloubedException,
+                               "snapshot snap1 already exists",
+                               self.domain.create_snapshot, 'snap1')
+        self.assertRaisesRegex(CloubedException,
+                               "name fail/ of snapshot of domain " \
+                               "test_domain is not valid",
+                               self.domain.create_snapshot, 'fail/')
+
+    def test_revert_snapshot(self):
+        """
+            Domain.revert_snapshot() should delete the later snapshots and
+            their overlays, re-create the overlays of the snapshot and boot
+            the domain on them
+        """
+        self.domain.create_snapshot('snap1')
+        self.domain.create_snapshot('snap2')
+        self.root.create_overlay.reset_mock()
+
+        self.domain.revert_snapshot('snap1')
+        self.domain.destroy.assert_called_once_with()
+        self.root.delete_pool_file.assert_called_once_with(
+            '/pool/root-snapshot-snap2.qcow2')
+        self.root.create_overlay.assert_called_once_with(
+            '/pool/root-snapshot-snap1.qcow2', '/pool/root.raw', 'raw')
+        self.domain.create.assert_called_once_with('hd')
+        self.assertEqual(self.__snapshots(), [ 'snap1' ])
+        self.assertEqual(self.domain.get_disk_path(self.data),
+                         '/pool/data-snapshot-snap1.qcow2')
+
+        self.assertRaisesRegex(CloubedException,
+                               "snapshot snap2 not found for domain " \
+                               "test_domain",
+                               self.domain.revert_snapshot, 'snap2')
+
+    def test_delete_snapshot(self):
+        """
+            Domain.delete_snapshot() should merge the overlays of the most
+            recent snapshot of the running domain and keep the overlays of
+            the other snapshots in the chain
+        """
+        self.domain.create_snapshot('snap1')
+        self.domain.create_snapshot('snap2')
+
+        self.domain.delete_snapshot('snap1')
+        self.assertEqual(self.__snapshots(), [ 'snap2' ])
+        self.root.delete_pool_file.assert_not_called()
+        self.assertEqual(self.domain.get_disk_path(self.root),
+                         '/pool/root-snapshot-snap2.qcow2')
+
+        self.active = True
+        self.domain.delete_snapshot('snap2')
+        self.assertEqual(self.__snapshots(), [])
+        self.tbd.ctl.commit_domain_disk.assert_any_call(
+            self.domain.libvirt_name, 'vda',
+            '/pool/root-snapshot-snap1.qcow2',
+            '/pool/root-snapshot-snap2.qcow2')
+        self.root.delete_pool_file.assert_called_once_with(
+            '/pool/root-snapshot-snap2.qcow2')
+        # the overlays of the deleted snapshot snap1 remain in the chain
+        self.assertEqual(self.domain.get_disk_path(self.root),
+                         '/pool/root-snapshot-snap1.qcow2')
+
+    def test_clear_snapshots(self):
+        """
+            Domain.clear_snapshots() should delete all the overlays and memory
+            states, then the domain should use its storage volumes directly
+        """
+        self.domain.clear_snapshots()
+        self.root.delete_pool_file.assert_not_called()
+
+        self.domain.create_snapshot('snap1')
+        self.active = True
+        self.domain.create_snapshot('snap2', memory=True)
+        self.domain.clear_snapshots()
+        self.assertEqual(
+            [ call.args[0] for call in self.root.delete_pool_file.mock_calls ],
+            [ '/pool/root-snapshot-snap2.mem',
+              '/pool/root-snapshot-snap2.qcow2',
+              '/pool/root-snapshot-snap1.qcow2' ])
+        self.assertEqual(self.__snapshots(), [])
+        self.assertEqual(self.domain.get_disk_path(self.root),
+                         '/pool/root.raw')
+
+loadtestcase(TestDomainSnapshot)
+loadtestcase(TestDomainSnapshotChain)
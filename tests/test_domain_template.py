@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+
+from CloubedTests import *
+
+from cloubed.DomainTemplate import DomainTemplate
+from cloubed.CloubedException import CloubedException
+
+class TestDomainTemplate(CloubedTestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.source = os.path.join(self.tmpdir.name, 'preseed.cfg')
+        with open(self.source, 'w') as source:
+            source.write("hostname ${self.name}\n")
+        self.template = DomainTemplate({ 'name': 'preseed',
+                                         'input': self.source })
+        self.calls = 0
+
+    def __get_template_dict(self):
+        self.calls += 1
+        return { 'self.name': 'node1' }
+
+    def test_content(self):
+        """
+            DomainTemplate.content() should render the template in memory and
+            render it again only when the source template is modified
+        """
+        self.assertEqual(self.template.content(self.__get_template_dict),
+                         b'hostname node1\n')
+        self.assertEqual(self.template.content(self.__get_template_dict),
+                         b'hostname node1\n')
+        self.assertEqual(self.calls, 1)
+
+        with open(self.source, 'w') as source:
+            source.write("host ${self.name}\n")
+        stat = os.stat(self.source)
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(self.template.content(self.__get_template_dict),
+                         b'host node1\n')
+        self.assertEqual(self.calls, 2)
+
+    def test_render_without_output(self):
+        """
+            DomainTemplate.render() should raise CloubedException if the
+            template does not have output file
+        """
+        self.assertRaisesRegex(CloubedException,
+                               "template preseed does not have output file",
+                               self.template.render,
+                               {})
+
+loadtestcase(TestDomainTemplate)
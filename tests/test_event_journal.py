@@ -0,0 +1,141 @@
+#!/usr/bin/python3
+
+import os
+import time
+import tempfile
+import threading
+
+from CloubedTests import *
+
+from cloubed.EventJournal import EventJournal
+from cloubed.DomainEvent import DomainEvent
+
+class TestEventJournal(CloubedTestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, '.cloubed', 'events.jsonl')
+        self.journal = EventJournal(self.path)
+        self.addCleanup(self.journal.close)
+
+    def __append(self, domain_name, event_type, event_detail, data=None):
+        self.journal.append(domain_name,
+                            DomainEvent(event_type,
+                                        event_type + '_' + event_detail,
+                                        data))
+
+    def test_append_read(self):
+        """
+            EventJournal.read() should return the records appended to the
+            journal with their timestamps, filtered on domain and event
+        """
+        self.__append('node1', 'STARTED', 'BOOTED')
+        self.__append('node2', 'STARTED', 'BOOTED')
+        self.__append('node1', 'BLOCK_JOB', 'COMPLETED', { 'disk': 'vda' })
+        self.__append('node1', 'STOPPED', 'SHUTDOWN')
+
+        records = self.journal.read()
+        self.assertEqual([ (record['domain'], record['detail']) \
+                           for record in records ],
+                         [ ('node1', 'STARTED_BOOTED'),
+                           ('node2', 'STARTED_BOOTED'),
+                           ('node1', 'BLOCK_JOB_COMPLETED'),
+                           ('node1', 'STOPPED_SHUTDOWN') ])
+        self.assertEqual(records[2]['data'], { 'disk': 'vda' })
+        monotonics = [ record['monotonic'] for record in records ]
+        self.assertEqual(monotonics, sorted(monotonics))
+
+        self.assertEqual(len(self.journal.read(domain_name='node1')), 3)
+        self.assertEqual(len(self.journal.read(event_type='STARTED')), 2)
+        self.assertEqual(
+            [ record['domain'] for record in \
+              self.journal.read(event_type='STARTED',
+                                event_detail='STARTED_BOOTED',
+                                tail=1) ],
+            [ 'node2' ])
+        self.assertEqual(
+            [ record['detail'] for record in \
+              self.journal.read(domain_name='node1', tail=2) ],
+            [ 'BLOCK_JOB_COMPLETED', 'STOPPED_SHUTDOWN' ])
+
+    def test_incomplete_line(self):
+        """
+            EventJournal.read() should skip the incomplete last line
+        """
+        self.__append('node1', 'STARTED', 'BOOTED')
+        with open(self.path, 'a') as journal:
+            journal.write('{"time":')
+        self.assertEqual(len(self.journal.read()), 1)
+
+    def test_rotate(self):
+        """
+            EventJournal.append() should rotate the journal when it exceeds its
+            maximum size and EventJournal.read() should read both files
+        """
+        self.journal.max_size = 1024
+        for index in range(30):
+            self.__append('node1', 'STARTED', str(index))
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertLessEqual(os.path.getsize(self.path), 1024)
+        self.assertLessEqual(os.path.getsize(self.path + '.1'), 1024)
+        details = [ record['detail'] for record in self.journal.read() ]
+        # the oldest records are dropped with the previous journal
+        self.assertEqual(details[-1], 'STARTED_29')
+        self.assertEqual(details,
+                         [ 'STARTED_' + str(index) \
+                           for index in range(30 - len(details), 30) ])
+
+    def test_follow(self):
+        """
+            EventJournal.follow() should give the records appended from now on,
+            including after the rotation of the journal
+        """
+        # the journal is rotated once while the records are appended
+        self.journal.max_size = 4096
+        self.__append('node1', 'STARTED', 'BOOTED')
+        follower = EventJournal(self.path).follow(domain_name='node1',
+                                                  interval=0.01)
+        self.addCleanup(follower.close)
+
+        def append():
+            for index in range(20):
+                self.__append('node1', 'SUSPENDED', str(index))
+                self.__append('node2', 'SUSPENDED', str(index))
+                time.sleep(0.005)
+
+        # the follower skips the records written before its first iteration
+        timer = threading.Timer(0.1, append)
+        timer.start()
+        self.addCleanup(timer.join)
+        details = [ next(follower)['detail'] for _ in range(20) ]
+        self.assertEqual(details,
+                         [ 'SUSPENDED_' + str(index) for index in range(20) ])
+
+    def test_summarize(self):
+        """
+            EventJournal.summarize() should count the events and compute the
+            mean interval between them by domain and event
+        """
+        records = [ { 'time': 100.0, 'monotonic': 1000000000,
+                      'domain': 'node1', 'type': 'REBOOT',
+                      'detail': 'REBOOT_REQUESTED' },
+                    { 'time': 101.0, 'monotonic': 2000000000,
+                      'domain': 'node1', 'type': 'REBOOT',
+                      'detail': 'REBOOT_REQUESTED' },
+                    { 'time': 101.5, 'monotonic': 2500000000,
+                      'domain': 'node2', 'type': 'STARTED',
+                      'detail': 'STARTED_BOOTED' },
+                    { 'time': 104.0, 'monotonic': 5000000000,
+                      'domain': 'node1', 'type': 'REBOOT',
+                      'detail': 'REBOOT_REQUESTED' } ]
+        summary = EventJournal.summarize(records)
+        self.assertEqual(summary[('node1', 'REBOOT', 'REBOOT_REQUESTED')],
+                         { 'count': 3, 'first': 100.0, 'last': 104.0,
+                           'interval': 2.0 })
+        self.assertEqual(summary[('node2', 'STARTED', 'STARTED_BOOTED')],
+                         { 'count': 1, 'first': 101.5, 'last': 101.5,
+                           'interval': None })
+
+loadtestcase(TestEventJournal)
@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+
+import os
+import time
+import tempfile
+import threading
+import http.client
+import http.server
+
+from CloubedTests import *
+
+from cloubed.HTTPServer import HTTPServer
+from cloubed.HTTPProxyCache import HTTPProxyCache
+
+class UpstreamHandler(http.server.BaseHTTPRequestHandler):
+
+    """Stand-in mirror which serves the files of its server and records the
+       requests"""
+
+    def do_GET(self):
+        self.server.requests.append((self.path,
+                                     self.headers.get('If-Modified-Since')))
+        time.sleep(self.server.delay)
+        if self.path not in self.server.files:
+            self.send_error(404)
+            return
+        if self.headers.get('If-Modified-Since') is not None:
+            self.send_response(304)
+            self.end_headers()
+            return
+        content = self.server.files[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-debian-package')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('Last-Modified', 'Sat, 01 Feb 2020 10:00:00 GMT')
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+class TestHTTPProxy(CloubedTestCase):
+
+    def setUp(self):
+
+        self.upstream = http.server.ThreadingHTTPServer(('127.0.0.1', 0),
+                                                        UpstreamHandler)
+        self.upstream.requests = []
+        self.upstream.delay = 0
+        self.upstream.files = { '/pool/a.deb': b'a' * 100,
+                                '/pool/b.deb': b'b' * 100,
+                                '/dists/Release': b'release' }
+        threading.Thread(target=self.upstream.serve_forever,
+                         daemon=True).start()
+        self.addCleanup(self.upstream.server_close)
+        self.addCleanup(self.upstream.shutdown)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache = HTTPProxyCache(os.path.join(self.tmpdir.name, 'proxy'),
+                                    1024)
+        self.server = HTTPServer(port=0, max_connections=16, proxy=self.cache)
+        self.server.launch('127.0.0.1', root=self.tmpdir.name)
+        self.addCleanup(self.server.terminate)
+
+    def __url(self, path):
+        return "http://127.0.0.1:{port}{path}" \
+                   .format(port=self.upstream.server_address[1], path=path)
+
+    def __get(self, path):
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.port,
+                                                timeout=10)
+        connection.request('GET', self.__url(path))
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return (response, body)
+
+    def test_cache(self):
+        """
+            HTTPServer should fetch the URLs upstream only once and keep them
+            in the proxy cache across runs
+        """
+        for _ in range(2):
+            (response, body) = self.__get('/pool/a.deb')
+            self.assertEqual(response.status, 200)
+            self.assertEqual(body, b'a' * 100)
+            self.assertEqual(response.getheader('Content-Type'),
+                             'application/x-debian-package')
+            self.assertEqual(response.getheader('Last-Modified'),
+                             'Sat, 01 Feb 2020 10:00:00 GMT')
+        self.assertEqual(len(self.upstream.requests), 1)
+
+        cache = HTTPProxyCache(self.cache.path, 1024)
+        self.assertEqual(cache.size, 100)
+        (handle, meta) = cache.open(self.__url('/pool/a.deb'))
+        handle.close()
+        self.assertEqual(meta['url'], self.__url('/pool/a.deb'))
+        self.assertEqual(len(self.upstream.requests), 1)
+
+    def test_coalesce(self):
+        """
+            HTTPServer should coalesce concurrent requests of the same URL in a
+            single upstream fetch
+        """
+        self.upstream.delay = 0.3
+        results = []
+        def fetch():
+            results.append(self.__get('/pool/b.deb')[1] == b'b' * 100)
+        threads = [ threading.Thread(target=fetch) for _ in range(8) ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [ True ] * 8)
+        self.assertEqual(len(self.upstream.requests), 1)
+
+    def test_revalidate(self):
+        """
+            HTTPServer should revalidate upstream the stale files which are not
+            packages
+        """
+        self.cache.max_age = 0
+        for _ in range(2):
+            self.assertEqual(self.__get('/dists/Release')[1], b'release')
+            self.assertEqual(self.__get('/pool/a.deb')[1], b'a' * 100)
+        self.assertEqual(self.upstream.requests,
+                         [ ('/dists/Release', None),
+                           ('/pool/a.deb', None),
+                           ('/dists/Release',
+                            'Sat, 01 Feb 2020 10:00:00 GMT') ])
+
+    def test_eviction(self):
+        """
+            HTTPProxyCache should evict the least recently used entries when
+            its size exceeds the budget
+        """
+        self.cache.budget = 150
+        self.__get('/pool/a.deb')
+        self.__get('/pool/b.deb')
+        self.assertEqual(self.cache.size, 100)
+        self.assertEqual(len(os.listdir(self.cache.path)), 2)
+        self.__get('/pool/a.deb')
+        self.assertEqual(len(self.upstream.requests), 3)
+
+    def test_errors(self):
+        """
+            HTTPServer should forward the upstream errors and answer 403 when
+            the proxy is disabled
+        """
+        (response, body) = self.__get('/pool/fail.deb')
+        self.assertEqual(response.status, 404)
+
+        server = HTTPServer(port=0)
+        server.launch('127.0.0.1', root=self.tmpdir.name)
+        self.addCleanup(server.terminate)
+        connection = http.client.HTTPConnection('127.0.0.1', server.port,
+                                                timeout=10)
+        self.addCleanup(connection.close)
+        connection.request('GET', self.__url('/pool/a.deb'))
+        self.assertEqual(connection.getresponse().status, 403)
+
+loadtestcase(TestHTTPProxy)
@@ -0,0 +1,292 @@
+#!/usr/bin/python3
+
+import os
+import tempfile
+import http.client
+import threading
+
+from CloubedTests import *
+
+from cloubed.HTTPServer import HTTPServer
+from cloubed.HTTPFileCache import HTTPFileCache
+from cloubed.CloubedException import CloubedException
+
+class TestHTTPServer(CloubedTestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.content = bytes(range(256)) * 1024
+        with open(os.path.join(self.tmpdir.name, 'initrd.img'), 'wb') as img:
+            img.write(self.content)
+        os.mkdir(os.path.join(self.tmpdir.name, 'pxe'))
+
+        self.server = HTTPServer(port=0, max_connections=4)
+        self.server.launch('127.0.0.1', root=self.tmpdir.name)
+        self.addCleanup(self.server.terminate)
+
+    def __connection(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.port,
+                                                timeout=5)
+        self.addCleanup(connection.close)
+        return connection
+
+    def __get(self, connection, path, headers={}):
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        return (response, response.read())
+
+    def test_get_keepalive(self):
+        """
+            HTTPServer should serve the files with their content and keep the
+            connection open for other requests
+        """
+        connection = self.__connection()
+        for _ in range(2):
+            (response, body) = self.__get(connection, '/initrd.img')
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.getheader('Content-Length'),
+                             str(len(self.content)))
+            self.assertEqual(body, self.content)
+            self.assertFalse(response.will_close)
+
+    def test_head(self):
+        """
+            HTTPServer should send only the headers in response to HEAD
+            requests
+        """
+        connection = self.__connection()
+        connection.request('HEAD', '/initrd.img')
+        response = connection.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Content-Length'),
+                         str(len(self.content)))
+        self.assertEqual(response.read(), b'')
+
+    def test_range(self):
+        """
+            HTTPServer should serve the byte ranges requested by clients
+        """
+        connection = self.__connection()
+        (response, body) = self.__get(connection, '/initrd.img',
+                                      { 'Range': 'bytes=100-199' })
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.getheader('Content-Range'),
+                         'bytes 100-199/{0}'.format(len(self.content)))
+        self.assertEqual(body, self.content[100:200])
+
+        (response, body) = self.__get(connection, '/initrd.img',
+                                      { 'Range': 'bytes=-10' })
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, self.content[-10:])
+
+        (response, body) = self.__get(connection, '/initrd.img',
+                                      { 'Range': 'bytes=1000000-' })
+        self.assertEqual(response.status, 416)
+
+    def test_not_found(self):
+        """
+            HTTPServer should answer 404 for missing files and list
+            directories
+        """
+        connection = self.__connection()
+        (response, body) = self.__get(connection, '/fail.img')
+        self.assertEqual(response.status, 404)
+        (response, body) = self.__get(connection, '/')
+        self.assertEqual(response.status, 200)
+        self.assertIn(b'initrd.img', body)
+
+    def test_concurrent(self):
+        """
+            HTTPServer should serve more clients than the maximum number of
+            concurrent connections
+        """
+        results = []
+        def fetch():
+            connection = http.client.HTTPConnection('127.0.0.1',
+                                                    self.server.port,
+                                                    timeout=10)
+            connection.request('GET', '/initrd.img',
+                               headers={ 'Connection': 'close' })
+            results.append(connection.getresponse().read() == self.content)
+            connection.close()
+        threads = [ threading.Thread(target=fetch) for _ in range(12) ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [ True ] * 12)
+
+    def test_large_file(self):
+        """
+            HTTPServer should send the files too large for the file cache from
+            disk
+        """
+        self.server._httpd.file_cache.max_file_size = 1024
+        connection = self.__connection()
+        (response, body) = self.__get(connection, '/initrd.img')
+        self.assertEqual(body, self.content)
+        (response, body) = self.__get(connection, '/initrd.img',
+                                      { 'Range': 'bytes=2000-2999' })
+        self.assertEqual(body, self.content[2000:3000])
+        self.assertEqual(self.server._httpd.file_cache.size, 0)
+
+    def test_conditional(self):
+        """
+            HTTPServer should answer 304 to conditional requests when the file
+            has not been modified
+        """
+        connection = self.__connection()
+        (response, body) = self.__get(connection, '/initrd.img')
+        etag = response.getheader('ETag')
+        last_modified = response.getheader('Last-Modified')
+        self.assertIsNotNone(etag)
+
+        (response, body) = self.__get(connection, '/initrd.img',
+                                      { 'If-None-Match': etag })
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(response.getheader('ETag'), etag)
+
+        (response, body) = self.__get(connection, '/initrd.img',
+                                      { 'If-Modified-Since': last_modified })
+        self.assertEqual(response.status, 304)
+
+        # If-None-Match has precedence over If-Modified-Since
+        (response, body) = self.__get(connection, '/initrd.img',
+                                      { 'If-None-Match': '"other"',
+                                        'If-Modified-Since': last_modified })
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.content)
+
+        # Range is ignored if If-Range does not match
+        (response, body) = self.__get(connection, '/initrd.img',
+                                      { 'Range': 'bytes=0-9',
+                                        'If-Range': '"other"' })
+        self.assertEqual(response.status, 200)
+        (response, body) = self.__get(connection, '/initrd.img',
+                                      { 'Range': 'bytes=0-9',
+                                        'If-Range': etag })
+        self.assertEqual(response.status, 206)
+
+    def test_modified(self):
+        """
+            HTTPServer should serve the new content of files modified after
+            they were cached
+        """
+        connection = self.__connection()
+        (response, body) = self.__get(connection, '/initrd.img')
+        etag = response.getheader('ETag')
+        path = os.path.join(self.tmpdir.name, 'initrd.img')
+        with open(path, 'wb') as img:
+            img.write(b'modified')
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        (response, body) = self.__get(connection, '/initrd.img',
+                                      { 'If-None-Match': etag })
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b'modified')
+        self.assertNotEqual(response.getheader('ETag'), etag)
+
+class TestHTTPServerTemplates(CloubedTestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.requests = []
+
+        self.server = HTTPServer(port=0, max_connections=4,
+                                 renderer=self.__renderer)
+        self.server.launch('127.0.0.1', root=self.tmpdir.name)
+        self.addCleanup(self.server.terminate)
+
+    def __renderer(self, ip, template_name):
+        self.requests.append((ip, template_name))
+        if template_name != 'preseed':
+            raise CloubedException("template {template} not defined" \
+                                       .format(template=template_name))
+        return "host {ip}".format(ip=ip).encode('utf-8')
+
+    def test_template(self):
+        """
+            HTTPServer should serve the templates rendered for the IP address
+            of the client and answer 404 if they cannot be rendered
+        """
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.port,
+                                                timeout=5)
+        self.addCleanup(connection.close)
+        connection.request('GET', '/.cloubed/templates/preseed')
+        response = connection.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.read(), b'host 127.0.0.1')
+
+        connection.request('GET', '/.cloubed/templates/fail')
+        response = connection.getresponse()
+        self.assertEqual(response.status, 404)
+        response.read()
+        self.assertEqual(self.requests, [ ('127.0.0.1', 'preseed'),
+                                          ('127.0.0.1', 'fail') ])
+
+class TestHTTPFileCache(CloubedTestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache = HTTPFileCache(max_size=20, max_file_size=10)
+
+    def __file(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'wb') as handle:
+            handle.write(content)
+        return (path, os.stat(path))
+
+    def test_get_put(self):
+        """
+            HTTPFileCache.get() should return the content of the files put in
+            cache and None for the files too large
+        """
+        (path, stat) = self.__file('a', b'0123456789')
+        self.assertIsNone(self.cache.get(path, stat))
+        self.cache.put(path, stat, b'0123456789')
+        self.assertEqual(self.cache.get(path, stat), b'0123456789')
+
+        (path, stat) = self.__file('b', b'0123456789a')
+        self.assertFalse(self.cache.cacheable(stat))
+        self.cache.put(path, stat, b'0123456789a')
+        self.assertIsNone(self.cache.get(path, stat))
+        self.assertEqual(self.cache.size, 10)
+
+    def test_invalidation(self):
+        """
+            HTTPFileCache.get() should drop the files modified since they were
+            put in cache
+        """
+        (path, stat) = self.__file('a', b'old')
+        self.cache.put(path, stat, b'old')
+        (path, stat) = self.__file('a', b'newer')
+        self.assertIsNone(self.cache.get(path, stat))
+        self.assertEqual(self.cache.size, 0)
+
+    def test_eviction(self):
+        """
+            HTTPFileCache.put() should evict the least recently used files when
+            the cache exceeds its size
+        """
+        files = [ self.__file(name, b'01234567') for name in 'abc' ]
+        self.cache.put(files[0][0], files[0][1], b'01234567')
+        self.cache.put(files[1][0], files[1][1], b'01234567')
+        # a is now more recently used than b
+        self.cache.get(files[0][0], files[0][1])
+        self.cache.put(files[2][0], files[2][1], b'01234567')
+        self.assertIsNotNone(self.cache.get(files[0][0], files[0][1]))
+        self.assertIsNone(self.cache.get(files[1][0], files[1][1]))
+        self.assertIsNotNone(self.cache.get(files[2][0], files[2][1]))
+        self.assertEqual(self.cache.size, 16)
+
+loadtestcase(TestHTTPServer)
+loadtestcase(TestHTTPServerTemplates)
+loadtestcase(TestHTTPFileCache)
@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+
+import os
+import time
+import socket
+import tempfile
+import threading
+import http.client
+
+from CloubedTests import *
+
+from cloubed.HTTPServer import HTTPServer
+from cloubed.HTTPUploads import HTTPUploads
+
+class TestHTTPUploads(CloubedTestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        # the secret key is written in the state directory of the cwd
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        self.addCleanup(os.chdir, cwd)
+
+        self.path = os.path.join(self.tmpdir.name, 'uploads')
+        self.uploads = HTTPUploads(self.path, [ 'node1', 'node2' ])
+        self.server = HTTPServer(port=0, max_connections=8,
+                                 uploads=self.uploads)
+        self.server.launch('127.0.0.1', root=self.tmpdir.name)
+        self.addCleanup(self.server.terminate)
+
+    def __connection(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.port,
+                                                timeout=10)
+        self.addCleanup(connection.close)
+        return connection
+
+    def __put(self, path, body, token):
+        # the connection is closed so that it does not hold a worker thread
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.port,
+                                                timeout=10)
+        connection.request('PUT', path, body=body,
+                           headers={ 'Authorization': 'Bearer ' + token })
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        return response.status
+
+    def __files(self):
+        return sorted(os.path.relpath(os.path.join(root, name), self.path) \
+                      for (root, _, names) in os.walk(self.path) \
+                      for name in names)
+
+    def test_token(self):
+        """
+            HTTPUploads.authenticate() should return the domain of valid tokens
+            and the tokens should be stable across runs
+        """
+        token = self.uploads.token('node1')
+        self.assertEqual(self.uploads.authenticate(token), 'node1')
+        self.assertIsNone(self.uploads.authenticate('fail'))
+        self.assertEqual(HTTPUploads(self.path, [ 'node1' ]).token('node1'),
+                         token)
+        self.assertNotEqual(self.uploads.token('node2'), token)
+
+    def test_put(self):
+        """
+            HTTPServer should write the files uploaded with PUT in the
+            directory of the domain of the token
+        """
+        status = self.__put('/.cloubed/uploads/logs/syslog', b'x' * 100000,
+                            self.uploads.token('node1'))
+        self.assertEqual(status, 201)
+        with open(os.path.join(self.path, 'node1', 'logs', 'syslog'),
+                  'rb') as upload:
+            self.assertEqual(upload.read(), b'x' * 100000)
+        self.assertEqual(self.__files(), [ 'node1/logs/syslog' ])
+
+    def test_post_chunked(self):
+        """
+            HTTPServer should accept uploads with chunked encoding and the
+            token in the query string
+        """
+        connection = self.__connection()
+        connection.request('POST', '/.cloubed/uploads/result.json?token=' +
+                                   self.uploads.token('node2'),
+                           body=iter([ b'{"a":', b' 1}' ]),
+                           encode_chunked=True)
+        response = connection.getresponse()
+        response.read()
+        self.assertEqual(response.status, 201)
+        with open(os.path.join(self.path, 'node2', 'result.json'),
+                  'rb') as upload:
+            self.assertEqual(upload.read(), b'{"a": 1}')
+
+    def test_errors(self):
+        """
+            HTTPServer should reject uploads with invalid tokens or paths and
+            keep no partial file of interrupted uploads
+        """
+        token = self.uploads.token('node1')
+        self.assertEqual(self.__put('/.cloubed/uploads/a', b'a', 'fail'), 401)
+        self.assertEqual(self.__put('/.cloubed/uploads/../node2/a', b'a',
+                                    token), 400)
+        self.assertEqual(self.__put('/a', b'a', token), 405)
+
+        sock = socket.create_connection(('127.0.0.1', self.server.port))
+        sock.sendall(b'PUT /.cloubed/uploads/partial HTTP/1.1\r\n' \
+                     b'Host: localhost\r\n' \
+                     b'Authorization: Bearer ' + token.encode() + b'\r\n' \
+                     b'Content-Length: 1000\r\n\r\n' + b'x' * 10)
+        sock.close()
+        for _ in range(50):
+            if not self.__files():
+                break
+            time.sleep(0.1)
+        self.assertEqual(self.__files(), [])
+
+    def test_concurrent(self):
+        """
+            HTTPServer should accept many uploads concurrently
+        """
+        results = []
+        def upload(index):
+            results.append(self.__put('/.cloubed/uploads/file{0}' \
+                                          .format(index),
+                                      os.urandom(200000),
+                                      self.uploads.token('node1')))
+        threads = [ threading.Thread(target=upload, args=(index,)) \
+                    for index in range(16) ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [ 201 ] * 16)
+        self.assertEqual(len(self.__files()), 16)
+
+loadtestcase(TestHTTPUploads)
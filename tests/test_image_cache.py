@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+import os
+import mock
+import tempfile
+
+from CloubedTests import *
+
+from cloubed.ImageCache import ImageCache
+
+class ImageCacheConfStub:
+
+    def __init__(self, path):
+        self.name = 'imagecache'
+        self.testbed = 'test'
+        self.path = path
+        self.size = 1 # GB
+
+class CloubedStub:
+
+    def __init__(self):
+        self.ctl = mock.Mock()
+
+class TestImageCache(CloubedTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.tbd = CloubedStub()
+        self.cache = ImageCache(self.tbd,
+                                ImageCacheConfStub(self.tmpdir.name))
+        self.cache.storage_pool = mock.Mock()
+        self.ctl = self.tbd.ctl
+        # no storage volume in the cache yet
+        self.ctl.find_storage_volume.return_value = None
+        self.image = os.path.join(self.tmpdir.name, 'image.img')
+        with open(self.image, 'wb') as image:
+            image.write(b'x' * 4096)
+
+    def __index(self, entries):
+        return { 'entries': entries }
+
+    def test_evict_unreferenced(self):
+        """
+            ImageCache.__evict() should delete the least recently used entries
+            without reference until the cache fits in its budget
+        """
+        gb = 1024**3
+        index = self.__index(
+                    { 'old': { 'format': 'raw', 'size': gb, 'refs': [],
+                               'last_used': 1 },
+                      'new': { 'format': 'raw', 'size': gb, 'refs': [],
+                               'last_used': 2 } })
+        self.cache._ImageCache__evict(index)
+        self.assertEqual(list(index['entries'].keys()), ['new'])
+
+    def test_evict_keep(self):
+        """
+            ImageCache.__evict() should never evict the entry given in keep,
+            even if it has no reference and the cache is over its budget
+        """
+        index = self.__index(
+                    { 'big': { 'format': 'raw', 'size': 2 * 1024**3,
+                               'refs': [], 'last_used': 1 } })
+        self.cache._ImageCache__evict(index, keep='big')
+        self.assertIn('big', index['entries'])
+
+    def test_add_over_budget(self):
+        """
+            ImageCache.add() should keep the entry of an image larger than the
+            budget and return its hash
+        """
+        self.cache.budget = 1024 # bytes
+        with mock.patch.object(self.cache, '_ImageCache__import') as imp:
+            digest = self.cache.add(self.image)
+        imp.assert_called_once_with(digest, 'raw', self.image)
+        self.assertIn(digest, self.cache.get_infos())
+
+loadtestcase(TestImageCache)
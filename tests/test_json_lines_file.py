@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import json
+import mock
+import tempfile
+
+from CloubedTests import *
+
+from cloubed.JSONLinesFile import JSONLinesFile
+
+class TestJSONLinesFile(CloubedTestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, '.cloubed', 'test.jsonl')
+        self.records = JSONLinesFile(self.path)
+        self.addCleanup(self.records.close)
+
+    def test_write(self):
+        """
+            JSONLinesFile.write() should append the records without
+            whitespace and JSONLinesFile.lines() should return the lines of
+            the rotated file then of the current file
+        """
+        self.records.max_size = 64
+        for index in range(10):
+            self.records.write({ 'index': index })
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertLessEqual(os.stat(self.path).st_size, 64)
+        lines = list(self.records.lines())
+        self.assertEqual(lines[-1], '{"index":9}\n')
+        indexes = [ json.loads(line)['index'] for line in lines ]
+        self.assertEqual(indexes, sorted(indexes))
+
+    def test_write_bytes(self):
+        """
+            JSONLinesFile.write() should rotate the file when its size in
+            bytes, not in characters, exceeds the maximum size
+        """
+        line = json.dumps({ 'name': 'é' * 8 }, separators=(',', ':'),
+                          ensure_ascii=False)
+        # the line fits in the maximum size in characters but not in bytes
+        self.records.max_size = len('{}\n') + len(line) + 1
+        with mock.patch.object(sys.modules['cloubed.JSONLinesFile'].json,
+                               'dumps', side_effect=[ '{}', line ]):
+            self.records.write({})
+            self.records.write({})
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertEqual(os.stat(self.path).st_size,
+                         len(line.encode('utf-8')) + 1)
+
+    def test_write_rotated(self):
+        """
+            JSONLinesFile.write() should reopen the file rotated by another
+            process instead of rotating it again
+        """
+        self.records.max_size = 32
+        other = JSONLinesFile(self.path)
+        self.addCleanup(other.close)
+        other.max_size = 32
+        self.records.write({ 'index': 0 })
+        other.write({ 'index': 1 })
+        other.write({ 'index': 2 })
+        # the file has been rotated by the other writer
+        self.records.write({ 'index': 3 })
+        with open(self.path + '.1') as rotated:
+            self.assertEqual(rotated.read(),
+                             '{"index":0}\n{"index":1}\n')
+        with open(self.path) as current:
+            self.assertEqual(current.read(),
+                             '{"index":2}\n{"index":3}\n')
+
+    def test_clear(self):
+        """
+            JSONLinesFile.clear() should remove the current and the rotated
+            files, and the file should be created again on next write
+        """
+        self.assertEqual(list(self.records.lines()), [])
+        self.records.max_size = 16
+        for index in range(3):
+            self.records.write({ 'index': index })
+        self.records.clear()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(os.path.exists(self.path + '.1'))
+        self.records.write({ 'index': 3 })
+        self.assertEqual(list(self.records.lines()), [ '{"index":3}\n' ])
+
+loadtestcase(TestJSONLinesFile)
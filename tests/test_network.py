@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+
+import os
+from xml.dom.minidom import Document, parseString
+
+from CloubedTests import *
+
+from cloubed.Network import Network
+from cloubed.conf.Configuration import Configuration
+from cloubed.conf.ConfigurationNetwork import ConfigurationNetwork
+from cloubed.conf.ConfigurationQos import ConfigurationQos
+from cloubed.CloubedException import CloubedException
+from Mock import MockConfigurationLoader, conf_minimal
+
+network_item = { 'name': 'test_network_name',
+                 'address': '10.0.0.1/24',
+                 'dhcp': { 'start': '10.0.0.100',
+                           'end': '10.0.0.200' } }
+
+class ControllerStub:
+
+    def __init__(self):
+        self.dhcp_hosts = []
+        self.dns_hosts = []
+        self.updates = []
+
+    def network_hosts(self, name):
+        return (self.dhcp_hosts, self.dns_hosts)
+
+    def update_network(self, name, command, section, xml):
+        self.updates.append((command, section, xml))
+
+class CloubedStub:
+
+    def __init__(self):
+        self.ctl = ControllerStub()
+
+class TestNetworkHosts(CloubedTestCase):
+
+    def setUp(self):
+        loader = MockConfigurationLoader(conf_minimal)
+        network_conf = ConfigurationNetwork(Configuration(loader),
+                                            network_item)
+        self.tbd = CloubedStub()
+        self.network = Network(self.tbd, network_conf)
+        self.network.register_host('node1', '52:54:00:00:00:01', '10.0.0.11')
+        self.network.register_host('node2', '52:54:00:00:00:02', '10.0.0.12')
+
+    def test_xml_hosts(self):
+        """
+            Network.toxml() should declare the registered hosts in DHCP and
+            DNS
+        """
+        xml = parseString(self.network.toxml())
+        dhcp = xml.getElementsByTagName('dhcp')[0]
+        self.assertEqual(len(dhcp.getElementsByTagName('host')), 2)
+        dns = xml.getElementsByTagName('dns')[0]
+        hosts = dns.getElementsByTagName('host')
+        self.assertEqual(hosts[0].getAttribute('ip'), '10.0.0.11')
+        self.assertEqual(
+            hosts[0].getElementsByTagName('hostname')[0].firstChild.data,
+            'node1')
+
+    def test_update_hosts_nothing(self):
+        """
+            Network.update_hosts() should not apply any update if the live
+            network already has all the registered hosts
+        """
+        self.tbd.ctl.dhcp_hosts = [
+            { 'mac': '52:54:00:00:00:01', 'hostname': 'node1',
+              'ip': '10.0.0.11' },
+            { 'mac': '52:54:00:00:00:02', 'hostname': 'node2',
+              'ip': '10.0.0.12' } ]
+        self.tbd.ctl.dns_hosts = [ ('10.0.0.11', ('node1',)),
+                                   ('10.0.0.12', ('node2',)) ]
+        self.assertEqual(self.network.update_hosts(), 0)
+        self.assertEqual(self.tbd.ctl.updates, [])
+
+    def test_update_hosts_diff(self):
+        """
+            Network.update_hosts() should delete, modify and add the hosts
+            which differ with the live network, deletions first
+        """
+        self.tbd.ctl.dhcp_hosts = [
+            { 'mac': '52:54:00:00:00:01', 'hostname': 'node1',
+              'ip': '10.0.0.21' },
+            { 'mac': '52:54:00:00:00:03', 'hostname': 'node3',
+              'ip': '10.0.0.13' } ]
+        self.tbd.ctl.dns_hosts = [ ('10.0.0.21', ('node1',)),
+                                   ('10.0.0.13', ('node3',)) ]
+        self.assertEqual(self.network.update_hosts(), 7)
+        commands = [ (command, section) \
+                     for command, section, xml in self.tbd.ctl.updates ]
+        self.assertEqual(commands,
+                         [ ('delete', 'dhcp-host'),
+                           ('delete', 'dns-host'),
+                           ('delete', 'dns-host'),
+                           ('modify', 'dhcp-host'),
+                           ('add', 'dhcp-host'),
+                           ('add', 'dns-host'),
+                           ('add', 'dns-host') ])
+        self.assertEqual(self.tbd.ctl.updates[3][2],
+                         '<host mac="52:54:00:00:00:01" name="node1" ' \
+                         'ip="10.0.0.11"/>')
+        self.assertEqual(self.tbd.ctl.updates[-1][2],
+                         '<host ip="10.0.0.12"><hostname>node2</hostname>' \
+                         '</host>')
+
+class TestNetworkMtu(CloubedTestCase):
+
+    def test_xml_mtu(self):
+        """
+            Network.toxml() should set the MTU of the network
+        """
+        loader = MockConfigurationLoader(conf_minimal)
+        network_conf = ConfigurationNetwork(Configuration(loader),
+                                            dict(network_item, mtu=9000))
+        network = Network(CloubedStub(), network_conf)
+        xml = parseString(network.toxml())
+        self.assertEqual(
+            xml.getElementsByTagName('mtu')[0].getAttribute('size'), '9000')
+        self.assertEqual(
+            network.get_templates_dict()['network.test_network_name.mtu'],
+            '9000')
+
+class TestNetworkTftp(CloubedTestCase):
+
+    def test_xml_tftp(self):
+        """
+            Network.toxml() should set the TFTP root only when the PXE files
+            are served by libvirt
+        """
+        loader = MockConfigurationLoader(conf_minimal)
+        for tftp, elements, root in [ ('libvirt', 1, None),
+                                      ('internal', 0, '/srv/tftp') ]:
+            network_conf = ConfigurationNetwork(Configuration(loader),
+                                                dict(network_item,
+                                                     pxe='/srv/tftp/boot.ipxe',
+                                                     tftp=tftp))
+            network = Network(CloubedStub(), network_conf)
+            xml = parseString(network.toxml())
+            self.assertEqual(len(xml.getElementsByTagName('tftp')), elements)
+            self.assertEqual(
+                xml.getElementsByTagName('bootp')[0].getAttribute('file'),
+                'boot.ipxe')
+            self.assertEqual(network.get_internal_tftp_root(), root)
+
+class TestNetworkHTTPProxy(CloubedTestCase):
+
+    def test_templates_http_proxy(self):
+        """
+            Network.get_templates_dict() should give the URL of the caching
+            proxy of the HTTP server only if it is enabled
+        """
+        for (http_server, expected) in [ ({}, None),
+                                         ({ 'proxy': True },
+                                          'http://10.0.0.1:5432') ]:
+            loader = MockConfigurationLoader(dict(conf_minimal,
+                                                  httpserver=http_server))
+            network_conf = ConfigurationNetwork(Configuration(loader),
+                                                network_item)
+            network = Network(CloubedStub(), network_conf)
+            self.assertEqual(network.get_templates_dict() \
+                                 .get('network.test_network_name.http_proxy'),
+                             expected)
+
+    def test_http_root(self):
+        """
+            Network.get_http_root() should give the directory served by the
+            HTTP server on the network, or None if the server does not listen
+            on the network
+        """
+        for (http_server, expected) in [ ({}, os.getcwd()),
+                                         ({ 'roots': { 'test_network_name':
+                                                           '/srv/http' } },
+                                          '/srv/http'),
+                                         ({ 'networks': [] }, None) ]:
+            loader = MockConfigurationLoader(dict(conf_minimal,
+                                                  networks=[dict(network_item)],
+                                                  httpserver=http_server))
+            network_conf = Configuration(loader).networks[0]
+            network = Network(CloubedStub(), network_conf)
+            self.assertEqual(network.get_http_root(), expected)
+            self.assertEqual(network.get_templates_dict() \
+                                 .get('network.test_network_name.http_server'),
+                             expected and 'http://10.0.0.1:5432')
+
+class TestNetworkDirect(CloubedTestCase):
+
+    def setUp(self):
+        loader = MockConfigurationLoader(conf_minimal)
+        network_conf = ConfigurationNetwork(Configuration(loader),
+                                            { 'name': 'test_network_name',
+                                              'forward': 'direct',
+                                              'interface': 'fail0',
+                                              'mode': 'vepa' })
+        self.network = Network(CloubedStub(), network_conf)
+
+    def test_xml_direct(self):
+        """
+            Network.toxml() should set the macvtap mode and the host interface
+            in the forward element, without bridge element
+        """
+        xml = parseString(self.network.toxml())
+        self.assertEqual(xml.getElementsByTagName('bridge'), [])
+        forward = xml.getElementsByTagName('forward')[0]
+        self.assertEqual(forward.getAttribute('mode'), 'vepa')
+        self.assertEqual(
+            forward.getElementsByTagName('interface')[0].getAttribute('dev'),
+            'fail0')
+        self.assertEqual(self.network.get_direct_source(), ('fail0', 'vepa'))
+
+    def test_create_missing_interface(self):
+        """
+            Network.create() should raise CloubedException if the host
+            interface does not exist
+        """
+        self.assertRaisesRegex(CloubedException,
+                               "host network interface fail0 of network " \
+                               "test_network_name does not exist",
+                               self.network.create)
+
+class TestNetworkBandwidth(CloubedTestCase):
+
+    def test_bandwidth_element(self):
+        """
+            Network.bandwidth_element() should return the bandwidth element of
+            the QoS class with the defined directions and parameters
+        """
+        loader = MockConfigurationLoader(conf_minimal)
+        qos = ConfigurationQos(Configuration(loader),
+                               { 'name': 'test_qos_name',
+                                 'outbound': { 'average': 128,
+                                               'burst': 256 } })
+        element = Network.bandwidth_element(Document(), qos)
+        self.assertEqual(element.toxml(),
+                         '<bandwidth><outbound average="128" burst="256"/>' \
+                         '</bandwidth>')
+
+loadtestcase(TestNetworkHosts)
+loadtestcase(TestNetworkMtu)
+loadtestcase(TestNetworkTftp)
+loadtestcase(TestNetworkHTTPProxy)
+loadtestcase(TestNetworkDirect)
+loadtestcase(TestNetworkBandwidth)
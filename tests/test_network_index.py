@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+
+from CloubedTests import *
+
+from cloubed.NetworkIndex import NetworkIndex
+
+class TestNetworkIndex(CloubedTestCase):
+
+    def setUp(self):
+
+        self.index = NetworkIndex()
+        self.index.add('net1', '10.0.0.1', '255.255.255.0')
+        self.index.add('net2', '10.0.2.1', '255.255.255.0')
+        self.index.add('net3', '192.168.0.1', '255.255.0.0')
+
+    def test_interval(self):
+        """
+            NetworkIndex.interval() should return the integer range of the
+            network or None if address or netmask are not valid
+        """
+        self.assertEqual(NetworkIndex.interval('10.0.0.12', '255.255.255.0'),
+                         (167772160, 167772415))
+        self.assertIsNone(NetworkIndex.interval('10.0.0.300', '255.255.255.0'))
+        self.assertIsNone(NetworkIndex.interval(None, None))
+
+    def test_conflict(self):
+        """
+            NetworkIndex.conflict() should return the name of an indexed
+            network which overlaps the network
+        """
+        self.assertEqual(self.index.conflict('10.0.2.254', '255.255.255.0'),
+                         'net2')
+        self.assertEqual(self.index.conflict('192.168.42.1', '255.255.255.0'),
+                         'net3')
+        self.assertIn(self.index.conflict('10.0.0.1', '255.0.0.0'),
+                      ['net1', 'net2'])
+
+    def test_conflict_none(self):
+        """
+            NetworkIndex.conflict() should return None if no indexed network
+            overlaps the network or if its settings are not valid
+        """
+        self.assertIsNone(self.index.conflict('10.0.1.1', '255.255.255.0'))
+        self.assertIsNone(self.index.conflict('9.0.0.1', '255.255.255.0'))
+        self.assertIsNone(self.index.conflict('172.16.0.1', '255.255.255.0'))
+        self.assertIsNone(self.index.conflict(None, None))
+
+    def test_conflict_nested(self):
+        """
+            NetworkIndex.conflict() should find a large network which starts
+            before a smaller indexed network
+        """
+        self.index.add('net4', '172.16.0.1', '255.240.0.0')
+        self.index.add('net5', '172.16.1.1', '255.255.255.0')
+        self.assertEqual(self.index.conflict('172.20.0.1', '255.255.255.0'),
+                         'net4')
+
+    def test_remove(self):
+        """
+            NetworkIndex.remove() should remove the network out of the index
+        """
+        self.index.remove('net2')
+        self.assertIsNone(self.index.conflict('10.0.2.1', '255.255.255.0'))
+        self.assertEqual(self.index.conflict('10.0.0.1', '255.255.0.0'),
+                         'net1')
+        # removing unknown network does nothing
+        self.index.remove('fail')
+
+    def test_add_replace(self):
+        """
+            NetworkIndex.add() should replace the range of a network already
+            indexed
+        """
+        self.index.add('net1', '10.0.1.1', '255.255.255.0')
+        self.assertIsNone(self.index.conflict('10.0.0.1', '255.255.255.0'))
+        self.assertEqual(self.index.conflict('10.0.1.1', '255.255.255.0'),
+                         'net1')
+
+loadtestcase(TestNetworkIndex)
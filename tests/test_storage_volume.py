@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+
+import os
+import mock
+import tempfile
+from xml.dom.minidom import parseString
+
+from CloubedTests import *
+
+from cloubed.StorageVolume import StorageVolume
+from cloubed.CloubedException import CloubedException
+from cloubed.Utils import getuser
+
+class StoragePoolStub:
+
+    def __init__(self, path):
+        self.name = 'pool'
+        self.path = path
+
+class StorageVolumeConfStub:
+
+    def __init__(self, name, imgtype='qcow2', backing=None):
+        self.name = name
+        self.storage_pool = 'pool'
+        self.testbed = 'tb'
+        self.size = 10
+        self.format = imgtype
+        self.backing = backing
+        self.backing_cache = False
+
+class CloubedStub:
+
+    def __init__(self, path):
+        self.ctl = mock.Mock()
+        self.storage_pool = StoragePoolStub(path)
+        self.storage_volumes = {}
+
+    def get_storage_pool_by_name(self, name):
+        return self.storage_pool
+
+    def get_storage_volume_by_name(self, name):
+        return self.storage_volumes[name]
+
+    def get_timeline(self):
+        return mock.MagicMock()
+
+class TestStorageVolume(CloubedTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.tbd = CloubedStub(self.tmpdir.name)
+        self.ctl = self.tbd.ctl
+        self.base = self.__storage_volume('base')
+        self.volume = self.__storage_volume('vol', backing='base')
+        self.raw = self.__storage_volume('raw', imgtype='raw')
+        # the storage volume found in libvirt
+        self.found = mock.Mock()
+        self.ctl.find_storage_volume.return_value = self.found
+
+    def __storage_volume(self, name, imgtype='qcow2', backing=None):
+        conf = StorageVolumeConfStub(name, imgtype, backing)
+        storage_volume = StorageVolume(self.tbd, conf)
+        self.tbd.storage_volumes[name] = storage_volume
+        return storage_volume
+
+    def __touch(self, path):
+        with open(path, 'wb') as pool_file:
+            pool_file.write(b'data')
+
+    def __created_backing(self):
+        """Returns the path of the backing of the single storage volume
+           created in libvirt
+        """
+        self.ctl.create_storage_volume.assert_called_once()
+        (pool, xml) = self.ctl.create_storage_volume.call_args[0]
+        self.assertIs(pool, self.tbd.storage_pool)
+        doc = parseString(xml)
+        self.assertEqual(doc.getElementsByTagName('name')[0].firstChild.data,
+                         self.volume.getfilename())
+        backing = doc.getElementsByTagName('backingStore')[0]
+        return backing.getElementsByTagName('path')[0].firstChild.data
+
+    def test_getbaselinepath(self):
+        """
+            StorageVolume.getbaselinepath() should return the path of the
+            baseline next to the storage volume
+        """
+        self.assertEqual(self.volume.getbaselinepath(),
+                         os.path.join(self.tmpdir.name,
+                                      "{user}:tb:vol-baseline.qcow2" \
+                                          .format(user=getuser())))
+
+    def test_resettable(self):
+        """
+            StorageVolume.resettable() should return True only for qcow2
+            storage volumes with a backing volume or a baseline
+        """
+        self.assertTrue(self.volume.resettable())
+        self.assertFalse(self.base.resettable())
+        self.assertFalse(self.raw.resettable())
+        self.__touch(self.base.getbaselinepath())
+        self.assertTrue(self.base.resettable())
+        self.__touch(self.raw.getbaselinepath())
+        self.assertFalse(self.raw.resettable())
+
+    def test_reset_backing(self):
+        """
+            StorageVolume.reset() should re-create the top overlay over the
+            backing volume when there is no baseline
+        """
+        self.volume.reset()
+        self.ctl.find_storage_volume.assert_called_once_with(
+            self.tbd.storage_pool, self.volume.getfilename())
+        self.found.delete.assert_called_once_with(0)
+        self.assertEqual(self.__created_backing(), self.base.getpath())
+
+    def test_reset_baseline(self):
+        """
+            StorageVolume.reset() should only re-create the top overlay over
+            the baseline, the baseline being kept
+        """
+        self.__touch(self.volume.getbaselinepath())
+        self.volume.reset()
+        self.ctl.find_storage_volume.assert_called_once_with(
+            self.tbd.storage_pool, self.volume.getfilename())
+        self.found.delete.assert_called_once_with(0)
+        self.assertEqual(self.__created_backing(),
+                         self.volume.getbaselinepath())
+        self.assertTrue(os.path.exists(self.volume.getbaselinepath()))
+
+    def test_reset_not_resettable(self):
+        """
+            StorageVolume.reset() should raise CloubedException if the storage
+            volume has neither baseline nor backing volume
+        """
+        self.assertRaisesRegex(CloubedException,
+                               'unable to reset storage volume base since ' \
+                               'it has neither baseline nor backing volume',
+                               self.base.reset)
+        self.ctl.create_storage_volume.assert_not_called()
+
+    def test_make_baseline(self):
+        """
+            StorageVolume.make_baseline() should rename the file of the
+            storage volume into its baseline, refresh the storage pool and
+            create a new overlay backed by the baseline
+        """
+        self.__touch(self.volume.getpath())
+        self.volume.make_baseline()
+        self.assertFalse(os.path.exists(self.volume.getpath()))
+        self.assertTrue(self.volume.has_baseline())
+        self.ctl.refresh_storage_pool.assert_called_once_with(
+            self.tbd.storage_pool)
+        self.assertEqual(self.__created_backing(),
+                         self.volume.getbaselinepath())
+
+    def test_make_baseline_invalid(self):
+        """
+            StorageVolume.make_baseline() should raise CloubedException if the
+            storage volume is not qcow2, already has a baseline or is not
+            found in libvirt
+        """
+        self.assertRaisesRegex(CloubedException,
+                               'unable to record baseline of storage volume ' \
+                               'raw since its format is not qcow2',
+                               self.raw.make_baseline)
+        self.ctl.find_storage_volume.return_value = None
+        self.assertRaisesRegex(CloubedException,
+                               'unable to record baseline of storage volume ' \
+                               'vol since not found in libvirt',
+                               self.volume.make_baseline)
+        self.__touch(self.volume.getbaselinepath())
+        self.assertRaisesRegex(CloubedException,
+                               'storage volume vol already has a baseline',
+                               self.volume.make_baseline)
+        self.ctl.refresh_storage_pool.assert_not_called()
+        self.ctl.create_storage_volume.assert_not_called()
+
+loadtestcase(TestStorageVolume)
@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+
+import os
+import mock
+import tempfile
+
+from CloubedTests import *
+from Mock import MockLibvirt, MockLibvirtStorageVolume
+
+from cloubed.VirtController import VirtController
+from cloubed.StorageVolumeTransfer import StorageVolumeTransfer
+from cloubed.CloubedException import CloubedException, \
+                                     CloubedControllerException
+
+class TestStorageVolumeTransfer(CloubedTestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.src = os.path.join(self.tmpdir.name, "src.img")
+        self.dst = os.path.join(self.tmpdir.name, "dst.img")
+
+        # sparse file: 1MiB hole, 64KiB data, 1MiB trailing hole
+        with open(self.src, 'wb') as src:
+            src.seek(1024**2)
+            src.write(b'x' * 64 * 1024)
+            src.truncate(2 * 1024**2 + 64 * 1024)
+
+        patcher_open = mock.patch('libvirt.open', MockLibvirt.open)
+        patcher_open.start()
+        self.addCleanup(patcher_open.stop)
+        self.ctl = VirtController()
+        self.volume = MockLibvirtStorageVolume('test')
+        patcher_find = mock.patch.object(self.ctl, 'find_storage_volume',
+                                         return_value=self.volume)
+        patcher_find.start()
+        self.addCleanup(patcher_find.stop)
+
+    def __upload(self):
+        """Uploads src in the volume through VirtController and returns the
+           transfer and the stream.
+        """
+        src = StorageVolumeTransfer('test', self.src, 'import')
+        src.open()
+        try:
+            self.ctl.upload_storage_volume(None, 'test', src)
+        finally:
+            src.close()
+        return (src, self.ctl.conn.streams[-1])
+
+    def __download(self):
+        """Downloads the volume in dst through VirtController and returns the
+           transfer and the stream.
+        """
+        dst = StorageVolumeTransfer('test', self.dst, 'export')
+        dst.open()
+        try:
+            self.ctl.download_storage_volume(None, 'test', dst)
+        finally:
+            dst.close()
+        return (dst, self.ctl.conn.streams[-1])
+
+    def __copy(self):
+        """Copies src to dst through the volume with the sparse streams of
+           VirtController.
+        """
+        (src, _) = self.__upload()
+        (dst, _) = self.__download()
+        return (src, dst)
+
+    def test_open_import_total(self):
+        """
+            StorageVolumeTransfer.open() should set the total size of the file
+            to import
+        """
+        transfer = StorageVolumeTransfer('test', self.src, 'import')
+        transfer.open()
+        self.assertEqual(transfer.total, 2 * 1024**2 + 64 * 1024)
+        transfer.close()
+
+    def test_open_error(self):
+        """
+            StorageVolumeTransfer.open() should raise CloubedException if the
+            file could not be opened
+        """
+        transfer = StorageVolumeTransfer('test',
+                                         os.path.join(self.tmpdir.name, "fail"),
+                                         'import')
+        self.assertRaisesRegex(CloubedException,
+                               "unable to open file .*/fail for import of " \
+                               "storage volume test",
+                               transfer.open)
+
+    def test_copy_content(self):
+        """
+            The content of the file should be kept when transferred through the
+            handlers and holes should not be counted as data
+        """
+        (src, dst) = self.__copy()
+        with open(self.src, 'rb') as f_src, open(self.dst, 'rb') as f_dst:
+            self.assertEqual(f_src.read(), f_dst.read())
+        self.assertEqual(src.progress(), src.total)
+        self.assertEqual(dst.progress(), src.total)
+        # the filesystem may not report holes, in this case everything is data
+        self.assertTrue(src.data >= 64 * 1024)
+        self.assertEqual(src.data, dst.data)
+
+    def test_upload_sparse(self):
+        """
+            VirtController.upload_storage_volume() should send the holes of the
+            local file with sendHole() and all the data even if send() does
+            not send the whole buffer at once
+        """
+        self.ctl.conn.newStream(0).max_send = 1000
+        stream = self.ctl.conn.streams[-1]
+        with mock.patch.object(self.ctl.conn, 'newStream',
+                               return_value=stream):
+            (src, _) = self.__upload()
+        self.assertTrue(stream.finished)
+        data = b''.join(content for (kind, content) in stream.segments \
+                        if kind == 'data')
+        holes = sum(content for (kind, content) in stream.segments \
+                    if kind == 'hole')
+        self.assertTrue(all(len(content) <= 1000 \
+                            for (kind, content) in stream.segments \
+                            if kind == 'data'))
+        self.assertEqual(len(data), src.data)
+        self.assertEqual(holes, src.holes)
+        self.assertEqual(len(data) + holes, src.total)
+        self.assertIn(b'x' * 64 * 1024, data)
+
+    def test_download_sparse(self):
+        """
+            VirtController.download_storage_volume() should leave the holes
+            received in the stream in the local file, including the trailing
+            one
+        """
+        self.volume.segments = [ ('hole', 1024**2),
+                                 ('data', b'x' * 64 * 1024),
+                                 ('hole', 1024**2) ]
+        (dst, stream) = self.__download()
+        self.assertTrue(stream.finished)
+        self.assertEqual(dst.data, 64 * 1024)
+        self.assertEqual(dst.holes, 2 * 1024**2)
+        with open(self.src, 'rb') as f_src, open(self.dst, 'rb') as f_dst:
+            self.assertEqual(f_src.read(), f_dst.read())
+
+    def test_transfer_abort(self):
+        """
+            VirtController.upload_storage_volume() and
+            download_storage_volume() should abort the stream and raise
+            CloubedControllerException on libvirt error
+        """
+        self.volume.segments = [ ('data', b'x' * 1024) ]
+        for transfer in [ self.__upload, self.__download ]:
+            stream = self.ctl.conn.newStream(0)
+            stream.fail = True
+            with mock.patch.object(self.ctl.conn, 'newStream',
+                                   return_value=stream):
+                self.assertRaisesRegex(CloubedControllerException,
+                                       'stream failure',
+                                       transfer)
+            self.assertTrue(stream.aborted)
+            self.assertFalse(stream.finished)
+
+loadtestcase(TestStorageVolumeTransfer)
@@ -0,0 +1,161 @@
+#!/usr/bin/python3
+
+import os
+import socket
+import struct
+import time
+import tempfile
+import threading
+
+from CloubedTests import *
+
+from cloubed.TFTPServer import TFTPServer
+
+class TFTPClient():
+
+    """Minimal TFTP client which acknowledges the last block of each window"""
+
+    def __init__(self, port):
+
+        self.port = port
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.settimeout(5)
+        self.drop = None # number of a block to drop once
+
+    def close(self):
+
+        self.sock.close()
+
+    def get(self, filename, options={}):
+        """Returns the tuple (OACK options, content) or (error code, None)"""
+
+        request = struct.pack("!H", 1) + filename.encode('ascii') + \
+                  b'\0octet\0'
+        for name, value in options.items():
+            request += "{0}\0{1}\0".format(name, value).encode('ascii')
+        self.sock.sendto(request, ('127.0.0.1', self.port))
+
+        blksize = int(options.get('blksize', 512))
+        windowsize = int(options.get('windowsize', 1))
+        accepted = {}
+        blocks = []
+        received = 0
+        while True:
+            (packet, server) = self.sock.recvfrom(70000)
+            (opcode,) = struct.unpack("!H", packet[:2])
+            if opcode == 5:
+                return (struct.unpack("!H", packet[2:4])[0], None)
+            if opcode == 6:
+                fields = packet[2:].split(b'\0')[:-1]
+                accepted = { fields[i].decode(): fields[i + 1].decode() \
+                             for i in range(0, len(fields), 2) }
+                blksize = int(accepted.get('blksize', 512))
+                windowsize = int(accepted.get('windowsize', 1))
+                self.sock.sendto(struct.pack("!HH", 4, 0), server)
+                continue
+            (number,) = struct.unpack("!H", packet[2:4])
+            if number == self.drop:
+                self.drop = None
+                continue
+            if number != (received + 1) & 0xffff:
+                continue
+            received += 1
+            blocks.append(packet[4:])
+            last = len(packet) - 4 < blksize
+            if last or received % windowsize == 0:
+                self.sock.sendto(struct.pack("!HH", 4, number), server)
+            if last:
+                return (accepted, b''.join(blocks))
+
+class TestTFTPServer(CloubedTestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.content = os.urandom(300000)
+        with open(os.path.join(self.tmpdir.name, 'initrd.img'), 'wb') as img:
+            img.write(self.content)
+
+        self.server = TFTPServer(port=0)
+        self.server.launch('127.0.0.1', self.tmpdir.name)
+        self.addCleanup(self.server.terminate)
+
+    def __stats(self, key, value):
+        """Waits for the server to record the transfers acknowledged by the
+           clients and returns the stats value of key
+        """
+        for _ in range(50):
+            stats = self.server.stats.get('127.0.0.1', {})
+            if stats.get(key) == value:
+                break
+            time.sleep(0.1)
+        return stats.get(key)
+
+    def __client(self):
+        client = TFTPClient(self.server.port)
+        self.addCleanup(client.close)
+        return client
+
+    def test_get(self):
+        """
+            TFTPServer should send files with the default block size if the
+            client does not request any option
+        """
+        (accepted, content) = self.__client().get('initrd.img')
+        self.assertEqual(accepted, {})
+        self.assertEqual(content, self.content)
+        self.assertEqual(self.__stats('bytes', len(self.content)),
+                         len(self.content))
+
+    def test_options(self):
+        """
+            TFTPServer should negotiate blksize, windowsize and tsize options
+            and send again the blocks lost in a window
+        """
+        client = self.__client()
+        client.drop = 5
+        # a window of large blocks would overflow the default receive buffer
+        # of the client socket
+        (accepted, content) = client.get('/initrd.img',
+                                         { 'blksize': 1428,
+                                           'windowsize': 100,
+                                           'tsize': 0 })
+        self.assertEqual(accepted, { 'blksize': '1428',
+                                     'windowsize': '64',
+                                     'tsize': str(len(self.content)) })
+        self.assertEqual(content, self.content)
+
+    def test_errors(self):
+        """
+            TFTPServer should answer errors for missing files, files out of
+            the root directory and write requests
+        """
+        client = self.__client()
+        self.assertEqual(client.get('fail.img'), (1, None))
+        self.assertEqual(client.get('../../etc/passwd'), (1, None))
+        client.sock.sendto(struct.pack("!H", 2) + b'initrd.img\0octet\0',
+                           ('127.0.0.1', self.server.port))
+        (packet, _) = client.sock.recvfrom(512)
+        self.assertEqual(struct.unpack("!HH", packet[:4]), (5, 2))
+
+    def test_concurrent(self):
+        """
+            TFTPServer should serve multiple clients concurrently
+        """
+        results = []
+        def fetch():
+            client = TFTPClient(self.server.port)
+            (_, content) = client.get('initrd.img', { 'blksize': 1428,
+                                                      'windowsize': 16 })
+            results.append(content == self.content)
+            client.close()
+        threads = [ threading.Thread(target=fetch) for _ in range(8) ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [ True ] * 8)
+        self.assertEqual(self.__stats('transfers', 8), 8)
+
+loadtestcase(TestTFTPServer)
@@ -0,0 +1,199 @@
+#!/usr/bin/python3
+
+import os
+import asyncio
+import tempfile
+import threading
+
+from CloubedTests import *
+
+from cloubed.Timeline import Timeline
+
+class TestTimeline(CloubedTestCase):
+
+    def setUp(self):
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, '.cloubed',
+                                 'timeline.jsonl')
+        self.timeline = Timeline(self.path)
+        self.addCleanup(self.timeline.close)
+
+    @staticmethod
+    def __span(phase, name, domain, start, duration, parent=None):
+        return { 'id': "1.{phase}.{name}".format(phase=phase, name=name),
+                 'parent': parent,
+                 'phase': phase,
+                 'name': name,
+                 'domain': domain,
+                 'time': start,
+                 'start': int(start * 1e9),
+                 'duration': int(duration * 1e9),
+                 'thread': 1 }
+
+    def __serve(self, path):
+        with self.timeline.span('http', path):
+            pass
+
+    def test_span(self):
+        """
+            Timeline.span() should record the spans when they are closed,
+            with the domain and the id of their parent, in the same thread
+            only
+        """
+        with self.timeline.span('boot', 'node1', domain='node1'):
+            with self.timeline.span('volume', 'disk1'):
+                pass
+            thread = threading.Thread(target=self.__serve, args=('/a',))
+            thread.start()
+            thread.join()
+            with self.timeline.span('network', 'lan', reset=True) as span:
+                span['created'] = True
+            try:
+                with self.timeline.span('domain', 'node1'):
+                    raise ValueError
+            except ValueError:
+                pass
+        with self.timeline.span('http', '/b', client='10.0.0.1'):
+            pass
+
+        spans = self.timeline.read()
+        self.assertEqual([ (span['phase'], span['domain']) for span in spans ],
+                         [ ('boot', 'node1'),
+                           ('volume', 'node1'),
+                           ('http', None),
+                           ('network', 'node1'),
+                           ('domain', 'node1'),
+                           ('http', None) ])
+        (boot, volume, thread_http, network, domain, http) = spans
+        self.assertIsNone(thread_http['parent'])
+        self.assertIsNone(boot['parent'])
+        self.assertEqual(volume['parent'], boot['id'])
+        self.assertTrue(network['reset'])
+        self.assertTrue(network['created'])
+        self.assertTrue(domain['failed'])
+        self.assertIsNone(http['parent'])
+        self.assertEqual(http['client'], '10.0.0.1')
+        self.assertGreaterEqual(boot['duration'],
+                                volume['duration'] + network['duration'])
+
+        self.timeline.clear()
+        self.assertEqual(self.timeline.read(), [])
+
+    async def __wait(self, name, first, second):
+        with self.timeline.span('wait', name):
+            await first.wait()
+            second.set()
+
+    async def __wait_all(self):
+        with self.timeline.span('boot', 'node1', domain='node1'):
+            (event_a, event_b) = (asyncio.Event(), asyncio.Event())
+            task_a = asyncio.ensure_future(self.__wait('A', event_a, event_b))
+            await asyncio.sleep(0)
+        # B is opened while A is still opened in another task and A is closed
+        # before B
+        task_b = asyncio.ensure_future(self.__wait('B', event_b, event_a))
+        await asyncio.sleep(0)
+        event_a.set()
+        await asyncio.gather(task_a, task_b)
+
+    def test_span_async(self):
+        """
+            Timeline.span() should record the spans of concurrent asyncio
+            tasks with the parent of their own task
+        """
+        asyncio.run(self.__wait_all())
+        spans = { span['name']: span for span in self.timeline.read() }
+        self.assertEqual(spans['A']['parent'], spans['node1']['id'])
+        self.assertEqual(spans['A']['domain'], 'node1')
+        self.assertIsNone(spans['B']['parent'])
+        self.assertIsNone(spans['B']['domain'])
+        # A remains a leaf span
+        self.assertNotIn(spans['A']['id'],
+                         [ span['parent'] for span in spans.values() ])
+
+    def test_rotate(self):
+        """
+            Timeline.append() should rotate the timeline when it exceeds its
+            maximum size and Timeline.read() should return the spans of both
+        """
+        self.timeline.max_size = 1024
+        for index in range(20):
+            self.timeline.append(self.__span('http', str(index), None,
+                                             index, 1))
+        self.assertTrue(os.path.exists(self.path + '.1'))
+        self.assertLessEqual(os.stat(self.path).st_size, 1024)
+        names = [ span['name'] for span in self.timeline.read() ]
+        self.assertEqual(names, sorted(names, key=int))
+        self.assertEqual(names[-1], '19')
+
+    def test_phases(self):
+        """
+            Timeline.phases() should sum the durations of the spans by domain
+            and phase
+        """
+        spans = [ self.__span('boot', 'node1', 'node1', 0, 10),
+                  self.__span('volume', 'disk1', 'node1', 0, 4),
+                  self.__span('volume', 'disk2', 'node1', 4, 5),
+                  self.__span('boot', 'node2', 'node2', 10, 2),
+                  self.__span('http', '/a', None, 12, 1) ]
+        self.assertEqual(Timeline.phases(spans),
+                         { 'node1': { 'boot': { 'count': 1,
+                                                'duration': 10.0 },
+                                      'volume': { 'count': 2,
+                                                  'duration': 9.0 } },
+                           'node2': { 'boot': { 'count': 1,
+                                                'duration': 2.0 } },
+                           None: { 'http': { 'count': 1,
+                                             'duration': 1.0 } } })
+
+    def test_critical_path(self):
+        """
+            Timeline.critical_path() should return the chain of innermost
+            spans ending last with the idle time before each of them
+        """
+        boot = self.__span('boot', 'node1', 'node1', 0, 10)
+        spans = [ boot,
+                  self.__span('volume', 'disk1', 'node1', 0, 4,
+                              boot['id']),
+                  self.__span('network', 'lan', 'node1', 4, 2, boot['id']),
+                  self.__span('domain', 'node1', 'node1', 6, 4, boot['id']),
+                  self.__span('volume', 'disk2', 'node2', 10, 1),
+                  self.__span('wait', 'STOPPED_SHUTDOWN', 'node1', 12, 100),
+                  self.__span('http', '/a', 'node1', 20, 1),
+                  self.__span('wait', 'STARTED_BOOTED', 'node2', 12, 50) ]
+        path = Timeline.critical_path(spans)
+        self.assertEqual([ (span['phase'], span['name'], idle) \
+                           for (span, idle) in path ],
+                         [ ('volume', 'disk1', 0.0),
+                           ('network', 'lan', 0.0),
+                           ('domain', 'node1', 0.0),
+                           ('volume', 'disk2', 0.0),
+                           ('wait', 'STOPPED_SHUTDOWN', 1.0) ])
+        self.assertEqual(Timeline.critical_path([]), [])
+
+    def test_chrome_trace(self):
+        """
+            Timeline.chrome_trace() should return the complete events of the
+            spans in microseconds with one process per domain
+        """
+        spans = [ self.__span('boot', 'node1', 'node1', 5, 10),
+                  self.__span('http', '/a', None, 6, 0.5) ]
+        spans[1]['client'] = '10.0.0.1'
+        trace = Timeline.chrome_trace(spans)
+        metadata = [ event for event in trace['traceEvents'] \
+                     if event['ph'] == 'M' ]
+        self.assertEqual([ event['args']['name'] for event in metadata ],
+                         [ 'node1', 'testbed' ])
+        events = [ event for event in trace['traceEvents'] \
+                   if event['ph'] == 'X' ]
+        self.assertEqual([ (event['name'], event['ts'], event['dur'],
+                            event['pid'], event['args']) \
+                           for event in events ],
+                         [ ('boot node1', 0.0, 10e6, 1, {}),
+                           ('http /a', 1e6, 0.5e6, 2,
+                            { 'client': '10.0.0.1' }) ])
+        self.assertEqual(Timeline.chrome_trace([])['traceEvents'], [])
+
+loadtestcase(TestTimeline)
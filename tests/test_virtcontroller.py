@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 
 import mock
+import libvirt
 from CloubedTests import *
 from cloubed.VirtController import VirtController
 from cloubed.StoragePool import StoragePool
@@ -150,6 +151,31 @@ class TestVirtControllerMethods(CloubedTestCase):
         xml = "<network><name>network_name</name></network>"
         self.ctl.create_network(xml)
 
+    def test_network_is_active(self):
+        """Checks that VirtController.network_is_active() returns True only if
+           the network exists and is active
+        """
+
+        self.assertFalse(self.ctl.network_is_active('fail'))
+
+        network = MockLibvirtNetwork('net1')
+        self.ctl.conn.networks = [ network, ]
+        self.assertTrue(self.ctl.network_is_active('net1'))
+        network.active = False
+        self.assertFalse(self.ctl.network_is_active('net1'))
+
+    def test_undefine_network(self):
+        """Checks that VirtController.undefine_network() undefines the network
+           if it exists and ignores it otherwise
+        """
+
+        self.ctl.undefine_network('fail')
+
+        network = MockLibvirtNetwork('net1')
+        self.ctl.conn.defined_networks = [ network, ]
+        self.ctl.undefine_network('net1')
+        self.assertTrue(network.undefined)
+
     def test_find_domain(self):
         """Checks that VirtController.find_domain() finds the domain if existing
            else None
@@ -165,6 +191,58 @@ class TestVirtControllerMethods(CloubedTestCase):
         self.assertIsNot(self.ctl.find_domain('domain2'), None)
         self.assertIs(self.ctl.find_domain('domain3'), None)
 
+    def test_commit_domain_disk(self):
+        """Checks that VirtController.commit_domain_disk() pivots the disk
+           only once the block job is ready, and raises
+           CloubedControllerException if the job disappears
+        """
+
+        domain = MockLibvirtDomain(0, 'domain1')
+        self.ctl.conn.domains = [ domain ]
+        self.ctl.conn.defined_domains = []
+        # the job is not measured yet, then merged but not ready yet
+        domain.block_job_steps['vda'] = [ ({ 'cur': 0, 'end': 0 }, False),
+                                          ({ 'cur': 50, 'end': 100 }, False),
+                                          ({ 'cur': 100, 'end': 100 }, False),
+                                          ({ 'cur': 100, 'end': 100 }, True) ]
+        with mock.patch('time.sleep') as sleep_m:
+            self.ctl.commit_domain_disk('domain1', 'vda', '/base', '/top')
+        self.assertEqual(domain.pivoted, [ 'vda' ])
+        self.assertEqual(sleep_m.call_count, 3)
+
+        domain.block_job_steps['vdb'] = [ ({ 'cur': 0, 'end': 0 }, False),
+                                          ({}, False) ]
+        with mock.patch('time.sleep'):
+            self.assertRaisesRegex(CloubedControllerException,
+                                   "commit of disk vdb of domain domain1 " \
+                                   "aborted",
+                                   self.ctl.commit_domain_disk,
+                                   'domain1', 'vdb', '/base', '/top')
+        self.assertEqual(domain.pivoted, [ 'vda' ])
+
+    def test_commit_domain_disk_timeout(self):
+        """Checks that VirtController.commit_domain_disk() aborts the block
+           job and raises CloubedControllerException if the job is not ready
+           before the timeout
+        """
+
+        domain = MockLibvirtDomain(0, 'domain1')
+        self.ctl.conn.domains = [ domain ]
+        self.ctl.conn.defined_domains = []
+        # the job is stuck
+        domain.block_job_steps['vda'] = [ ({ 'cur': 50, 'end': 100 }, False) ]
+        clock = iter(range(0, 1000, 5))
+        with mock.patch('time.sleep'), \
+             mock.patch('time.monotonic', side_effect=lambda: next(clock)):
+            self.assertRaisesRegex(CloubedControllerException,
+                                   "commit of disk vda of domain domain1 " \
+                                   "timed out after 30 seconds",
+                                   self.ctl.commit_domain_disk,
+                                   'domain1', 'vda', '/base', '/top',
+                                   timeout=30)
+        self.assertEqual(domain.block_jobs, {})
+        self.assertEqual(domain.pivoted, [])
+
     def test_create_domain(self):
         """Checks that VirtController.create_domain() does not raise any
            issue
@@ -187,6 +265,27 @@ class TestVirtControllerMethods(CloubedTestCase):
             pass
         self.ctl.domain_event_register(handler)
 
+    def test_domain_event_register_dispatch(self):
+        """Checks that VirtController.domain_event_register() registers all
+           event IDs and calls the handler with the name of the event ID and
+           the specific arguments of its callback
+        """
+
+        events = []
+        def handler(dom, event_id, args):
+            events.append((dom, event_id, args))
+        callback_ids = self.ctl.domain_event_register(handler)
+        callbacks = self.ctl.conn.event_callbacks
+        self.assertEqual(len(callback_ids),
+                         len(VirtController.domain_event_ids))
+        for (event_id, callback) in callbacks:
+            if event_id == libvirt.VIR_DOMAIN_EVENT_ID_REBOOT:
+                callback(self.ctl.conn, 'dom', 'opaque')
+            elif event_id == libvirt.VIR_DOMAIN_EVENT_ID_BLOCK_JOB:
+                callback(self.ctl.conn, 'dom', 'vda', 1, 0, 'opaque')
+        self.assertEqual(events, [ ('dom', 'REBOOT', ()),
+                                   ('dom', 'BLOCK_JOB', ('vda', 1, 0)) ])
+
 class TestVirtControllerStaticMethods(CloubedTestCase):
 
     def test_event_register(self):